@@ -1,30 +1,40 @@
 ﻿from collections.abc import Generator
 
-from fastapi import Depends, HTTPException, status
+from fastapi import Depends, HTTPException, Query, Request, Response, status
 from fastapi.security import OAuth2PasswordBearer
 from jose import JWTError, jwt
 from pydantic import ValidationError
-from sqlalchemy.orm import Session
+from sqlalchemy.orm import Session, sessionmaker
 
 from app.core.config import settings
-from app.db.session import get_session
+from app.db.session import SessionLocal, get_session
 from app.models import User
 from app.schemas.auth import TokenPayload
+from app.services.graph_versions import etag_matches
+from app.services.principal_cache import Principal, principal_cache
 
 oauth2_scheme = OAuth2PasswordBearer(
     tokenUrl="/api/auth/login",
     scopes={"offline_access": "Request refresh token issuance."},
 )
+optional_oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/api/auth/login", auto_error=False)
 
 
 def get_db() -> Generator[Session, None, None]:
     yield from get_session()
 
 
-def get_current_user(
-    session: Session = Depends(get_db),
-    token: str = Depends(oauth2_scheme),
-) -> User:
+def get_session_factory() -> sessionmaker[Session]:
+    """Sessions for handlers that must not hold a connection for the whole response."""
+
+    return SessionLocal
+
+
+def _principal_from_token(session: Session, token: str) -> Principal:
+    cached = principal_cache.get(token)
+    if cached is not None:
+        return cached
+
     credentials_exception = HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="Could not validate credentials",
@@ -37,8 +47,49 @@ def get_current_user(
     except (JWTError, ValidationError) as exc:  # pragma: no cover - simple guard
         raise credentials_exception from exc
 
-    user = session.get(User, int(token_data.sub))
-    if user is None:
+    user_id = int(token_data.sub)
+    generation = principal_cache.generation(user_id)
+    user = session.get(User, user_id)
+    if user is None or not user.is_active:
         raise credentials_exception
 
-    return user
+    principal = Principal.from_user(user)
+    principal_cache.put(token, principal, token_data.exp, generation)
+    return principal
+
+
+def get_current_user(
+    session: Session = Depends(get_db),
+    token: str = Depends(oauth2_scheme),
+) -> Principal:
+    return _principal_from_token(session, token)
+
+
+def get_stream_user(
+    session_factory: sessionmaker[Session] = Depends(get_session_factory),
+    token: str | None = Depends(optional_oauth2_scheme),
+    access_token: str | None = Query(None, description="Bearer token for EventSource clients"),
+) -> Principal:
+    """Authenticate long-lived stream requests, which browsers cannot send headers with.
+
+    The lookup uses its own short-lived session: a ``get_db`` session would stay checked out
+    of the pool until the stream ends.
+    """
+
+    with session_factory() as session:
+        return _principal_from_token(session, token or access_token or "")
+
+
+def conditional_response(
+    request: Request | None,
+    response: Response | None,
+    etag: str,
+) -> Response | None:
+    """Attach ``etag`` to the outgoing response or short-circuit with ``304 Not Modified``."""
+
+    headers = {"ETag": etag, "Cache-Control": "private, no-cache"}
+    if request is not None and etag_matches(request.headers.get("if-none-match"), etag):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+    if response is not None:
+        response.headers.update(headers)
+    return None
@@ -4,7 +4,6 @@ from sqlalchemy.orm import Session
 
 from app.api.deps import get_current_user, get_db
 from app.core.config import settings
-from app.models import User
 from app.schemas.auth import (
     PasswordResetConfirm,
     PasswordResetRequest,
@@ -14,6 +13,7 @@ from app.schemas.auth import (
 from app.schemas.user import UserCreate, UserRead
 from app.services import auth as auth_service
 from app.services import email as email_service
+from app.services.principal_cache import Principal
 
 router = APIRouter()
 
@@ -88,7 +88,7 @@ def password_reset(payload: PasswordResetConfirm, session: Session = Depends(get
 
 
 @router.get("/me", response_model=UserRead)
-def read_current_user(current_user: User = Depends(get_current_user)) -> UserRead:
+def read_current_user(current_user: Principal = Depends(get_current_user)) -> UserRead:
     return UserRead.model_validate(current_user)
 
 
@@ -5,8 +5,8 @@ from sqlalchemy.orm import Session
 
 from app.api.deps import get_current_user, get_db
 from app.api.routes import graph as graph_routes
-from app.models import User
 from app.schemas.graph import EdgeCreate, EdgeRead, EdgeUpdate
+from app.services.principal_cache import Principal
 
 router = APIRouter()
 
@@ -14,7 +14,7 @@ router = APIRouter()
 @router.post("/", response_model=EdgeRead, status_code=status.HTTP_201_CREATED)
 def create_edge(
     payload: EdgeCreate,
-    current_user: User = Depends(get_current_user),
+    current_user: Principal = Depends(get_current_user),
     session: Session = Depends(get_db),
 ) -> EdgeRead:
     return graph_routes.create_edge(payload, current_user, session)
@@ -24,7 +24,7 @@ def create_edge(
 def update_edge(
     edge_id: int,
     payload: EdgeUpdate,
-    current_user: User = Depends(get_current_user),
+    current_user: Principal = Depends(get_current_user),
     session: Session = Depends(get_db),
 ) -> EdgeRead:
     return graph_routes.update_edge(edge_id, payload, current_user, session)
@@ -33,7 +33,7 @@ def update_edge(
 @router.delete("/{edge_id}", status_code=status.HTTP_204_NO_CONTENT, response_class=Response, response_model=None)
 def delete_edge(
     edge_id: int,
-    current_user: User = Depends(get_current_user),
+    current_user: Principal = Depends(get_current_user),
     session: Session = Depends(get_db),
 ) -> None:
     graph_routes.delete_edge(edge_id, current_user, session)
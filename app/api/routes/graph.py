@@ -1,32 +1,81 @@
 from __future__ import annotations
 
+import json
 import logging
-from typing import List, Optional
+from collections.abc import Iterator
+from typing import Any, List, Optional
 
-from fastapi import APIRouter, Depends, HTTPException, Query, Response, status
-from sqlalchemy import delete, select
+from fastapi import APIRouter, Body, Depends, HTTPException, Query, Request, Response, status
+from fastapi.responses import StreamingResponse
+from sqlalchemy import select
 from sqlalchemy.orm import Session, selectinload
 
-from app.api.deps import get_current_user, get_db
-from app.models import Edge, Node, OrganizationMember, Sphere, User
+from app.api.deps import conditional_response, get_current_user, get_db
+from app.core.config import settings
+from app.models import Edge, Node, OrganizationMember, Sphere
 from app.schemas.graph import (
     EDGE_TYPES,
+    MAX_POSITION_UPDATES,
     NODE_STATUSES,
     NODE_TYPES,
+    BatchCreateEdge,
+    BatchCreateNode,
+    BatchDeleteNode,
+    BatchUpdateEdge,
+    BatchUpdateNode,
     EdgeCreate,
     EdgeRead,
     EdgeUpdate,
+    GraphBatchOperation,
+    GraphBatchRequest,
+    GraphBatchResult,
     GraphExportResponse,
     GraphImportPayload,
     GraphImportResult,
+    GraphImportSummary,
+    GraphTopology,
+    ImpactResult,
+    NeighborhoodResult,
     NodeCreate,
+    NodePosition,
+    NodePositionsResult,
     NodeRead,
     NodeUpdate,
+    PathResult,
+    ReachabilityResult,
+)
+from app.services import (
+    graph_changes,
+    graph_import,
+    graph_index,
+    graph_json,
+    graph_metrics,
+    graph_neighborhood,
+    graph_reachability,
+    graph_snapshots,
+    graph_topology,
+    graph_versions,
+    node_layout,
+    node_search,
 )
 from app.services import organizations as org_service
+from app.services.pagination import (
+    MAX_PAGE_SIZE,
+    apply_keyset,
+    apply_value_keyset,
+    attach_next_cursor,
+    encode_value_cursor,
+    page_params,
+    split_page,
+)
+from app.services.principal_cache import Principal
 
 logger = logging.getLogger(__name__)
 
+NDJSON_MEDIA_TYPE = "application/x-ndjson"
+_EXPORT_YIELD_PER = 500
+_POSITION_CHUNK = 500
+
 router = APIRouter()
 
 
@@ -61,61 +110,210 @@ def _validate_edge_type(relation_type: Optional[str]) -> None:
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid relation type")
 
 
+def _parse_relation_types(relation_types: Optional[str]) -> Optional[List[str]]:
+    if not isinstance(relation_types, str):
+        return None
+    names = sorted({name.strip() for name in relation_types.split(",") if name.strip()})
+    for name in names:
+        _validate_edge_type(name)
+    return names or None
+
+
+def _ensure_acyclic(
+    session: Session,
+    source: Node,
+    target: Node,
+    relation_type: str,
+    *,
+    edge_id: Optional[int] = None,
+) -> None:
+    acyclic_relations = settings.graph_acyclic_relations
+    if relation_type not in acyclic_relations:
+        return
+    # Pending nodes need ids and pending edges must be visible to the search.
+    session.flush()
+    if graph_topology.creates_cycle(
+        session, source.id, target.id, relation_type, acyclic_relations, exclude_edge_id=edge_id
+    ):
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT, detail="Edge would create a cycle"
+        )
+
+
+def _node_from_payload(payload: NodeCreate) -> Node:
+    return Node(
+        sphere_id=payload.sphere_id,
+        label=payload.label,
+        node_type=payload.node_type,
+        status=payload.status,
+        summary=payload.summary,
+        position=payload.position,
+        metadata_json=payload.metadata,
+        links_json=payload.links,
+        owners_json=payload.owners,
+    )
+
+
+def _apply_node_update(node: Node, payload: NodeUpdate) -> None:
+    if payload.label is not None:
+        node.label = payload.label
+    if payload.node_type is not None:
+        node.node_type = payload.node_type
+    if payload.status is not None:
+        node.status = payload.status
+    if payload.summary is not None:
+        node.summary = payload.summary
+    if payload.position is not None:
+        node.position = payload.position
+    if payload.metadata is not None:
+        node.metadata_json = payload.metadata
+    if payload.links is not None:
+        node.links_json = payload.links
+    if payload.owners is not None:
+        node.owners_json = payload.owners
+
+
+def _apply_edge_update(edge: Edge, payload: EdgeUpdate) -> None:
+    if payload.relation_type is not None:
+        edge.relation_type = payload.relation_type
+    if payload.metadata is not None:
+        edge.metadata_json = payload.metadata
+
+
 @router.get("/nodes", response_model=List[NodeRead])
 def list_nodes(
     organization_id: int = Query(..., description="Organization to scope the query"),
     sphere_id: Optional[int] = Query(None),
     node_type: Optional[str] = Query(None),
     status_filter: Optional[str] = Query(None, alias="status"),
-    search: Optional[str] = Query(None, description="Search by label, summary, owners"),
-    current_user: User = Depends(get_current_user),
+    search: Optional[str] = Query(None, description="Search by label, summary, owners, links"),
+    limit: Optional[int] = Query(
+        None, ge=1, le=MAX_PAGE_SIZE, description="Page size; omit for all"
+    ),
+    cursor: Optional[str] = Query(None, description="Opaque cursor from the X-Next-Cursor header"),
+    sort: Optional[str] = Query(
+        None,
+        pattern="^(created|degree|in_degree|out_degree|pagerank|betweenness)$",
+        description="Newest first by default; metrics sort highest first",
+    ),
+    relation_type: Optional[str] = Query(
+        None, description="Count only edges of this relation type in degree sorting and filters"
+    ),
+    min_degree: Optional[int] = Query(None, ge=0, description="Minimum in + out degree"),
+    min_pagerank: Optional[float] = Query(None, ge=0),
+    min_betweenness: Optional[float] = Query(None, ge=0),
+    request: Request = None,
+    response: Response = None,
+    current_user: Principal = Depends(get_current_user),
     session: Session = Depends(get_db),
-) -> List[NodeRead]:
+) -> Response:
     _ensure_membership(session, organization_id, current_user.id)
     _validate_node_fields(node_type, status_filter)
+    metric = sort if isinstance(sort, str) and sort != "created" else None
+    degree_relation = relation_type if isinstance(relation_type, str) else None
+    _validate_edge_type(degree_relation)
+    minimums = {
+        name: value
+        for name, value in (
+            ("degree", min_degree),
+            ("pagerank", min_pagerank),
+            ("betweenness", min_betweenness),
+        )
+        if isinstance(value, (int, float))
+    }
+
+    search_value: Optional[str]
+    if isinstance(search, str):
+        search_value = search.strip().lower()
+    else:
+        search_value = None
+    page_limit, page_cursor = page_params(limit, cursor)
 
-    query = select(Node).join(Sphere).where(Sphere.organization_id == organization_id)
+    version, metrics_version = graph_versions.current_versions(session, organization_id)
+    etag = graph_versions.build_etag(
+        organization_id,
+        version,
+        "nodes",
+        metrics_version,
+        sphere_id,
+        node_type,
+        status_filter,
+        search_value,
+        page_limit,
+        page_cursor,
+        metric,
+        degree_relation,
+        *(minimums.get(name) for name in ("degree", "pagerank", "betweenness")),
+    )
+    not_modified = conditional_response(request, response, etag)
+    if not_modified is not None:
+        return not_modified
+
+    query = (
+        select(*graph_json.NODE_COLUMNS)
+        .join(Sphere, Node.sphere_id == Sphere.id)
+        .where(Sphere.organization_id == organization_id)
+    )
     if sphere_id is not None:
         query = query.where(Node.sphere_id == sphere_id)
     if node_type is not None:
         query = query.where(Node.node_type == node_type)
     if status_filter is not None:
         query = query.where(Node.status == status_filter)
-    search_value: Optional[str]
-    if isinstance(search, str):
-        search_value = search.strip().lower()
-    else:
-        search_value = None
+    for name, value in minimums.items():
+        if name == "degree":
+            query = query.where(graph_metrics.metric_expression(name, degree_relation) >= value)
+        else:
+            query = query.where(getattr(Node, name) >= value)
     if search_value:
-        like = f"%{search_value}%"
-        query = query.where(Node.label.ilike(like) | Node.summary.ilike(like))
+        # Relevance order cannot be resumed from a (created_at, id) cursor.
+        query = node_search.apply_search(
+            query, search_value, ranked=page_limit is None and metric is None
+        )
 
-    nodes = session.scalars(query.order_by(Node.created_at.desc())).all()
-    return [NodeRead.model_validate(node) for node in nodes]
+    if metric is None:
+        query = apply_keyset(
+            query, Node.created_at, Node.id, limit=page_limit, cursor=page_cursor, descending=True
+        )
+        rows, next_cursor = split_page(session.execute(query).all(), page_limit)
+    else:
+        query = apply_value_keyset(
+            query,
+            graph_metrics.metric_expression(metric, degree_relation),
+            Node.id,
+            limit=page_limit,
+            cursor=page_cursor,
+        )
+
+        def cursor_for(row: Any) -> str:
+            record = graph_json.node_record(row)
+            value = graph_metrics.metric_value(record, metric, degree_relation)
+            return encode_value_cursor(value, record["id"])
+
+        rows, next_cursor = split_page(
+            session.execute(query).all(), page_limit, cursor_for=cursor_for
+        )
+    attach_next_cursor(response, next_cursor)
+    return graph_json.json_response(graph_json.encode_nodes(rows), response)
 
 
 @router.post("/nodes", response_model=NodeRead, status_code=status.HTTP_201_CREATED)
 def create_node(
     payload: NodeCreate,
-    current_user: User = Depends(get_current_user),
+    current_user: Principal = Depends(get_current_user),
     session: Session = Depends(get_db),
 ) -> NodeRead:
     sphere = _get_sphere(session, payload.sphere_id)
     _ensure_membership(session, sphere.organization_id, current_user.id)
     _validate_node_fields(payload.node_type, payload.status)
 
-    node = Node(
-        sphere_id=payload.sphere_id,
-        label=payload.label,
-        node_type=payload.node_type,
-        status=payload.status,
-        summary=payload.summary,
-        position=payload.position,
-        metadata_json=payload.metadata,
-        links_json=payload.links,
-        owners_json=payload.owners,
-    )
+    node = _node_from_payload(payload)
+    if payload.position is None:
+        x, y = node_layout.place_node(node_layout.Occupancy.load(session, sphere))
+        node.position = {"x": x, "y": y}
     session.add(node)
+    session.flush()
+    graph_changes.record_upsert(session, sphere.organization_id, graph_changes.NODE, node.id)
     session.commit()
     session.refresh(node)
     logger.info("node.created", extra={"sphere_id": node.sphere_id, "node_id": node.id})
@@ -126,7 +324,7 @@ def create_node(
 def update_node(
     node_id: int,
     payload: NodeUpdate,
-    current_user: User = Depends(get_current_user),
+    current_user: Principal = Depends(get_current_user),
     session: Session = Depends(get_db),
 ) -> NodeRead:
     node = session.get(Node, node_id)
@@ -137,34 +335,57 @@ def update_node(
     _ensure_membership(session, sphere.organization_id, current_user.id)
     _validate_node_fields(payload.node_type, payload.status)
 
-    if payload.label is not None:
-        node.label = payload.label
-    if payload.node_type is not None:
-        node.node_type = payload.node_type
-    if payload.status is not None:
-        node.status = payload.status
-    if payload.summary is not None:
-        node.summary = payload.summary
-    if payload.position is not None:
-        node.position = payload.position
-    if payload.metadata is not None:
-        node.metadata_json = payload.metadata
-    if payload.links is not None:
-        node.links_json = payload.links
-    if payload.owners is not None:
-        node.owners_json = payload.owners
-
+    _apply_node_update(node, payload)
     session.add(node)
+    graph_changes.record_upsert(session, sphere.organization_id, graph_changes.NODE, node.id)
     session.commit()
     session.refresh(node)
     logger.info("node.updated", extra={"node_id": node.id})
     return NodeRead.model_validate(node)
 
 
+@router.post("/nodes/positions", response_model=NodePositionsResult)
+def update_node_positions(
+    payload: List[NodePosition] = Body(..., max_length=MAX_POSITION_UPDATES),
+    current_user: Principal = Depends(get_current_user),
+    session: Session = Depends(get_db),
+) -> NodePositionsResult:
+    positions = list({item.id: item for item in payload}.values())
+    chunks = [
+        positions[start : start + _POSITION_CHUNK]
+        for start in range(0, len(positions), _POSITION_CHUNK)
+    ]
+    organizations: dict[int, list[int]] = {}
+    for chunk in chunks:
+        rows = session.execute(
+            select(Node.id, Sphere.organization_id)
+            .join(Sphere)
+            .where(Node.id.in_([item.id for item in chunk]))
+        ).all()
+        if len(rows) != len(chunk):
+            raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Node not found")
+        for node_id, organization_id in rows:
+            organizations.setdefault(organization_id, []).append(node_id)
+    for organization_id in organizations:
+        _ensure_membership(session, organization_id, current_user.id)
+
+    node_layout.write_positions(session, [(item.id, item.x, item.y) for item in positions])
+    for organization_id, ids in organizations.items():
+        graph_changes.record_changes(
+            session, organization_id, graph_changes.upserts(graph_changes.NODE, ids)
+        )
+    session.commit()
+    logger.info(
+        "node.positions_updated",
+        extra={"nodes": len(positions), "organizations": sorted(organizations)},
+    )
+    return NodePositionsResult(updated=len(positions))
+
+
 @router.delete("/nodes/{node_id}", status_code=status.HTTP_204_NO_CONTENT, response_class=Response, response_model=None)
 def delete_node(
     node_id: int,
-    current_user: User = Depends(get_current_user),
+    current_user: Principal = Depends(get_current_user),
     session: Session = Depends(get_db),
 ) -> None:
     node = session.get(Node, node_id)
@@ -174,7 +395,16 @@ def delete_node(
     sphere = _get_sphere(session, node.sphere_id)
     _ensure_membership(session, sphere.organization_id, current_user.id)
 
+    edge_ids = session.scalars(
+        select(Edge.id).where((Edge.source_node_id == node_id) | (Edge.target_node_id == node_id))
+    ).all()
     session.delete(node)
+    graph_changes.record_changes(
+        session,
+        sphere.organization_id,
+        graph_changes.deletes(graph_changes.EDGE, edge_ids)
+        + graph_changes.deletes(graph_changes.NODE, [node_id]),
+    )
     session.commit()
     logger.info("node.deleted", extra={"node_id": node_id})
 
@@ -184,26 +414,49 @@ def list_edges(
     organization_id: int = Query(..., description="Organization to scope the query"),
     sphere_id: Optional[int] = Query(None),
     relation_type: Optional[str] = Query(None),
-    current_user: User = Depends(get_current_user),
+    limit: Optional[int] = Query(
+        None, ge=1, le=MAX_PAGE_SIZE, description="Page size; omit for all"
+    ),
+    cursor: Optional[str] = Query(None, description="Opaque cursor from the X-Next-Cursor header"),
+    request: Request = None,
+    response: Response = None,
+    current_user: Principal = Depends(get_current_user),
     session: Session = Depends(get_db),
-) -> List[EdgeRead]:
+) -> Response:
     _ensure_membership(session, organization_id, current_user.id)
     _validate_edge_type(relation_type)
+    page_limit, page_cursor = page_params(limit, cursor)
+
+    version = graph_versions.current_version(session, organization_id)
+    etag = graph_versions.build_etag(
+        organization_id, version, "edges", sphere_id, relation_type, page_limit, page_cursor
+    )
+    not_modified = conditional_response(request, response, etag)
+    if not_modified is not None:
+        return not_modified
 
-    query = select(Edge).join(Sphere).where(Sphere.organization_id == organization_id)
+    query = (
+        select(*graph_json.EDGE_COLUMNS)
+        .join(Sphere, Edge.sphere_id == Sphere.id)
+        .where(Sphere.organization_id == organization_id)
+    )
     if sphere_id is not None:
         query = query.where(Edge.sphere_id == sphere_id)
     if relation_type is not None:
         query = query.where(Edge.relation_type == relation_type)
 
-    edges = session.scalars(query.order_by(Edge.created_at.desc())).all()
-    return [EdgeRead.model_validate(edge) for edge in edges]
+    query = apply_keyset(
+        query, Edge.created_at, Edge.id, limit=page_limit, cursor=page_cursor, descending=True
+    )
+    rows, next_cursor = split_page(session.execute(query).all(), page_limit)
+    attach_next_cursor(response, next_cursor)
+    return graph_json.json_response(graph_json.encode_edges(rows), response)
 
 
 @router.post("/edges", response_model=EdgeRead, status_code=status.HTTP_201_CREATED)
 def create_edge(
     payload: EdgeCreate,
-    current_user: User = Depends(get_current_user),
+    current_user: Principal = Depends(get_current_user),
     session: Session = Depends(get_db),
 ) -> EdgeRead:
     sphere = _get_sphere(session, payload.sphere_id)
@@ -216,6 +469,7 @@ def create_edge(
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid node references")
     if source.sphere_id != sphere.id or target.sphere_id != sphere.id:
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Nodes must belong to the sphere")
+    _ensure_acyclic(session, source, target, payload.relation_type)
 
     edge = Edge(
         sphere_id=payload.sphere_id,
@@ -225,7 +479,14 @@ def create_edge(
         metadata_json=payload.metadata,
     )
     session.add(edge)
+    session.flush()
+    version = graph_changes.record_upsert(
+        session, sphere.organization_id, graph_changes.EDGE, edge.id
+    )
     session.commit()
+    graph_reachability.index_cache.add_edge(
+        sphere.organization_id, version, source.id, target.id, payload.relation_type
+    )
     session.refresh(edge)
     logger.info("edge.created", extra={"edge_id": edge.id, "sphere_id": edge.sphere_id})
     return EdgeRead.model_validate(edge)
@@ -235,7 +496,7 @@ def create_edge(
 def update_edge(
     edge_id: int,
     payload: EdgeUpdate,
-    current_user: User = Depends(get_current_user),
+    current_user: Principal = Depends(get_current_user),
     session: Session = Depends(get_db),
 ) -> EdgeRead:
     edge = session.get(Edge, edge_id)
@@ -245,13 +506,12 @@ def update_edge(
     sphere = _get_sphere(session, edge.sphere_id)
     _ensure_membership(session, sphere.organization_id, current_user.id)
     _validate_edge_type(payload.relation_type)
+    if payload.relation_type is not None and payload.relation_type != edge.relation_type:
+        _ensure_acyclic(session, edge.source, edge.target, payload.relation_type, edge_id=edge.id)
 
-    if payload.relation_type is not None:
-        edge.relation_type = payload.relation_type
-    if payload.metadata is not None:
-        edge.metadata_json = payload.metadata
-
+    _apply_edge_update(edge, payload)
     session.add(edge)
+    graph_changes.record_upsert(session, sphere.organization_id, graph_changes.EDGE, edge.id)
     session.commit()
     session.refresh(edge)
     logger.info("edge.updated", extra={"edge_id": edge_id})
@@ -261,7 +521,7 @@ def update_edge(
 @router.delete("/edges/{edge_id}", status_code=status.HTTP_204_NO_CONTENT, response_class=Response, response_model=None)
 def delete_edge(
     edge_id: int,
-    current_user: User = Depends(get_current_user),
+    current_user: Principal = Depends(get_current_user),
     session: Session = Depends(get_db),
 ) -> None:
     edge = session.get(Edge, edge_id)
@@ -271,8 +531,13 @@ def delete_edge(
     sphere = _get_sphere(session, edge.sphere_id)
     _ensure_membership(session, sphere.organization_id, current_user.id)
 
+    endpoints = (edge.source_node_id, edge.target_node_id, edge.relation_type)
     session.delete(edge)
+    version = graph_changes.record_delete(
+        session, sphere.organization_id, graph_changes.EDGE, edge_id
+    )
     session.commit()
+    graph_reachability.index_cache.remove_edge(sphere.organization_id, version, *endpoints)
     logger.info("edge.deleted", extra={"edge_id": edge_id})
 
 
@@ -280,114 +545,653 @@ def delete_edge(
 def search_nodes(
     organization_id: int = Query(...),
     q: str = Query(..., min_length=1),
-    current_user: User = Depends(get_current_user),
+    current_user: Principal = Depends(get_current_user),
     session: Session = Depends(get_db),
-) -> List[NodeRead]:
+) -> Response:
     _ensure_membership(session, organization_id, current_user.id)
-    like = f"%{q.lower()}%"
-    query = (
-        select(Node)
-        .join(Sphere)
-        .where(Sphere.organization_id == organization_id)
-        .where(Node.label.ilike(like) | Node.summary.ilike(like))
-        .order_by(Node.created_at.desc())
-        .limit(20)
+    query = node_search.apply_search(
+        select(*graph_json.NODE_COLUMNS)
+        .join(Sphere, Node.sphere_id == Sphere.id)
+        .where(Sphere.organization_id == organization_id),
+        q,
+        ranked=True,
+    )
+    rows = session.execute(query.order_by(Node.created_at.desc()).limit(20)).all()
+    return graph_json.json_response(graph_json.encode_nodes(rows), None)
+
+
+@router.get("/impact", response_model=ImpactResult)
+def graph_impact(
+    node_id: int = Query(..., description="Node to trace dependents or dependencies of"),
+    direction: str = Query(
+        graph_index.DOWNSTREAM,
+        pattern="^(downstream|upstream|both)$",
+        description="downstream: what breaks if the node goes down; upstream: what it needs",
+    ),
+    relation_types: Optional[str] = Query(
+        None, description="Comma-separated relation types to follow; all by default"
+    ),
+    max_depth: Optional[int] = Query(None, ge=1, description="Hop limit; unbounded by default"),
+    request: Request = None,
+    response: Response = None,
+    current_user: Principal = Depends(get_current_user),
+    session: Session = Depends(get_db),
+) -> Response:
+    organization_id = session.scalar(
+        select(Sphere.organization_id)
+        .join(Node, Node.sphere_id == Sphere.id)
+        .where(Node.id == node_id)
+    )
+    if organization_id is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Node not found")
+    _ensure_membership(session, organization_id, current_user.id)
+    relations = _parse_relation_types(relation_types)
+
+    version = graph_versions.current_version(session, organization_id)
+    etag = graph_versions.build_etag(
+        organization_id,
+        version,
+        "impact",
+        node_id,
+        direction,
+        ",".join(relations) if relations else None,
+        max_depth,
+    )
+    not_modified = conditional_response(request, response, etag)
+    if not_modified is not None:
+        return not_modified
+
+    index = graph_index.index_cache.get(session, organization_id, version)
+    try:
+        reached = graph_index.impact(
+            index, node_id, direction=direction, relation_types=relations, max_depth=max_depth
+        )
+    except KeyError as exc:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Node not found") from exc
+
+    node_ids = index.node_ids
+    logger.info(
+        "graph.impact",
+        extra={"organization_id": organization_id, "node_id": node_id, "reached": len(reached)},
+    )
+    body = graph_json.encode(
+        {
+            "organization_id": organization_id,
+            "node_id": node_id,
+            "direction": direction,
+            "relation_types": relations or sorted(EDGE_TYPES),
+            "max_depth": max_depth,
+            "version": version,
+            "nodes": [
+                {"id": node_ids[position], "depth": depth, "via": node_ids[via]}
+                for position, depth, via in reached
+            ],
+        }
+    )
+    return graph_json.json_response(body, response)
+
+
+def _pair_organization(
+    session: Session, source_node_id: int, target_node_id: int, user_id: int
+) -> int:
+    organizations = dict(
+        session.execute(
+            select(Node.id, Sphere.organization_id)
+            .join(Sphere, Node.sphere_id == Sphere.id)
+            .where(Node.id.in_([source_node_id, target_node_id]))
+        ).all()
+    )
+    if source_node_id not in organizations or target_node_id not in organizations:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Node not found")
+    organization_id = organizations[source_node_id]
+    if organizations[target_node_id] != organization_id:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Nodes belong to different organizations",
+        )
+    _ensure_membership(session, organization_id, user_id)
+    return organization_id
+
+
+@router.get("/reachable", response_model=ReachabilityResult)
+def read_reachability(
+    source_node_id: int = Query(..., description="Node that may depend on the target"),
+    target_node_id: int = Query(..., description="Node that may be needed by the source"),
+    current_user: Principal = Depends(get_current_user),
+    session: Session = Depends(get_db),
+) -> ReachabilityResult:
+    organization_id = _pair_organization(session, source_node_id, target_node_id, current_user.id)
+    version = graph_versions.current_version(session, organization_id)
+    index = graph_reachability.index_cache.get(session, organization_id, version)
+    return ReachabilityResult(
+        organization_id=organization_id,
+        source_node_id=source_node_id,
+        target_node_id=target_node_id,
+        version=version,
+        reachable=index.reachable(source_node_id, target_node_id),
+    )
+
+
+@router.get("/path", response_model=PathResult)
+def read_path(
+    source_node_id: int = Query(..., description="Node that may depend on the target"),
+    target_node_id: int = Query(..., description="Node that may be needed by the source"),
+    current_user: Principal = Depends(get_current_user),
+    session: Session = Depends(get_db),
+) -> Response:
+    organization_id = _pair_organization(session, source_node_id, target_node_id, current_user.id)
+    version = graph_versions.current_version(session, organization_id)
+    index = graph_reachability.index_cache.get(session, organization_id, version)
+    chain = index.path(source_node_id, target_node_id) or []
+    edges = graph_reachability.path_edges(session, chain)
+    body = graph_json.encode(
+        {
+            "organization_id": organization_id,
+            "source_node_id": source_node_id,
+            "target_node_id": target_node_id,
+            "version": version,
+            "reachable": bool(chain),
+            "nodes": chain,
+            "edges": [graph_json.edge_record(row) for row in edges],
+        }
+    )
+    return graph_json.json_response(body, None)
+
+
+@router.get("/nodes/{node_id}/neighborhood", response_model=NeighborhoodResult)
+def read_node_neighborhood(
+    node_id: int,
+    hops: int = Query(
+        1, ge=1, le=graph_neighborhood.MAX_HOPS, description="Edges away from the node"
+    ),
+    limit: int = Query(
+        200, ge=1, le=graph_neighborhood.MAX_NODES, description="Node cap, the node itself included"
+    ),
+    relation_type: Optional[str] = Query(
+        None, description="Comma-separated relation types to follow; all by default"
+    ),
+    request: Request = None,
+    response: Response = None,
+    current_user: Principal = Depends(get_current_user),
+    session: Session = Depends(get_db),
+) -> Response:
+    organization_id = session.scalar(
+        select(Sphere.organization_id)
+        .join(Node, Node.sphere_id == Sphere.id)
+        .where(Node.id == node_id)
+    )
+    if organization_id is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Node not found")
+    _ensure_membership(session, organization_id, current_user.id)
+    relations = _parse_relation_types(relation_type)
+
+    version, metrics_version = graph_versions.current_versions(session, organization_id)
+    etag = graph_versions.build_etag(
+        organization_id,
+        version,
+        "neighborhood",
+        metrics_version,
+        node_id,
+        hops,
+        limit,
+        ",".join(relations) if relations else None,
+    )
+    not_modified = conditional_response(request, response, etag)
+    if not_modified is not None:
+        return not_modified
+
+    neighborhood = graph_neighborhood.expand(
+        session, node_id, hops=hops, limit=limit, relation_types=relations
+    )
+    depths = neighborhood.depths
+    nodes = []
+    for row in session.execute(select(*graph_json.NODE_COLUMNS).where(Node.id.in_(list(depths)))):
+        record = graph_json.node_record(row)
+        record["depth"] = depths[record["id"]]
+        nodes.append(record)
+    nodes.sort(key=lambda record: (record["depth"], record["id"]))
+    edges = graph_neighborhood.induced_edges(session, depths, relations)
+    body = graph_json.encode(
+        {
+            "organization_id": organization_id,
+            "node_id": node_id,
+            "hops": hops,
+            "limit": limit,
+            "relation_types": relations or sorted(EDGE_TYPES),
+            "version": version,
+            "truncated": neighborhood.truncated,
+            "nodes": nodes,
+            "edges": [graph_json.edge_record(row) for row in edges],
+        }
+    )
+    return graph_json.json_response(body, response)
+
+
+@router.get("/topology", response_model=GraphTopology)
+def read_topology(
+    organization_id: int = Query(...),
+    sphere_id: Optional[int] = Query(None, description="Only nodes and edges of this sphere"),
+    relation_types: Optional[str] = Query(
+        None, description="Comma-separated relation types to consider; all by default"
+    ),
+    request: Request = None,
+    response: Response = None,
+    current_user: Principal = Depends(get_current_user),
+    session: Session = Depends(get_db),
+) -> Response:
+    _ensure_membership(session, organization_id, current_user.id)
+    if sphere_id is not None:
+        _get_sphere(session, sphere_id, organization_id)
+    relations = _parse_relation_types(relation_types)
+
+    version = graph_versions.current_version(session, organization_id)
+    etag = graph_versions.build_etag(
+        organization_id,
+        version,
+        "topology",
+        sphere_id,
+        ",".join(relations) if relations else None,
+    )
+    not_modified = conditional_response(request, response, etag)
+    if not_modified is not None:
+        return not_modified
+
+    index = graph_index.index_cache.get(session, organization_id, version)
+    members = None
+    if sphere_id is not None:
+        members = bytearray(node_sphere == sphere_id for node_sphere in index.node_spheres)
+    topology = graph_topology.analyze(
+        index, relations=index.relation_codes(relations), members=members
+    )
+    node_ids = index.node_ids
+    logger.info(
+        "graph.topology",
+        extra={
+            "organization_id": organization_id,
+            "layers": len(topology.layers),
+            "cycles": len(topology.cycles),
+        },
     )
-    nodes = session.scalars(query).all()
-    return [NodeRead.model_validate(node) for node in nodes]
+    body = graph_json.encode(
+        {
+            "organization_id": organization_id,
+            "sphere_id": sphere_id,
+            "relation_types": relations or sorted(EDGE_TYPES),
+            "version": version,
+            "acyclic": topology.acyclic,
+            "cycles": [[node_ids[position] for position in cycle] for cycle in topology.cycles],
+            "layers": [[node_ids[position] for position in layer] for layer in topology.layers],
+        }
+    )
+    return graph_json.json_response(body, response)
 
 
 @router.get("/export", response_model=GraphExportResponse)
 def export_graph(
     organization_id: int = Query(...),
-    current_user: User = Depends(get_current_user),
+    export_format: Optional[str] = Query(
+        None, alias="format", pattern="^(json|ndjson)$", description="json (default) or ndjson"
+    ),
+    request: Request = None,
+    response: Response = None,
+    current_user: Principal = Depends(get_current_user),
     session: Session = Depends(get_db),
-) -> GraphExportResponse:
+) -> Response:
     _ensure_membership(session, organization_id, current_user.id)
-    spheres = session.scalars(select(Sphere).where(Sphere.organization_id == organization_id)).all()
-    sphere_ids = [sphere.id for sphere in spheres]
-    nodes = session.scalars(select(Node).where(Node.sphere_id.in_(sphere_ids))).all()
+    streaming = _wants_ndjson(export_format, request)
+    version, metrics_version = graph_versions.current_versions(session, organization_id)
+    etag = graph_versions.build_etag(
+        organization_id, version, "export", metrics_version, "ndjson" if streaming else "json"
+    )
+    not_modified = conditional_response(request, response, etag)
+    if not_modified is not None:
+        return not_modified
+
+    if streaming:
+        logger.info(
+            "graph.export_stream", extra={"organization_id": organization_id, "version": version}
+        )
+        headers = dict(response.headers) if response is not None else {}
+        headers.pop("content-length", None)
+        return StreamingResponse(
+            _iter_export_ndjson(session, organization_id, version),
+            media_type=NDJSON_MEDIA_TYPE,
+            headers=headers,
+        )
+
+    sphere_ids = session.scalars(
+        select(Sphere.id).where(Sphere.organization_id == organization_id)
+    ).all()
+    nodes = session.execute(
+        select(*graph_json.NODE_COLUMNS).where(Node.sphere_id.in_(sphere_ids))
+    ).all()
     node_ids = [node.id for node in nodes]
-    edges = session.scalars(select(Edge).where(Edge.source_node_id.in_(node_ids))).all()
+    edges = session.execute(
+        select(*graph_json.EDGE_COLUMNS).where(Edge.source_node_id.in_(node_ids))
+    ).all()
     logger.info("graph.export", extra={"organization_id": organization_id, "nodes": len(nodes)})
-    return GraphExportResponse(
-        organization_id=organization_id,
-        spheres=sphere_ids,
-        nodes=[NodeRead.model_validate(node) for node in nodes],
-        edges=[EdgeRead.model_validate(edge) for edge in edges],
+    body = graph_json.encode(
+        {
+            "organization_id": organization_id,
+            "spheres": sphere_ids,
+            "nodes": [graph_json.node_record(node) for node in nodes],
+            "edges": [graph_json.edge_record(edge) for edge in edges],
+        }
+    )
+    return graph_json.json_response(body, response)
+
+
+def _wants_ndjson(export_format: object, request: Request | None) -> bool:
+    if isinstance(export_format, str):
+        return export_format == "ndjson"
+    if request is None:
+        return False
+    return NDJSON_MEDIA_TYPE in request.headers.get("accept", "")
+
+
+def _ndjson_line(record_type: str, data: bytes) -> bytes:
+    return b'{"type":"%s","data":%s}\n' % (record_type.encode("ascii"), data)
+
+
+def _iter_export_ndjson(session: Session, organization_id: int, version: int) -> Iterator[bytes]:
+    """Yield the organization graph as NDJSON records without materializing it.
+
+    The first line describes the export, then every sphere, node and edge follows on its
+    own line. Rows are read through ``yield_per`` cursors and released as soon as they
+    are written, so memory use does not grow with the graph.
+    """
+
+    header = {"organization_id": organization_id, "version": version}
+    yield _ndjson_line("export", json.dumps(header, separators=(",", ":")).encode("utf-8"))
+
+    sphere_ids = session.execute(
+        select(Sphere.id)
+        .where(Sphere.organization_id == organization_id)
+        .order_by(Sphere.id)
+        .execution_options(yield_per=_EXPORT_YIELD_PER)
+    ).scalars()
+    for sphere_id in sphere_ids:
+        yield _ndjson_line("sphere", b'{"id":%d}' % sphere_id)
+
+    nodes = session.execute(
+        select(*graph_json.NODE_COLUMNS)
+        .join(Sphere, Node.sphere_id == Sphere.id)
+        .where(Sphere.organization_id == organization_id)
+        .order_by(Node.id)
+        .execution_options(yield_per=_EXPORT_YIELD_PER)
     )
+    for node in nodes:
+        yield _ndjson_line("node", graph_json.encode(graph_json.node_record(node)))
+
+    edges = session.execute(
+        select(*graph_json.EDGE_COLUMNS)
+        .join(Node, Edge.source_node_id == Node.id)
+        .join(Sphere, Node.sphere_id == Sphere.id)
+        .where(Sphere.organization_id == organization_id)
+        .order_by(Edge.id)
+        .execution_options(yield_per=_EXPORT_YIELD_PER)
+    )
+    for edge in edges:
+        yield _ndjson_line("edge", graph_json.encode(graph_json.edge_record(edge)))
 
 
 @router.post("/import", response_model=GraphImportResult)
 def import_graph(
     payload: GraphImportPayload,
-    current_user: User = Depends(get_current_user),
+    current_user: Principal = Depends(get_current_user),
     session: Session = Depends(get_db),
 ) -> GraphImportResult:
     org_service.ensure_owner_or_admin(session, payload.organization_id, current_user.id)
-    spheres = session.scalars(select(Sphere).where(Sphere.organization_id == payload.organization_id)).all()
-    sphere_ids = {sphere.id for sphere in spheres}
-
-    # Prepare node mapping (old id -> Node instance)
-    existing_nodes = session.scalars(
-        select(Node)
-        .join(Sphere)
-        .where(Sphere.organization_id == payload.organization_id)
-    ).all()
-    existing_by_id = {node.id: node for node in existing_nodes}
-
-    imported_nodes: List[Node] = []
-    for node_data in payload.nodes or []:
-        if node_data.sphere_id not in sphere_ids:
-            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Node sphere outside organization")
-        node = existing_by_id.get(node_data.id)
-        if node is None:
-            node = Node(sphere_id=node_data.sphere_id)
-        node.label = node_data.label
-        node.node_type = node_data.node_type
-        node.status = node_data.status
-        node.summary = node_data.summary
-        node.position = node_data.position
-        node.metadata_json = node_data.metadata
-        node.links_json = node_data.links
-        node.owners_json = node_data.owners
-        session.add(node)
-        session.flush()
-        imported_nodes.append(node)
-        existing_by_id[node.id] = node
-
-    node_id_map = {node.id: node.id for node in imported_nodes}
-
-    # Remove edges for the organization prior to import and recreate
-    session.execute(
-        delete(Edge).where(
-            Edge.sphere_id.in_(select(Sphere.id).where(Sphere.organization_id == payload.organization_id))
-        )
+    # Imports can replace the whole graph; keep the state before them recoverable.
+    graph_snapshots.take_automatic(session, payload.organization_id, user_id=current_user.id)
+    session.commit()
+    chunk_size = settings.graph_import_chunk_size
+    outcome = graph_import.import_graph(session, payload, chunk_size=chunk_size)
+    nodes, edges = graph_import.load_result(session, outcome, chunk_size=chunk_size)
+    return GraphImportResult(
+        nodes=nodes, edges=edges, summary=GraphImportSummary(**outcome.stats.counts())
     )
 
-    imported_edges: List[Edge] = []
-    for edge_data in payload.edges or []:
-        if edge_data.sphere_id not in sphere_ids:
-            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Edge sphere outside organization")
-        if edge_data.source_node_id not in node_id_map or edge_data.target_node_id not in node_id_map:
-            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Edge references unknown node")
-        edge = Edge(
-            sphere_id=edge_data.sphere_id,
-            source_node_id=edge_data.source_node_id,
-            target_node_id=edge_data.target_node_id,
-            relation_type=edge_data.relation_type,
-            metadata_json=edge_data.metadata,
+
+class _BatchApplier:
+    """Apply batch operations in one transaction, checking each organization only once."""
+
+    def __init__(self, session: Session, user: Principal) -> None:
+        self.session = session
+        self.user = user
+        self.spheres: dict[int, Sphere] = {}
+        self.allowed_organizations: set[int] = set()
+        self.temp_nodes: dict[str, Node] = {}
+        self.temp_edges: dict[str, Edge] = {}
+        self.touched_nodes: dict[int, Node] = {}
+        self.touched_edges: dict[int, Edge] = {}
+        self.deleted: list[tuple[int, str, int]] = []
+        self.unplaced: list[Node] = []
+
+    def sphere(self, sphere_id: int) -> Sphere:
+        sphere = self.spheres.get(sphere_id)
+        if sphere is None:
+            sphere = _get_sphere(self.session, sphere_id)
+            self.spheres[sphere_id] = sphere
+        if sphere.organization_id not in self.allowed_organizations:
+            _ensure_membership(self.session, sphere.organization_id, self.user.id)
+            self.allowed_organizations.add(sphere.organization_id)
+        return sphere
+
+    def _claim_temp_id(self, temp_id: Optional[str]) -> None:
+        if temp_id is not None and (temp_id in self.temp_nodes or temp_id in self.temp_edges):
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST, detail="Duplicate temporary id"
+            )
+
+    def node(self, ref: int | str) -> Node:
+        if isinstance(ref, str):
+            node = self.temp_nodes.get(ref)
+            if node is None:
+                raise HTTPException(
+                    status_code=status.HTTP_400_BAD_REQUEST, detail="Unknown temporary id"
+                )
+        else:
+            node = self.session.get(Node, ref)
+            if node is None:
+                raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Node not found")
+        self.sphere(node.sphere_id)
+        return node
+
+    def edge(self, ref: int | str) -> Edge:
+        if isinstance(ref, str):
+            edge = self.temp_edges.get(ref)
+            if edge is None:
+                raise HTTPException(
+                    status_code=status.HTTP_400_BAD_REQUEST, detail="Unknown temporary id"
+                )
+        else:
+            edge = self.session.get(Edge, ref)
+            if edge is None:
+                raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Edge not found")
+        self.sphere(edge.sphere_id)
+        return edge
+
+    def apply(self, operation: GraphBatchOperation) -> None:
+        if isinstance(operation, BatchCreateNode):
+            self._claim_temp_id(operation.temp_id)
+            self.sphere(operation.node.sphere_id)
+            _validate_node_fields(operation.node.node_type, operation.node.status)
+            node = _node_from_payload(operation.node)
+            self.session.add(node)
+            if operation.temp_id is not None:
+                self.temp_nodes[operation.temp_id] = node
+            self.touched_nodes[id(node)] = node
+            if operation.node.position is None:
+                self.unplaced.append(node)
+        elif isinstance(operation, BatchUpdateNode):
+            node = self.node(operation.id)
+            _validate_node_fields(operation.node.node_type, operation.node.status)
+            _apply_node_update(node, operation.node)
+            self.touched_nodes[id(node)] = node
+        elif isinstance(operation, BatchDeleteNode):
+            node = self.node(operation.id)
+            # Flush pending rows so the node and the edges touching it have ids.
+            self.session.flush()
+            edges = self.session.scalars(
+                select(Edge).where(
+                    (Edge.source_node_id == node.id) | (Edge.target_node_id == node.id)
+                )
+            ).all()
+            for edge in edges:
+                self._delete_edge(edge)
+            self._forget(self.touched_nodes, self.temp_nodes, node)
+            self.deleted.append(
+                (self.sphere(node.sphere_id).organization_id, graph_changes.NODE, node.id)
+            )
+            self.session.delete(node)
+        elif isinstance(operation, BatchCreateEdge):
+            self._claim_temp_id(operation.temp_id)
+            sphere = self.sphere(operation.edge.sphere_id)
+            _validate_edge_type(operation.edge.relation_type)
+            source = self.node(operation.edge.source_node_id)
+            target = self.node(operation.edge.target_node_id)
+            if source.sphere_id != sphere.id or target.sphere_id != sphere.id:
+                raise HTTPException(
+                    status_code=status.HTTP_400_BAD_REQUEST,
+                    detail="Nodes must belong to the sphere",
+                )
+            _ensure_acyclic(self.session, source, target, operation.edge.relation_type)
+            edge = Edge(
+                sphere_id=sphere.id,
+                source=source,
+                target=target,
+                relation_type=operation.edge.relation_type,
+                metadata_json=operation.edge.metadata,
+            )
+            self.session.add(edge)
+            if operation.temp_id is not None:
+                self.temp_edges[operation.temp_id] = edge
+            self.touched_edges[id(edge)] = edge
+        elif isinstance(operation, BatchUpdateEdge):
+            edge = self.edge(operation.id)
+            _validate_edge_type(operation.edge.relation_type)
+            relation_type = operation.edge.relation_type
+            if relation_type is not None and relation_type != edge.relation_type:
+                _ensure_acyclic(
+                    self.session, edge.source, edge.target, relation_type, edge_id=edge.id
+                )
+            _apply_edge_update(edge, operation.edge)
+            self.touched_edges[id(edge)] = edge
+        else:
+            edge = self.edge(operation.id)
+            self.session.flush()
+            self._delete_edge(edge)
+
+    def _delete_edge(self, edge: Edge) -> None:
+        self._forget(self.touched_edges, self.temp_edges, edge)
+        self.deleted.append(
+            (self.sphere(edge.sphere_id).organization_id, graph_changes.EDGE, edge.id)
         )
-        session.add(edge)
-        imported_edges.append(edge)
+        self.session.delete(edge)
 
-    session.commit()
-    logger.info(
-        "graph.import", extra={"organization_id": payload.organization_id, "nodes": len(imported_nodes)}
-    )
-    refreshed_nodes = [NodeRead.model_validate(node) for node in imported_nodes]
-    refreshed_edges = [EdgeRead.model_validate(edge) for edge in imported_edges]
-    return GraphImportResult(nodes=refreshed_nodes, edges=refreshed_edges)
+    @staticmethod
+    def _forget(touched: dict[int, Any], temp: dict[str, Any], entity: Any) -> None:
+        touched.pop(id(entity), None)
+        for temp_id in [key for key, value in temp.items() if value is entity]:
+            del temp[temp_id]
+
+    def place_new_nodes(self) -> None:
+        """Give created nodes without a position a free spot next to their batch neighbours.
+
+        Runs after the batch is flushed, so edges created by later operations count.
+        """
 
+        unplaced = [node for node in self.unplaced if id(node) in self.touched_nodes]
+        if not unplaced:
+            return
+        pending = {id(node) for node in unplaced}
+        exclude_ids = {node.id for node in unplaced}
+        occupancies: dict[int, node_layout.Occupancy] = {}
+        for node in unplaced:
+            anchors = []
+            for edge in self.touched_edges.values():
+                if edge.source is node:
+                    neighbour = edge.target
+                elif edge.target is node:
+                    neighbour = edge.source
+                else:
+                    continue
+                if id(neighbour) not in pending:
+                    anchors.append((neighbour.x, neighbour.y))
+            occupancy = occupancies.get(node.sphere_id)
+            if occupancy is None:
+                occupancy = occupancies[node.sphere_id] = node_layout.Occupancy.load(
+                    self.session, self.spheres[node.sphere_id], exclude_ids=exclude_ids
+                )
+            x, y = node_layout.place_node(occupancy, anchors)
+            node.position = {"x": x, "y": y}
+            pending.discard(id(node))
+            occupancy.add((x, y))
 
+    def record_changes(self) -> None:
+        changes: dict[int, list[graph_changes.ChangeEntry]] = {}
+        for organization_id, entity_type, entity_id in self.deleted:
+            changes.setdefault(organization_id, []).extend(
+                graph_changes.deletes(entity_type, [entity_id])
+            )
+        for node in self.touched_nodes.values():
+            changes.setdefault(self.spheres[node.sphere_id].organization_id, []).extend(
+                graph_changes.upserts(graph_changes.NODE, [node.id])
+            )
+        for edge in self.touched_edges.values():
+            changes.setdefault(self.spheres[edge.sphere_id].organization_id, []).extend(
+                graph_changes.upserts(graph_changes.EDGE, [edge.id])
+            )
+        for organization_id, entries in changes.items():
+            graph_changes.record_changes(self.session, organization_id, entries)
 
+
+@router.post("/batch", response_model=GraphBatchResult)
+def apply_graph_batch(
+    payload: GraphBatchRequest,
+    current_user: Principal = Depends(get_current_user),
+    session: Session = Depends(get_db),
+) -> GraphBatchResult:
+    applier = _BatchApplier(session, current_user)
+    for index, operation in enumerate(payload.operations):
+        try:
+            applier.apply(operation)
+        except HTTPException as exc:
+            session.rollback()
+            raise HTTPException(
+                status_code=exc.status_code, detail=f"Operation {index}: {exc.detail}"
+            ) from exc
+
+    session.flush()
+    applier.place_new_nodes()
+    applier.record_changes()
+    session.commit()
+    if applier.touched_nodes:
+        # Edge triggers moved the degree counts behind the identity map's back.
+        session.scalars(
+            select(Node)
+            .where(Node.id.in_([node.id for node in applier.touched_nodes.values()]))
+            .execution_options(populate_existing=True)
+        ).all()
+    logger.info(
+        "graph.batch",
+        extra={
+            "operations": len(payload.operations),
+            "organizations": sorted(applier.allowed_organizations),
+        },
+    )
+    return GraphBatchResult(
+        temp_ids={
+            **{temp_id: node.id for temp_id, node in applier.temp_nodes.items()},
+            **{temp_id: edge.id for temp_id, edge in applier.temp_edges.items()},
+        },
+        nodes=[NodeRead.model_validate(node) for node in applier.touched_nodes.values()],
+        edges=[EdgeRead.model_validate(edge) for edge in applier.touched_edges.values()],
+        deleted_node_ids=[
+            entity_id for _, kind, entity_id in applier.deleted if kind == graph_changes.NODE
+        ],
+        deleted_edge_ids=[
+            entity_id for _, kind, entity_id in applier.deleted if kind == graph_changes.EDGE
+        ],
+    )
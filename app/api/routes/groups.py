@@ -1,4 +1,4 @@
-from fastapi import APIRouter, Depends, HTTPException, Response, status
+from fastapi import APIRouter, Depends, HTTPException, Query, Response, status
 from sqlalchemy import select
 from sqlalchemy.orm import Session, selectinload
 
@@ -13,7 +13,16 @@ from app.schemas.organization import (
     GroupRead,
     GroupUpdate,
 )
+from app.services import graph_changes
 from app.services import organizations as org_service
+from app.services.pagination import (
+    MAX_PAGE_SIZE,
+    apply_keyset,
+    attach_next_cursor,
+    page_params,
+    split_page,
+)
+from app.services.principal_cache import Principal
 
 router = APIRouter()
 
@@ -21,17 +30,27 @@ router = APIRouter()
 @router.get("/organizations/{organization_id}/groups", response_model=list[GroupRead])
 def list_groups(
     organization_id: int,
-    current_user: User = Depends(get_current_user),
+    response: Response,
+    limit: int | None = Query(None, ge=1, le=MAX_PAGE_SIZE, description="Page size; omit for all"),
+    cursor: str | None = Query(None, description="Opaque cursor from the X-Next-Cursor header"),
+    current_user: Principal = Depends(get_current_user),
     session: Session = Depends(get_db),
 ) -> list[GroupRead]:
     org_service.require_membership(session, organization_id, current_user.id)
+    page_limit, page_cursor = page_params(limit, cursor)
 
-    groups = session.scalars(
+    query = apply_keyset(
         select(Group)
         .options(selectinload(Group.memberships).selectinload(GroupMembership.user))
-        .where(Group.organization_id == organization_id)
-        .order_by(Group.created_at.asc())
-    ).all()
+        .where(Group.organization_id == organization_id),
+        Group.created_at,
+        Group.id,
+        limit=page_limit,
+        cursor=page_cursor,
+        descending=False,
+    )
+    groups, next_cursor = split_page(session.scalars(query).all(), page_limit)
+    attach_next_cursor(response, next_cursor)
 
     return [GroupRead.model_validate(group) for group in groups]
 
@@ -40,7 +59,7 @@ def list_groups(
 def create_group(
     organization_id: int,
     payload: GroupCreate,
-    current_user: User = Depends(get_current_user),
+    current_user: Principal = Depends(get_current_user),
     session: Session = Depends(get_db),
 ) -> GroupRead:
     org_service.ensure_owner_or_admin(session, organization_id, current_user.id)
@@ -62,7 +81,7 @@ def create_group(
 def update_group(
     group_id: int,
     payload: GroupUpdate,
-    current_user: User = Depends(get_current_user),
+    current_user: Principal = Depends(get_current_user),
     session: Session = Depends(get_db),
 ) -> GroupRead:
     group = session.get(Group, group_id)
@@ -79,6 +98,11 @@ def update_group(
         group.color = payload.color
 
     session.add(group)
+    graph_changes.record_changes(
+        session,
+        group.organization_id,
+        graph_changes.upserts(graph_changes.SPHERE, [sphere.id for sphere in group.spheres]),
+    )
     session.commit()
     session.refresh(group)
 
@@ -88,7 +112,7 @@ def update_group(
 @router.delete("/groups/{group_id}", status_code=status.HTTP_204_NO_CONTENT, response_class=Response, response_model=None)
 def delete_group(
     group_id: int,
-    current_user: User = Depends(get_current_user),
+    current_user: Principal = Depends(get_current_user),
     session: Session = Depends(get_db),
 ) -> None:
     group = session.get(Group, group_id)
@@ -97,7 +121,11 @@ def delete_group(
 
     org_service.ensure_owner_or_admin(session, group.organization_id, current_user.id)
 
+    sphere_ids = [sphere.id for sphere in group.spheres]
     session.delete(group)
+    graph_changes.record_changes(
+        session, group.organization_id, graph_changes.upserts(graph_changes.SPHERE, sphere_ids)
+    )
     session.commit()
 
 
@@ -105,7 +133,7 @@ def delete_group(
 def add_group_member(
     group_id: int,
     payload: GroupMemberAdd,
-    current_user: User = Depends(get_current_user),
+    current_user: Principal = Depends(get_current_user),
     session: Session = Depends(get_db),
 ) -> GroupMemberRead:
     group = session.get(Group, group_id)
@@ -128,7 +156,7 @@ def add_group_member(
 def remove_group_member(
     group_id: int,
     user_id: int,
-    current_user: User = Depends(get_current_user),
+    current_user: Principal = Depends(get_current_user),
     session: Session = Depends(get_db),
 ) -> None:
     group = session.get(Group, group_id)
@@ -1,4 +1,7 @@
-﻿from fastapi import APIRouter
+﻿from fastapi import APIRouter, Depends
+
+from app.api.deps import get_current_user
+from app.services.map_cache import map_cache
 
 router = APIRouter(prefix="/health", tags=["health"])
 
@@ -6,3 +9,12 @@ router = APIRouter(prefix="/health", tags=["health"])
 @router.get("", summary="Health check")
 async def healthcheck() -> dict[str, str]:
     return {"status": "ok"}
+
+
+@router.get(
+    "/cache",
+    summary="Map response cache counters",
+    dependencies=[Depends(get_current_user)],
+)
+async def cache_stats() -> dict[str, int]:
+    return map_cache.stats()
@@ -3,30 +3,39 @@ from sqlalchemy.orm import Session
 
 from app.api.deps import get_current_user, get_db
 from app.core.config import settings
-from app.models import InviteStatus, OrganizationInvite, User
+from app.models import InviteStatus, OrganizationInvite
 from app.schemas.invite import InviteAccept, InviteCreate, InviteCreateResponse, InviteRead
 from app.services import email as email_service
 from app.services import invites as invite_service
 from app.services import organizations as org_service
+from app.services.pagination import MAX_PAGE_SIZE, attach_next_cursor, page_params
+from app.services.principal_cache import Principal
 
 router = APIRouter()
 
 
 @router.get("/", response_model=list[InviteRead])
 def list_invites(
+    response: Response,
     organization_id: int = Query(..., description="Organization identifier"),
-    current_user: User = Depends(get_current_user),
+    limit: int | None = Query(None, ge=1, le=MAX_PAGE_SIZE, description="Page size; omit for all"),
+    cursor: str | None = Query(None, description="Opaque cursor from the X-Next-Cursor header"),
+    current_user: Principal = Depends(get_current_user),
     session: Session = Depends(get_db),
 ) -> list[InviteRead]:
     org_service.ensure_owner_or_admin(session, organization_id, current_user.id)
-    invites = invite_service.list_invites(session, organization_id)
+    page_limit, page_cursor = page_params(limit, cursor)
+    invites, next_cursor = invite_service.list_invites(
+        session, organization_id, limit=page_limit, cursor=page_cursor
+    )
+    attach_next_cursor(response, next_cursor)
     return [InviteRead.model_validate(invite) for invite in invites]
 
 
 @router.post("/", response_model=InviteCreateResponse, status_code=status.HTTP_201_CREATED)
 def create_invite(
     payload: InviteCreate,
-    current_user: User = Depends(get_current_user),
+    current_user: Principal = Depends(get_current_user),
     session: Session = Depends(get_db),
 ) -> InviteCreateResponse:
     invite, token, group_names = invite_service.create_invite(session, payload, current_user)
@@ -55,7 +64,7 @@ def create_invite(
 @router.post("/accept", response_model=InviteRead)
 def accept_invite(
     payload: InviteAccept,
-    current_user: User = Depends(get_current_user),
+    current_user: Principal = Depends(get_current_user),
     session: Session = Depends(get_db),
 ) -> InviteRead:
     membership = invite_service.accept_invite(session, payload.token, current_user)
@@ -68,7 +77,7 @@ def accept_invite(
 @router.post("/{invite_id}/revoke", status_code=status.HTTP_204_NO_CONTENT, response_class=Response, response_model=None)
 def revoke_invite(
     invite_id: int,
-    current_user: User = Depends(get_current_user),
+    current_user: Principal = Depends(get_current_user),
     session: Session = Depends(get_db),
 ) -> None:
     invite = session.get(OrganizationInvite, invite_id)
@@ -1,20 +1,59 @@
 ﻿from __future__ import annotations
 
-from typing import Optional
+import asyncio
+import json
+from collections.abc import AsyncIterator
+from typing import List, Optional, Union
 
-from fastapi import APIRouter, Depends, HTTPException, Query, status
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response, status
+from fastapi.responses import StreamingResponse
 from pydantic import AliasChoices
 from sqlalchemy import select
-from sqlalchemy.orm import Session, selectinload
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session, selectinload, sessionmaker
+from starlette.concurrency import run_in_threadpool
 
-from app.api.deps import get_current_user, get_db
-from app.models import Edge, Node, Sphere, User
+from app.api.deps import (
+    conditional_response,
+    get_current_user,
+    get_db,
+    get_session_factory,
+    get_stream_user,
+)
+from app.core import compression
+from app.core.config import settings
+from app.models import Edge, GraphSnapshot, Node, Sphere
+from app.models.structures import nodes_rtree
 from app.schemas.graph import NODE_STATUSES, NODE_TYPES
-from app.schemas.map import MapResponse
+from app.schemas.map import (
+    MapChangesResponse,
+    MapEdge,
+    MapLodResponse,
+    MapNode,
+    MapResponse,
+    SnapshotCreate,
+    SnapshotDiff,
+    SnapshotRead,
+)
+from app.schemas.organization import SphereRead
+from app.services import (
+    graph_changes,
+    graph_events,
+    graph_json,
+    graph_snapshots,
+    graph_versions,
+    map_columnar,
+    map_lod,
+    node_search,
+)
 from app.services import organizations as org_service
+from app.services.map_cache import map_cache
+from app.services.principal_cache import Principal
 
 router = APIRouter()
 
+_STREAM_KEEPALIVE_SECONDS = 15.0
+
 
 def _validate_filters(node_type: Optional[str], status_value: Optional[str]) -> None:
     if node_type is not None and node_type not in NODE_TYPES:
@@ -23,7 +62,27 @@ def _validate_filters(node_type: Optional[str], status_value: Optional[str]) ->
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid node status")
 
 
-@router.get("/", response_model=MapResponse)
+def _wants_columnar(request: Request | None) -> bool:
+    if request is None:
+        return False
+    return map_columnar.MEDIA_TYPE in request.headers.get("accept", "")
+
+
+def _parse_bbox(value: Optional[str]) -> Optional[tuple[float, float, float, float]]:
+    if not isinstance(value, str) or not value.strip():
+        return None
+    try:
+        x0, y0, x1, y1 = (float(part) for part in value.split(","))
+    except ValueError as exc:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid bbox, expected x0,y0,x1,y1"
+        ) from exc
+    if x0 > x1 or y0 > y1:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid bbox bounds")
+    return x0, y0, x1, y1
+
+
+@router.get("/", response_model=Union[MapResponse, MapLodResponse])
 def read_map(
     organization_id: int = Query(
         ...,
@@ -44,12 +103,91 @@ def read_map(
         validation_alias=AliasChoices("status_value", "status"),
         description="Filter by node status",
     ),
-    search: Optional[str] = Query(None, description="Case-insensitive search by label or summary"),
-    current_user: User = Depends(get_current_user),
+    search: Optional[str] = Query(
+        None, description="Full-text search over label, summary, owners and links"
+    ),
+    bbox: Optional[str] = Query(
+        None, description="Viewport x0,y0,x1,y1: only nodes inside it and edges touching them"
+    ),
+    lod: Optional[str] = Query(
+        None,
+        pattern="^(sphere|type)$",
+        description=(
+            "Level of detail: node clusters per sphere or per (sphere, type) instead of nodes"
+        ),
+    ),
+    at: Optional[str] = Query(
+        None, description="Snapshot id or name to read instead of the current graph"
+    ),
+    request: Request = None,
+    response: Response = None,
+    current_user: Principal = Depends(get_current_user),
     session: Session = Depends(get_db),
-) -> MapResponse:
+) -> MapResponse | Response:
     org_service.require_membership(session, organization_id, current_user.id)
     _validate_filters(node_type, status_value)
+    viewport = _parse_bbox(bbox)
+    if lod is not None and (search or viewport is not None):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Level of detail does not combine with search or bbox",
+        )
+    snapshot_ref = at.strip() if isinstance(at, str) and at.strip() else None
+    if snapshot_ref is not None and (lod is not None or search or viewport is not None):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Snapshots do not combine with search, bbox or level of detail",
+        )
+    # Cluster maps are small, so they are always served as JSON.
+    columnar = lod is None and _wants_columnar(request)
+    if response is not None:
+        response.headers["Vary"] = "Accept"
+
+    search_value: Optional[str]
+    if isinstance(search, str):
+        search_value = search.strip().lower()
+    else:
+        search_value = None
+
+    if snapshot_ref is not None:
+        snapshot = graph_snapshots.resolve(session, organization_id, snapshot_ref)
+        return _read_snapshot_map(
+            session, snapshot, sphere_id, node_type, status_value, request, response, columnar
+        )
+
+    version, metrics_version = graph_versions.current_versions(session, organization_id)
+    etag = graph_versions.build_etag(
+        organization_id,
+        version,
+        "map",
+        metrics_version,
+        sphere_id,
+        node_type,
+        status_value,
+        search_value,
+        viewport,
+        "columnar" if columnar else "json",
+        lod,
+    )
+    not_modified = conditional_response(request, response, etag)
+    if not_modified is not None:
+        not_modified.headers["Vary"] = "Accept"
+        return not_modified
+
+    cache_key = (
+        organization_id,
+        metrics_version,
+        sphere_id,
+        node_type,
+        status_value,
+        search_value,
+        viewport,
+        columnar,
+        lod,
+    )
+    cached_body = map_cache.get(cache_key, version)
+    if cached_body is not None:
+        return _map_body_response(cache_key, version, cached_body, request, response, columnar)
 
     spheres_query = (
         select(Sphere)
@@ -62,46 +200,431 @@ def read_map(
         if not any(sphere.id == sphere_id for sphere in spheres):
             raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Sphere outside organization")
 
-    node_query = (
-        select(Node)
-        .join(Sphere)
-        .where(Sphere.organization_id == organization_id)
-    )
+    sphere_records = [
+        SphereRead.model_validate(sphere).model_dump(mode="json") for sphere in spheres
+    ]
+    if lod is not None:
+        clusters, cluster_edges = map_lod.build_lod(
+            session,
+            organization_id,
+            lod,
+            sphere_id=sphere_id,
+            node_type=node_type,
+            status_value=status_value,
+        )
+        body = graph_json.encode(
+            {
+                "organization_id": organization_id,
+                "version": version,
+                "lod": lod,
+                "spheres": sphere_records,
+                "clusters": clusters,
+                "edges": cluster_edges,
+            }
+        )
+        map_cache.put(cache_key, version, body)
+        return _map_body_response(cache_key, version, body, request, response, columnar)
+
+    if viewport is None:
+        node_query = (
+            select(*graph_json.NODE_COLUMNS)
+            .join(Sphere, Node.sphere_id == Sphere.id)
+            .where(Sphere.organization_id == organization_id)
+        )
+    else:
+        # Drive from the R*Tree; every candidate in the window is checked against the
+        # organization's spheres as it is joined, so other organizations' nodes never
+        # reach the rest of the query.
+        x0, y0, x1, y1 = viewport
+        node_query = (
+            select(*graph_json.NODE_COLUMNS)
+            .select_from(nodes_rtree)
+            .join(Node, Node.id == nodes_rtree.c.id)
+            .where(nodes_rtree.c.max_x >= x0)
+            .where(nodes_rtree.c.min_x <= x1)
+            .where(nodes_rtree.c.max_y >= y0)
+            .where(nodes_rtree.c.min_y <= y1)
+            .where(
+                Node.sphere_id.in_(
+                    select(Sphere.id).where(Sphere.organization_id == organization_id)
+                )
+            )
+        )
     if sphere_id is not None:
         node_query = node_query.where(Node.sphere_id == sphere_id)
     if node_type is not None:
         node_query = node_query.where(Node.node_type == node_type)
     if status_value is not None:
         node_query = node_query.where(Node.status == status_value)
-    search_value: Optional[str]
-    if isinstance(search, str):
-        search_value = search.strip().lower()
-    else:
-        search_value = None
     if search_value:
-        like = f"%{search_value}%"
-        node_query = node_query.where(Node.label.ilike(like) | Node.summary.ilike(like))
+        node_query = node_search.apply_search(node_query, search_value, ranked=True)
 
-    nodes = session.scalars(node_query.order_by(Node.created_at.desc())).all()
+    nodes = session.execute(node_query.order_by(Node.created_at.desc())).all()
     node_ids = [node.id for node in nodes]
 
-    edges: list[Edge]
     if not node_ids:
         edges = []
     else:
         edge_query = (
-            select(Edge)
-            .join(Sphere)
+            select(*graph_json.EDGE_COLUMNS)
+            .join(Sphere, Edge.sphere_id == Sphere.id)
             .where(Sphere.organization_id == organization_id)
         )
         if sphere_id is not None:
             edge_query = edge_query.where(Edge.sphere_id == sphere_id)
-        edge_query = edge_query.where(Edge.source_node_id.in_(node_ids)).where(Edge.target_node_id.in_(node_ids))
-        edges = session.scalars(edge_query).all()
+        if viewport is not None:
+            edge_query = edge_query.where(
+                Edge.source_node_id.in_(node_ids) | Edge.target_node_id.in_(node_ids)
+            )
+        else:
+            edge_query = edge_query.where(Edge.source_node_id.in_(node_ids)).where(
+                Edge.target_node_id.in_(node_ids)
+            )
+        edges = session.execute(edge_query).all()
+
+    if columnar:
+        body = map_columnar.encode_map(
+            organization_id=organization_id,
+            version=version,
+            spheres=sphere_records,
+            nodes=nodes,
+            edges=edges,
+        )
+    else:
+        # Same bytes as ``MapResponse.model_dump_json(by_alias=True)``, without model validation.
+        body = graph_json.encode(
+            {
+                "organization_id": organization_id,
+                "version": version,
+                "spheres": sphere_records,
+                "nodes": [graph_json.map_node_record(node) for node in nodes],
+                "edges": [graph_json.map_edge_record(edge) for edge in edges],
+            }
+        )
+    map_cache.put(cache_key, version, body)
+    return _map_body_response(cache_key, version, body, request, response, columnar)
+
+
+def _read_snapshot_map(
+    session: Session,
+    snapshot: GraphSnapshot,
+    sphere_id: Optional[int],
+    node_type: Optional[str],
+    status_value: Optional[str],
+    request: Request | None,
+    response: Response | None,
+    columnar: bool,
+) -> Response:
+    # Snapshots never change, so the ETag and the cached body only depend on their trees.
+    organization_id = snapshot.organization_id
+    roots = tuple(graph_snapshots.roots(snapshot).values())
+    etag = graph_versions.build_etag(
+        organization_id,
+        snapshot.version,
+        "map",
+        sphere_id,
+        node_type,
+        status_value,
+        "columnar" if columnar else "json",
+        "snapshot",
+        snapshot.id,
+        *roots,
+    )
+    not_modified = conditional_response(request, response, etag)
+    if not_modified is not None:
+        not_modified.headers["Vary"] = "Accept"
+        return not_modified
+
+    cache_key = (organization_id, sphere_id, node_type, status_value, columnar, "snapshot", *roots)
+    version = snapshot.version
+    body = map_cache.get(cache_key, version)
+    if body is not None:
+        return _map_body_response(cache_key, version, body, request, response, columnar)
 
-    return MapResponse.from_entities(
+    spheres, nodes, edges = graph_snapshots.load_map(
+        session, snapshot, sphere_id=sphere_id, node_type=node_type, status_value=status_value
+    )
+    if sphere_id is not None and not any(sphere["id"] == sphere_id for sphere in spheres):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST, detail="Sphere outside organization"
+        )
+    spheres.sort(key=lambda sphere: sphere["created_at"])
+    if columnar:
+        body = map_columnar.encode_map(
+            organization_id=organization_id,
+            version=version,
+            spheres=spheres,
+            nodes=nodes,
+            edges=edges,
+        )
+    else:
+        body = graph_json.encode(
+            {
+                "organization_id": organization_id,
+                "version": version,
+                "spheres": spheres,
+                "nodes": [graph_json.map_node_record(node) for node in nodes],
+                "edges": [graph_json.map_edge_record(edge) for edge in edges],
+            }
+        )
+    map_cache.put(cache_key, version, body)
+    return _map_body_response(cache_key, version, body, request, response, columnar)
+
+
+def _map_body_response(
+    cache_key: tuple[object, ...],
+    version: int,
+    body: bytes,
+    request: Request | None,
+    response: Response | None,
+    columnar: bool,
+) -> Response:
+    media_type = map_columnar.MEDIA_TYPE if columnar else "application/json"
+    encoding = None
+    if settings.compression_enabled and request is not None:
+        if len(body) >= settings.compression_min_size:
+            encoding = compression.negotiate(request.headers.get("accept-encoding"))
+    if encoding is None:
+        return graph_json.json_response(body, response, media_type=media_type)
+
+    # Compress once per cache entry and coding; the middleware skips encoded responses.
+    encoded = map_cache.get_encoded(cache_key, version, encoding)
+    if encoded is None:
+        encoded = compression.compress(body, encoding)
+        map_cache.put_encoded(cache_key, version, encoding, encoded)
+    served = graph_json.json_response(encoded, response, media_type=media_type)
+    compression.mark_encoded(served.headers, encoding)
+    return served
+
+
+@router.get("/changes", response_model=MapChangesResponse)
+def read_map_changes(
+    organization_id: int = Query(
+        ...,
+        alias="org_id",
+        validation_alias=AliasChoices("organization_id", "org_id"),
+        description="Organization identifier",
+    ),
+    since: int = Query(..., ge=0, description="Graph version the client already has"),
+    current_user: Principal = Depends(get_current_user),
+    session: Session = Depends(get_db),
+) -> MapChangesResponse:
+    org_service.require_membership(session, organization_id, current_user.id)
+
+    change_set = graph_changes.collect_changes(session, organization_id, since)
+    response = MapChangesResponse(
         organization_id=organization_id,
-        spheres=spheres,
-        nodes=nodes,
-        edges=edges,
+        since=since,
+        version=change_set.version,
+        resync_required=change_set.resync_required,
+    )
+    if change_set.resync_required:
+        return response
+
+    deleted = {kind: set(ids) for kind, ids in change_set.deletes.items()}
+
+    sphere_ids = change_set.upserts[graph_changes.SPHERE]
+    if sphere_ids:
+        spheres = session.scalars(
+            select(Sphere)
+            .options(selectinload(Sphere.groups))
+            .where(Sphere.organization_id == organization_id)
+            .where(Sphere.id.in_(sphere_ids))
+        ).all()
+        response.spheres = [SphereRead.model_validate(sphere) for sphere in spheres]
+        deleted[graph_changes.SPHERE] |= sphere_ids - {sphere.id for sphere in spheres}
+
+    node_ids = change_set.upserts[graph_changes.NODE]
+    if node_ids:
+        nodes = session.scalars(
+            select(Node)
+            .join(Sphere)
+            .where(Sphere.organization_id == organization_id)
+            .where(Node.id.in_(node_ids))
+        ).all()
+        response.nodes = [MapNode.model_validate(node) for node in nodes]
+        deleted[graph_changes.NODE] |= node_ids - {node.id for node in nodes}
+
+    edge_ids = change_set.upserts[graph_changes.EDGE]
+    if edge_ids:
+        edges = session.scalars(
+            select(Edge)
+            .join(Sphere)
+            .where(Sphere.organization_id == organization_id)
+            .where(Edge.id.in_(edge_ids))
+        ).all()
+        response.edges = [MapEdge.model_validate(edge) for edge in edges]
+        deleted[graph_changes.EDGE] |= edge_ids - {edge.id for edge in edges}
+
+    response.deleted_sphere_ids = sorted(deleted[graph_changes.SPHERE])
+    response.deleted_node_ids = sorted(deleted[graph_changes.NODE])
+    response.deleted_edge_ids = sorted(deleted[graph_changes.EDGE])
+    return response
+
+
+@router.get("/snapshots", response_model=List[SnapshotRead])
+def list_snapshots(
+    organization_id: int = Query(
+        ...,
+        alias="org_id",
+        validation_alias=AliasChoices("organization_id", "org_id"),
+        description="Organization identifier",
+    ),
+    current_user: Principal = Depends(get_current_user),
+    session: Session = Depends(get_db),
+) -> List[SnapshotRead]:
+    org_service.require_membership(session, organization_id, current_user.id)
+    snapshots = session.scalars(
+        select(GraphSnapshot)
+        .where(GraphSnapshot.organization_id == organization_id)
+        .order_by(GraphSnapshot.created_at.desc(), GraphSnapshot.id.desc())
+    ).all()
+    return [SnapshotRead.model_validate(snapshot) for snapshot in snapshots]
+
+
+@router.post("/snapshots", response_model=SnapshotRead, status_code=status.HTTP_201_CREATED)
+def create_snapshot(
+    payload: SnapshotCreate,
+    current_user: Principal = Depends(get_current_user),
+    session: Session = Depends(get_db),
+) -> SnapshotRead:
+    org_service.require_membership(session, payload.organization_id, current_user.id)
+    taken = session.scalar(
+        select(GraphSnapshot.id)
+        .where(GraphSnapshot.organization_id == payload.organization_id)
+        .where(GraphSnapshot.name == payload.name)
+    )
+    if taken is not None:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST, detail="Snapshot already exists"
+        )
+    snapshot = graph_snapshots.take_snapshot(
+        session, payload.organization_id, name=payload.name, user_id=current_user.id
+    )
+    try:
+        session.commit()
+    except IntegrityError as exc:
+        session.rollback()
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST, detail="Snapshot already exists"
+        ) from exc
+    return SnapshotRead.model_validate(snapshot)
+
+
+@router.get("/snapshots/diff", response_model=SnapshotDiff)
+def diff_snapshots(
+    organization_id: int = Query(
+        ...,
+        alias="org_id",
+        validation_alias=AliasChoices("organization_id", "org_id"),
+        description="Organization identifier",
+    ),
+    source: str = Query(..., alias="from", description="Snapshot id or name to compare from"),
+    target: Optional[str] = Query(
+        None,
+        alias="to",
+        description="Snapshot id or name to compare to; the current graph if omitted",
+    ),
+    current_user: Principal = Depends(get_current_user),
+    session: Session = Depends(get_db),
+) -> SnapshotDiff:
+    org_service.require_membership(session, organization_id, current_user.id)
+    source_snapshot = graph_snapshots.resolve(session, organization_id, source)
+    target_snapshot = (
+        graph_snapshots.resolve(session, organization_id, target)
+        if isinstance(target, str) and target.strip()
+        else None
+    )
+    changes = graph_snapshots.diff(session, source_snapshot, target_snapshot)
+    return SnapshotDiff(
+        organization_id=organization_id,
+        source=SnapshotRead.model_validate(source_snapshot),
+        target=SnapshotRead.model_validate(target_snapshot) if target_snapshot else None,
+        **changes,
+    )
+
+
+@router.delete(
+    "/snapshots/{snapshot_id}",
+    status_code=status.HTTP_204_NO_CONTENT,
+    response_class=Response,
+    response_model=None,
+)
+def delete_snapshot(
+    snapshot_id: int,
+    current_user: Principal = Depends(get_current_user),
+    session: Session = Depends(get_db),
+) -> Response:
+    snapshot = session.get(GraphSnapshot, snapshot_id)
+    if snapshot is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Snapshot not found")
+    org_service.ensure_owner_or_admin(session, snapshot.organization_id, current_user.id)
+    graph_snapshots.delete_snapshot(session, snapshot)
+    session.commit()
+    return Response(status_code=status.HTTP_204_NO_CONTENT)
+
+
+def _sse(event: str, data: dict[str, object], event_id: int | None = None) -> str:
+    lines = []
+    if event_id is not None:
+        lines.append(f"id: {event_id}")
+    lines.append(f"event: {event}")
+    lines.append(f"data: {json.dumps(data, separators=(',', ':'))}")
+    return "\n".join(lines) + "\n\n"
+
+
+async def _stream_graph_events(
+    request: Request, subscription: graph_events.Subscription, version: int
+) -> AsyncIterator[str]:
+    try:
+        yield "retry: 3000\n\n"
+        hello = {"organization_id": subscription.organization_id, "version": version}
+        yield _sse("hello", hello, version)
+        while True:
+            if await request.is_disconnected():
+                break
+            try:
+                message = await asyncio.wait_for(
+                    subscription.queue.get(), _STREAM_KEEPALIVE_SECONDS
+                )
+            except asyncio.TimeoutError:
+                yield ": keepalive\n\n"
+                continue
+            if message is None:
+                yield _sse("resync", {"organization_id": subscription.organization_id})
+                break
+            yield _sse("graph", message, int(message["version"]))
+    finally:
+        graph_events.hub.unsubscribe(subscription)
+
+
+@router.get("/stream", response_class=StreamingResponse)
+async def stream_map_events(
+    request: Request,
+    organization_id: int = Query(
+        ...,
+        alias="org_id",
+        validation_alias=AliasChoices("organization_id", "org_id"),
+        description="Organization identifier",
+    ),
+    current_user: Principal = Depends(get_stream_user),
+    session_factory: sessionmaker[Session] = Depends(get_session_factory),
+) -> StreamingResponse:
+    def check_membership() -> None:
+        with session_factory() as session:
+            org_service.require_membership(session, organization_id, current_user.id)
+
+    def read_version() -> int:
+        with session_factory() as session:
+            return graph_versions.current_version(session, organization_id)
+
+    # Streams stay open for hours, so they must not keep a pooled connection checked out.
+    await run_in_threadpool(check_membership)
+    # Subscribe before reading the version, so an event committed in between is queued.
+    subscription = graph_events.hub.subscribe(organization_id)
+    version = await run_in_threadpool(read_version)
+    return StreamingResponse(
+        _stream_graph_events(request, subscription, version),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
     )
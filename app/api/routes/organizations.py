@@ -2,10 +2,10 @@ from sqlalchemy import func, select
 from sqlalchemy.exc import IntegrityError
 from sqlalchemy.orm import Session, selectinload
 
-from fastapi import APIRouter, Depends, HTTPException, Response, status
+from fastapi import APIRouter, Depends, HTTPException, Query, Response, status
 
 from app.api.deps import get_current_user, get_db
-from app.models import Organization, OrganizationMember, OrganizationRole, User
+from app.models import Organization, OrganizationMember, OrganizationRole
 from app.schemas.organization import (
     OrganizationCreate,
     OrganizationMemberRead,
@@ -13,13 +13,21 @@ from app.schemas.organization import (
     OrganizationRead,
 )
 from app.services import organizations as org_service
+from app.services.pagination import (
+    MAX_PAGE_SIZE,
+    apply_keyset,
+    attach_next_cursor,
+    page_params,
+    split_page,
+)
+from app.services.principal_cache import Principal
 
 router = APIRouter()
 
 
 @router.get("/", response_model=list[OrganizationRead])
 def list_organizations(
-    current_user: User = Depends(get_current_user),
+    current_user: Principal = Depends(get_current_user),
     session: Session = Depends(get_db),
 ) -> list[OrganizationRead]:
     organizations = session.scalars(
@@ -33,7 +41,7 @@ def list_organizations(
 @router.post("/", response_model=OrganizationRead, status_code=status.HTTP_201_CREATED)
 def create_organization(
     payload: OrganizationCreate,
-    current_user: User = Depends(get_current_user),
+    current_user: Principal = Depends(get_current_user),
     session: Session = Depends(get_db),
 ) -> OrganizationRead:
     organization = Organization(
@@ -59,7 +67,7 @@ def create_organization(
 @router.get("/{organization_id}", response_model=OrganizationRead)
 def get_organization(
     organization_id: int,
-    current_user: User = Depends(get_current_user),
+    current_user: Principal = Depends(get_current_user),
     session: Session = Depends(get_db),
 ) -> OrganizationRead:
     organization = session.get(Organization, organization_id)
@@ -76,17 +84,27 @@ def get_organization(
 @router.get("/{organization_id}/members", response_model=list[OrganizationMemberRead])
 def list_members(
     organization_id: int,
-    current_user: User = Depends(get_current_user),
+    response: Response,
+    limit: int | None = Query(None, ge=1, le=MAX_PAGE_SIZE, description="Page size; omit for all"),
+    cursor: str | None = Query(None, description="Opaque cursor from the X-Next-Cursor header"),
+    current_user: Principal = Depends(get_current_user),
     session: Session = Depends(get_db),
 ) -> list[OrganizationMemberRead]:
     org_service.require_membership(session, organization_id, current_user.id)
+    page_limit, page_cursor = page_params(limit, cursor)
 
-    members = session.scalars(
+    query = apply_keyset(
         select(OrganizationMember)
         .options(selectinload(OrganizationMember.user))
-        .where(OrganizationMember.organization_id == organization_id)
-        .order_by(OrganizationMember.created_at.asc())
-    ).all()
+        .where(OrganizationMember.organization_id == organization_id),
+        OrganizationMember.created_at,
+        OrganizationMember.id,
+        limit=page_limit,
+        cursor=page_cursor,
+        descending=False,
+    )
+    members, next_cursor = split_page(session.scalars(query).all(), page_limit)
+    attach_next_cursor(response, next_cursor)
 
     return [OrganizationMemberRead.model_validate(member) for member in members]
 
@@ -96,7 +114,7 @@ def update_member_role(
     organization_id: int,
     member_id: int,
     payload: OrganizationMemberUpdate,
-    current_user: User = Depends(get_current_user),
+    current_user: Principal = Depends(get_current_user),
     session: Session = Depends(get_db),
 ) -> OrganizationMemberRead:
     acting_member = org_service.ensure_owner_or_admin(session, organization_id, current_user.id)
@@ -116,7 +134,7 @@ def update_member_role(
 def remove_member(
     organization_id: int,
     member_id: int,
-    current_user: User = Depends(get_current_user),
+    current_user: Principal = Depends(get_current_user),
     session: Session = Depends(get_db),
 ) -> None:
     acting_member = org_service.ensure_owner_or_admin(session, organization_id, current_user.id)
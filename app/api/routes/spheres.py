@@ -1,18 +1,29 @@
-﻿from typing import List
+﻿from typing import List, Optional
 
-from fastapi import APIRouter, Depends, HTTPException, Query, status
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response, status
 from sqlalchemy import select
 from sqlalchemy.orm import Session, selectinload
 
-from app.api.deps import get_current_user, get_db
-from app.models import Group, Sphere, User
+from app.api.deps import conditional_response, get_current_user, get_db
+from app.models import Edge, Group, Node, Sphere
+from app.schemas.graph import NodeLayoutRequest, NodeLayoutResult, NodePosition
 from app.schemas.organization import (
     SphereCreate,
     SphereLayoutRequest,
+    SphereLayoutSolveRequest,
     SphereRead,
     SphereUpdate,
 )
+from app.services import graph_changes, graph_versions, node_layout, sphere_layout
 from app.services import organizations as org_service
+from app.services.pagination import (
+    MAX_PAGE_SIZE,
+    apply_keyset,
+    attach_next_cursor,
+    page_params,
+    split_page,
+)
+from app.services.principal_cache import Principal
 
 router = APIRouter()
 
@@ -26,31 +37,62 @@ def _get_sphere(session: Session, sphere_id: int) -> Sphere:
     return sphere
 
 
+def _record_moves(
+    session: Session,
+    organization_id: int,
+    spheres: List[Sphere],
+    before: dict[int, node_layout.Circle],
+) -> None:
+    # Nodes follow their sphere; the spheres and the moved nodes form one graph change.
+    node_ids = sphere_layout.reproject_nodes(session, spheres, before)
+    graph_changes.record_changes(
+        session,
+        organization_id,
+        graph_changes.upserts(graph_changes.SPHERE, [sphere.id for sphere in spheres])
+        + graph_changes.upserts(graph_changes.NODE, node_ids),
+    )
+
+
 @router.get("/", response_model=List[SphereRead])
 def list_spheres(
     organization_id: int = Query(..., description="Filter spheres by organization"),
-    current_user: User = Depends(get_current_user),
+    limit: Optional[int] = Query(
+        None, ge=1, le=MAX_PAGE_SIZE, description="Page size; omit for all"
+    ),
+    cursor: Optional[str] = Query(None, description="Opaque cursor from the X-Next-Cursor header"),
+    request: Request = None,
+    response: Response = None,
+    current_user: Principal = Depends(get_current_user),
     session: Session = Depends(get_db),
-) -> List[SphereRead]:
+) -> List[SphereRead] | Response:
     org_service.require_membership(session, organization_id, current_user.id)
+    page_limit, page_cursor = page_params(limit, cursor)
 
-    spheres = (
-        session.scalars(
-            select(Sphere)
-            .options(selectinload(Sphere.groups))
-            .where(Sphere.organization_id == organization_id)
-            .order_by(Sphere.created_at.desc())
-        )
-        .unique()
-        .all()
+    version = graph_versions.current_version(session, organization_id)
+    etag = graph_versions.build_etag(organization_id, version, "spheres", page_limit, page_cursor)
+    not_modified = conditional_response(request, response, etag)
+    if not_modified is not None:
+        return not_modified
+
+    query = apply_keyset(
+        select(Sphere)
+        .options(selectinload(Sphere.groups))
+        .where(Sphere.organization_id == organization_id),
+        Sphere.created_at,
+        Sphere.id,
+        limit=page_limit,
+        cursor=page_cursor,
+        descending=True,
     )
+    spheres, next_cursor = split_page(session.scalars(query).unique().all(), page_limit)
+    attach_next_cursor(response, next_cursor)
     return [SphereRead.model_validate(sphere) for sphere in spheres]
 
 
 @router.post("/", response_model=SphereRead, status_code=status.HTTP_201_CREATED)
 def create_sphere(
     payload: SphereCreate,
-    current_user: User = Depends(get_current_user),
+    current_user: Principal = Depends(get_current_user),
     session: Session = Depends(get_db),
 ) -> SphereRead:
     org_service.ensure_owner_or_admin(session, payload.organization_id, current_user.id)
@@ -76,6 +118,8 @@ def create_sphere(
         sphere.groups.extend(groups)
 
     session.add(sphere)
+    session.flush()
+    graph_changes.record_upsert(session, sphere.organization_id, graph_changes.SPHERE, sphere.id)
     session.commit()
     session.refresh(sphere)
 
@@ -85,7 +129,7 @@ def create_sphere(
 @router.get("/{sphere_id}", response_model=SphereRead)
 def get_sphere(
     sphere_id: int,
-    current_user: User = Depends(get_current_user),
+    current_user: Principal = Depends(get_current_user),
     session: Session = Depends(get_db),
 ) -> SphereRead:
     sphere = _get_sphere(session, sphere_id)
@@ -97,11 +141,12 @@ def get_sphere(
 def update_sphere(
     sphere_id: int,
     payload: SphereUpdate,
-    current_user: User = Depends(get_current_user),
+    current_user: Principal = Depends(get_current_user),
     session: Session = Depends(get_db),
 ) -> SphereRead:
     sphere = _get_sphere(session, sphere_id)
     org_service.ensure_owner_or_admin(session, sphere.organization_id, current_user.id)
+    before = sphere_layout.circles([sphere])
 
     if payload.name is not None:
         sphere.name = payload.name
@@ -127,6 +172,7 @@ def update_sphere(
         sphere.groups = groups
 
     session.add(sphere)
+    _record_moves(session, sphere.organization_id, [sphere], before)
     session.commit()
     session.refresh(sphere)
 
@@ -136,7 +182,7 @@ def update_sphere(
 @router.post("/layout", response_model=List[SphereRead])
 def update_sphere_layout(
     payload: SphereLayoutRequest,
-    current_user: User = Depends(get_current_user),
+    current_user: Principal = Depends(get_current_user),
     session: Session = Depends(get_db),
 ) -> List[SphereRead]:
     org_service.ensure_owner_or_admin(session, payload.organization_id, current_user.id)
@@ -153,6 +199,7 @@ def update_sphere_layout(
 
     if len(spheres) != len(layout_map):
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Sphere set mismatch")
+    before = sphere_layout.circles(spheres)
 
     for sphere in spheres:
         if sphere.organization_id != payload.organization_id:
@@ -166,6 +213,7 @@ def update_sphere_layout(
             sphere.radius = update.radius
         session.add(sphere)
 
+    _record_moves(session, payload.organization_id, list(spheres), before)
     session.commit()
 
     # Refresh to include relationships
@@ -175,4 +223,90 @@ def update_sphere_layout(
     return [SphereRead.model_validate(sphere) for sphere in spheres]
 
 
+@router.post("/layout/solve", response_model=List[SphereRead])
+def solve_sphere_layout(
+    payload: SphereLayoutSolveRequest,
+    current_user: Principal = Depends(get_current_user),
+    session: Session = Depends(get_db),
+) -> List[SphereRead]:
+    org_service.ensure_owner_or_admin(session, payload.organization_id, current_user.id)
+
+    spheres = session.scalars(
+        select(Sphere)
+        .options(selectinload(Sphere.groups))
+        .where(Sphere.organization_id == payload.organization_id)
+        .order_by(Sphere.id)
+    ).all()
+    if not spheres:
+        return []
+
+    counts = sphere_layout.node_counts(session, [sphere.id for sphere in spheres])
+    solved = sphere_layout.solve([counts[sphere.id] for sphere in spheres], payload.mode)
+    before = sphere_layout.circles(spheres)
+    for sphere, circle in zip(spheres, solved, strict=True):
+        sphere.center_x = circle.center_x
+        sphere.center_y = circle.center_y
+        sphere.radius = circle.radius
+
+    _record_moves(session, payload.organization_id, list(spheres), before)
+    session.commit()
 
+    for sphere in spheres:
+        session.refresh(sphere)
+
+    return [SphereRead.model_validate(sphere) for sphere in spheres]
+
+
+@router.post("/{sphere_id}/nodes/layout", response_model=NodeLayoutResult)
+def layout_sphere_nodes(
+    sphere_id: int,
+    payload: NodeLayoutRequest,
+    current_user: Principal = Depends(get_current_user),
+    session: Session = Depends(get_db),
+) -> NodeLayoutResult:
+    sphere = _get_sphere(session, sphere_id)
+    org_service.require_membership(session, sphere.organization_id, current_user.id)
+    if not node_layout.available():
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE, detail="Layout engine unavailable"
+        )
+
+    nodes = session.execute(
+        select(Node.id, Node.x, Node.y).where(Node.sphere_id == sphere.id).order_by(Node.id)
+    ).all()
+    positions = {node_id: position for position, (node_id, _, _) in enumerate(nodes)}
+    selected = None if payload.node_ids is None else set(payload.node_ids)
+    if selected is not None and not selected <= positions.keys():
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST, detail="Nodes must belong to the sphere"
+        )
+
+    edges = session.execute(
+        select(Edge.source_node_id, Edge.target_node_id).where(Edge.sphere_id == sphere.id)
+    ).all()
+    placed = node_layout.force_layout(
+        [(x, y) for _, x, y in nodes],
+        [(positions[source], positions[target]) for source, target in edges],
+        node_layout.Circle.for_sphere(sphere),
+        movable=None if selected is None else [node_id in selected for node_id, _, _ in nodes],
+        iterations=payload.iterations,
+    )
+    moved = [
+        (node_id, x, y)
+        for (node_id, _, _), (x, y) in zip(nodes, placed, strict=True)
+        if selected is None or node_id in selected
+    ]
+    if moved:
+        node_layout.write_positions(session, moved)
+        graph_changes.record_changes(
+            session,
+            sphere.organization_id,
+            graph_changes.upserts(graph_changes.NODE, [node_id for node_id, _, _ in moved]),
+        )
+        session.commit()
+
+    return NodeLayoutResult(
+        sphere_id=sphere.id,
+        updated=len(moved),
+        positions=[NodePosition(id=node_id, x=x, y=y) for node_id, x, y in moved],
+    )
@@ -0,0 +1,325 @@
+from __future__ import annotations
+
+import logging
+import mimetypes
+import os
+import zlib
+from collections.abc import Iterable, MutableMapping
+from typing import Any, Protocol
+
+from starlette.concurrency import run_in_threadpool
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.responses import FileResponse, Response
+from starlette.staticfiles import StaticFiles
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+try:  # Optional codecs, see the ``compression`` extra in pyproject.toml.
+    import brotli
+except ImportError:  # pragma: no cover - depends on the environment
+    brotli = None
+
+try:
+    import zstandard
+except ImportError:  # pragma: no cover - depends on the environment
+    zstandard = None
+
+logger = logging.getLogger(__name__)
+
+# Preferred first when the client weighs several encodings equally.
+_ENCODINGS = tuple(
+    name
+    for name, available in (("br", brotli), ("zstd", zstandard), ("gzip", zlib))
+    if available is not None
+)
+# (on-the-fly, precompressed) levels: bodies compressed once can afford the slow settings.
+_LEVELS = {"br": (5, 11), "zstd": (3, 19), "gzip": (6, 9)}
+_COMPRESSIBLE_TYPES = (
+    "text/",
+    "application/json",
+    "application/javascript",
+    "application/x-ndjson",
+    "application/xml",
+    "application/vnd.egida.",
+    "image/svg+xml",
+)
+_UNBUFFERED_TYPES = ("text/event-stream",)
+_THREADPOOL_BYTES = 256 * 1024
+
+
+class StreamCompressor(Protocol):
+    def compress(self, data: bytes) -> bytes: ...
+
+    def flush(self) -> bytes: ...
+
+
+class _BrotliStream:
+    def __init__(self) -> None:
+        self._compressor = brotli.Compressor(quality=_LEVELS["br"][0])
+
+    def compress(self, data: bytes) -> bytes:
+        return self._compressor.process(data)
+
+    def flush(self) -> bytes:
+        return self._compressor.finish()
+
+
+class _ZstdStream:
+    def __init__(self) -> None:
+        self._compressor = zstandard.ZstdCompressor(level=_LEVELS["zstd"][0]).compressobj()
+
+    def compress(self, data: bytes) -> bytes:
+        return self._compressor.compress(data)
+
+    def flush(self) -> bytes:
+        return self._compressor.flush()
+
+
+def available_encodings() -> tuple[str, ...]:
+    return _ENCODINGS
+
+
+def negotiate(accept_encoding: str | None, offered: Iterable[str] | None = None) -> str | None:
+    """Pick the content coding to use for a request's ``Accept-Encoding`` header.
+
+    Only codings we can produce (optionally narrowed to ``offered``) are considered; the
+    highest q-value wins and ties go to the better compressor. ``None`` means identity.
+    """
+
+    if not accept_encoding:
+        return None
+    candidates = [name for name in _ENCODINGS if offered is None or name in set(offered)]
+    weights: dict[str, float] = {}
+    wildcard: float | None = None
+    for part in accept_encoding.split(","):
+        name, _, params = part.strip().partition(";")
+        name = name.strip().lower()
+        weight = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                weight = float(params[2:])
+            except ValueError:
+                weight = 0.0
+        if name == "*":
+            wildcard = weight
+        elif name:
+            weights[name] = weight
+
+    best: str | None = None
+    best_weight = 0.0
+    for name in candidates:
+        weight = weights.get(name, wildcard if wildcard is not None else 0.0)
+        if weight > best_weight:
+            best, best_weight = name, weight
+    return best
+
+
+def is_compressible(content_type: str | None) -> bool:
+    if not content_type:
+        return False
+    content_type = content_type.lower()
+    if content_type.startswith(_UNBUFFERED_TYPES):
+        return False
+    return content_type.startswith(_COMPRESSIBLE_TYPES)
+
+
+def compress(body: bytes, encoding: str, *, precompress: bool = False) -> bytes:
+    level = _LEVELS[encoding][1 if precompress else 0]
+    if encoding == "br":
+        return brotli.compress(body, quality=level)
+    if encoding == "zstd":
+        return zstandard.ZstdCompressor(level=level).compress(body)
+    if encoding == "gzip":
+        compressor = zlib.compressobj(level, zlib.DEFLATED, 31)
+        return compressor.compress(body) + compressor.flush()
+    raise ValueError(f"unsupported content coding: {encoding}")
+
+
+def stream_compressor(encoding: str) -> StreamCompressor:
+    if encoding == "br":
+        return _BrotliStream()
+    if encoding == "zstd":
+        return _ZstdStream()
+    if encoding == "gzip":
+        return zlib.compressobj(_LEVELS["gzip"][0], zlib.DEFLATED, 31)
+    raise ValueError(f"unsupported content coding: {encoding}")
+
+
+def mark_encoded(headers: MutableMapping[str, str], encoding: str) -> None:
+    """Label a compressed body: coding, ``Vary`` and a weak validator.
+
+    The ETag becomes weak because the bytes differ per coding while the representation
+    does not; ``etag_matches`` ignores the ``W/`` prefix, so revalidation keeps working.
+    """
+
+    headers["content-encoding"] = encoding
+    add_vary(headers, "Accept-Encoding")
+    weaken_etag(headers)
+
+
+def weaken_etag(headers: MutableMapping[str, str]) -> None:
+    etag = headers.get("etag")
+    if etag and not etag.startswith("W/"):
+        headers["etag"] = f"W/{etag}"
+
+
+def add_vary(headers: MutableMapping[str, str], field: str) -> None:
+    existing = headers.get("vary")
+    if not existing:
+        headers["vary"] = field
+    elif field.lower() not in {item.strip().lower() for item in existing.split(",")}:
+        headers["vary"] = f"{existing}, {field}"
+
+
+class CompressionMiddleware:
+    """Compress responses for clients that accept gzip, brotli or zstd.
+
+    Bodies smaller than ``minimum_size``, non-text media types, event streams and
+    responses that already carry a ``Content-Encoding`` (precompressed cache entries and
+    static files) pass through untouched. Streaming responses are compressed chunk by chunk.
+    """
+
+    def __init__(self, app: ASGIApp, minimum_size: int = 1024) -> None:
+        self.app = app
+        self.minimum_size = minimum_size
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        encoding = negotiate(Headers(scope=scope).get("accept-encoding"))
+        if encoding is None:
+            await self.app(scope, receive, send)
+            return
+        responder = _CompressingResponder(send, encoding, self.minimum_size)
+        await self.app(scope, receive, responder.send)
+
+
+class _CompressingResponder:
+    def __init__(self, send: Send, encoding: str, minimum_size: int) -> None:
+        self._send = send
+        self._encoding = encoding
+        self._minimum_size = minimum_size
+        self._start: Message | None = None
+        self._compressor: StreamCompressor | None = None
+        self._passthrough = False
+
+    async def send(self, message: Message) -> None:
+        if message["type"] == "http.response.start":
+            headers = MutableHeaders(raw=list(message["headers"]))
+            message["headers"] = headers.raw
+            if message["status"] == 304:
+                # Keep the validator identical to the one on the (compressed) 200 response.
+                weaken_etag(headers)
+            self._passthrough = (
+                message["status"] in (204, 206, 304)
+                or "content-encoding" in headers
+                or not is_compressible(headers.get("content-type"))
+            )
+            if self._passthrough:
+                await self._send(message)
+            else:
+                self._start = message
+            return
+        if message["type"] != "http.response.body" or self._passthrough:
+            await self._send(message)
+            return
+
+        body = message.get("body", b"")
+        more_body = message.get("more_body", False)
+        if self._start is not None:
+            start, self._start = self._start, None
+            headers = MutableHeaders(raw=start["headers"])
+            add_vary(headers, "Accept-Encoding")
+            weaken_etag(headers)
+            if not more_body and len(body) < self._minimum_size:
+                self._passthrough = True
+                await self._send(start)
+                await self._send(message)
+                return
+            mark_encoded(headers, self._encoding)
+            if not more_body:
+                if len(body) >= _THREADPOOL_BYTES:
+                    body = await run_in_threadpool(compress, body, self._encoding)
+                else:
+                    body = compress(body, self._encoding)
+                headers["content-length"] = str(len(body))
+                await self._send(start)
+                await self._send({"type": "http.response.body", "body": body})
+                return
+            del headers["content-length"]
+            self._compressor = stream_compressor(self._encoding)
+            await self._send(start)
+
+        assert self._compressor is not None
+        chunk = self._compressor.compress(body)
+        if not more_body:
+            chunk += self._compressor.flush()
+        if chunk or not more_body:
+            await self._send({"type": "http.response.body", "body": chunk, "more_body": more_body})
+
+
+class PrecompressedStaticFiles(StaticFiles):
+    """``StaticFiles`` that serves compressed variants prepared once by ``precompress``.
+
+    Variants are kept in memory next to the file's mtime and size; a file edited after
+    startup falls back to the uncompressed response until the next ``precompress``.
+    """
+
+    def __init__(self, *args: Any, minimum_size: int = 1024, **kwargs: Any) -> None:
+        super().__init__(*args, **kwargs)
+        self.minimum_size = minimum_size
+        self._variants: dict[str, tuple[tuple[float, int], dict[str, bytes]]] = {}
+
+    def precompress(self) -> int:
+        variants: dict[str, tuple[tuple[float, int], dict[str, bytes]]] = {}
+        for directory in self.all_directories:
+            for root, _, files in os.walk(directory):
+                for name in files:
+                    path = os.path.realpath(os.path.join(root, name))
+                    media_type, _ = mimetypes.guess_type(name)
+                    stat = os.stat(path)
+                    if stat.st_size < self.minimum_size or not is_compressible(media_type):
+                        continue
+                    with open(path, "rb") as handle:
+                        data = handle.read()
+                    variants[path] = (
+                        (stat.st_mtime, stat.st_size),
+                        {
+                            encoding: compress(data, encoding, precompress=True)
+                            for encoding in _ENCODINGS
+                        },
+                    )
+        self._variants = variants
+        logger.info("static.precompressed", extra={"files": len(variants)})
+        return len(variants)
+
+    async def get_response(self, path: str, scope: Scope) -> Response:
+        response = await super().get_response(path, scope)
+        if not isinstance(response, FileResponse) or response.status_code != 200:
+            return response
+        request_headers = Headers(scope=scope)
+        if "range" in request_headers:
+            return response
+        prepared = self._variants.get(os.path.realpath(response.path))
+        if prepared is None:
+            return response
+        (mtime, size), encoded = prepared
+        stat = response.stat_result
+        if stat is None or (stat.st_mtime, stat.st_size) != (mtime, size):
+            return response
+        encoding = negotiate(request_headers.get("accept-encoding"), encoded)
+        if encoding is None:
+            add_vary(response.headers, "Accept-Encoding")
+            return response
+
+        headers = {
+            key: value
+            for key, value in response.headers.items()
+            if key not in ("accept-ranges", "content-length", "content-type")
+        }
+        compressed = Response(
+            content=encoded[encoding], media_type=response.media_type, headers=headers
+        )
+        mark_encoded(compressed.headers, encoding)
+        return compressed
@@ -1,9 +1,9 @@
 ﻿from functools import lru_cache
 from pathlib import Path
-from typing import List
+from typing import Annotated, List
 
 from pydantic import AliasChoices, Field, field_validator
-from pydantic_settings import BaseSettings, SettingsConfigDict
+from pydantic_settings import BaseSettings, NoDecode, SettingsConfigDict
 
 PROJECT_ROOT = Path(__file__).resolve().parents[2]
 
@@ -65,29 +65,108 @@ class Settings(BaseSettings):
         alias="SQLITE_JOURNAL_MODE",
         validation_alias=AliasChoices("SQLITE_JOURNAL_MODE", "sqlite_journal_mode"),
     )
-    cors_origins: List[str] = Field(
+    cors_origins: Annotated[List[str], NoDecode] = Field(
         default_factory=list,
         alias="CORS_ORIGINS",
         validation_alias=AliasChoices("CORS_ORIGINS", "cors_origins"),
     )
+    graph_changelog_retention: int = Field(
+        default=10000,
+        alias="GRAPH_CHANGELOG_RETENTION",
+        validation_alias=AliasChoices("GRAPH_CHANGELOG_RETENTION", "graph_changelog_retention"),
+    )
+    graph_stream_queue_size: int = Field(
+        default=256,
+        alias="GRAPH_STREAM_QUEUE_SIZE",
+        validation_alias=AliasChoices("GRAPH_STREAM_QUEUE_SIZE", "graph_stream_queue_size"),
+    )
+    graph_import_chunk_size: int = Field(
+        default=1000,
+        alias="GRAPH_IMPORT_CHUNK_SIZE",
+        validation_alias=AliasChoices("GRAPH_IMPORT_CHUNK_SIZE", "graph_import_chunk_size"),
+    )
+    map_cache_max_entries: int = Field(
+        default=256,
+        alias="MAP_CACHE_MAX_ENTRIES",
+        validation_alias=AliasChoices("MAP_CACHE_MAX_ENTRIES", "map_cache_max_entries"),
+    )
+    map_cache_max_bytes: int = Field(
+        default=64 * 1024 * 1024,
+        alias="MAP_CACHE_MAX_BYTES",
+        validation_alias=AliasChoices("MAP_CACHE_MAX_BYTES", "map_cache_max_bytes"),
+    )
+    graph_index_max_organizations: int = Field(
+        default=64,
+        alias="GRAPH_INDEX_MAX_ORGANIZATIONS",
+        validation_alias=AliasChoices(
+            "GRAPH_INDEX_MAX_ORGANIZATIONS", "graph_index_max_organizations"
+        ),
+    )
+    graph_acyclic_relations: Annotated[List[str], NoDecode] = Field(
+        default_factory=list,
+        alias="GRAPH_ACYCLIC_RELATIONS",
+        validation_alias=AliasChoices("GRAPH_ACYCLIC_RELATIONS", "graph_acyclic_relations"),
+    )
+    graph_metrics_enabled: bool = Field(
+        default=True,
+        alias="GRAPH_METRICS_ENABLED",
+        validation_alias=AliasChoices("GRAPH_METRICS_ENABLED", "graph_metrics_enabled"),
+    )
+    graph_metrics_delay_seconds: float = Field(
+        default=5.0,
+        alias="GRAPH_METRICS_DELAY_SECONDS",
+        validation_alias=AliasChoices("GRAPH_METRICS_DELAY_SECONDS", "graph_metrics_delay_seconds"),
+    )
+    graph_metrics_samples: int = Field(
+        default=64,
+        alias="GRAPH_METRICS_SAMPLES",
+        validation_alias=AliasChoices("GRAPH_METRICS_SAMPLES", "graph_metrics_samples"),
+    )
+    graph_snapshot_keep_automatic: int = Field(
+        default=20,
+        alias="GRAPH_SNAPSHOT_KEEP_AUTOMATIC",
+        validation_alias=AliasChoices(
+            "GRAPH_SNAPSHOT_KEEP_AUTOMATIC", "graph_snapshot_keep_automatic"
+        ),
+    )
+    principal_cache_max_entries: int = Field(
+        default=4096,
+        alias="PRINCIPAL_CACHE_MAX_ENTRIES",
+        validation_alias=AliasChoices("PRINCIPAL_CACHE_MAX_ENTRIES", "principal_cache_max_entries"),
+    )
+    principal_cache_ttl_seconds: float = Field(
+        default=60.0,
+        alias="PRINCIPAL_CACHE_TTL_SECONDS",
+        validation_alias=AliasChoices("PRINCIPAL_CACHE_TTL_SECONDS", "principal_cache_ttl_seconds"),
+    )
+    compression_enabled: bool = Field(
+        default=True,
+        alias="COMPRESSION_ENABLED",
+        validation_alias=AliasChoices("COMPRESSION_ENABLED", "compression_enabled"),
+    )
+    compression_min_size: int = Field(
+        default=1024,
+        alias="COMPRESSION_MIN_SIZE",
+        validation_alias=AliasChoices("COMPRESSION_MIN_SIZE", "compression_min_size"),
+    )
     database_path: Path = Field(
         default=PROJECT_ROOT / "data" / "app.db",
         alias="DATABASE_PATH",
         validation_alias=AliasChoices("DATABASE_PATH", "database_path"),
     )
 
-    @field_validator("cors_origins", mode="before")
+    @field_validator("cors_origins", "graph_acyclic_relations", mode="before")
     @classmethod
-    def split_cors_origins(cls, value: List[str] | str) -> List[str]:
+    def split_comma_separated(cls, value: List[str] | str) -> List[str]:
         if isinstance(value, str):
             try:
                 import json
 
                 decoded = json.loads(value)
                 if isinstance(decoded, list):
-                    return [str(origin).strip() for origin in decoded if str(origin).strip()]
+                    return [str(item).strip() for item in decoded if str(item).strip()]
             except json.JSONDecodeError:
-                return [origin.strip() for origin in value.split(",") if origin.strip()]
+                return [item.strip() for item in value.split(",") if item.strip()]
         if isinstance(value, list):
             return value
         return []
@@ -1,11 +1,14 @@
 ﻿from app.db.base import Base
 from app.db.session import engine
+from app.db.upgrade import upgrade_schema
 
 
 def init_database() -> None:
-    """Create database tables if they do not yet exist."""
+    """Create missing database tables and upgrade existing ones to the current schema."""
 
     # Import models to ensure they are registered with SQLAlchemy metadata.
     import app.models  # noqa: F401
 
     Base.metadata.create_all(bind=engine)
+    with engine.begin() as connection:
+        upgrade_schema(connection)
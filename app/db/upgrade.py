@@ -0,0 +1,74 @@
+﻿from sqlalchemy import inspect
+from sqlalchemy.engine import Connection
+from sqlalchemy.schema import CreateColumn
+
+from app.db.base import Base
+from app.models.structures import EDGE_DEGREES_DDL, NODES_FTS_DDL, NODES_RTREE_DDL
+
+# Statements run right after the keyed column has been added to an existing table, so that
+# rows which predate the column get a meaningful value instead of the server default.
+_COLUMN_BACKFILLS: dict[tuple[str, str], tuple[str, ...]] = {
+    # Start graphs that already have content at version 1 with the change log floor above
+    # 0, so a client that never saw a version resyncs instead of reading an empty log.
+    ("organizations", "graph_version"): (
+        "UPDATE organizations SET graph_version = 1, graph_log_floor = 1 "
+        "WHERE EXISTS (SELECT 1 FROM spheres WHERE spheres.organization_id = organizations.id)",
+    ),
+    ("nodes", "x"): (
+        "UPDATE nodes SET x = CAST(coalesce(json_extract(position, '$.x'), 0) AS REAL), "
+        "y = CAST(coalesce(json_extract(position, '$.y'), 0) AS REAL)",
+    ),
+    # Count the existing edges once, then let the ``edges`` triggers keep the counts.
+    ("nodes", "in_degree"): (
+        "UPDATE nodes SET "
+        "in_degree = (SELECT count(*) FROM edges WHERE target_node_id = nodes.id), "
+        "out_degree = (SELECT count(*) FROM edges WHERE source_node_id = nodes.id), "
+        "degrees = coalesce(("
+        "SELECT json_group_object(relation_type, json_object('in', incoming, 'out', outgoing)) "
+        "FROM (SELECT relation_type, sum(target_node_id = nodes.id) AS incoming, "
+        "sum(source_node_id = nodes.id) AS outgoing FROM edges "
+        "WHERE source_node_id = nodes.id OR target_node_id = nodes.id "
+        "GROUP BY relation_type)), '{}')",
+        *EDGE_DEGREES_DDL,
+    ),
+}
+
+# SQLite virtual tables kept in sync with the models by triggers, as
+# ``(name, statements creating the table and its triggers, statements filling it)``.
+_SQLITE_AUXILIARY_TABLES: tuple[tuple[str, tuple[str, ...], tuple[str, ...]], ...] = (
+    ("nodes_rtree", NODES_RTREE_DDL, ("INSERT INTO nodes_rtree SELECT id, x, x, y, y FROM nodes",)),
+    ("nodes_fts", NODES_FTS_DDL, ("INSERT INTO nodes_fts(nodes_fts) VALUES ('rebuild')",)),
+)
+
+
+def upgrade_schema(connection: Connection) -> None:
+    """Bring tables created by earlier releases up to the current models.
+
+    ``create_all`` skips tables that already exist, so columns and indexes added to them
+    later are created (and the columns backfilled) here, and so are the SQLite virtual
+    tables that the models only create alongside a new table. Every step checks the
+    database first, which makes the upgrade a no-op on an up-to-date schema.
+    """
+
+    inspector = inspect(connection)
+    existing_tables = set(inspector.get_table_names())
+    for table in Base.metadata.sorted_tables:
+        if table.name not in existing_tables:
+            continue
+        present = {column["name"] for column in inspector.get_columns(table.name)}
+        added = [column for column in table.columns if column.name not in present]
+        for column in added:
+            definition = CreateColumn(column).compile(dialect=connection.dialect)
+            connection.exec_driver_sql(f"ALTER TABLE {table.name} ADD COLUMN {definition}")
+        for column in added:
+            for statement in _COLUMN_BACKFILLS.get((table.name, column.name), ()):
+                connection.exec_driver_sql(statement)
+        for index in table.indexes:
+            index.create(connection, checkfirst=True)
+
+    if connection.dialect.name != "sqlite":
+        return
+    for name, create, fill in _SQLITE_AUXILIARY_TABLES:
+        if name not in existing_tables:
+            for statement in (*create, *fill):
+                connection.exec_driver_sql(statement)
@@ -1,14 +1,18 @@
+import logging
 from pathlib import Path
 
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.staticfiles import StaticFiles
 
 from app.api import api_router
+from app.core.compression import CompressionMiddleware, PrecompressedStaticFiles
 from app.core.config import settings
 from app.db.init_db import init_database
+from app.services import graph_metrics
 from app.web import router as web_router
 
+logger = logging.getLogger(__name__)
+
 app = FastAPI(
     title=settings.project_name,
     debug=settings.debug,
@@ -26,8 +30,14 @@ if settings.cors_origins:
         allow_credentials=True,
     )
 
+if settings.compression_enabled:
+    app.add_middleware(CompressionMiddleware, minimum_size=settings.compression_min_size)
+
 static_path = Path(__file__).resolve().parent / "static"
-app.mount("/static", StaticFiles(directory=str(static_path)), name="static")
+static_files = PrecompressedStaticFiles(
+    directory=str(static_path), minimum_size=settings.compression_min_size
+)
+app.mount("/static", static_files, name="static")
 
 app.include_router(api_router, prefix="/api")
 app.include_router(web_router)
@@ -36,3 +46,16 @@ app.include_router(web_router)
 @app.on_event("startup")
 async def startup() -> None:
     init_database()
+    if settings.compression_enabled:
+        static_files.precompress()
+    if settings.graph_metrics_enabled:
+        if graph_metrics.available():
+            graph_metrics.scheduler.start()
+        else:
+            # Centrality stays null; everything else works without NumPy.
+            logger.warning("graph_metrics.disabled", extra={"reason": "numpy is not installed"})
+
+
+@app.on_event("shutdown")
+async def shutdown() -> None:
+    graph_metrics.scheduler.stop()
@@ -1,4 +1,6 @@
 ﻿from app.models.audit import AuditLog
+from app.models.graph_change import GraphChange, GraphChangeAction
+from app.models.graph_snapshot import GraphChunk, GraphSnapshot
 from app.models.invite import InviteStatus, OrganizationInvite
 from app.models.organization import (
     GroupMembership,
@@ -22,6 +24,10 @@ __all__ = [
     "Node",
     "Edge",
     "AuditLog",
+    "GraphChange",
+    "GraphChangeAction",
+    "GraphSnapshot",
+    "GraphChunk",
     "RefreshToken",
     "PasswordResetToken",
     "OrganizationInvite",
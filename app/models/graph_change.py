@@ -0,0 +1,34 @@
+from __future__ import annotations
+
+from datetime import datetime
+from enum import Enum
+
+from sqlalchemy import DateTime, ForeignKey, Index, Integer, String
+from sqlalchemy.orm import Mapped, mapped_column
+
+from app.db.base import Base
+
+
+class GraphChangeAction(str, Enum):
+    UPSERT = "upsert"
+    DELETE = "delete"
+
+
+class GraphChange(Base):
+    """Append-only log of graph entity changes, one row per entity per version."""
+
+    __tablename__ = "graph_changes"
+    __table_args__ = (Index("ix_graph_changes_org_version", "organization_id", "version"),)
+
+    id: Mapped[int] = mapped_column(Integer, primary_key=True)
+    organization_id: Mapped[int] = mapped_column(
+        ForeignKey("organizations.id", ondelete="CASCADE"), nullable=False
+    )
+    version: Mapped[int] = mapped_column(Integer, nullable=False)
+    entity_type: Mapped[str] = mapped_column(String(16), nullable=False)
+    entity_id: Mapped[int] = mapped_column(Integer, nullable=False)
+    action: Mapped[str] = mapped_column(String(16), nullable=False)
+    created_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow, nullable=False)
+
+
+__all__ = ["GraphChange", "GraphChangeAction"]
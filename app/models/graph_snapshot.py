@@ -0,0 +1,60 @@
+from __future__ import annotations
+
+from datetime import datetime
+
+from sqlalchemy import (
+    Boolean,
+    DateTime,
+    ForeignKey,
+    Index,
+    Integer,
+    LargeBinary,
+    String,
+    UniqueConstraint,
+)
+from sqlalchemy.orm import Mapped, mapped_column
+
+from app.db.base import Base
+
+
+class GraphSnapshot(Base):
+    """A saved state of an organization's graph, as the roots of its chunk trees."""
+
+    __tablename__ = "graph_snapshots"
+    __table_args__ = (
+        UniqueConstraint("organization_id", "name", name="uq_graph_snapshots_org_name"),
+        Index("ix_graph_snapshots_org_created", "organization_id", "created_at"),
+    )
+
+    id: Mapped[int] = mapped_column(Integer, primary_key=True)
+    organization_id: Mapped[int] = mapped_column(
+        ForeignKey("organizations.id", ondelete="CASCADE"), nullable=False
+    )
+    # ``None`` for automatic snapshots.
+    name: Mapped[str | None] = mapped_column(String(64), nullable=True)
+    automatic: Mapped[bool] = mapped_column(Boolean, default=False, nullable=False)
+    # Graph version the snapshot was taken at.
+    version: Mapped[int] = mapped_column(Integer, nullable=False)
+    spheres_root: Mapped[str] = mapped_column(String(64), nullable=False)
+    nodes_root: Mapped[str] = mapped_column(String(64), nullable=False)
+    edges_root: Mapped[str] = mapped_column(String(64), nullable=False)
+    sphere_count: Mapped[int] = mapped_column(Integer, default=0, nullable=False)
+    node_count: Mapped[int] = mapped_column(Integer, default=0, nullable=False)
+    edge_count: Mapped[int] = mapped_column(Integer, default=0, nullable=False)
+    created_by_id: Mapped[int | None] = mapped_column(
+        ForeignKey("users.id", ondelete="SET NULL"), nullable=True
+    )
+    created_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow, nullable=False)
+
+
+class GraphChunk(Base):
+    """Content-addressed blob shared by every snapshot that contains it."""
+
+    __tablename__ = "graph_chunks"
+
+    # Hex SHA-256 of ``data``.
+    digest: Mapped[str] = mapped_column(String(64), primary_key=True)
+    data: Mapped[bytes] = mapped_column(LargeBinary, nullable=False)
+
+
+__all__ = ["GraphChunk", "GraphSnapshot"]
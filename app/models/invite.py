@@ -4,7 +4,7 @@ from datetime import datetime
 from enum import Enum
 from typing import TYPE_CHECKING
 
-from sqlalchemy import DateTime, Enum as SqlEnum, ForeignKey, Integer, JSON, String
+from sqlalchemy import DateTime, Enum as SqlEnum, ForeignKey, Index, Integer, JSON, String
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 
 from app.db.base import Base
@@ -23,6 +23,9 @@ class InviteStatus(str, Enum):
 
 class OrganizationInvite(Base):
     __tablename__ = "organization_invites"
+    __table_args__ = (
+        Index("ix_organization_invites_org_created", "organization_id", "created_at", "id"),
+    )
 
     id: Mapped[int] = mapped_column(Integer, primary_key=True)
     organization_id: Mapped[int] = mapped_column(
@@ -2,8 +2,23 @@
 
 from datetime import datetime
 
-from sqlalchemy import Column, DateTime, Float, ForeignKey, Integer, JSON, String, Table, Text
-from sqlalchemy.orm import Mapped, mapped_column, relationship
+from sqlalchemy import (
+    DDL,
+    Column,
+    DateTime,
+    Float,
+    ForeignKey,
+    Index,
+    Integer,
+    JSON,
+    String,
+    Table,
+    Text,
+    column,
+    event,
+    table,
+)
+from sqlalchemy.orm import Mapped, mapped_column, relationship, validates
 
 from app.db.base import Base, metadata as base_metadata
 
@@ -17,6 +32,7 @@ sphere_groups = Table(
 
 class Group(Base):
     __tablename__ = "groups"
+    __table_args__ = (Index("ix_groups_org_created", "organization_id", "created_at", "id"),)
 
     id: Mapped[int] = mapped_column(Integer, primary_key=True)
     organization_id: Mapped[int] = mapped_column(
@@ -38,6 +54,7 @@ class Group(Base):
 
 class Sphere(Base):
     __tablename__ = "spheres"
+    __table_args__ = (Index("ix_spheres_org_created", "organization_id", "created_at", "id"),)
 
     id: Mapped[int] = mapped_column(Integer, primary_key=True)
     organization_id: Mapped[int] = mapped_column(
@@ -65,6 +82,7 @@ class Sphere(Base):
 
 class Node(Base):
     __tablename__ = "nodes"
+    __table_args__ = (Index("ix_nodes_created", "created_at", "id"),)
 
     id: Mapped[int] = mapped_column(Integer, primary_key=True)
     sphere_id: Mapped[int] = mapped_column(
@@ -75,9 +93,22 @@ class Node(Base):
     status: Mapped[str] = mapped_column(String(16), nullable=False, default="active", index=True)
     summary: Mapped[str | None] = mapped_column(Text)
     position: Mapped[dict[str, float]] = mapped_column(JSON, default=dict, nullable=False)
+    x: Mapped[float] = mapped_column(Float, default=0.0, server_default="0", nullable=False)
+    y: Mapped[float] = mapped_column(Float, default=0.0, server_default="0", nullable=False)
     metadata_json: Mapped[dict[str, object]] = mapped_column("metadata", JSON, default=dict)
     links_json: Mapped[list[str]] = mapped_column("links", JSON, default=list)
     owners_json: Mapped[list[str]] = mapped_column("owners", JSON, default=list)
+    # Edge counts, maintained by the ``edges`` triggers below: totals and, in ``degrees``,
+    # ``{relation_type: {"in": n, "out": n}}`` for every relation type the node takes part in.
+    in_degree: Mapped[int] = mapped_column(Integer, default=0, server_default="0", nullable=False)
+    out_degree: Mapped[int] = mapped_column(Integer, default=0, server_default="0", nullable=False)
+    degrees: Mapped[dict[str, dict[str, int]]] = mapped_column(
+        JSON, default=dict, server_default="{}", nullable=False
+    )
+    # Centrality in the "needs" graph, recomputed in the background by
+    # ``app.services.graph_metrics``; ``None`` until the first run.
+    pagerank: Mapped[float | None] = mapped_column(Float)
+    betweenness: Mapped[float | None] = mapped_column(Float)
     created_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow, nullable=False)
 
     sphere: Mapped[Sphere] = relationship("Sphere", back_populates="nodes")
@@ -88,19 +119,27 @@ class Node(Base):
         "Edge", foreign_keys="Edge.target_node_id", back_populates="target"
     )
 
+    @validates("position")
+    def _sync_coordinates(self, key: str, value: dict[str, float] | None) -> dict[str, float]:
+        value = value or {}
+        self.x = float(value.get("x", 0.0))
+        self.y = float(value.get("y", 0.0))
+        return value
+
 
 class Edge(Base):
     __tablename__ = "edges"
+    __table_args__ = (Index("ix_edges_created", "created_at", "id"),)
 
     id: Mapped[int] = mapped_column(Integer, primary_key=True)
     sphere_id: Mapped[int] = mapped_column(
         ForeignKey("spheres.id", ondelete="CASCADE"), nullable=False, index=True
     )
     source_node_id: Mapped[int] = mapped_column(
-        ForeignKey("nodes.id", ondelete="CASCADE"), nullable=False
+        ForeignKey("nodes.id", ondelete="CASCADE"), nullable=False, index=True
     )
     target_node_id: Mapped[int] = mapped_column(
-        ForeignKey("nodes.id", ondelete="CASCADE"), nullable=False
+        ForeignKey("nodes.id", ondelete="CASCADE"), nullable=False, index=True
     )
     relation_type: Mapped[str] = mapped_column(String(24), nullable=False, default="depends", index=True)
     metadata_json: Mapped[dict[str, object]] = mapped_column("metadata", JSON, default=dict)
@@ -115,4 +154,116 @@ class Edge(Base):
     )
 
 
-__all__ = ["Group", "Sphere", "Node", "Edge", "sphere_groups"]
+def _degree_update(node: str, relation: str, direction: str, step: str) -> str:
+    """``UPDATE`` moving one endpoint's ``direction`` ("in"/"out") count by ``step`` ("+"/"-").
+
+    The per-relation entry is rewritten as ``{"in": n, "out": n}`` and dropped once both
+    counts reach zero.
+    """
+
+    path = f"'$.\"' || {relation} || '\"'"
+    counts = {
+        name: f"coalesce(json_extract(degrees, {path} || '.{name}'), 0)"
+        for name in ("in", "out")
+    }
+    counts[direction] += f" {step} 1"
+    return (
+        f"UPDATE nodes SET {direction}_degree = {direction}_degree {step} 1, degrees = CASE "
+        f"WHEN {counts['in']} = 0 AND {counts['out']} = 0 THEN json_remove(degrees, {path}) "
+        f"ELSE json_set(degrees, {path}, "
+        f"json_object('in', {counts['in']}, 'out', {counts['out']})) END WHERE id = {node};"
+    )
+
+
+def _edge_counts(row: str, step: str) -> str:
+    return _degree_update(
+        f"{row}.source_node_id", f"{row}.relation_type", "out", step
+    ) + _degree_update(f"{row}.target_node_id", f"{row}.relation_type", "in", step)
+
+
+EDGE_DEGREES_DDL = (
+    "CREATE TRIGGER IF NOT EXISTS edges_degrees_insert AFTER INSERT ON edges BEGIN "
+    + _edge_counts("new", "+")
+    + " END",
+    "CREATE TRIGGER IF NOT EXISTS edges_degrees_update "
+    "AFTER UPDATE OF source_node_id, target_node_id, relation_type ON edges BEGIN "
+    + _edge_counts("old", "-")
+    + _edge_counts("new", "+")
+    + " END",
+    "CREATE TRIGGER IF NOT EXISTS edges_degrees_delete AFTER DELETE ON edges BEGIN "
+    + _edge_counts("old", "-")
+    + " END",
+)
+
+for _statement in EDGE_DEGREES_DDL:
+    event.listen(Edge.__table__, "after_create", DDL(_statement).execute_if(dialect="sqlite"))
+
+
+# R*Tree over node coordinates, kept in sync with ``nodes.x``/``nodes.y`` by triggers.
+nodes_rtree = table(
+    "nodes_rtree",
+    column("id", Integer),
+    column("min_x", Float),
+    column("max_x", Float),
+    column("min_y", Float),
+    column("max_y", Float),
+)
+
+NODES_RTREE_DDL = (
+    "CREATE VIRTUAL TABLE IF NOT EXISTS nodes_rtree USING rtree(id, min_x, max_x, min_y, max_y)",
+    "CREATE TRIGGER IF NOT EXISTS nodes_rtree_insert AFTER INSERT ON nodes BEGIN "
+    "INSERT INTO nodes_rtree VALUES (new.id, new.x, new.x, new.y, new.y); END",
+    "CREATE TRIGGER IF NOT EXISTS nodes_rtree_update AFTER UPDATE OF x, y ON nodes BEGIN "
+    "UPDATE nodes_rtree SET min_x = new.x, max_x = new.x, min_y = new.y, max_y = new.y "
+    "WHERE id = new.id; END",
+    "CREATE TRIGGER IF NOT EXISTS nodes_rtree_delete AFTER DELETE ON nodes BEGIN "
+    "DELETE FROM nodes_rtree WHERE id = old.id; END",
+)
+
+for _statement in NODES_RTREE_DDL:
+    event.listen(Node.__table__, "after_create", DDL(_statement).execute_if(dialect="sqlite"))
+event.listen(
+    Node.__table__,
+    "after_drop",
+    DDL("DROP TABLE IF EXISTS nodes_rtree").execute_if(dialect="sqlite"),
+)
+
+
+# FTS5 index over node text, an external-content table kept in sync with ``nodes`` by triggers.
+nodes_fts = table(
+    "nodes_fts",
+    column("rowid", Integer),
+    column("label", Text),
+    column("summary", Text),
+    column("owners", Text),
+    column("links", Text),
+)
+
+NODES_FTS_DDL = (
+    "CREATE VIRTUAL TABLE IF NOT EXISTS nodes_fts USING fts5("
+    "label, summary, owners, links, content='nodes', content_rowid='id', "
+    "tokenize='unicode61 remove_diacritics 2')",
+    "CREATE TRIGGER IF NOT EXISTS nodes_fts_insert AFTER INSERT ON nodes BEGIN "
+    "INSERT INTO nodes_fts(rowid, label, summary, owners, links) "
+    "VALUES (new.id, new.label, new.summary, new.owners, new.links); END",
+    "CREATE TRIGGER IF NOT EXISTS nodes_fts_update AFTER UPDATE OF label, summary, owners, links "
+    "ON nodes BEGIN "
+    "INSERT INTO nodes_fts(nodes_fts, rowid, label, summary, owners, links) "
+    "VALUES ('delete', old.id, old.label, old.summary, old.owners, old.links); "
+    "INSERT INTO nodes_fts(rowid, label, summary, owners, links) "
+    "VALUES (new.id, new.label, new.summary, new.owners, new.links); END",
+    "CREATE TRIGGER IF NOT EXISTS nodes_fts_delete AFTER DELETE ON nodes BEGIN "
+    "INSERT INTO nodes_fts(nodes_fts, rowid, label, summary, owners, links) "
+    "VALUES ('delete', old.id, old.label, old.summary, old.owners, old.links); END",
+)
+
+for _statement in NODES_FTS_DDL:
+    event.listen(Node.__table__, "after_create", DDL(_statement).execute_if(dialect="sqlite"))
+event.listen(
+    Node.__table__,
+    "after_drop",
+    DDL("DROP TABLE IF EXISTS nodes_fts").execute_if(dialect="sqlite"),
+)
+
+
+__all__ = ["Group", "Sphere", "Node", "Edge", "nodes_fts", "nodes_rtree", "sphere_groups"]
@@ -1,7 +1,7 @@
 ﻿from __future__ import annotations
 
 from datetime import datetime
-from typing import Any, Dict, List, Optional
+from typing import Annotated, Any, Dict, List, Literal, Optional, Union
 
 from pydantic import AliasChoices, BaseModel, ConfigDict, Field, field_validator, model_validator
 
@@ -96,6 +96,15 @@ class NodeBase(BaseModel):
 
 class NodeCreate(NodeBase):
     sphere_id: int = Field(validation_alias=AliasChoices("sphere_id", "sphereId"))
+    # Without coordinates the server picks a free spot inside the sphere.
+    position: Dict[str, float] | None = None
+
+    @field_validator("position")
+    @classmethod
+    def normalize_position(cls, value: Dict[str, float] | None) -> Dict[str, float] | None:
+        if not value or ("x" not in value and "y" not in value):
+            return None
+        return {"x": float(value.get("x", 0.5)), "y": float(value.get("y", 0.5))}
 
 
 class NodeUpdate(BaseModel):
@@ -187,6 +196,13 @@ class NodeRead(NodeBase):
     metadata: Dict[str, Any] = Field(default_factory=dict, alias="metadata_json")
     links: List[str] = Field(default_factory=list, alias="links_json")
     owners: List[str] = Field(default_factory=list, alias="owners_json")
+    # Maintained on every edge change; per relation type as {"in": n, "out": n}.
+    in_degree: int = 0
+    out_degree: int = 0
+    degrees: Dict[str, Dict[str, int]] = Field(default_factory=dict)
+    # Recomputed in the background; None until the first run for the organization.
+    pagerank: float | None = None
+    betweenness: float | None = None
 
     model_config = ConfigDict(from_attributes=True, populate_by_name=True)
 
@@ -247,11 +263,185 @@ class GraphImportPayload(BaseModel):
     organization_id: int
     nodes: Optional[List[NodeRead]] = None
     edges: Optional[List[EdgeRead]] = None
+    mode: Literal["replace", "diff"] = "replace"
+    match_by: Literal["id", "label"] = Field(
+        default="id", validation_alias=AliasChoices("match_by", "matchBy")
+    )
+
+
+class GraphImportSummary(BaseModel):
+    nodes_inserted: int = 0
+    nodes_updated: int = 0
+    nodes_deleted: int = 0
+    nodes_unchanged: int = 0
+    edges_inserted: int = 0
+    edges_updated: int = 0
+    edges_deleted: int = 0
+    edges_unchanged: int = 0
 
 
 class GraphImportResult(BaseModel):
     nodes: List[NodeRead]
     edges: List[EdgeRead]
+    summary: GraphImportSummary = Field(default_factory=GraphImportSummary)
+
+
+MAX_BATCH_OPERATIONS = 1000
+MAX_POSITION_UPDATES = 10000
+
+
+class NodePosition(BaseModel):
+    id: int
+    x: float
+    y: float
+
+
+class NodePositionsResult(BaseModel):
+    updated: int
+
+
+class NodeLayoutRequest(BaseModel):
+    iterations: int = Field(default=150, ge=1, le=1000)
+    # Only these nodes move; the rest of the sphere stays put but still shapes the layout.
+    node_ids: List[int] | None = Field(
+        default=None, validation_alias=AliasChoices("node_ids", "nodeIds")
+    )
+
+
+class NodeLayoutResult(NodePositionsResult):
+    sphere_id: int
+    positions: List[NodePosition]
+
+
+# Inside a batch an entity is referenced by its id or by the temporary id of an earlier create.
+BatchRef = Union[int, str]
+
+
+def _temp_id_field() -> Any:
+    return Field(default=None, validation_alias=AliasChoices("temp_id", "tempId"), min_length=1)
+
+
+class BatchEdgeCreate(EdgeBase):
+    source_node_id: BatchRef = Field(
+        validation_alias=AliasChoices("source_node_id", "sourceNodeId")
+    )
+    target_node_id: BatchRef = Field(
+        validation_alias=AliasChoices("target_node_id", "targetNodeId")
+    )
+
+
+class BatchCreateNode(BaseModel):
+    op: Literal["create_node"]
+    temp_id: str | None = _temp_id_field()
+    node: NodeCreate
+
+
+class BatchUpdateNode(BaseModel):
+    op: Literal["update_node"]
+    id: BatchRef
+    node: NodeUpdate
+
+
+class BatchDeleteNode(BaseModel):
+    op: Literal["delete_node"]
+    id: BatchRef
+
+
+class BatchCreateEdge(BaseModel):
+    op: Literal["create_edge"]
+    temp_id: str | None = _temp_id_field()
+    edge: BatchEdgeCreate
+
+
+class BatchUpdateEdge(BaseModel):
+    op: Literal["update_edge"]
+    id: BatchRef
+    edge: EdgeUpdate
+
+
+class BatchDeleteEdge(BaseModel):
+    op: Literal["delete_edge"]
+    id: BatchRef
+
+
+GraphBatchOperation = Annotated[
+    Union[
+        BatchCreateNode,
+        BatchUpdateNode,
+        BatchDeleteNode,
+        BatchCreateEdge,
+        BatchUpdateEdge,
+        BatchDeleteEdge,
+    ],
+    Field(discriminator="op"),
+]
+
+
+class GraphBatchRequest(BaseModel):
+    operations: List[GraphBatchOperation] = Field(min_length=1, max_length=MAX_BATCH_OPERATIONS)
+
+
+class GraphBatchResult(BaseModel):
+    temp_ids: Dict[str, int] = Field(default_factory=dict)
+    nodes: List[NodeRead] = Field(default_factory=list)
+    edges: List[EdgeRead] = Field(default_factory=list)
+    deleted_node_ids: List[int] = Field(default_factory=list)
+    deleted_edge_ids: List[int] = Field(default_factory=list)
+
+
+class ImpactNode(BaseModel):
+    id: int
+    depth: int
+    via: int
+
+
+class ImpactResult(BaseModel):
+    organization_id: int
+    node_id: int
+    direction: str
+    relation_types: List[str]
+    max_depth: int | None = None
+    version: int
+    nodes: List[ImpactNode] = Field(default_factory=list)
+
+
+class GraphTopology(BaseModel):
+    organization_id: int
+    sphere_id: int | None = None
+    relation_types: List[str]
+    version: int
+    acyclic: bool
+    cycles: List[List[int]] = Field(default_factory=list)
+    layers: List[List[int]] = Field(default_factory=list)
+
+
+class ReachabilityResult(BaseModel):
+    organization_id: int
+    source_node_id: int
+    target_node_id: int
+    version: int
+    reachable: bool
+
+
+class PathResult(ReachabilityResult):
+    nodes: List[int] = Field(default_factory=list)
+    edges: List[EdgeRead] = Field(default_factory=list)
+
+
+class NeighborhoodNode(NodeRead):
+    depth: int
+
+
+class NeighborhoodResult(BaseModel):
+    organization_id: int
+    node_id: int
+    hops: int
+    limit: int
+    relation_types: List[str]
+    version: int
+    truncated: bool = False
+    nodes: List[NeighborhoodNode] = Field(default_factory=list)
+    edges: List[EdgeRead] = Field(default_factory=list)
 
 
 __all__ = [
@@ -266,6 +456,30 @@ __all__ = [
     "GraphExportResponse",
     "GraphImportPayload",
     "GraphImportResult",
+    "GraphImportSummary",
+    "GraphBatchOperation",
+    "GraphBatchRequest",
+    "GraphBatchResult",
+    "GraphTopology",
+    "ImpactNode",
+    "ImpactResult",
+    "NeighborhoodNode",
+    "NeighborhoodResult",
+    "ReachabilityResult",
+    "PathResult",
+    "BatchCreateNode",
+    "BatchUpdateNode",
+    "BatchDeleteNode",
+    "BatchCreateEdge",
+    "BatchEdgeCreate",
+    "BatchUpdateEdge",
+    "BatchDeleteEdge",
+    "MAX_BATCH_OPERATIONS",
+    "MAX_POSITION_UPDATES",
+    "NodePosition",
+    "NodePositionsResult",
+    "NodeLayoutRequest",
+    "NodeLayoutResult",
     "NODE_TYPES",
     "NODE_STATUSES",
     "EDGE_TYPES",
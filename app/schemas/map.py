@@ -1,8 +1,9 @@
 ﻿from __future__ import annotations
 
-from typing import TYPE_CHECKING, List, Sequence
+from datetime import datetime
+from typing import TYPE_CHECKING, Any, Dict, List, Literal, Optional, Sequence
 
-from pydantic import BaseModel, computed_field
+from pydantic import BaseModel, ConfigDict, Field, computed_field, field_validator
 
 from app.schemas.graph import EdgeRead, NodeRead
 from app.schemas.organization import SphereRead
@@ -56,6 +57,7 @@ class MapEdge(EdgeRead):
 
 class MapResponse(BaseModel):
     organization_id: int
+    version: int = 0
     spheres: List[SphereRead]
     nodes: List[MapNode]
     edges: List[MapEdge]
@@ -68,13 +70,120 @@ class MapResponse(BaseModel):
         spheres: Sequence["SphereModel"],
         nodes: Sequence["NodeModel"],
         edges: Sequence["EdgeModel"],
+        version: int = 0,
     ) -> "MapResponse":
         return cls(
             organization_id=organization_id,
+            version=version,
             spheres=[SphereRead.model_validate(sphere) for sphere in spheres],
             nodes=[MapNode.model_validate(node) for node in nodes],
             edges=[MapEdge.model_validate(edge) for edge in edges],
         )
 
 
-__all__ = ["MapNode", "MapEdge", "MapResponse"]
+class MapCluster(BaseModel):
+    # "<sphere_id>" or "<sphere_id>:<node_type>", depending on the level of detail.
+    id: str
+    sphere_id: int
+    node_type: Optional[str] = None
+    count: int
+    archived: int
+    # Centroid of the cluster's nodes.
+    x: float
+    y: float
+    # Edges between the cluster's own nodes; they are not listed in ``edges``.
+    internal_edges: int = 0
+
+
+class MapClusterEdge(BaseModel):
+    source: str
+    target: str
+    relation_type: str
+    count: int
+
+
+class MapLodResponse(BaseModel):
+    organization_id: int
+    version: int = 0
+    lod: Literal["sphere", "type"]
+    spheres: List[SphereRead]
+    clusters: List[MapCluster]
+    edges: List[MapClusterEdge]
+
+
+class MapChangesResponse(BaseModel):
+    organization_id: int
+    since: int
+    version: int
+    resync_required: bool = False
+    spheres: List[SphereRead] = Field(default_factory=list)
+    nodes: List[MapNode] = Field(default_factory=list)
+    edges: List[MapEdge] = Field(default_factory=list)
+    deleted_sphere_ids: List[int] = Field(default_factory=list)
+    deleted_node_ids: List[int] = Field(default_factory=list)
+    deleted_edge_ids: List[int] = Field(default_factory=list)
+
+
+class SnapshotCreate(BaseModel):
+    organization_id: int
+    name: str = Field(min_length=1, max_length=64, pattern=r"^[A-Za-z0-9][A-Za-z0-9_.-]*$")
+
+    @field_validator("name")
+    @classmethod
+    def validate_name(cls, value: str) -> str:
+        # Numeric references in ``?at=`` are snapshot ids.
+        if value.isdigit():
+            raise ValueError("snapshot name must not be a number")
+        return value
+
+
+class SnapshotRead(BaseModel):
+    id: int
+    organization_id: int
+    name: Optional[str] = None
+    automatic: bool = False
+    version: int
+    sphere_count: int = 0
+    node_count: int = 0
+    edge_count: int = 0
+    created_by_id: Optional[int] = None
+    created_at: datetime
+
+    model_config = ConfigDict(from_attributes=True)
+
+
+class SnapshotChange(BaseModel):
+    before: Dict[str, Any]
+    after: Dict[str, Any]
+
+
+class SnapshotEntityDiff(BaseModel):
+    added: List[Dict[str, Any]] = Field(default_factory=list)
+    removed: List[Dict[str, Any]] = Field(default_factory=list)
+    changed: List[SnapshotChange] = Field(default_factory=list)
+
+
+class SnapshotDiff(BaseModel):
+    organization_id: int
+    source: SnapshotRead
+    # ``None`` when compared with the current graph.
+    target: Optional[SnapshotRead] = None
+    spheres: SnapshotEntityDiff
+    nodes: SnapshotEntityDiff
+    edges: SnapshotEntityDiff
+
+
+__all__ = [
+    "MapNode",
+    "MapEdge",
+    "MapResponse",
+    "MapCluster",
+    "MapClusterEdge",
+    "MapLodResponse",
+    "MapChangesResponse",
+    "SnapshotCreate",
+    "SnapshotRead",
+    "SnapshotChange",
+    "SnapshotEntityDiff",
+    "SnapshotDiff",
+]
@@ -1,7 +1,7 @@
 ﻿from __future__ import annotations
 
 from datetime import datetime
-from typing import List, Optional
+from typing import List, Literal, Optional
 
 from pydantic import AliasChoices, BaseModel, ConfigDict, Field
 
@@ -182,6 +182,13 @@ class SphereLayoutRequest(BaseModel):
     layout: List[SphereLayoutItem]
 
 
+class SphereLayoutSolveRequest(BaseModel):
+    organization_id: int = Field(
+        validation_alias=AliasChoices("organization_id", "organizationId")
+    )
+    mode: Literal["radial", "grid", "packed"] = "packed"
+
+
 __all__ = [
     "OrganizationBase",
     "OrganizationCreate",
@@ -200,5 +207,6 @@ __all__ = [
     "SphereRead",
     "SphereLayoutItem",
     "SphereLayoutRequest",
+    "SphereLayoutSolveRequest",
     "OrganizationRole",
 ]
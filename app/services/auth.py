@@ -20,6 +20,7 @@ from app.core.security import (
 from app.models import PasswordResetToken, RefreshToken, User
 from app.schemas.auth import Token
 from app.schemas.user import UserCreate
+from app.services.principal_cache import principal_cache
 
 _ACCESS_TOKEN_EXPIRES_IN = settings.access_token_expire_minutes * 60
 _PASSWORD_RESET_EXPIRES = timedelta(hours=24)
@@ -100,6 +101,7 @@ def rotate_refresh_token(session: Session, token_str: str, client: str | None =
     refresh_record.revoked = True
     session.add(refresh_record)
     session.commit()
+    principal_cache.invalidate_user(refresh_record.user_id)
 
     return issue_tokens(session, user, client=client)
 
@@ -112,6 +114,7 @@ def revoke_refresh_token(session: Session, token_str: str) -> None:
     refresh_record.revoked = True
     session.add(refresh_record)
     session.commit()
+    principal_cache.invalidate_user(refresh_record.user_id)
 
 
 def request_password_reset(session: Session, email: str) -> tuple[str, datetime] | None:
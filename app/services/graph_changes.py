@@ -0,0 +1,178 @@
+from __future__ import annotations
+
+import logging
+from collections.abc import Callable, Iterable
+from dataclasses import dataclass, field
+
+from sqlalchemy import delete, event, insert, select, update
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.models import GraphChange, GraphChangeAction, Organization
+from app.services import graph_versions
+
+SPHERE = "sphere"
+NODE = "node"
+EDGE = "edge"
+ENTITY_TYPES = (SPHERE, NODE, EDGE)
+
+_COMPACT_EVERY = 500
+_PENDING_EVENTS_KEY = "graph_changes.pending"
+
+logger = logging.getLogger(__name__)
+
+ChangeEntry = tuple[str, int, GraphChangeAction]
+
+
+@dataclass(frozen=True)
+class GraphChangeEvent:
+    organization_id: int
+    version: int
+    changes: tuple[ChangeEntry, ...]
+
+
+GraphChangeListener = Callable[[GraphChangeEvent], None]
+
+_listeners: list[GraphChangeListener] = []
+
+
+def _ids_by_entity_type() -> dict[str, set[int]]:
+    return {kind: set() for kind in ENTITY_TYPES}
+
+
+@dataclass
+class ChangeSet:
+    version: int
+    resync_required: bool = False
+    upserts: dict[str, set[int]] = field(default_factory=_ids_by_entity_type)
+    deletes: dict[str, set[int]] = field(default_factory=_ids_by_entity_type)
+
+
+def upserts(entity_type: str, entity_ids: Iterable[int]) -> list[ChangeEntry]:
+    return [(entity_type, entity_id, GraphChangeAction.UPSERT) for entity_id in entity_ids]
+
+
+def deletes(entity_type: str, entity_ids: Iterable[int]) -> list[ChangeEntry]:
+    return [(entity_type, entity_id, GraphChangeAction.DELETE) for entity_id in entity_ids]
+
+
+def record_changes(session: Session, organization_id: int, changes: Iterable[ChangeEntry]) -> int:
+    """Bump the graph version and append ``changes`` under it in the caller's transaction."""
+
+    entries = tuple(changes)
+    version = graph_versions.bump_version(session, organization_id)
+    rows = [
+        {
+            "organization_id": organization_id,
+            "version": version,
+            "entity_type": entity_type,
+            "entity_id": entity_id,
+            "action": action.value,
+        }
+        for entity_type, entity_id, action in entries
+    ]
+    if rows:
+        session.execute(insert(GraphChange), rows)
+    session.info.setdefault(_PENDING_EVENTS_KEY, []).append(
+        GraphChangeEvent(organization_id=organization_id, version=version, changes=entries)
+    )
+
+    retention = settings.graph_changelog_retention
+    if retention > 0 and version > retention and version % _COMPACT_EVERY == 0:
+        compact_changes(session, organization_id, keep_versions=retention)
+    return version
+
+
+def add_listener(listener: GraphChangeListener) -> None:
+    """Register ``listener`` to be called with every committed :class:`GraphChangeEvent`."""
+
+    if listener not in _listeners:
+        _listeners.append(listener)
+
+
+def remove_listener(listener: GraphChangeListener) -> None:
+    if listener in _listeners:
+        _listeners.remove(listener)
+
+
+@event.listens_for(Session, "after_commit")
+def _dispatch_committed(session: Session) -> None:
+    pending = session.info.pop(_PENDING_EVENTS_KEY, None)
+    if not pending:
+        return
+    for change_event in pending:
+        for listener in list(_listeners):
+            try:
+                listener(change_event)
+            except Exception:  # pragma: no cover - listeners must not break commits
+                logger.exception("graph_changes.listener_failed")
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard_rolled_back(session: Session) -> None:
+    session.info.pop(_PENDING_EVENTS_KEY, None)
+
+
+def record_upsert(session: Session, organization_id: int, entity_type: str, entity_id: int) -> int:
+    return record_changes(session, organization_id, upserts(entity_type, [entity_id]))
+
+
+def record_delete(session: Session, organization_id: int, entity_type: str, entity_id: int) -> int:
+    return record_changes(session, organization_id, deletes(entity_type, [entity_id]))
+
+
+def compact_changes(session: Session, organization_id: int, *, keep_versions: int) -> int:
+    """Drop log entries older than the last ``keep_versions`` versions and raise the floor."""
+
+    floor = graph_versions.current_version(session, organization_id) - keep_versions
+    if floor <= 0:
+        return 0
+    result = session.execute(
+        delete(GraphChange)
+        .where(GraphChange.organization_id == organization_id)
+        .where(GraphChange.version <= floor)
+    )
+    session.execute(
+        update(Organization)
+        .where(Organization.id == organization_id)
+        .where(Organization.graph_log_floor < floor)
+        .values(graph_log_floor=floor)
+        .execution_options(synchronize_session=False)
+    )
+    return result.rowcount or 0
+
+
+def collect_changes(session: Session, organization_id: int, since: int) -> ChangeSet:
+    """Fold the log after ``since`` into the latest action per entity."""
+
+    state = session.execute(
+        select(Organization.graph_version, Organization.graph_log_floor).where(
+            Organization.id == organization_id
+        )
+    ).one_or_none()
+    version, floor = (int(state[0] or 0), int(state[1] or 0)) if state else (0, 0)
+
+    if since < floor or since > version:
+        return ChangeSet(version=version, resync_required=True)
+
+    change_set = ChangeSet(version=version)
+    if since == version:
+        return change_set
+
+    rows = session.execute(
+        select(GraphChange.entity_type, GraphChange.entity_id, GraphChange.action)
+        .where(GraphChange.organization_id == organization_id)
+        .where(GraphChange.version > since)
+        .order_by(GraphChange.version.asc(), GraphChange.id.asc())
+    )
+    for entity_type, entity_id, action in rows:
+        if entity_type not in change_set.upserts:
+            continue
+        if action == GraphChangeAction.DELETE.value:
+            change_set.upserts[entity_type].discard(entity_id)
+            change_set.deletes[entity_type].add(entity_id)
+        else:
+            change_set.deletes[entity_type].discard(entity_id)
+            change_set.upserts[entity_type].add(entity_id)
+    return change_set
+
@@ -0,0 +1,98 @@
+from __future__ import annotations
+
+import asyncio
+import logging
+import threading
+from dataclasses import dataclass, field
+from typing import Any
+
+from app.core.config import settings
+from app.services import graph_changes
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass(eq=False)
+class Subscription:
+    organization_id: int
+    loop: asyncio.AbstractEventLoop
+    queue: asyncio.Queue[dict[str, Any] | None]
+    dropped: bool = field(default=False)
+
+
+class GraphEventHub:
+    """In-process fan-out of committed graph changes to per-organization subscribers.
+
+    Every subscriber owns a bounded queue. A subscriber whose queue is full when an
+    event arrives is dropped: its queue is cleared and a ``None`` sentinel tells the
+    consumer to resynchronize instead of silently missing events.
+    """
+
+    def __init__(self, queue_size: int) -> None:
+        self._queue_size = queue_size
+        self._lock = threading.Lock()
+        self._subscribers: dict[int, set[Subscription]] = {}
+
+    def subscribe(self, organization_id: int) -> Subscription:
+        subscription = Subscription(
+            organization_id=organization_id,
+            loop=asyncio.get_running_loop(),
+            queue=asyncio.Queue(maxsize=self._queue_size),
+        )
+        with self._lock:
+            self._subscribers.setdefault(organization_id, set()).add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription) -> None:
+        with self._lock:
+            subscribers = self._subscribers.get(subscription.organization_id)
+            if subscribers is None:
+                return
+            subscribers.discard(subscription)
+            if not subscribers:
+                del self._subscribers[subscription.organization_id]
+
+    def subscriber_count(self, organization_id: int) -> int:
+        with self._lock:
+            return len(self._subscribers.get(organization_id, ()))
+
+    def publish(self, change_event: graph_changes.GraphChangeEvent) -> None:
+        with self._lock:
+            subscribers = list(self._subscribers.get(change_event.organization_id, ()))
+        if not subscribers:
+            return
+
+        message = {
+            "organization_id": change_event.organization_id,
+            "version": change_event.version,
+            "changes": [
+                {"entity_type": entity_type, "entity_id": entity_id, "action": action.value}
+                for entity_type, entity_id, action in change_event.changes
+            ],
+        }
+        for subscription in subscribers:
+            try:
+                subscription.loop.call_soon_threadsafe(self._deliver, subscription, message)
+            except RuntimeError:
+                # The subscriber's event loop is gone; nobody is listening anymore.
+                self.unsubscribe(subscription)
+
+    def _deliver(self, subscription: Subscription, message: dict[str, Any]) -> None:
+        if subscription.dropped:
+            return
+        try:
+            subscription.queue.put_nowait(message)
+        except asyncio.QueueFull:
+            subscription.dropped = True
+            while not subscription.queue.empty():
+                subscription.queue.get_nowait()
+            subscription.queue.put_nowait(None)
+            self.unsubscribe(subscription)
+            logger.warning(
+                "graph_events.subscriber_dropped",
+                extra={"organization_id": subscription.organization_id},
+            )
+
+
+hub = GraphEventHub(queue_size=settings.graph_stream_queue_size)
+graph_changes.add_listener(hub.publish)
@@ -0,0 +1,450 @@
+from __future__ import annotations
+
+import logging
+import time
+from collections.abc import Hashable, Iterator, Sequence
+from dataclasses import dataclass, field
+from typing import Any, TypeVar
+
+from fastapi import HTTPException, status
+from sqlalchemy import delete, insert, select, update
+from sqlalchemy.dialects import sqlite
+from sqlalchemy.orm import Session
+
+from app.models import Edge, Node, Sphere
+from app.schemas.graph import EdgeRead, GraphImportPayload, NodeRead
+from app.services import graph_changes, graph_json
+
+logger = logging.getLogger(__name__)
+
+ItemT = TypeVar("ItemT")
+
+_NODE_UPDATE_COLUMNS = (
+    "sphere_id",
+    "label",
+    "node_type",
+    "status",
+    "summary",
+    "position",
+    "x",
+    "y",
+    "metadata",
+    "links",
+    "owners",
+)
+# Columns that decide whether a node differs from the payload; x/y follow ``position``.
+_NODE_COMPARED_COLUMNS = tuple(name for name in _NODE_UPDATE_COLUMNS if name not in ("x", "y"))
+_NODE_JSON_COLUMNS = ("position", "metadata", "links", "owners")
+
+
+@dataclass
+class ImportStats:
+    nodes_inserted: int = 0
+    nodes_updated: int = 0
+    nodes_deleted: int = 0
+    nodes_unchanged: int = 0
+    edges_inserted: int = 0
+    edges_updated: int = 0
+    edges_deleted: int = 0
+    edges_unchanged: int = 0
+    chunks: int = 0
+    seconds: float = 0.0
+
+    @property
+    def rows_written(self) -> int:
+        return (
+            self.nodes_inserted
+            + self.nodes_updated
+            + self.nodes_deleted
+            + self.edges_inserted
+            + self.edges_updated
+            + self.edges_deleted
+        )
+
+    @property
+    def rows_per_second(self) -> float:
+        return self.rows_written / self.seconds if self.seconds > 0 else float(self.rows_written)
+
+    def counts(self) -> dict[str, int]:
+        return {
+            "nodes_inserted": self.nodes_inserted,
+            "nodes_updated": self.nodes_updated,
+            "nodes_deleted": self.nodes_deleted,
+            "nodes_unchanged": self.nodes_unchanged,
+            "edges_inserted": self.edges_inserted,
+            "edges_updated": self.edges_updated,
+            "edges_deleted": self.edges_deleted,
+            "edges_unchanged": self.edges_unchanged,
+        }
+
+
+@dataclass
+class ImportOutcome:
+    node_ids: list[int] = field(default_factory=list)
+    edge_ids: list[int] = field(default_factory=list)
+    stats: ImportStats = field(default_factory=ImportStats)
+
+
+def _chunks(items: Sequence[ItemT], size: int) -> Iterator[Sequence[ItemT]]:
+    for start in range(0, len(items), size):
+        yield items[start : start + size]
+
+
+def _bad_request(detail: str) -> HTTPException:
+    return HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=detail)
+
+
+def _node_row(node_data: NodeRead) -> dict[str, Any]:
+    position = node_data.position or {}
+    return {
+        "sphere_id": node_data.sphere_id,
+        "label": node_data.label,
+        "node_type": node_data.node_type,
+        "status": node_data.status,
+        "summary": node_data.summary,
+        "position": position,
+        "x": float(position.get("x", 0.0)),
+        "y": float(position.get("y", 0.0)),
+        "metadata": node_data.metadata,
+        "links": node_data.links,
+        "owners": node_data.owners,
+    }
+
+
+def _normalized(row: dict[str, Any]) -> dict[str, Any]:
+    """``row`` with its JSON columns normalized, for comparing stored nodes with the payload."""
+
+    return {**row, **graph_json.node_values(*(row[name] for name in _NODE_JSON_COLUMNS))}
+
+
+def _upsert_statement():
+    """``INSERT .. ON CONFLICT (id) DO UPDATE`` for nodes that already exist (SQLite)."""
+
+    statement = sqlite.insert(Node.__table__)
+    return statement.on_conflict_do_update(
+        index_elements=[Node.__table__.c.id],
+        set_={name: statement.excluded[name] for name in _NODE_UPDATE_COLUMNS},
+    )
+
+
+class _ChunkWriter:
+    """Write rows ``chunk_size`` at a time inside the caller's transaction.
+
+    The change-log entries of all chunks are recorded under one graph version by
+    :meth:`finish`, which commits once, so readers and a failed import only ever see the
+    graph before or after it.
+    """
+
+    def __init__(self, session: Session, organization_id: int, chunk_size: int, stats: ImportStats):
+        self.session = session
+        self.organization_id = organization_id
+        self.chunk_size = max(chunk_size, 1)
+        self.stats = stats
+        self.changes: list[graph_changes.ChangeEntry] = []
+
+    def _written(self, changes: list[graph_changes.ChangeEntry]) -> None:
+        self.changes.extend(changes)
+        self.stats.chunks += 1
+
+    def upsert_nodes(self, rows: Sequence[dict[str, Any]]) -> None:
+        statement = _upsert_statement()
+        for chunk in _chunks(rows, self.chunk_size):
+            self.session.execute(statement, list(chunk))
+            self._written(graph_changes.upserts(graph_changes.NODE, [row["id"] for row in chunk]))
+
+    def insert(self, model: type[Node] | type[Edge], rows: Sequence[dict[str, Any]]) -> list[int]:
+        """Insert ``rows`` and return the ids the database assigned, in row order."""
+
+        entity_type = graph_changes.NODE if model is Node else graph_changes.EDGE
+        table = model.__table__
+        statement = insert(table).returning(table.c.id, sort_by_parameter_order=True)
+        inserted: list[int] = []
+        for chunk in _chunks(rows, self.chunk_size):
+            new_ids = list(self.session.execute(statement, list(chunk)).scalars())
+            self._written(graph_changes.upserts(entity_type, new_ids))
+            inserted.extend(new_ids)
+        return inserted
+
+    def update_edges(self, rows: Sequence[dict[str, Any]]) -> None:
+        for chunk in _chunks(rows, self.chunk_size):
+            self.session.execute(update(Edge), list(chunk))
+            self._written(graph_changes.upserts(graph_changes.EDGE, [row["id"] for row in chunk]))
+
+    def delete(self, model: type[Node] | type[Edge], ids: Sequence[int]) -> None:
+        entity_type = graph_changes.NODE if model is Node else graph_changes.EDGE
+        for chunk in _chunks(ids, self.chunk_size):
+            self.session.execute(delete(model).where(model.id.in_(chunk)))
+            self._written(graph_changes.deletes(entity_type, chunk))
+
+    def finish(self) -> None:
+        if self.changes:
+            graph_changes.record_changes(self.session, self.organization_id, self.changes)
+        self.session.commit()
+
+
+def _validate(payload: GraphImportPayload, sphere_ids: set[int]) -> None:
+    """Check the whole payload before anything is written."""
+
+    payload_ids: set[int] = set()
+    for node_data in payload.nodes or []:
+        if node_data.sphere_id not in sphere_ids:
+            raise _bad_request("Node sphere outside organization")
+        payload_ids.add(node_data.id)
+    for edge_data in payload.edges or []:
+        if edge_data.sphere_id not in sphere_ids:
+            raise _bad_request("Edge sphere outside organization")
+        if (
+            edge_data.source_node_id not in payload_ids
+            or edge_data.target_node_id not in payload_ids
+        ):
+            raise _bad_request("Edge references unknown node")
+
+
+def _edge_rows(payload: GraphImportPayload, id_map: dict[int, int]) -> list[dict[str, Any]]:
+    return [
+        {
+            "sphere_id": edge_data.sphere_id,
+            "source_node_id": id_map[edge_data.source_node_id],
+            "target_node_id": id_map[edge_data.target_node_id],
+            "relation_type": edge_data.relation_type,
+            "metadata": edge_data.metadata,
+        }
+        for edge_data in payload.edges or []
+    ]
+
+
+def _replace(
+    session: Session, payload: GraphImportPayload, writer: _ChunkWriter, outcome: ImportOutcome
+) -> None:
+    organization_id = payload.organization_id
+    stats = outcome.stats
+    node_items = list(payload.nodes or [])
+    existing_ids = set(
+        session.scalars(
+            select(Node.id).join(Sphere).where(Sphere.organization_id == organization_id)
+        ).all()
+    )
+
+    updates = [item for item in node_items if item.id in existing_ids]
+    inserts = [item for item in node_items if item.id not in existing_ids]
+    writer.upsert_nodes([{"id": item.id, **_node_row(item)} for item in updates])
+    new_ids = writer.insert(Node, [_node_row(item) for item in inserts])
+
+    id_map = {item.id: item.id for item in updates}
+    id_map.update((item.id, new_id) for item, new_id in zip(inserts, new_ids, strict=True))
+    outcome.node_ids = [id_map[item.id] for item in node_items]
+    stats.nodes_updated = len(updates)
+    stats.nodes_inserted = len(inserts)
+
+    previous_edge_ids = session.scalars(
+        select(Edge.id).join(Sphere).where(Sphere.organization_id == organization_id)
+    ).all()
+    writer.delete(Edge, previous_edge_ids)
+    edge_rows = _edge_rows(payload, id_map)
+    outcome.edge_ids = writer.insert(Edge, edge_rows)
+    stats.edges_deleted = len(previous_edge_ids)
+    stats.edges_inserted = len(edge_rows)
+
+
+def _diff(
+    session: Session, payload: GraphImportPayload, writer: _ChunkWriter, outcome: ImportOutcome
+) -> None:
+    organization_id = payload.organization_id
+    stats = outcome.stats
+    node_items = list(payload.nodes or [])
+    by_label = payload.match_by == "label"
+
+    def node_key(node_id: int, sphere_id: int, label: str) -> Hashable:
+        return (sphere_id, label) if by_label else node_id
+
+    existing_node_ids: list[int] = []
+    existing_nodes: dict[Hashable, dict[str, Any]] = {}
+    node_rows = session.execute(
+        select(
+            Node.id,
+            Node.sphere_id,
+            Node.label,
+            Node.node_type,
+            Node.status,
+            Node.summary,
+            Node.position,
+            Node.metadata_json.label("metadata"),
+            Node.links_json.label("links"),
+            Node.owners_json.label("owners"),
+        )
+        .join(Sphere)
+        .where(Sphere.organization_id == organization_id)
+        .order_by(Node.id)
+    ).mappings()
+    for row in node_rows:
+        existing_node_ids.append(row["id"])
+        # With label matching, later duplicates of a (sphere, label) key are never matched.
+        existing_nodes.setdefault(
+            node_key(row["id"], row["sphere_id"], row["label"]), _normalized(dict(row))
+        )
+
+    seen_keys: set[Hashable] = set()
+    id_map: dict[int, int] = {}
+    updates: list[dict[str, Any]] = []
+    inserts: list[NodeRead] = []
+    for item in node_items:
+        key = node_key(item.id, item.sphere_id, item.label)
+        if key in seen_keys:
+            raise _bad_request("Duplicate node in import payload")
+        seen_keys.add(key)
+        current = existing_nodes.get(key)
+        if current is None:
+            inserts.append(item)
+            continue
+        row = _node_row(item)
+        id_map[item.id] = current["id"]
+        compared = _normalized(row)
+        if any(current[name] != compared[name] for name in _NODE_COMPARED_COLUMNS):
+            updates.append({"id": current["id"], **row})
+        else:
+            stats.nodes_unchanged += 1
+
+    writer.upsert_nodes(updates)
+    new_ids = writer.insert(Node, [_node_row(item) for item in inserts])
+    id_map.update((item.id, new_id) for item, new_id in zip(inserts, new_ids, strict=True))
+    outcome.node_ids = [id_map[item.id] for item in node_items]
+    stats.nodes_updated = len(updates)
+    stats.nodes_inserted = len(inserts)
+
+    existing_edges: dict[tuple[int, int, str], list[dict[str, Any]]] = {}
+    edge_rows = session.execute(
+        select(
+            Edge.id,
+            Edge.sphere_id,
+            Edge.source_node_id,
+            Edge.target_node_id,
+            Edge.relation_type,
+            Edge.metadata_json.label("metadata"),
+        )
+        .join(Sphere)
+        .where(Sphere.organization_id == organization_id)
+        .order_by(Edge.id)
+    ).mappings()
+    for row in edge_rows:
+        edge_key = (row["source_node_id"], row["target_node_id"], row["relation_type"])
+        existing_edges.setdefault(edge_key, []).append(dict(row))
+
+    resolved_edges: list[int] = []
+    edge_updates: list[dict[str, Any]] = []
+    edge_inserts: list[tuple[int, dict[str, Any]]] = []
+    for index, row in enumerate(_edge_rows(payload, id_map)):
+        candidates = existing_edges.get(
+            (row["source_node_id"], row["target_node_id"], row["relation_type"])
+        )
+        if not candidates:
+            edge_inserts.append((index, row))
+            resolved_edges.append(0)
+            continue
+        current = candidates.pop(0)
+        resolved_edges.append(current["id"])
+        if (
+            current["sphere_id"] != row["sphere_id"]
+            or (current["metadata"] or {}) != row["metadata"]
+        ):
+            edge_updates.append(
+                {
+                    "id": current["id"],
+                    "sphere_id": row["sphere_id"],
+                    "metadata_json": row["metadata"],
+                }
+            )
+        else:
+            stats.edges_unchanged += 1
+
+    stale_edges = [edge["id"] for remaining in existing_edges.values() for edge in remaining]
+    writer.delete(Edge, stale_edges)
+    writer.update_edges(edge_updates)
+    new_edge_ids = writer.insert(Edge, [row for _, row in edge_inserts])
+    for (index, _), new_id in zip(edge_inserts, new_edge_ids, strict=True):
+        resolved_edges[index] = new_id
+    outcome.edge_ids = resolved_edges
+    stats.edges_deleted = len(stale_edges)
+    stats.edges_updated = len(edge_updates)
+    stats.edges_inserted = len(edge_inserts)
+
+    # Edges touching these nodes were not in the payload and are already gone.
+    kept = set(id_map.values())
+    stale_nodes = [node_id for node_id in existing_node_ids if node_id not in kept]
+    writer.delete(Node, stale_nodes)
+    stats.nodes_deleted = len(stale_nodes)
+
+
+def import_graph(
+    session: Session, payload: GraphImportPayload, *, chunk_size: int
+) -> ImportOutcome:
+    """Apply ``payload`` to the organization graph using set-based statements.
+
+    ``replace`` mode updates nodes whose id already belongs to the organization, inserts
+    every other node under a fresh id and replaces all edges of the organization. ``diff``
+    mode treats the payload as the desired graph: nodes are matched by id or by
+    ``(sphere_id, label)``, edges by endpoints and relation, and only rows that differ are
+    inserted, updated or deleted, so re-importing an unchanged graph writes nothing.
+
+    In both modes edges refer to nodes by their payload ids and the whole payload is
+    validated before anything is written. Rows are written ``chunk_size`` at a time with
+    one statement per chunk; new ids are assigned by the database. The import is one
+    transaction and one graph version: it is committed once at the end, and rolled back
+    as a whole when any statement fails.
+    """
+
+    started = time.perf_counter()
+    organization_id = payload.organization_id
+    sphere_ids = set(
+        session.scalars(select(Sphere.id).where(Sphere.organization_id == organization_id)).all()
+    )
+    _validate(payload, sphere_ids)
+
+    outcome = ImportOutcome()
+    writer = _ChunkWriter(session, organization_id, chunk_size, outcome.stats)
+    try:
+        if payload.mode == "diff":
+            _diff(session, payload, writer, outcome)
+        else:
+            _replace(session, payload, writer, outcome)
+        writer.finish()
+    except Exception:
+        session.rollback()
+        raise
+
+    stats = outcome.stats
+    stats.seconds = time.perf_counter() - started
+    logger.info(
+        "graph.import",
+        extra={
+            "organization_id": organization_id,
+            "mode": payload.mode,
+            **stats.counts(),
+            "chunks": stats.chunks,
+            "seconds": round(stats.seconds, 3),
+            "rows_per_second": round(stats.rows_per_second, 1),
+        },
+    )
+    return outcome
+
+
+def load_result(
+    session: Session, outcome: ImportOutcome, *, chunk_size: int
+) -> tuple[list[NodeRead], list[EdgeRead]]:
+    """Read the imported rows back in payload order.
+
+    Rows are projected with ``graph_json`` rather than loaded as entities, which skips stale
+    identity-map state and reads JSON nulls the way every other endpoint renders them.
+    """
+
+    nodes: dict[int, NodeRead] = {}
+    for chunk in _chunks(sorted(set(outcome.node_ids)), chunk_size):
+        rows = session.execute(select(*graph_json.NODE_COLUMNS).where(Node.id.in_(chunk)))
+        nodes.update((row.id, NodeRead.model_validate(graph_json.node_record(row))) for row in rows)
+    edges: dict[int, EdgeRead] = {}
+    for chunk in _chunks(sorted(set(outcome.edge_ids)), chunk_size):
+        rows = session.execute(select(*graph_json.EDGE_COLUMNS).where(Edge.id.in_(chunk)))
+        edges.update((row.id, EdgeRead.model_validate(graph_json.edge_record(row))) for row in rows)
+    return (
+        [nodes[node_id] for node_id in outcome.node_ids],
+        [edges[edge_id] for edge_id in outcome.edge_ids],
+    )
@@ -0,0 +1,376 @@
+from __future__ import annotations
+
+import logging
+import threading
+import time
+from array import array
+from collections import OrderedDict
+from collections.abc import Collection, Sequence
+from dataclasses import dataclass
+from functools import cached_property
+from itertools import accumulate
+
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.models import Edge, GraphChangeAction, Node, Sphere
+from app.services import graph_changes
+
+logger = logging.getLogger(__name__)
+
+DOWNSTREAM = "downstream"
+UPSTREAM = "upstream"
+BOTH = "both"
+DIRECTIONS = (DOWNSTREAM, UPSTREAM, BOTH)
+
+# Relations that feed their target: ``a -produces-> b`` starves ``b`` when ``a`` goes down.
+# Every other relation (``uses``, ``depends``, ``consumes`` and unknown types) means the
+# source needs the target: ``a -uses-> b`` breaks ``a`` when ``b`` goes down.
+FEEDING_RELATIONS = frozenset({"produces"})
+
+# (position, depth, predecessor position)
+Reached = tuple[int, int, int]
+# Updated nodes whose sphere the cache re-reads; beyond that a rebuild is about as cheap.
+_MAX_SPHERE_REFRESH = 500
+
+
+@dataclass(frozen=True)
+class Csr:
+    """Compressed sparse rows: the neighbours of position ``p`` are
+    ``neighbours[offsets[p]:offsets[p + 1]]``, with matching relation codes in ``relations``.
+    """
+
+    offsets: array
+    neighbours: array
+    relations: array
+
+    @classmethod
+    def build(
+        cls, count: int, heads: Sequence[int], tails: Sequence[int], relations: Sequence[int]
+    ) -> Csr:
+        degrees = [0] * (count + 1)
+        for head in heads:
+            degrees[head + 1] += 1
+        # A stable sort keeps each node's neighbours in edge order.
+        order = sorted(range(len(heads)), key=heads.__getitem__)
+        return cls(
+            array("I", accumulate(degrees)),
+            array("I", [tails[slot] for slot in order]),
+            array("B", [relations[slot] for slot in order]),
+        )
+
+    def degree(self, position: int) -> int:
+        return self.offsets[position + 1] - self.offsets[position]
+
+
+@dataclass(frozen=True)
+class AdjacencyIndex:
+    """Integer adjacency of one organization's graph at ``version``.
+
+    Nodes are addressed by their position in ``node_ids`` (ascending ids; ``node_spheres``
+    holds each node's sphere) and relation types by their code in ``relation_types``;
+    ``sources``/``targets``/``relations`` hold the edges in id order. The CSR views are
+    derived on first use: ``outgoing``/``incoming`` follow the stored edge direction,
+    ``affects``/``requires`` the direction a failure travels (see ``FEEDING_RELATIONS``),
+    so impact queries never filter by relation type.
+    """
+
+    organization_id: int
+    version: int
+    node_ids: array
+    node_spheres: array
+    positions: dict[int, int]
+    relation_types: tuple[str, ...]
+    sources: array
+    targets: array
+    relations: array
+
+    @property
+    def node_count(self) -> int:
+        return len(self.node_ids)
+
+    @property
+    def edge_count(self) -> int:
+        return len(self.sources)
+
+    @cached_property
+    def outgoing(self) -> Csr:
+        return Csr.build(self.node_count, self.sources, self.targets, self.relations)
+
+    @cached_property
+    def incoming(self) -> Csr:
+        return Csr.build(self.node_count, self.targets, self.sources, self.relations)
+
+    @cached_property
+    def affects(self) -> Csr:
+        failing, failed = self._failure_edges
+        return Csr.build(self.node_count, failing, failed, self.relations)
+
+    @cached_property
+    def requires(self) -> Csr:
+        failing, failed = self._failure_edges
+        return Csr.build(self.node_count, failed, failing, self.relations)
+
+    @cached_property
+    def _failure_edges(self) -> tuple[list[int], list[int]]:
+        feeds = [name in FEEDING_RELATIONS for name in self.relation_types]
+        failing: list[int] = []
+        failed: list[int] = []
+        edges = zip(self.sources, self.targets, self.relations, strict=True)
+        for source, target, relation in edges:
+            if feeds[relation]:
+                failing.append(source)
+                failed.append(target)
+            else:
+                failing.append(target)
+                failed.append(source)
+        return failing, failed
+
+    def relation_codes(self, relation_types: Collection[str] | None) -> frozenset[int] | None:
+        """Codes of ``relation_types``, or ``None`` when that covers every relation present."""
+
+        if relation_types is None:
+            return None
+        codes = frozenset(
+            code for code, name in enumerate(self.relation_types) if name in relation_types
+        )
+        return None if len(codes) == len(self.relation_types) else codes
+
+
+def build_index(session: Session, organization_id: int, version: int) -> AdjacencyIndex:
+    started = time.perf_counter()
+    node_ids = array("Q")
+    node_spheres = array("Q")
+    for node_id, sphere_id in session.execute(
+        select(Node.id, Node.sphere_id)
+        .join(Sphere, Node.sphere_id == Sphere.id)
+        .where(Sphere.organization_id == organization_id)
+        .order_by(Node.id)
+    ):
+        node_ids.append(node_id)
+        node_spheres.append(sphere_id)
+    positions = {node_id: position for position, node_id in enumerate(node_ids)}
+
+    relation_types: dict[str, int] = {}
+    sources: list[int] = []
+    targets: list[int] = []
+    relations: list[int] = []
+    rows = session.execute(
+        select(Edge.source_node_id, Edge.target_node_id, Edge.relation_type)
+        .join(Sphere, Edge.sphere_id == Sphere.id)
+        .where(Sphere.organization_id == organization_id)
+        .order_by(Edge.id)
+    )
+    for source_id, target_id, relation_type in rows:
+        source = positions.get(source_id)
+        target = positions.get(target_id)
+        if source is None or target is None:
+            continue
+        sources.append(source)
+        targets.append(target)
+        relations.append(relation_types.setdefault(relation_type, len(relation_types)))
+
+    index = AdjacencyIndex(
+        organization_id=organization_id,
+        version=version,
+        node_ids=node_ids,
+        node_spheres=node_spheres,
+        positions=positions,
+        relation_types=tuple(relation_types),
+        sources=array("I", sources),
+        targets=array("I", targets),
+        relations=array("B", relations),
+    )
+    logger.info(
+        "graph_index.built",
+        extra={
+            "organization_id": organization_id,
+            "version": version,
+            "nodes": index.node_count,
+            "edges": index.edge_count,
+            "elapsed_ms": round((time.perf_counter() - started) * 1000, 1),
+        },
+    )
+    return index
+
+
+def traverse(
+    index: AdjacencyIndex,
+    start: int,
+    adjacency: Sequence[Csr],
+    *,
+    relations: frozenset[int] | None = None,
+    max_depth: int | None = None,
+) -> list[Reached]:
+    """Breadth-first search from position ``start`` over the union of ``adjacency``.
+
+    Only edges whose relation code is in ``relations`` are followed (all when ``None``).
+    Every reachable position is reported once, at its shortest depth, with the position it
+    was first reached from; ``start`` itself is not included.
+    """
+
+    visited = bytearray(index.node_count)
+    visited[start] = 1
+    reached: list[Reached] = []
+    frontier = [start]
+    depth = 0
+    while frontier and (max_depth is None or depth < max_depth):
+        depth += 1
+        next_frontier: list[int] = []
+        for csr in adjacency:
+            offsets = csr.offsets
+            neighbours = csr.neighbours
+            codes = csr.relations
+            for position in frontier:
+                low = offsets[position]
+                high = offsets[position + 1]
+                if low == high:
+                    continue
+                if relations is None:
+                    candidates = neighbours[low:high]
+                else:
+                    candidates = [
+                        neighbour
+                        for neighbour, code in zip(
+                            neighbours[low:high], codes[low:high], strict=True
+                        )
+                        if code in relations
+                    ]
+                for neighbour in candidates:
+                    if not visited[neighbour]:
+                        visited[neighbour] = 1
+                        next_frontier.append(neighbour)
+                        reached.append((neighbour, depth, position))
+        frontier = next_frontier
+    return reached
+
+
+def impact(
+    index: AdjacencyIndex,
+    node_id: int,
+    *,
+    direction: str = DOWNSTREAM,
+    relation_types: Collection[str] | None = None,
+    max_depth: int | None = None,
+) -> list[Reached]:
+    """Nodes affected by (``downstream``) or needed by (``upstream``) ``node_id``.
+
+    ``downstream`` answers "what breaks if this node goes down", ``both`` is the union of
+    the two directions. Raises ``KeyError`` when the node is not part of the index.
+    """
+
+    if direction == DOWNSTREAM:
+        adjacency = [index.affects]
+    elif direction == UPSTREAM:
+        adjacency = [index.requires]
+    elif direction == BOTH:
+        adjacency = [index.affects, index.requires]
+    else:
+        raise ValueError(f"unknown direction: {direction}")
+    start = index.positions[node_id]
+    relations = index.relation_codes(relation_types)
+    if relations is not None and not relations:
+        return []
+    return traverse(index, start, adjacency, relations=relations, max_depth=max_depth)
+
+
+class AdjacencyIndexCache:
+    """Per-organization :class:`AdjacencyIndex` cache, rebuilt when the graph version moves.
+
+    Committed changes that cannot alter the adjacency (updates of nodes the index already
+    knows, such as moves or renames) extend the cached index to the new version instead of
+    dropping it; anything else invalidates the organization. Such an update may still have
+    moved the node to another sphere (imports and batches can), so the ids are remembered
+    and their spheres re-read on the next :meth:`get`.
+    """
+
+    def __init__(self, max_organizations: int) -> None:
+        self._max_organizations = max_organizations
+        self._lock = threading.Lock()
+        # organization id -> (graph version the index is valid for, index,
+        #                     updated node ids whose sphere is not re-read yet)
+        self._entries: OrderedDict[int, tuple[int, AdjacencyIndex, frozenset[int]]] = (
+            OrderedDict()
+        )
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+
+    def get(self, session: Session, organization_id: int, version: int) -> AdjacencyIndex:
+        with self._lock:
+            entry = self._entries.get(organization_id)
+            if entry is not None and entry[0] == version:
+                self._entries.move_to_end(organization_id)
+                self.hits += 1
+                if not entry[2]:
+                    return entry[1]
+            else:
+                entry = None
+                self.misses += 1
+
+        if entry is not None:
+            _, index, updated = entry
+            spheres = session.execute(
+                select(Node.id, Node.sphere_id).where(Node.id.in_(sorted(updated)))
+            ).all()
+            with self._lock:
+                # Patched in place, so readers holding this index see the same membership.
+                for node_id, sphere_id in spheres:
+                    index.node_spheres[index.positions[node_id]] = sphere_id
+                if self._entries.get(organization_id) is entry:
+                    self._entries[organization_id] = (version, index, frozenset())
+            return index
+
+        index = build_index(session, organization_id, version)
+        if self._max_organizations <= 0:
+            return index
+        with self._lock:
+            entry = self._entries.get(organization_id)
+            if entry is None or entry[0] <= version:
+                self._entries[organization_id] = (version, index, frozenset())
+                self._entries.move_to_end(organization_id)
+            while len(self._entries) > self._max_organizations:
+                self._entries.popitem(last=False)
+        return index
+
+    def apply_change(self, change_event: graph_changes.GraphChangeEvent) -> None:
+        organization_id = change_event.organization_id
+        with self._lock:
+            entry = self._entries.get(organization_id)
+            if entry is None:
+                return
+            version, index, updated = entry
+            node_ids = {entity_id for _, entity_id, _ in change_event.changes}
+            if (
+                version + 1 == change_event.version
+                and len(updated) + len(node_ids) <= _MAX_SPHERE_REFRESH
+                and all(
+                    entity_type == graph_changes.NODE
+                    and action == GraphChangeAction.UPSERT
+                    and entity_id in index.positions
+                    for entity_type, entity_id, action in change_event.changes
+                )
+            ):
+                self._entries[organization_id] = (change_event.version, index, updated | node_ids)
+            elif version < change_event.version:
+                del self._entries[organization_id]
+                self.invalidations += 1
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> dict[str, int]:
+        with self._lock:
+            return {
+                "organizations": len(self._entries),
+                "hits": self.hits,
+                "misses": self.misses,
+                "invalidations": self.invalidations,
+            }
+
+
+index_cache = AdjacencyIndexCache(max_organizations=settings.graph_index_max_organizations)
+
+graph_changes.add_listener(index_cache.apply_change)
@@ -0,0 +1,182 @@
+from __future__ import annotations
+
+from collections.abc import Iterable
+from typing import Any
+
+from fastapi import Response
+from pydantic_core import from_json, to_json
+from sqlalchemy import Row, Text, type_coerce
+from sqlalchemy.orm import InstrumentedAttribute
+
+from app.models import Edge, Node
+
+
+def _raw_json(attribute: InstrumentedAttribute[Any]) -> Any:
+    # JSON columns are fetched as text and parsed by pydantic-core, several times faster
+    # than the stdlib decoder SQLAlchemy's JSON type would run on every value.
+    return type_coerce(attribute, Text).label(attribute.key)
+
+
+# Column projections in the field order of ``NodeRead`` and ``EdgeRead``. Read endpoints
+# select these instead of ORM entities and render rows without building Pydantic models.
+NODE_COLUMNS = (
+    Node.label,
+    Node.node_type,
+    Node.status,
+    Node.summary,
+    _raw_json(Node.position),
+    _raw_json(Node.metadata_json),
+    _raw_json(Node.links_json),
+    _raw_json(Node.owners_json),
+    Node.id,
+    Node.sphere_id,
+    Node.created_at,
+    Node.in_degree,
+    Node.out_degree,
+    _raw_json(Node.degrees),
+    Node.pagerank,
+    Node.betweenness,
+)
+EDGE_COLUMNS = (
+    Edge.id,
+    Edge.sphere_id,
+    Edge.source_node_id,
+    Edge.target_node_id,
+    Edge.relation_type,
+    _raw_json(Edge.metadata_json),
+    Edge.created_at,
+)
+
+
+def _load(raw: Any) -> Any:
+    # Some drivers (psycopg) hand JSON columns back already decoded.
+    return from_json(raw) if isinstance(raw, (str, bytes)) and raw else raw
+
+
+def _position(raw: Any) -> dict[str, float]:
+    # Mirrors ``NodeBase.normalize_position``.
+    value = _load(raw) or {}
+    return {"x": float(value.get("x", 0.5)), "y": float(value.get("y", 0.5))}
+
+
+def _strings(raw: Any) -> list[str]:
+    # Mirrors ``NodeBase.split_links`` / ``NodeBase.split_owners``.
+    value = _load(raw)
+    if isinstance(value, str):
+        value = [part.strip() for part in value.split(",") if part.strip()]
+    return [item.strip() for item in value or []]
+
+
+def node_values(position: Any, metadata: Any, links: Any, owners: Any) -> dict[str, Any]:
+    """A node's JSON columns as ``NodeRead`` reads them, so stored NULLs compare as empty."""
+
+    return {
+        "position": _position(position),
+        "metadata": _load(metadata) or {},
+        "links": _strings(links),
+        "owners": _strings(owners),
+    }
+
+
+def node_record(row: Row[Any], *, by_alias: bool = True) -> dict[str, Any]:
+    """Render a ``NODE_COLUMNS`` row exactly as ``NodeRead`` would dump it."""
+
+    (
+        label,
+        node_type,
+        status,
+        summary,
+        position,
+        metadata,
+        links,
+        owners,
+        id_,
+        sphere_id,
+        created_at,
+        in_degree,
+        out_degree,
+        degrees,
+        pagerank,
+        betweenness,
+    ) = row
+    suffix = "_json" if by_alias else ""
+    return {
+        "label": label,
+        "node_type": node_type,
+        "status": status,
+        "summary": summary,
+        "position": _position(position),
+        "metadata" + suffix: _load(metadata) or {},
+        "links" + suffix: _strings(links),
+        "owners" + suffix: _strings(owners),
+        "id": id_,
+        "sphere_id": sphere_id,
+        "created_at": created_at,
+        "in_degree": in_degree,
+        "out_degree": out_degree,
+        "degrees": _load(degrees) or {},
+        "pagerank": pagerank,
+        "betweenness": betweenness,
+    }
+
+
+def map_node_record(row: Row[Any]) -> dict[str, Any]:
+    """Render a ``NODE_COLUMNS`` row exactly as ``MapNode.model_dump(by_alias=True)`` would."""
+
+    record = node_record(row)
+    position = record["position"]
+    record["name"] = record["label"]
+    record["kind"] = record["node_type"]
+    record["archived"] = record["status"] == "archived"
+    record["x"] = position["x"]
+    record["y"] = position["y"]
+    return record
+
+
+def edge_record(row: Row[Any], *, by_alias: bool = True) -> dict[str, Any]:
+    """Render an ``EDGE_COLUMNS`` row exactly as ``EdgeRead`` would dump it."""
+
+    id_, sphere_id, source_node_id, target_node_id, relation_type, metadata, created_at = row
+    return {
+        "id": id_,
+        "sphere_id": sphere_id,
+        "source_node_id": source_node_id,
+        "target_node_id": target_node_id,
+        "relation_type": relation_type,
+        "metadata_json" if by_alias else "metadata": _load(metadata) or {},
+        "created_at": created_at,
+    }
+
+
+def map_edge_record(row: Row[Any]) -> dict[str, Any]:
+    """Render an ``EDGE_COLUMNS`` row exactly as ``MapEdge.model_dump(by_alias=True)`` would."""
+
+    record = edge_record(row)
+    record["from_node_id"] = record["source_node_id"]
+    record["to_node_id"] = record["target_node_id"]
+    return record
+
+
+def encode_nodes(rows: Iterable[Row[Any]]) -> bytes:
+    return to_json([node_record(row) for row in rows])
+
+
+def encode_edges(rows: Iterable[Row[Any]]) -> bytes:
+    return to_json([edge_record(row) for row in rows])
+
+
+def encode(payload: Any) -> bytes:
+    """Encode plain records with the same JSON rules Pydantic applies to our schemas."""
+
+    return to_json(payload)
+
+
+def json_response(
+    body: bytes, response: Response | None, *, media_type: str = "application/json"
+) -> Response:
+    """Wrap a pre-encoded body, keeping headers (ETag, cursors) set on ``response``."""
+
+    headers = dict(response.headers) if response is not None else {}
+    headers.pop("content-length", None)
+    return Response(content=body, media_type=media_type, headers=headers)
+
@@ -0,0 +1,355 @@
+from __future__ import annotations
+
+import logging
+import math
+import threading
+import time
+from collections.abc import Callable, Sequence
+from typing import Any
+
+from sqlalchemy import ColumnElement, case, func, select, update
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.models import GraphChangeAction, Node, Sphere
+from app.services import graph_changes, graph_index, graph_versions
+from app.services.graph_index import AdjacencyIndex
+
+try:  # Optional, see the ``layout`` extra in pyproject.toml.
+    import numpy as np
+except ImportError:  # pragma: no cover - depends on the environment
+    np = None
+
+logger = logging.getLogger(__name__)
+
+METRICS = ("degree", "in_degree", "out_degree", "pagerank", "betweenness")
+
+_DAMPING = 0.85
+_TOLERANCE = 1e-10
+_MAX_ITERATIONS = 100
+# Betweenness sources traversed together; memory grows with batch size times node count.
+_SOURCE_BATCH = 16
+_WRITE_CHUNK = 500
+# Stored values are only rewritten (and the metrics version bumped) when they move this much.
+_RELATIVE_CHANGE = 1e-6
+_ABSOLUTE_CHANGE = 1e-12
+
+
+class MetricsUnavailableError(RuntimeError):
+    """Raised when centrality is requested without NumPy installed."""
+
+
+def available() -> bool:
+    return np is not None
+
+
+def metric_expression(metric: str, relation_type: str | None = None) -> ColumnElement[Any]:
+    """SQL value of a node ``metric`` for ranking; missing centrality sorts as ``-1``.
+
+    Degree metrics count the edges of ``relation_type`` only when it is given.
+    """
+
+    if metric in ("pagerank", "betweenness"):
+        return func.coalesce(getattr(Node, metric), -1.0)
+    if metric == "degree":
+        return metric_expression("in_degree", relation_type) + metric_expression(
+            "out_degree", relation_type
+        )
+    if metric not in ("in_degree", "out_degree"):
+        raise ValueError(f"unknown node metric: {metric}")
+    if relation_type is None:
+        return getattr(Node, metric)
+    path = f'$."{relation_type}".{metric.removesuffix("_degree")}'
+    return func.coalesce(func.json_extract(Node.degrees, path), 0)
+
+
+def metric_value(record: dict[str, Any], metric: str, relation_type: str | None = None) -> Any:
+    """Python counterpart of :func:`metric_expression` for a ``node_record``."""
+
+    if metric in ("pagerank", "betweenness"):
+        return -1.0 if record[metric] is None else record[metric]
+    if metric == "degree":
+        return metric_value(record, "in_degree", relation_type) + metric_value(
+            record, "out_degree", relation_type
+        )
+    if relation_type is None:
+        return record[metric]
+    return record["degrees"].get(relation_type, {}).get(metric.removesuffix("_degree"), 0)
+
+
+def _needs_csr(index: AdjacencyIndex) -> tuple[Any, Any]:
+    """Offsets and neighbours of the "needs" graph without duplicate edges or self-loops."""
+
+    csr = index.requires
+    count = index.node_count
+    offsets = np.asarray(csr.offsets, dtype=np.intp)
+    heads = np.repeat(np.arange(count, dtype=np.intp), np.diff(offsets))
+    tails = np.asarray(csr.neighbours, dtype=np.intp)
+    distinct = heads != tails
+    heads, tails = np.divmod(np.unique(heads[distinct] * count + tails[distinct]), count)
+    offsets = np.concatenate(([0], np.cumsum(np.bincount(heads, minlength=count))))
+    return offsets, tails
+
+
+def pagerank(offsets: Any, neighbours: Any) -> Any:
+    """PageRank by power iteration, mass flowing from a node to the nodes it needs.
+
+    Nodes many others (transitively) depend on rank highest. Each step is one sparse
+    matrix-vector product expressed as a ``bincount`` over the edge list; the rank of nodes
+    without outgoing edges is spread evenly.
+    """
+
+    count = len(offsets) - 1
+    degree = np.diff(offsets)
+    heads = np.repeat(np.arange(count, dtype=np.intp), degree)
+    share = np.divide(1.0, degree, out=np.zeros(count), where=degree > 0)
+    dangling = degree == 0
+    rank = np.full(count, 1.0 / count)
+    for _ in range(_MAX_ITERATIONS):
+        spread = np.bincount(neighbours, weights=(rank * share)[heads], minlength=count)
+        updated = (1 - _DAMPING) / count + _DAMPING * (spread + rank[dangling].sum() / count)
+        change = np.abs(updated - rank).sum()
+        rank = updated
+        if change < _TOLERANCE:
+            break
+    return rank
+
+
+def betweenness(offsets: Any, neighbours: Any, *, samples: int, seed: int = 0) -> Any:
+    """Normalized betweenness estimated from ``samples`` random source nodes (Brandes).
+
+    Exact when there are no more nodes than samples. Sources are processed in batches:
+    each breadth-first level gathers the out-edges of the whole frontier of every source
+    in the batch at once, and path counts and dependencies are accumulated with scattered
+    adds over those edges.
+    """
+
+    count = len(offsets) - 1
+    if count < 3:
+        return np.zeros(count)
+    rng = np.random.default_rng(seed)
+    if count <= samples:
+        sources = np.arange(count, dtype=np.intp)
+    else:
+        sources = rng.choice(count, samples, replace=False)
+    degree = np.diff(offsets)
+    total = np.zeros(count)
+    for start in range(0, len(sources), _SOURCE_BATCH):
+        batch = sources[start : start + _SOURCE_BATCH]
+        rows = np.arange(len(batch), dtype=np.intp)
+        distance = np.full((len(batch), count), -1, dtype=np.int64)
+        paths = np.zeros((len(batch), count))
+        distance[rows, batch] = 0
+        paths[rows, batch] = 1.0
+        levels = []
+        frontier_rows, frontier_nodes = rows, batch
+        depth = 0
+        while len(frontier_nodes):
+            # Every out-edge of every frontier node, as (batch row, head, tail) triples.
+            counts = degree[frontier_nodes]
+            reached = int(counts.sum())
+            if not reached:
+                break
+            ends = np.cumsum(counts)
+            slots = np.repeat(offsets[frontier_nodes] - (ends - counts), counts) + np.arange(
+                reached
+            )
+            edge_rows = np.repeat(frontier_rows, counts)
+            heads = np.repeat(frontier_nodes, counts)
+            tails = neighbours[slots]
+            fresh = distance[edge_rows, tails] == -1
+            distance[edge_rows[fresh], tails[fresh]] = depth + 1
+            shortest = distance[edge_rows, tails] == depth + 1
+            edge_rows, heads, tails = edge_rows[shortest], heads[shortest], tails[shortest]
+            np.add.at(paths, (edge_rows, tails), paths[edge_rows, heads])
+            levels.append((edge_rows, heads, tails))
+            keys = np.unique(edge_rows[fresh[shortest]] * count + tails[fresh[shortest]])
+            frontier_rows, frontier_nodes = np.divmod(keys, count)
+            depth += 1
+
+        dependency = np.zeros((len(batch), count))
+        for edge_rows, heads, tails in reversed(levels):
+            np.add.at(
+                dependency,
+                (edge_rows, heads),
+                paths[edge_rows, heads]
+                / paths[edge_rows, tails]
+                * (1.0 + dependency[edge_rows, tails]),
+            )
+        dependency[rows, batch] = 0.0
+        total += dependency.sum(axis=0)
+    return total * (count / len(sources)) / ((count - 1) * (count - 2))
+
+
+def compute(index: AdjacencyIndex, *, samples: int) -> tuple[list[float], list[float]]:
+    """PageRank and betweenness of every node of ``index``, by index position."""
+
+    if np is None:
+        raise MetricsUnavailableError("centrality requires numpy (install the 'layout' extra)")
+    if not index.node_count:
+        return [], []
+    offsets, neighbours = _needs_csr(index)
+    return (
+        pagerank(offsets, neighbours).tolist(),
+        betweenness(offsets, neighbours, samples=samples).tolist(),
+    )
+
+
+def _changed(old: float | None, new: float) -> bool:
+    return old is None or not math.isclose(
+        old, new, rel_tol=_RELATIVE_CHANGE, abs_tol=_ABSOLUTE_CHANGE
+    )
+
+
+def recompute(session: Session, organization_id: int, *, samples: int | None = None) -> int:
+    """Recompute and store the centrality of an organization's nodes; commits.
+
+    Only nodes whose values moved are written. They are not recorded as graph changes:
+    centrality moves on most nodes after every edge edit, and versioning it with the graph
+    would invalidate every cache and fan the whole node set out to the delta feeds. The
+    organization's metrics version is bumped instead, which the ETags and cached bodies of
+    node responses include. Returns how many nodes changed.
+    """
+
+    started = time.perf_counter()
+    version = graph_versions.current_version(session, organization_id)
+    index = graph_index.index_cache.get(session, organization_id, version)
+    ranks, scores = compute(
+        index, samples=settings.graph_metrics_samples if samples is None else samples
+    )
+    stored = {
+        node_id: (rank, score)
+        for node_id, rank, score in session.execute(
+            select(Node.id, Node.pagerank, Node.betweenness)
+            .join(Sphere, Node.sphere_id == Sphere.id)
+            .where(Sphere.organization_id == organization_id)
+        )
+    }
+    changes = [
+        (node_id, rank, score)
+        for node_id, rank, score in zip(index.node_ids, ranks, scores, strict=True)
+        if node_id in stored
+        and (_changed(stored[node_id][0], rank) or _changed(stored[node_id][1], score))
+    ]
+    write_metrics(session, changes)
+    if changes:
+        graph_versions.bump_metrics_version(session, organization_id)
+    session.commit()
+    logger.info(
+        "graph_metrics.recomputed",
+        extra={
+            "organization_id": organization_id,
+            "nodes": index.node_count,
+            "changed": len(changes),
+            "elapsed_ms": round((time.perf_counter() - started) * 1000, 1),
+        },
+    )
+    return len(changes)
+
+
+def write_metrics(session: Session, values: Sequence[tuple[int, float, float]]) -> None:
+    """Store ``(node_id, pagerank, betweenness)`` triples with one ``UPDATE`` per chunk."""
+
+    for start in range(0, len(values), _WRITE_CHUNK):
+        chunk = values[start : start + _WRITE_CHUNK]
+        session.execute(
+            update(Node)
+            .where(Node.id.in_([node_id for node_id, _, _ in chunk]))
+            .values(
+                pagerank=case({node_id: rank for node_id, rank, _ in chunk}, value=Node.id),
+                betweenness=case({node_id: score for node_id, _, score in chunk}, value=Node.id),
+            )
+            .execution_options(synchronize_session="fetch")
+        )
+
+
+class MetricsScheduler:
+    """Recomputes centrality in a background thread after the graph structure changes.
+
+    Committed changes that add, remove or re-type edges, or delete nodes, mark their
+    organization; a marked organization is recomputed ``delay`` seconds after it was first
+    marked, so a burst of edits costs one run. Changes made during a run mark it again.
+    """
+
+    def __init__(self, delay: float, session_factory: Callable[[], Session] | None = None) -> None:
+        self._delay = delay
+        self._session_factory = session_factory
+        self._condition = threading.Condition()
+        # organization id -> monotonic time it was first marked
+        self._pending: dict[int, float] = {}
+        self._thread: threading.Thread | None = None
+        self._stopping = False
+
+    def apply_change(self, change_event: graph_changes.GraphChangeEvent) -> None:
+        if any(
+            entity_type == graph_changes.EDGE
+            or (entity_type == graph_changes.NODE and action == GraphChangeAction.DELETE)
+            for entity_type, _, action in change_event.changes
+        ):
+            with self._condition:
+                self._pending.setdefault(change_event.organization_id, time.monotonic())
+                self._condition.notify()
+
+    def pending(self) -> list[int]:
+        with self._condition:
+            return sorted(self._pending)
+
+    def clear(self) -> None:
+        with self._condition:
+            self._pending.clear()
+
+    def start(self) -> None:
+        if self._thread is not None:
+            return
+        if self._session_factory is None:
+            from app.db.session import SessionLocal
+
+            self._session_factory = SessionLocal
+        self._stopping = False
+        self._thread = threading.Thread(target=self._run, name="graph-metrics", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        thread = self._thread
+        if thread is None:
+            return
+        with self._condition:
+            self._stopping = True
+            self._condition.notify()
+        thread.join()
+        self._thread = None
+
+    def _due(self) -> list[int]:
+        now = time.monotonic()
+        due = [
+            organization_id
+            for organization_id, marked in self._pending.items()
+            if now - marked >= self._delay
+        ]
+        for organization_id in due:
+            del self._pending[organization_id]
+        return due
+
+    def _run(self) -> None:
+        while True:
+            with self._condition:
+                due = self._due()
+                while not due and not self._stopping:
+                    waits = [self._delay - (time.monotonic() - t) for t in self._pending.values()]
+                    self._condition.wait(timeout=max(min(waits), 0.0) if waits else None)
+                    due = self._due()
+                if self._stopping:
+                    return
+            for organization_id in due:
+                try:
+                    with self._session_factory() as session:
+                        recompute(session, organization_id)
+                except Exception:  # pragma: no cover - a failed run must not stop the worker
+                    logger.exception(
+                        "graph_metrics.failed", extra={"organization_id": organization_id}
+                    )
+
+
+scheduler = MetricsScheduler(delay=settings.graph_metrics_delay_seconds)
+
+graph_changes.add_listener(scheduler.apply_change)
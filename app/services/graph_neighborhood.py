@@ -0,0 +1,115 @@
+from __future__ import annotations
+
+from collections.abc import Collection, Sequence
+from dataclasses import dataclass
+from typing import Any
+
+from sqlalchemy import Row, select, union
+from sqlalchemy.orm import Session
+
+from app.models import Edge
+from app.services.graph_json import EDGE_COLUMNS
+
+# The frontier and the visited set are bound as ``IN`` parameters, so the node cap also
+# keeps every statement well under SQLite's variable limit.
+MAX_NODES = 1000
+MAX_HOPS = 6
+
+
+@dataclass(frozen=True)
+class Neighborhood:
+    # Node id -> number of hops from the start node (0 for the start node itself), in the
+    # order the nodes were reached.
+    depths: dict[int, int]
+    # Whether the node cap cut the expansion short.
+    truncated: bool
+
+
+def expand(
+    session: Session,
+    node_id: int,
+    *,
+    hops: int,
+    limit: int,
+    relation_types: Collection[str] | None = None,
+) -> Neighborhood:
+    """Nodes within ``hops`` edges of ``node_id``, ignoring edge direction.
+
+    Each hop is one query over the indexed ``source_node_id``/``target_node_id`` columns:
+    the unvisited neighbours of the current frontier, lowest ids first, at most as many as
+    the cap still allows. Once ``limit`` nodes are collected the expansion stops, so the
+    cost is bounded by the cap rather than by the size of the graph.
+    """
+
+    depths = {node_id: 0}
+    frontier = [node_id]
+    truncated = False
+    for depth in range(1, hops + 1):
+        if not frontier:
+            break
+        remaining = limit - len(depths)
+        if remaining <= 0:
+            truncated = _has_unvisited_neighbour(session, frontier, depths, relation_types)
+            break
+        outgoing = select(Edge.target_node_id.label("node_id")).where(
+            Edge.source_node_id.in_(frontier)
+        )
+        incoming = select(Edge.source_node_id.label("node_id")).where(
+            Edge.target_node_id.in_(frontier)
+        )
+        if relation_types:
+            outgoing = outgoing.where(Edge.relation_type.in_(relation_types))
+            incoming = incoming.where(Edge.relation_type.in_(relation_types))
+        reached = union(outgoing, incoming).subquery()
+        found = list(
+            session.scalars(
+                select(reached.c.node_id)
+                .where(reached.c.node_id.not_in(list(depths)))
+                .order_by(reached.c.node_id)
+                .limit(remaining + 1)
+            )
+        )
+        if len(found) > remaining:
+            found = found[:remaining]
+            truncated = True
+        for neighbour in found:
+            depths[neighbour] = depth
+        frontier = found
+        if truncated:
+            break
+    return Neighborhood(depths=depths, truncated=truncated)
+
+
+def _has_unvisited_neighbour(
+    session: Session,
+    frontier: Sequence[int],
+    visited: Collection[int],
+    relation_types: Collection[str] | None,
+) -> bool:
+    visited_ids = list(visited)
+    query = select(Edge.id).where(
+        (Edge.source_node_id.in_(frontier) & Edge.target_node_id.not_in(visited_ids))
+        | (Edge.target_node_id.in_(frontier) & Edge.source_node_id.not_in(visited_ids))
+    )
+    if relation_types:
+        query = query.where(Edge.relation_type.in_(relation_types))
+    return session.scalar(query.limit(1)) is not None
+
+
+def induced_edges(
+    session: Session,
+    node_ids: Collection[int],
+    relation_types: Collection[str] | None = None,
+) -> list[Row[Any]]:
+    """``EDGE_COLUMNS`` rows of the edges with both ends in ``node_ids``, by id."""
+
+    ids = list(node_ids)
+    query = (
+        select(*EDGE_COLUMNS)
+        .where(Edge.source_node_id.in_(ids))
+        .where(Edge.target_node_id.in_(ids))
+        .order_by(Edge.id)
+    )
+    if relation_types:
+        query = query.where(Edge.relation_type.in_(relation_types))
+    return list(session.execute(query))
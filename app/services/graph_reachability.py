@@ -0,0 +1,388 @@
+from __future__ import annotations
+
+import logging
+import threading
+import time
+from collections import OrderedDict, deque
+from itertools import pairwise
+from typing import Any
+
+from sqlalchemy import Row, and_, or_, select
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.models import Edge, GraphChangeAction
+from app.services import graph_changes, graph_index
+from app.services.graph_index import FEEDING_RELATIONS, AdjacencyIndex
+from app.services.graph_json import EDGE_COLUMNS
+from app.services.graph_topology import strongly_connected_components
+
+logger = logging.getLogger(__name__)
+
+
+def needs(source_id: int, target_id: int, relation_type: str) -> tuple[int, int]:
+    """``(needing, needed)`` node ids of an edge, in the failure sense of ``graph_index``."""
+
+    if relation_type in FEEDING_RELATIONS:
+        return target_id, source_id
+    return source_id, target_id
+
+
+class ReachabilityIndex:
+    """Which nodes of one organization need which others, directly or transitively.
+
+    The "needs" graph (see ``FEEDING_RELATIONS``) is condensed into its strongly connected
+    components; every component keeps the set of components it reaches as an integer
+    bitset (bit ``c`` for component ``c``, itself excluded), so a reachability check is
+    one dictionary lookup per node and one bit test. Edge insertions and deletions update
+    the bitsets of the affected components in place; a change that merges or may split a
+    component reports that the index has to be rebuilt instead.
+    """
+
+    def __init__(
+        self,
+        organization_id: int,
+        version: int,
+        component_of: dict[int, int],
+        needed: dict[int, list[int]],
+        successors: list[dict[int, int]],
+        reach: list[int],
+    ) -> None:
+        self.organization_id = organization_id
+        self.version = version
+        # node id -> component
+        self._component_of = component_of
+        # node id -> node ids it needs directly, one entry per edge
+        self._needed = needed
+        # component -> {successor component: number of edges between the two}
+        self._successors = successors
+        # component -> bitset of the components it reaches
+        self._reach = reach
+        self._lock = threading.Lock()
+
+    @classmethod
+    def build(cls, index: AdjacencyIndex) -> ReachabilityIndex:
+        csr = index.requires
+        # Tarjan emits a component only after every component it reaches, so the bitsets
+        # can be filled in emission order.
+        components = strongly_connected_components(index, csr)
+        position_component = [0] * index.node_count
+        for component, members in enumerate(components):
+            for position in members:
+                position_component[position] = component
+
+        offsets = csr.offsets
+        neighbours = csr.neighbours
+        node_ids = index.node_ids
+        successors: list[dict[int, int]] = [{} for _ in components]
+        reach = [0] * len(components)
+        for component, members in enumerate(components):
+            links = successors[component]
+            for position in members:
+                for slot in range(offsets[position], offsets[position + 1]):
+                    other = position_component[neighbours[slot]]
+                    if other != component:
+                        links[other] = links.get(other, 0) + 1
+            bits = 0
+            for other in links:
+                bits |= reach[other] | (1 << other)
+            reach[component] = bits
+
+        return cls(
+            organization_id=index.organization_id,
+            version=index.version,
+            component_of={
+                node_ids[position]: component
+                for position, component in enumerate(position_component)
+            },
+            needed={
+                node_ids[position]: [
+                    node_ids[neighbour]
+                    for neighbour in neighbours[offsets[position] : offsets[position + 1]]
+                ]
+                for position in range(index.node_count)
+            },
+            successors=successors,
+            reach=reach,
+        )
+
+    @property
+    def component_count(self) -> int:
+        return len(self._reach)
+
+    def __contains__(self, node_id: int) -> bool:
+        return node_id in self._component_of
+
+    def reachable(self, source_id: int, target_id: int) -> bool:
+        """Whether ``source_id`` needs ``target_id``; raises ``KeyError`` for unknown nodes."""
+
+        with self._lock:
+            return self._reachable(self._component_of[source_id], self._component_of[target_id])
+
+    def _reachable(self, source: int, target: int) -> bool:
+        return source == target or bool(self._reach[source] >> target & 1)
+
+    def path(self, source_id: int, target_id: int) -> list[int] | None:
+        """Shortest chain of node ids from ``source_id`` to ``target_id`` along "needs" edges.
+
+        Breadth-first, but only through nodes that still reach the target according to the
+        bitsets, so the search never leaves the corridor between the two nodes. ``None``
+        when there is no such chain; raises ``KeyError`` for unknown nodes.
+        """
+
+        with self._lock:
+            component_of = self._component_of
+            target = component_of[target_id]
+            if not self._reachable(component_of[source_id], target):
+                return None
+            if source_id == target_id:
+                return [source_id]
+            previous = {source_id: source_id}
+            queue = deque([source_id])
+            while queue:
+                current = queue.popleft()
+                for neighbour in self._needed.get(current, ()):
+                    if neighbour in previous or not self._reachable(
+                        component_of[neighbour], target
+                    ):
+                        continue
+                    previous[neighbour] = current
+                    if neighbour == target_id:
+                        chain = [neighbour]
+                        while chain[-1] != source_id:
+                            chain.append(previous[chain[-1]])
+                        return chain[::-1]
+                    queue.append(neighbour)
+            return None  # pragma: no cover - the bitsets promised a path
+
+    def add_node(self, node_id: int) -> None:
+        with self._lock:
+            if node_id not in self._component_of:
+                self._component_of[node_id] = len(self._reach)
+                self._needed[node_id] = []
+                self._successors.append({})
+                self._reach.append(0)
+
+    def add_edge(self, source_id: int, target_id: int, relation_type: str) -> bool:
+        """Account for a new edge; ``False`` when the index has to be rebuilt instead."""
+
+        needing, needed = needs(source_id, target_id, relation_type)
+        with self._lock:
+            first = self._component_of.get(needing)
+            second = self._component_of.get(needed)
+            if first is None or second is None:
+                return False
+            if first != second and self._reach[second] >> first & 1:
+                # The edge closes a cycle and merges components.
+                return False
+            self._needed[needing].append(needed)
+            if first == second:
+                return True
+            links = self._successors[first]
+            links[second] = links.get(second, 0) + 1
+            if self._reach[first] >> second & 1:
+                return True
+            gained = self._reach[second] | (1 << second)
+            bit = 1 << first
+            for component, bits in enumerate(self._reach):
+                if component == first or bits & bit:
+                    self._reach[component] = bits | gained
+            return True
+
+    def remove_edge(self, source_id: int, target_id: int, relation_type: str) -> bool:
+        """Account for a deleted edge; ``False`` when the index has to be rebuilt instead."""
+
+        needing, needed = needs(source_id, target_id, relation_type)
+        with self._lock:
+            first = self._component_of.get(needing)
+            second = self._component_of.get(needed)
+            if first is None or second is None or first == second:
+                # Removing an edge inside a component may split it.
+                return False
+            targets = self._needed[needing]
+            links = self._successors[first]
+            if needed not in targets or second not in links:
+                return False
+            targets.remove(needed)
+            links[second] -= 1
+            if links[second]:
+                return True
+            del links[second]
+
+            # Only the component and the ones reaching it can lose reachability. A component
+            # reaches strictly fewer components than any of its ancestors (the condensation
+            # is acyclic), so ordering by the old bit counts puts successors first.
+            bit = 1 << first
+            affected = [
+                component
+                for component, bits in enumerate(self._reach)
+                if component == first or bits & bit
+            ]
+            affected.sort(key=lambda component: self._reach[component].bit_count())
+            for component in affected:
+                bits = 0
+                for other in self._successors[component]:
+                    bits |= self._reach[other] | (1 << other)
+                self._reach[component] = bits
+            return True
+
+
+def path_edges(session: Session, chain: list[int]) -> list[Row[Any]]:
+    """``EDGE_COLUMNS`` rows linking consecutive nodes of ``chain``, lowest edge id per step."""
+
+    steps = list(pairwise(chain))
+    if not steps:
+        return []
+    feeding = list(FEEDING_RELATIONS)
+    rows = session.execute(
+        select(*EDGE_COLUMNS)
+        .where(
+            or_(
+                *(
+                    or_(
+                        and_(
+                            Edge.source_node_id == needing,
+                            Edge.target_node_id == needed,
+                            Edge.relation_type.not_in(feeding),
+                        ),
+                        and_(
+                            Edge.source_node_id == needed,
+                            Edge.target_node_id == needing,
+                            Edge.relation_type.in_(feeding),
+                        ),
+                    )
+                    for needing, needed in steps
+                )
+            )
+        )
+        .order_by(Edge.id)
+    )
+    by_step: dict[tuple[int, int], Row[Any]] = {}
+    for row in rows:
+        step = needs(row.source_node_id, row.target_node_id, row.relation_type)
+        by_step.setdefault(step, row)
+    return [by_step[step] for step in steps if step in by_step]
+
+
+class ReachabilityIndexCache:
+    """Per-organization :class:`ReachabilityIndex` cache.
+
+    Committed changes that only touch nodes and spheres extend the cached index to the new
+    version (new nodes join as components of their own). Edge changes are applied by the
+    graph routes through :meth:`add_edge`/:meth:`remove_edge`; an index that misses a
+    version, for instance after a batch or an import, is rebuilt on the next request.
+    """
+
+    def __init__(self, max_organizations: int) -> None:
+        self._max_organizations = max_organizations
+        self._lock = threading.Lock()
+        self._entries: OrderedDict[int, ReachabilityIndex] = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.updates = 0
+
+    def get(self, session: Session, organization_id: int, version: int) -> ReachabilityIndex:
+        with self._lock:
+            entry = self._entries.get(organization_id)
+            if entry is not None and entry.version == version:
+                self._entries.move_to_end(organization_id)
+                self.hits += 1
+                return entry
+            self.misses += 1
+
+        started = time.perf_counter()
+        adjacency = graph_index.index_cache.get(session, organization_id, version)
+        reachability = ReachabilityIndex.build(adjacency)
+        logger.info(
+            "graph_reachability.built",
+            extra={
+                "organization_id": organization_id,
+                "version": version,
+                "components": reachability.component_count,
+                "elapsed_ms": round((time.perf_counter() - started) * 1000, 1),
+            },
+        )
+        if self._max_organizations <= 0:
+            return reachability
+        with self._lock:
+            entry = self._entries.get(organization_id)
+            if entry is None or entry.version <= version:
+                self._entries[organization_id] = reachability
+                self._entries.move_to_end(organization_id)
+            while len(self._entries) > self._max_organizations:
+                self._entries.popitem(last=False)
+        return reachability
+
+    def add_edge(
+        self,
+        organization_id: int,
+        version: int,
+        source_id: int,
+        target_id: int,
+        relation_type: str,
+    ) -> None:
+        """Apply an edge created at ``version`` (the version its change was recorded under)."""
+
+        self._update(organization_id, version, "add_edge", source_id, target_id, relation_type)
+
+    def remove_edge(
+        self,
+        organization_id: int,
+        version: int,
+        source_id: int,
+        target_id: int,
+        relation_type: str,
+    ) -> None:
+        self._update(organization_id, version, "remove_edge", source_id, target_id, relation_type)
+
+    def _update(
+        self,
+        organization_id: int,
+        version: int,
+        method: str,
+        source_id: int,
+        target_id: int,
+        relation_type: str,
+    ) -> None:
+        with self._lock:
+            entry = self._entries.get(organization_id)
+            if entry is None or entry.version + 1 != version:
+                return
+            if getattr(entry, method)(source_id, target_id, relation_type):
+                entry.version = version
+                self.updates += 1
+            else:
+                del self._entries[organization_id]
+
+    def apply_change(self, change_event: graph_changes.GraphChangeEvent) -> None:
+        with self._lock:
+            entry = self._entries.get(change_event.organization_id)
+            if entry is None or entry.version + 1 != change_event.version:
+                return
+            if all(
+                entity_type in (graph_changes.NODE, graph_changes.SPHERE)
+                and action == GraphChangeAction.UPSERT
+                for entity_type, _, action in change_event.changes
+            ):
+                for entity_type, entity_id, _ in change_event.changes:
+                    if entity_type == graph_changes.NODE:
+                        entry.add_node(entity_id)
+                entry.version = change_event.version
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> dict[str, int]:
+        with self._lock:
+            return {
+                "organizations": len(self._entries),
+                "hits": self.hits,
+                "misses": self.misses,
+                "updates": self.updates,
+            }
+
+
+index_cache = ReachabilityIndexCache(max_organizations=settings.graph_index_max_organizations)
+
+graph_changes.add_listener(index_cache.apply_change)
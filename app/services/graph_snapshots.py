@@ -0,0 +1,481 @@
+from __future__ import annotations
+
+import hashlib
+import logging
+import struct
+from collections.abc import Iterable, Iterator, Mapping, Sequence
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Any
+
+from fastapi import HTTPException, status
+from pydantic_core import from_json
+from sqlalchemy import delete, insert, select
+from sqlalchemy.orm import Session, selectinload
+
+from app.core.config import settings
+from app.models import Edge, GraphChunk, GraphSnapshot, Node, Sphere
+from app.schemas.organization import SphereRead
+from app.services import graph_json, graph_versions
+
+logger = logging.getLogger(__name__)
+
+SPHERES = "spheres"
+NODES = "nodes"
+EDGES = "edges"
+KINDS = (SPHERES, NODES, EDGES)
+
+# Entities are indexed by a radix tree over their ids: a leaf page lists the digests of
+# ``FANOUT`` consecutive ids, every level above groups ``FANOUT`` pages of the level below,
+# and ``_LEVELS`` levels lead to the root page. A change rewrites one page per level, so a
+# snapshot adds its changed entities plus a handful of small pages.
+FANOUT = 64
+_LEVELS = 4
+# Page entry: the id (or id prefix) and the raw SHA-256 of the chunk it points to.
+_ENTRY = struct.Struct("<Q32s")
+_BATCH = 500
+# Maintained by triggers or recomputed in the background. Keeping them out of the stored
+# records means a centrality pass does not rewrite every node; degrees are derived from
+# the snapshot's edges when it is read.
+_DERIVED_NODE_FIELDS = ("in_degree", "out_degree", "degrees", "pagerank", "betweenness")
+
+
+@dataclass(frozen=True)
+class GraphState:
+    # Root page digest per kind.
+    roots: dict[str, str]
+    counts: dict[str, int]
+    # Every chunk of the state by digest, stored or not.
+    chunks: dict[str, bytes]
+
+
+def _digest(data: bytes) -> str:
+    return hashlib.sha256(data).hexdigest()
+
+
+def _pack(entries: Iterable[tuple[int, str]]) -> bytes:
+    return b"".join(_ENTRY.pack(key, bytes.fromhex(digest)) for key, digest in entries)
+
+
+def _unpack(data: bytes) -> list[tuple[int, str]]:
+    return [(key, digest.hex()) for key, digest in _ENTRY.iter_unpack(data)]
+
+
+def _batches(items: Sequence[str]) -> Iterator[Sequence[str]]:
+    for start in range(0, len(items), _BATCH):
+        yield items[start : start + _BATCH]
+
+
+def _build_tree(records: Mapping[int, bytes], chunks: dict[str, bytes]) -> str:
+    """Root digest of the page tree over ``records``; every chunk is added to ``chunks``."""
+
+    entries = []
+    for entity_id in sorted(records):
+        data = records[entity_id]
+        digest = _digest(data)
+        chunks[digest] = data
+        entries.append((entity_id, digest))
+    for _ in range(_LEVELS):
+        pages: dict[int, list[tuple[int, str]]] = {}
+        for key, digest in entries:
+            pages.setdefault(key // FANOUT, []).append((key, digest))
+        entries = []
+        for prefix, page_entries in pages.items():
+            page = _pack(page_entries)
+            digest = _digest(page)
+            chunks[digest] = page
+            entries.append((prefix, digest))
+    root = _pack(entries)
+    digest = _digest(root)
+    chunks[digest] = root
+    return digest
+
+
+def _entity_records(session: Session, organization_id: int) -> dict[str, dict[int, bytes]]:
+    spheres = session.scalars(
+        select(Sphere)
+        .options(selectinload(Sphere.groups))
+        .where(Sphere.organization_id == organization_id)
+    )
+    records: dict[str, dict[int, bytes]] = {
+        SPHERES: {
+            sphere.id: graph_json.encode(SphereRead.model_validate(sphere).model_dump(mode="json"))
+            for sphere in spheres
+        },
+        NODES: {},
+        EDGES: {},
+    }
+    nodes = session.execute(
+        select(*graph_json.NODE_COLUMNS)
+        .join(Sphere, Node.sphere_id == Sphere.id)
+        .where(Sphere.organization_id == organization_id)
+    )
+    for row in nodes:
+        record = graph_json.node_record(row, by_alias=False)
+        for name in _DERIVED_NODE_FIELDS:
+            del record[name]
+        records[NODES][record["id"]] = graph_json.encode(record)
+    edges = session.execute(
+        select(*graph_json.EDGE_COLUMNS)
+        .join(Sphere, Edge.sphere_id == Sphere.id)
+        .where(Sphere.organization_id == organization_id)
+    )
+    for row in edges:
+        records[EDGES][row.id] = graph_json.encode(graph_json.edge_record(row, by_alias=False))
+    return records
+
+
+def capture(session: Session, organization_id: int) -> GraphState:
+    """Chunk trees of the organization's current graph, without storing anything."""
+
+    chunks: dict[str, bytes] = {}
+    roots = {}
+    counts = {}
+    for kind, records in _entity_records(session, organization_id).items():
+        roots[kind] = _build_tree(records, chunks)
+        counts[kind] = len(records)
+    return GraphState(roots=roots, counts=counts, chunks=chunks)
+
+
+def _store_trees(session: Session, roots: Iterable[str], chunks: Mapping[str, bytes]) -> int:
+    """Write the chunks of the trees under ``roots`` that are not stored yet.
+
+    A stored page always comes with its whole subtree (a tree is written in one transaction
+    and only unreachable chunks are collected), so the walk descends only into new pages
+    and its cost follows the number of changes rather than the size of the graph.
+    """
+
+    written = 0
+    frontier = set(roots)
+    for depth in range(_LEVELS + 2):
+        digests = list(frontier)
+        existing: set[str] = set()
+        for batch in _batches(digests):
+            existing.update(
+                session.scalars(select(GraphChunk.digest).where(GraphChunk.digest.in_(batch)))
+            )
+        new = [digest for digest in digests if digest not in existing]
+        if new:
+            session.execute(
+                insert(GraphChunk), [{"digest": digest, "data": chunks[digest]} for digest in new]
+            )
+        written += len(new)
+        if depth <= _LEVELS:
+            frontier = {child for digest in new for _, child in _unpack(chunks[digest])}
+    return written
+
+
+def _load_chunks(
+    session: Session, digests: Iterable[str], pending: Mapping[str, bytes] | None = None
+) -> dict[str, bytes]:
+    found: dict[str, bytes] = {}
+    missing = []
+    for digest in set(digests):
+        if pending is not None and digest in pending:
+            found[digest] = pending[digest]
+        else:
+            missing.append(digest)
+    for batch in _batches(missing):
+        found.update(
+            session.execute(
+                select(GraphChunk.digest, GraphChunk.data).where(GraphChunk.digest.in_(batch))
+            ).all()
+        )
+    return found
+
+
+def roots(snapshot: GraphSnapshot) -> dict[str, str]:
+    return {
+        SPHERES: snapshot.spheres_root,
+        NODES: snapshot.nodes_root,
+        EDGES: snapshot.edges_root,
+    }
+
+
+def take_snapshot(
+    session: Session,
+    organization_id: int,
+    *,
+    name: str | None = None,
+    automatic: bool = False,
+    user_id: int | None = None,
+) -> GraphSnapshot:
+    """Save the organization's current graph in the caller's transaction.
+
+    Only chunks that no earlier snapshot produced are written, so the storage a snapshot
+    takes grows with what changed since, not with the size of the graph.
+    """
+
+    version = graph_versions.current_version(session, organization_id)
+    state = capture(session, organization_id)
+    written = _store_trees(session, state.roots.values(), state.chunks)
+    snapshot = GraphSnapshot(
+        organization_id=organization_id,
+        name=name,
+        automatic=automatic,
+        version=version,
+        spheres_root=state.roots[SPHERES],
+        nodes_root=state.roots[NODES],
+        edges_root=state.roots[EDGES],
+        sphere_count=state.counts[SPHERES],
+        node_count=state.counts[NODES],
+        edge_count=state.counts[EDGES],
+        created_by_id=user_id,
+    )
+    session.add(snapshot)
+    session.flush()
+    logger.info(
+        "graph_snapshot.taken",
+        extra={
+            "organization_id": organization_id,
+            "snapshot_id": snapshot.id,
+            "version": version,
+            "chunks": len(state.chunks),
+            "chunks_written": written,
+        },
+    )
+    return snapshot
+
+
+def take_automatic(
+    session: Session, organization_id: int, *, user_id: int | None = None
+) -> GraphSnapshot | None:
+    """Automatic snapshot of the current graph; older automatic ones beyond the newest
+    ``graph_snapshot_keep_automatic`` are deleted.
+
+    Reuses the latest automatic snapshot when the graph has not changed since; ``None``
+    when automatic snapshots are disabled.
+    """
+
+    keep = settings.graph_snapshot_keep_automatic
+    if keep <= 0:
+        return None
+    automatic = (
+        select(GraphSnapshot)
+        .where(GraphSnapshot.organization_id == organization_id)
+        .where(GraphSnapshot.automatic.is_(True))
+        .order_by(GraphSnapshot.id.desc())
+    )
+    latest = session.scalar(automatic.limit(1))
+    if latest is not None and latest.version == graph_versions.current_version(
+        session, organization_id
+    ):
+        return latest
+    snapshot = take_snapshot(session, organization_id, automatic=True, user_id=user_id)
+    stale = session.scalars(automatic.offset(keep)).all()
+    if stale:
+        for old in stale:
+            session.delete(old)
+        session.flush()
+        collect_garbage(session)
+    return snapshot
+
+
+def delete_snapshot(session: Session, snapshot: GraphSnapshot) -> int:
+    """Delete ``snapshot`` and the chunks only it referred to; returns the chunks removed."""
+
+    session.delete(snapshot)
+    session.flush()
+    return collect_garbage(session)
+
+
+def collect_garbage(session: Session) -> int:
+    """Mark the chunks reachable from any snapshot and delete the rest.
+
+    Identical subtrees share a digest, so each is walked once however many snapshots hold
+    it and the walk is proportional to the stored chunks, not to the snapshot count.
+    """
+
+    live: set[str] = set()
+    frontier: set[str] = set()
+    for row in session.execute(
+        select(GraphSnapshot.spheres_root, GraphSnapshot.nodes_root, GraphSnapshot.edges_root)
+    ):
+        frontier.update(row)
+    for _ in range(_LEVELS + 1):
+        frontier -= live
+        live |= frontier
+        pages = _load_chunks(session, frontier)
+        frontier = {digest for page in pages.values() for _, digest in _unpack(page)}
+    live |= frontier
+
+    stale = [digest for digest in session.scalars(select(GraphChunk.digest)) if digest not in live]
+    for batch in _batches(stale):
+        session.execute(delete(GraphChunk).where(GraphChunk.digest.in_(batch)))
+    return len(stale)
+
+
+def resolve(session: Session, organization_id: int, ref: str) -> GraphSnapshot:
+    """Snapshot of the organization by id (a number) or by name."""
+
+    ref = ref.strip()
+    query = select(GraphSnapshot).where(GraphSnapshot.organization_id == organization_id)
+    if ref.isdigit():
+        query = query.where(GraphSnapshot.id == int(ref))
+    else:
+        query = query.where(GraphSnapshot.name == ref)
+    snapshot = session.scalar(query)
+    if snapshot is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Snapshot not found")
+    return snapshot
+
+
+def _records(
+    session: Session, root: str, pending: Mapping[str, bytes] | None = None
+) -> list[dict[str, Any]]:
+    """Records of one tree, by id."""
+
+    entries = [(0, root)]
+    for _ in range(_LEVELS + 1):
+        pages = _load_chunks(session, [digest for _, digest in entries], pending)
+        entries = [entry for _, digest in entries for entry in _unpack(pages[digest])]
+    data = _load_chunks(session, [digest for _, digest in entries], pending)
+    return [from_json(data[digest]) for _, digest in entries]
+
+
+def _degrees(edges: Iterable[dict[str, Any]]) -> dict[int, dict[str, dict[str, int]]]:
+    # Same shape as the ``nodes.degrees`` column the edge triggers maintain.
+    degrees: dict[int, dict[str, dict[str, int]]] = {}
+    for edge in edges:
+        for node_id, direction in ((edge["source_node_id"], "out"), (edge["target_node_id"], "in")):
+            counts = degrees.setdefault(node_id, {}).setdefault(
+                edge["relation_type"], {"in": 0, "out": 0}
+            )
+            counts[direction] += 1
+    return degrees
+
+
+def _node_row(record: dict[str, Any], degrees: dict[str, dict[str, int]]) -> tuple[Any, ...]:
+    # In ``graph_json.NODE_COLUMNS`` order, so the live map renderers accept it.
+    return (
+        record["label"],
+        record["node_type"],
+        record["status"],
+        record["summary"],
+        record["position"],
+        record["metadata"],
+        record["links"],
+        record["owners"],
+        record["id"],
+        record["sphere_id"],
+        datetime.fromisoformat(record["created_at"]),
+        sum(counts["in"] for counts in degrees.values()),
+        sum(counts["out"] for counts in degrees.values()),
+        degrees,
+        None,
+        None,
+    )
+
+
+def _edge_row(record: dict[str, Any]) -> tuple[Any, ...]:
+    # In ``graph_json.EDGE_COLUMNS`` order.
+    return (
+        record["id"],
+        record["sphere_id"],
+        record["source_node_id"],
+        record["target_node_id"],
+        record["relation_type"],
+        record["metadata"],
+        datetime.fromisoformat(record["created_at"]),
+    )
+
+
+def load_map(
+    session: Session,
+    snapshot: GraphSnapshot,
+    *,
+    sphere_id: int | None = None,
+    node_type: str | None = None,
+    status_value: str | None = None,
+) -> tuple[list[dict[str, Any]], list[tuple[Any, ...]], list[tuple[Any, ...]]]:
+    """Spheres, node rows and edge rows of ``snapshot``, filtered like the live map query.
+
+    Rows follow ``NODE_COLUMNS``/``EDGE_COLUMNS`` so the map renderers can take them as they
+    are. Degrees are counted from the snapshot's edges; centrality is not kept (``None``).
+    """
+
+    spheres = _records(session, snapshot.spheres_root)
+    node_records = _records(session, snapshot.nodes_root)
+    edge_records = _records(session, snapshot.edges_root)
+    degrees = _degrees(edge_records)
+
+    nodes = [
+        _node_row(record, degrees.get(record["id"], {}))
+        for record in node_records
+        if (sphere_id is None or record["sphere_id"] == sphere_id)
+        and (node_type is None or record["node_type"] == node_type)
+        and (status_value is None or record["status"] == status_value)
+    ]
+    nodes.sort(key=lambda row: (row[10], row[8]), reverse=True)
+    kept = {row[8] for row in nodes}
+    edges = [
+        _edge_row(record)
+        for record in edge_records
+        if (sphere_id is None or record["sphere_id"] == sphere_id)
+        and record["source_node_id"] in kept
+        and record["target_node_id"] in kept
+    ]
+    return spheres, nodes, edges
+
+
+def _changed_entries(
+    session: Session, before: str, after: str, pending: Mapping[str, bytes] | None
+) -> list[tuple[int, str | None, str | None]]:
+    """``(id, digest before, digest after)`` of the entities that differ between two trees.
+
+    Both trees are walked level by level and subtrees with equal digests are skipped, so
+    the pages read are proportional to the number of changes.
+    """
+
+    level: list[tuple[int, str | None, str | None]] = [(0, before, after)]
+    for _ in range(_LEVELS + 1):
+        level = [item for item in level if item[1] != item[2]]
+        pages = _load_chunks(
+            session,
+            [digest for _, left, right in level for digest in (left, right) if digest is not None],
+            pending,
+        )
+        deeper = []
+        for _, left, right in level:
+            left_entries = dict(_unpack(pages[left])) if left is not None else {}
+            right_entries = dict(_unpack(pages[right])) if right is not None else {}
+            for key in sorted(left_entries.keys() | right_entries.keys()):
+                deeper.append((key, left_entries.get(key), right_entries.get(key)))
+        level = deeper
+    return [item for item in level if item[1] != item[2]]
+
+
+def diff(
+    session: Session, source: GraphSnapshot, target: GraphSnapshot | None = None
+) -> dict[str, dict[str, list[Any]]]:
+    """Entities added, removed and changed from ``source`` to ``target``.
+
+    Without ``target`` the snapshot is compared with the current graph, which is captured
+    in memory first.
+    """
+
+    pending: dict[str, bytes] | None = None
+    if target is None:
+        state = capture(session, source.organization_id)
+        target_roots, pending = state.roots, state.chunks
+    else:
+        target_roots = roots(target)
+    source_roots = roots(source)
+
+    result = {}
+    for kind in KINDS:
+        changes = _changed_entries(session, source_roots[kind], target_roots[kind], pending)
+        digests = [digest for _, left, right in changes for digest in (left, right) if digest]
+        data = _load_chunks(session, digests, pending)
+        added: list[dict[str, Any]] = []
+        removed: list[dict[str, Any]] = []
+        changed: list[dict[str, Any]] = []
+        for _, left, right in changes:
+            if left is None:
+                added.append(from_json(data[right]))
+            elif right is None:
+                removed.append(from_json(data[left]))
+            else:
+                changed.append({"before": from_json(data[left]), "after": from_json(data[right])})
+        result[kind] = {"added": added, "removed": removed, "changed": changed}
+    return result
@@ -0,0 +1,211 @@
+from __future__ import annotations
+
+from collections.abc import Collection
+from dataclasses import dataclass
+
+from sqlalchemy import literal, select
+from sqlalchemy.orm import Session
+
+from app.models import Edge
+from app.services.graph_index import FEEDING_RELATIONS, AdjacencyIndex, Csr
+
+
+@dataclass(frozen=True)
+class Topology:
+    """Strongly connected components and deploy layers, as index positions."""
+
+    # Components that contain a cycle: more than one node, or a node with a self-loop.
+    cycles: list[list[int]]
+    # Every node exactly once; a node only depends on nodes in earlier layers, except for
+    # members of its own cyclic component, which share its layer.
+    layers: list[list[int]]
+
+    @property
+    def acyclic(self) -> bool:
+        return not self.cycles
+
+
+def strongly_connected_components(
+    index: AdjacencyIndex,
+    csr: Csr,
+    *,
+    relations: frozenset[int] | None = None,
+    members: bytearray | None = None,
+) -> list[list[int]]:
+    """Tarjan's algorithm without recursion, in reverse topological order of ``csr``.
+
+    Only edges with a relation code in ``relations`` (all when ``None``) between positions
+    set in ``members`` (all when ``None``) are considered.
+    """
+
+    count = index.node_count
+    offsets = csr.offsets
+    neighbours = csr.neighbours
+    codes = csr.relations
+    order = [-1] * count
+    low = [0] * count
+    on_stack = bytearray(count)
+    stack: list[int] = []
+    components: list[list[int]] = []
+    counter = 0
+
+    for root in range(count):
+        if order[root] != -1 or (members is not None and not members[root]):
+            continue
+        order[root] = low[root] = counter
+        counter += 1
+        stack.append(root)
+        on_stack[root] = 1
+        work = [(root, offsets[root])]
+        while work:
+            position, slot = work[-1]
+            end = offsets[position + 1]
+            descended = False
+            while slot < end:
+                neighbour = neighbours[slot]
+                code = codes[slot]
+                slot += 1
+                if relations is not None and code not in relations:
+                    continue
+                if members is not None and not members[neighbour]:
+                    continue
+                if order[neighbour] == -1:
+                    work[-1] = (position, slot)
+                    order[neighbour] = low[neighbour] = counter
+                    counter += 1
+                    stack.append(neighbour)
+                    on_stack[neighbour] = 1
+                    work.append((neighbour, offsets[neighbour]))
+                    descended = True
+                    break
+                if on_stack[neighbour] and order[neighbour] < low[position]:
+                    low[position] = order[neighbour]
+            if descended:
+                continue
+            work.pop()
+            if work and low[position] < low[work[-1][0]]:
+                low[work[-1][0]] = low[position]
+            if low[position] == order[position]:
+                component = []
+                while True:
+                    member = stack.pop()
+                    on_stack[member] = 0
+                    component.append(member)
+                    if member == position:
+                        break
+                components.append(component)
+    return components
+
+
+def analyze(
+    index: AdjacencyIndex,
+    *,
+    relations: frozenset[int] | None = None,
+    members: bytearray | None = None,
+) -> Topology:
+    """Find cyclic components and layer the condensation in deploy order.
+
+    Edges are taken in the failure direction (``AdjacencyIndex.affects``), so layer 0 holds
+    the nodes that need nothing else and every later layer only needs earlier ones.
+    """
+
+    csr = index.affects
+    components = strongly_connected_components(index, csr, relations=relations, members=members)
+    component_of = [-1] * index.node_count
+    for component_id, component in enumerate(components):
+        for position in component:
+            component_of[position] = component_id
+
+    successors: list[list[int]] = [[] for _ in components]
+    indegree = [0] * len(components)
+    cyclic = [len(component) > 1 for component in components]
+    offsets = csr.offsets
+    neighbours = csr.neighbours
+    codes = csr.relations
+    for component_id, component in enumerate(components):
+        for position in component:
+            for slot in range(offsets[position], offsets[position + 1]):
+                if relations is not None and codes[slot] not in relations:
+                    continue
+                neighbour_component = component_of[neighbours[slot]]
+                if neighbour_component == -1:
+                    continue
+                if neighbour_component == component_id:
+                    if neighbours[slot] == position:
+                        cyclic[component_id] = True
+                    continue
+                successors[component_id].append(neighbour_component)
+                indegree[neighbour_component] += 1
+
+    layers: list[list[int]] = []
+    frontier = [component_id for component_id, degree in enumerate(indegree) if degree == 0]
+    while frontier:
+        layers.append(
+            sorted(position for component_id in frontier for position in components[component_id])
+        )
+        next_frontier = []
+        for component_id in frontier:
+            for successor in successors[component_id]:
+                indegree[successor] -= 1
+                if indegree[successor] == 0:
+                    next_frontier.append(successor)
+        frontier = next_frontier
+
+    cycles = sorted(
+        sorted(component)
+        for component_id, component in enumerate(components)
+        if cyclic[component_id]
+    )
+    return Topology(cycles=cycles, layers=layers)
+
+
+def creates_cycle(
+    session: Session,
+    source_node_id: int,
+    target_node_id: int,
+    relation_type: str,
+    acyclic_relations: Collection[str],
+    *,
+    exclude_edge_id: int | None = None,
+) -> bool:
+    """Whether a new ``source -> target`` edge closes a failure cycle of ``acyclic_relations``.
+
+    The edge makes one node need another (see ``FEEDING_RELATIONS``); that closes a cycle
+    exactly when the needed node already needs the other one, directly or transitively.
+    Only the part of the graph the needed node depends on is visited, inside the caller's
+    transaction, so pending edges of the same transaction count. ``exclude_edge_id`` leaves
+    out an edge that is being re-typed.
+    """
+
+    if relation_type not in acyclic_relations:
+        return False
+    if source_node_id == target_node_id:
+        return True
+    if relation_type in FEEDING_RELATIONS:
+        needing, needed = target_node_id, source_node_id
+    else:
+        needing, needed = source_node_id, target_node_id
+
+    feeding = [name for name in acyclic_relations if name in FEEDING_RELATIONS]
+    other = [name for name in acyclic_relations if name not in FEEDING_RELATIONS]
+    required = select(literal(needed).label("node_id")).cte("required", recursive=True)
+    steps = []
+    if other:
+        steps.append(
+            select(Edge.target_node_id)
+            .join(required, Edge.source_node_id == required.c.node_id)
+            .where(Edge.relation_type.in_(other))
+        )
+    if feeding:
+        steps.append(
+            select(Edge.source_node_id)
+            .join(required, Edge.target_node_id == required.c.node_id)
+            .where(Edge.relation_type.in_(feeding))
+        )
+    if exclude_edge_id is not None:
+        steps = [step.where(Edge.id != exclude_edge_id) for step in steps]
+    required = required.union(*steps)
+    found = session.scalar(
+        select(required.c.node_id).where(required.c.node_id == needing).limit(1)
+    )
+    return found is not None
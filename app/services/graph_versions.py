@@ -0,0 +1,77 @@
+from __future__ import annotations
+
+import hashlib
+
+from sqlalchemy import select, update
+from sqlalchemy.orm import Session
+
+from app.models import Organization
+
+
+def current_version(session: Session, organization_id: int) -> int:
+    version = session.scalar(
+        select(Organization.graph_version).where(Organization.id == organization_id)
+    )
+    return int(version or 0)
+
+
+def current_versions(session: Session, organization_id: int) -> tuple[int, int]:
+    """Graph version and centrality metrics version of the organization.
+
+    Node bodies carry ``pagerank``/``betweenness``, so their ETags depend on both.
+    """
+
+    row = session.execute(
+        select(Organization.graph_version, Organization.metrics_version).where(
+            Organization.id == organization_id
+        )
+    ).first()
+    if row is None:
+        return 0, 0
+    return int(row[0] or 0), int(row[1] or 0)
+
+
+def bump_version(session: Session, organization_id: int) -> int:
+    """Advance the organization's graph version inside the caller's transaction."""
+
+    version = session.scalar(
+        update(Organization)
+        .where(Organization.id == organization_id)
+        .values(graph_version=Organization.graph_version + 1)
+        .returning(Organization.graph_version)
+        .execution_options(synchronize_session=False)
+    )
+    return int(version or 0)
+
+
+def bump_metrics_version(session: Session, organization_id: int) -> int:
+    """Advance the version of the organization's stored centrality metrics."""
+
+    version = session.scalar(
+        update(Organization)
+        .where(Organization.id == organization_id)
+        .values(metrics_version=Organization.metrics_version + 1)
+        .returning(Organization.metrics_version)
+        .execution_options(synchronize_session=False)
+    )
+    return int(version or 0)
+
+
+def build_etag(organization_id: int, version: int, *parts: object) -> str:
+    digest = hashlib.sha1(repr(parts).encode("utf-8")).hexdigest()[:16]
+    return f'"g{organization_id}-{version}-{digest}"'
+
+
+def etag_matches(if_none_match: str | None, etag: str) -> bool:
+    if not if_none_match:
+        return False
+    for candidate in if_none_match.split(","):
+        candidate = candidate.strip()
+        if candidate == "*":
+            return True
+        if candidate.startswith("W/"):
+            candidate = candidate[2:]
+        if candidate == etag:
+            return True
+    return False
+
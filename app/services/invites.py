@@ -9,9 +9,11 @@ from sqlalchemy import select
 from sqlalchemy.orm import Session, selectinload
 
 from app.core.config import settings
-from app.models import InviteStatus, OrganizationInvite, OrganizationMember, OrganizationRole, User
+from app.models import InviteStatus, OrganizationInvite, OrganizationMember, OrganizationRole
 from app.schemas.invite import InviteCreate
 from app.services import organizations as org_service
+from app.services.pagination import apply_keyset, split_page
+from app.services.principal_cache import Principal
 
 _INVITE_EXPIRES_DEFAULT = timedelta(hours=72)
 
@@ -30,7 +32,7 @@ def _validate_role_for_inviter(inviter_role: OrganizationRole, requested_role: O
 def create_invite(
     session: Session,
     payload: InviteCreate,
-    inviter: User,
+    inviter: Principal,
 ) -> Tuple[OrganizationInvite, str, List[str]]:
     organization = org_service.fetch_organization(session, payload.organization_id)
     inviter_membership = org_service.ensure_owner_or_admin(session, organization.id, inviter.id)
@@ -63,13 +65,24 @@ def create_invite(
     return invite, raw_token, [group.name for group in groups]
 
 
-def list_invites(session: Session, organization_id: int) -> list[OrganizationInvite]:
-    return session.scalars(
+def list_invites(
+    session: Session,
+    organization_id: int,
+    *,
+    limit: int | None = None,
+    cursor: str | None = None,
+) -> tuple[list[OrganizationInvite], str | None]:
+    query = apply_keyset(
         select(OrganizationInvite)
         .options(selectinload(OrganizationInvite.invited_by))
-        .where(OrganizationInvite.organization_id == organization_id)
-        .order_by(OrganizationInvite.created_at.desc())
-    ).all()
+        .where(OrganizationInvite.organization_id == organization_id),
+        OrganizationInvite.created_at,
+        OrganizationInvite.id,
+        limit=limit,
+        cursor=cursor,
+        descending=True,
+    )
+    return split_page(session.scalars(query).all(), limit)
 
 
 def get_invite_by_token(session: Session, token: str) -> OrganizationInvite | None:
@@ -90,7 +103,7 @@ def ensure_invite_active(session: Session, invite: OrganizationInvite) -> None:
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Invite expired")
 
 
-def accept_invite(session: Session, token: str, user: User) -> OrganizationInvite:
+def accept_invite(session: Session, token: str, user: Principal) -> OrganizationInvite:
     invite = get_invite_by_token(session, token)
     if invite is None:
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid invite token")
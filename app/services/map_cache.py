@@ -0,0 +1,142 @@
+from __future__ import annotations
+
+import threading
+from collections import OrderedDict
+from collections.abc import Hashable
+from dataclasses import dataclass, field
+
+from app.core.config import settings
+from app.services import graph_changes
+
+CacheKey = tuple[Hashable, ...]
+
+
+@dataclass
+class _Entry:
+    version: int
+    body: bytes
+    # Compressed copies of ``body`` keyed by content coding, filled on first use.
+    encoded: dict[str, bytes] = field(default_factory=dict)
+
+    @property
+    def size(self) -> int:
+        return len(self.body) + sum(len(variant) for variant in self.encoded.values())
+
+
+class SerializedResponseCache:
+    """Size-bounded LRU of serialized response bodies keyed by ``(organization_id, ...)``.
+
+    Entries remember the graph version they were rendered from and are only served for
+    that version, so a body rendered concurrently with a mutation can never outlive it.
+    Each entry can also hold compressed variants of its body, so a hot response is
+    compressed once per coding instead of once per request; they count towards the size cap.
+    """
+
+    def __init__(self, max_entries: int, max_bytes: int) -> None:
+        self._max_entries = max_entries
+        self._max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._entries: OrderedDict[CacheKey, _Entry] = OrderedDict()
+        self._keys_by_org: dict[Hashable, set[CacheKey]] = {}
+        self._bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self._max_entries > 0 and self._max_bytes > 0
+
+    def get(self, key: CacheKey, version: int) -> bytes | None:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry.version != version:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry.body
+
+    def get_encoded(self, key: CacheKey, version: int, encoding: str) -> bytes | None:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry.version != version:
+                return None
+            return entry.encoded.get(encoding)
+
+    def put_encoded(self, key: CacheKey, version: int, encoding: str, body: bytes) -> None:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry.version != version or encoding in entry.encoded:
+                return
+            entry.encoded[encoding] = body
+            self._bytes += len(body)
+            self._evict()
+
+    def put(self, key: CacheKey, version: int, body: bytes) -> None:
+        if not self.enabled or len(body) > self._max_bytes:
+            return
+        with self._lock:
+            self._discard(key)
+            self._entries[key] = _Entry(version=version, body=body)
+            self._keys_by_org.setdefault(key[0], set()).add(key)
+            self._bytes += len(body)
+            self._evict()
+
+    def invalidate_organization(self, organization_id: int) -> None:
+        with self._lock:
+            keys = self._keys_by_org.pop(organization_id, set())
+            for key in keys:
+                entry = self._entries.pop(key, None)
+                if entry is not None:
+                    self._bytes -= entry.size
+            if keys:
+                self.invalidations += 1
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._keys_by_org.clear()
+            self._bytes = 0
+
+    def stats(self) -> dict[str, int]:
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "invalidations": self.invalidations,
+            }
+
+    def _evict(self) -> None:
+        while len(self._entries) > self._max_entries or self._bytes > self._max_bytes:
+            oldest = next(iter(self._entries))
+            self._discard(oldest)
+            self.evictions += 1
+
+    def _discard(self, key: CacheKey) -> None:
+        entry = self._entries.pop(key, None)
+        if entry is None:
+            return
+        self._bytes -= entry.size
+        keys = self._keys_by_org.get(key[0])
+        if keys is not None:
+            keys.discard(key)
+            if not keys:
+                del self._keys_by_org[key[0]]
+
+
+map_cache = SerializedResponseCache(
+    max_entries=settings.map_cache_max_entries,
+    max_bytes=settings.map_cache_max_bytes,
+)
+
+
+def _invalidate_on_change(change_event: graph_changes.GraphChangeEvent) -> None:
+    map_cache.invalidate_organization(change_event.organization_id)
+
+
+graph_changes.add_listener(_invalidate_on_change)
@@ -0,0 +1,275 @@
+from __future__ import annotations
+
+import json
+import math
+import struct
+import sys
+from array import array
+from collections.abc import Hashable, Sequence
+from datetime import datetime, timedelta
+from typing import Any
+
+from sqlalchemy import Row
+
+from app.services import graph_json
+
+MEDIA_TYPE = "application/vnd.egida.map-columnar"
+MAGIC = b"EGMC"
+FORMAT_VERSION = 1
+
+_ALIGN = 8
+_EPOCH = datetime(1970, 1, 1)
+_MICROSECOND = timedelta(microseconds=1)
+_TYPECODES = {"u8": "B", "u32": "I", "f64": "d"}
+_FLOAT_COLUMNS = {
+    "node.x",
+    "node.y",
+    "node.pagerank",
+    "node.betweenness",
+    "node.created_at",
+    "edge.created_at",
+}
+
+
+class _Dictionary:
+    """Assigns small consecutive integer codes to repeated values."""
+
+    def __init__(self, *initial: Hashable) -> None:
+        self.values: list[Any] = []
+        self._codes: dict[Hashable, int] = {}
+        for value in initial:
+            self.code(value)
+
+    def code(self, value: Hashable) -> int:
+        code = self._codes.get(value)
+        if code is None:
+            code = self._codes[value] = len(self.values)
+            self.values.append(value)
+        return code
+
+
+def _uint_type(values: Sequence[int]) -> str:
+    largest = max(values, default=0)
+    if largest < 2**8:
+        return "u8"
+    if largest < 2**32:
+        return "u32"
+    return "f64"
+
+
+def _micros(value: datetime) -> int:
+    return (value - _EPOCH) // _MICROSECOND
+
+
+def _from_micros(value: float) -> str:
+    return (_EPOCH + timedelta(microseconds=int(value))).isoformat()
+
+
+def encode_map(
+    *,
+    organization_id: int,
+    version: int,
+    spheres: list[dict[str, Any]],
+    nodes: Sequence[Row[Any]],
+    edges: Sequence[Row[Any]],
+) -> bytes:
+    """Encode a map as little-endian struct-of-arrays for clients that send ``MEDIA_TYPE``.
+
+    Layout: ``MAGIC``, a ``u32`` header length and a JSON header (spheres, the string
+    dictionary, code tables and ``[name, type, length]`` for every column), then each
+    column as a packed ``u8``/``u32``/``f64`` array. The header and every column are padded
+    to 8 bytes so clients can map them as typed arrays without copying. String columns hold
+    indexes into ``strings`` (0 is ``null``); metadata is stored as dictionary-encoded JSON
+    text and links/owners as offset/value pairs. ``created_at`` is microseconds since epoch;
+    per-relation ``degrees`` are dictionary-encoded JSON like metadata and a missing
+    ``pagerank``/``betweenness`` is NaN.
+    Computed map fields (``name``, ``kind``, ``archived``, ``x``/``y`` duplicates of
+    ``position``, ``from_node_id``/``to_node_id``) are left for the client to derive.
+    """
+
+    strings = _Dictionary(None)
+    node_types = _Dictionary()
+    statuses = _Dictionary()
+    relation_types = _Dictionary()
+    columns: dict[str, list[Any]] = {
+        name: []
+        for name in (
+            "node.id",
+            "node.sphere_id",
+            "node.x",
+            "node.y",
+            "node.node_type",
+            "node.status",
+            "node.label",
+            "node.summary",
+            "node.metadata",
+            "node.links_offsets",
+            "node.links",
+            "node.owners_offsets",
+            "node.owners",
+            "node.created_at",
+            "node.in_degree",
+            "node.out_degree",
+            "node.degrees",
+            "node.pagerank",
+            "node.betweenness",
+            "edge.id",
+            "edge.sphere_id",
+            "edge.source_node_id",
+            "edge.target_node_id",
+            "edge.relation_type",
+            "edge.metadata",
+            "edge.created_at",
+        )
+    }
+    columns["node.links_offsets"].append(0)
+    columns["node.owners_offsets"].append(0)
+
+    for row in nodes:
+        node = graph_json.node_record(row, by_alias=False)
+        columns["node.id"].append(node["id"])
+        columns["node.sphere_id"].append(node["sphere_id"])
+        columns["node.x"].append(node["position"]["x"])
+        columns["node.y"].append(node["position"]["y"])
+        columns["node.node_type"].append(node_types.code(node["node_type"]))
+        columns["node.status"].append(statuses.code(node["status"]))
+        columns["node.label"].append(strings.code(node["label"]))
+        columns["node.summary"].append(strings.code(node["summary"]))
+        columns["node.metadata"].append(strings.code(graph_json.encode(node["metadata"]).decode()))
+        for field in ("links", "owners"):
+            values = columns[f"node.{field}"]
+            values.extend(strings.code(item) for item in node[field])
+            columns[f"node.{field}_offsets"].append(len(values))
+        columns["node.created_at"].append(_micros(node["created_at"]))
+        columns["node.in_degree"].append(node["in_degree"])
+        columns["node.out_degree"].append(node["out_degree"])
+        columns["node.degrees"].append(strings.code(graph_json.encode(node["degrees"]).decode()))
+        for field in ("pagerank", "betweenness"):
+            value = node[field]
+            columns[f"node.{field}"].append(math.nan if value is None else value)
+
+    for row in edges:
+        edge = graph_json.edge_record(row, by_alias=False)
+        columns["edge.id"].append(edge["id"])
+        columns["edge.sphere_id"].append(edge["sphere_id"])
+        columns["edge.source_node_id"].append(edge["source_node_id"])
+        columns["edge.target_node_id"].append(edge["target_node_id"])
+        columns["edge.relation_type"].append(relation_types.code(edge["relation_type"]))
+        columns["edge.metadata"].append(strings.code(graph_json.encode(edge["metadata"]).decode()))
+        columns["edge.created_at"].append(_micros(edge["created_at"]))
+
+    layout = []
+    for name, values in columns.items():
+        if name in _FLOAT_COLUMNS:
+            column_type = "f64"
+        else:
+            column_type = _uint_type(values)
+        layout.append([name, column_type, len(values)])
+
+    header = graph_json.encode(
+        {
+            "format": FORMAT_VERSION,
+            "organization_id": organization_id,
+            "version": version,
+            "spheres": spheres,
+            "strings": strings.values,
+            "node_types": node_types.values,
+            "statuses": statuses.values,
+            "relation_types": relation_types.values,
+            "columns": layout,
+        }
+    )
+    prefix_length = len(MAGIC) + 4
+    header += b" " * (-(prefix_length + len(header)) % _ALIGN)
+    chunks = [MAGIC, struct.pack("<I", len(header)), header]
+    for name, column_type, _ in layout:
+        packed = array(_TYPECODES[column_type], columns[name])
+        if sys.byteorder != "little":
+            packed.byteswap()
+        data = packed.tobytes()
+        chunks.append(data + b"\0" * (-len(data) % _ALIGN))
+    return b"".join(chunks)
+
+
+def decode_map(body: bytes) -> dict[str, Any]:
+    """Expand an ``encode_map`` body back into the JSON ``MapResponse`` shape."""
+
+    if body[: len(MAGIC)] != MAGIC:
+        raise ValueError("not a columnar map body")
+    (header_length,) = struct.unpack_from("<I", body, len(MAGIC))
+    offset = len(MAGIC) + 4
+    header = json.loads(body[offset : offset + header_length])
+    offset += header_length
+    columns: dict[str, list[Any]] = {}
+    for name, column_type, length in header["columns"]:
+        packed = array(_TYPECODES[column_type])
+        size = packed.itemsize * length
+        packed.frombytes(body[offset : offset + size])
+        if sys.byteorder != "little":
+            packed.byteswap()
+        columns[name] = packed.tolist()
+        offset += size + (-size % _ALIGN)
+
+    strings = header["strings"]
+    nodes = []
+    links = columns["node.links_offsets"]
+    owners = columns["node.owners_offsets"]
+    for index, node_id in enumerate(columns["node.id"]):
+        position = {"x": columns["node.x"][index], "y": columns["node.y"][index]}
+        node = {
+            "label": strings[columns["node.label"][index]],
+            "node_type": header["node_types"][columns["node.node_type"][index]],
+            "status": header["statuses"][columns["node.status"][index]],
+            "summary": strings[columns["node.summary"][index]],
+            "position": position,
+            "metadata_json": json.loads(strings[columns["node.metadata"][index]]),
+            "links_json": [
+                strings[code] for code in columns["node.links"][links[index] : links[index + 1]]
+            ],
+            "owners_json": [
+                strings[code] for code in columns["node.owners"][owners[index] : owners[index + 1]]
+            ],
+            "id": int(node_id),
+            "sphere_id": int(columns["node.sphere_id"][index]),
+            "created_at": _from_micros(columns["node.created_at"][index]),
+            "in_degree": int(columns["node.in_degree"][index]),
+            "out_degree": int(columns["node.out_degree"][index]),
+            "degrees": json.loads(strings[columns["node.degrees"][index]]),
+        }
+        for field in ("pagerank", "betweenness"):
+            value = columns[f"node.{field}"][index]
+            node[field] = None if math.isnan(value) else value
+        node.update(
+            name=node["label"],
+            kind=node["node_type"],
+            archived=node["status"] == "archived",
+            x=position["x"],
+            y=position["y"],
+        )
+        nodes.append(node)
+
+    edges = []
+    for index, edge_id in enumerate(columns["edge.id"]):
+        source = int(columns["edge.source_node_id"][index])
+        target = int(columns["edge.target_node_id"][index])
+        edges.append(
+            {
+                "id": int(edge_id),
+                "sphere_id": int(columns["edge.sphere_id"][index]),
+                "source_node_id": source,
+                "target_node_id": target,
+                "relation_type": header["relation_types"][columns["edge.relation_type"][index]],
+                "metadata_json": json.loads(strings[columns["edge.metadata"][index]]),
+                "created_at": _from_micros(columns["edge.created_at"][index]),
+                "from_node_id": source,
+                "to_node_id": target,
+            }
+        )
+
+    return {
+        "organization_id": header["organization_id"],
+        "version": header["version"],
+        "spheres": header["spheres"],
+        "nodes": nodes,
+        "edges": edges,
+    }
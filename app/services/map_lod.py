@@ -0,0 +1,125 @@
+from __future__ import annotations
+
+from typing import Any
+
+from sqlalchemy import Select, case, func, select
+from sqlalchemy.orm import Session, aliased
+
+from app.models import Edge, Node, Sphere
+
+SPHERE = "sphere"
+TYPE = "type"
+LEVELS = (SPHERE, TYPE)
+
+
+def _cluster_keys(level: str, node: Any) -> tuple[Any, ...]:
+    if level == SPHERE:
+        return (node.sphere_id,)
+    return (node.sphere_id, node.node_type)
+
+
+def _cluster_id(level: str, sphere_id: int, node_type: str | None) -> str:
+    return str(sphere_id) if level == SPHERE else f"{sphere_id}:{node_type}"
+
+
+def _filter_nodes(
+    query: Select[Any],
+    node: Any,
+    *,
+    sphere_id: int | None,
+    node_type: str | None,
+    status_value: str | None,
+) -> Select[Any]:
+    if sphere_id is not None:
+        query = query.where(node.sphere_id == sphere_id)
+    if node_type is not None:
+        query = query.where(node.node_type == node_type)
+    if status_value is not None:
+        query = query.where(node.status == status_value)
+    return query
+
+
+def build_lod(
+    session: Session,
+    organization_id: int,
+    level: str,
+    *,
+    sphere_id: int | None = None,
+    node_type: str | None = None,
+    status_value: str | None = None,
+) -> tuple[list[dict[str, Any]], list[dict[str, Any]]]:
+    """Clusters and aggregated edges of the organization's map at a level of detail.
+
+    ``sphere`` makes one cluster per sphere, ``type`` one per (sphere, node type). A cluster
+    carries its node count, how many of them are archived, the centroid of its nodes and
+    ``internal_edges``, the number of edges between its own nodes; edges between nodes of two
+    clusters collapse into one entry per relation type with their count. Edges never leave
+    their sphere, so at the ``sphere`` level all of them are internal and the edge list is
+    empty. Both are computed by ``GROUP BY`` in SQLite.
+    """
+
+    filters = {"sphere_id": sphere_id, "node_type": node_type, "status_value": status_value}
+    keys = _cluster_keys(level, Node)
+    cluster_query = (
+        select(
+            *keys,
+            func.count(Node.id),
+            func.sum(case((Node.status == "archived", 1), else_=0)),
+            func.avg(Node.x),
+            func.avg(Node.y),
+        )
+        .join(Sphere, Node.sphere_id == Sphere.id)
+        .where(Sphere.organization_id == organization_id)
+        .group_by(*keys)
+        .order_by(*keys)
+    )
+    clusters = []
+    for row in session.execute(_filter_nodes(cluster_query, Node, **filters)):
+        cluster_type = row[1] if level == TYPE else None
+        count, archived, x, y = row[len(keys) :]
+        clusters.append(
+            {
+                "id": _cluster_id(level, row[0], cluster_type),
+                "sphere_id": row[0],
+                "node_type": cluster_type,
+                "count": count,
+                "archived": archived,
+                "x": x,
+                "y": y,
+                "internal_edges": 0,
+            }
+        )
+    clusters_by_id = {cluster["id"]: cluster for cluster in clusters}
+
+    source = aliased(Node)
+    target = aliased(Node)
+    source_keys = _cluster_keys(level, source)
+    target_keys = _cluster_keys(level, target)
+    edge_query = (
+        select(*source_keys, *target_keys, Edge.relation_type, func.count(Edge.id))
+        .join(source, Edge.source_node_id == source.id)
+        .join(target, Edge.target_node_id == target.id)
+        .join(Sphere, Edge.sphere_id == Sphere.id)
+        .where(Sphere.organization_id == organization_id)
+        .group_by(*source_keys, *target_keys, Edge.relation_type)
+        .order_by(*source_keys, *target_keys, Edge.relation_type)
+    )
+    edge_query = _filter_nodes(edge_query, source, **filters)
+    edge_query = _filter_nodes(edge_query, target, **filters)
+    width = len(source_keys)
+    edges = []
+    for row in session.execute(edge_query):
+        source_id = _cluster_id(level, row[0], row[width - 1])
+        target_id = _cluster_id(level, row[width], row[2 * width - 1])
+        if source_id == target_id:
+            clusters_by_id[source_id]["internal_edges"] += row[-1]
+            continue
+        edges.append(
+            {
+                "source": source_id,
+                "target": target_id,
+                "relation_type": row[-2],
+                "count": row[-1],
+            }
+        )
+    return clusters, edges
@@ -0,0 +1,278 @@
+from __future__ import annotations
+
+import math
+from collections.abc import Collection, Iterable, Sequence
+from dataclasses import dataclass
+from typing import Any
+
+from sqlalchemy import JSON, case, select, type_coerce, update
+from sqlalchemy.orm import Session
+
+from app.models import Node, Sphere
+from app.models.structures import nodes_rtree
+
+try:  # Optional, see the ``layout`` extra in pyproject.toml.
+    import numpy as np
+except ImportError:  # pragma: no cover - depends on the environment
+    np = None
+
+Point = tuple[float, float]
+
+# Spheres created without a radius get 0.22, see ``app.api.routes.spheres``.
+_DEFAULT_RADIUS = 0.22
+# Nodes are kept this far inside the rim, as a fraction of the radius.
+_MARGIN = 0.06
+# Above this many nodes, repulsion is estimated from a random sample of pivots per step.
+_EXACT_LIMIT = 512
+_PIVOTS = 256
+_CHUNK = 512
+_GOLDEN_ANGLE = math.pi * (3 - math.sqrt(5))
+# New nodes keep this distance (per axis, as a fraction of the radius) from other nodes.
+_SPACING = 0.12
+_PLACEMENT_CANDIDATES = 96
+_WRITE_CHUNK = 500
+
+
+class LayoutUnavailableError(RuntimeError):
+    """Raised when the force layout is requested without NumPy installed."""
+
+
+@dataclass(frozen=True)
+class Circle:
+    center_x: float
+    center_y: float
+    radius: float
+
+    @classmethod
+    def for_sphere(cls, sphere: Sphere) -> Circle:
+        return cls(
+            center_x=0.5 if sphere.center_x is None else sphere.center_x,
+            center_y=0.5 if sphere.center_y is None else sphere.center_y,
+            radius=_DEFAULT_RADIUS if not sphere.radius else sphere.radius,
+        )
+
+    def project(self, point: Point, *, margin: float = _MARGIN) -> Point:
+        """Pull ``point`` inside the circle, like ``projectToCircle`` in ``app.js``."""
+
+        limit = self.radius * (1 - margin)
+        dx = point[0] - self.center_x
+        dy = point[1] - self.center_y
+        distance = math.hypot(dx, dy)
+        if distance <= limit:
+            return point
+        scale = limit / distance
+        return (self.center_x + dx * scale, self.center_y + dy * scale)
+
+
+def available() -> bool:
+    return np is not None
+
+
+def force_layout(
+    positions: Sequence[Point],
+    edges: Sequence[tuple[int, int]],
+    circle: Circle,
+    *,
+    movable: Sequence[bool] | None = None,
+    iterations: int = 150,
+    seed: int = 0,
+) -> list[Point]:
+    """Fruchterman-Reingold layout of one sphere, kept inside ``circle``.
+
+    ``positions`` are the current coordinates (the starting point, so re-running refines
+    rather than reshuffles), ``edges`` index into them. Nodes whose ``movable`` flag is
+    false stay where they are but still push and pull the others. The computation runs in
+    unit-disc coordinates with NumPy: repulsion is exact (in row chunks) up to
+    ``_EXACT_LIMIT`` nodes and estimated from ``_PIVOTS`` random nodes per step above it.
+    """
+
+    if np is None:
+        raise LayoutUnavailableError("force layout requires numpy (install the 'layout' extra)")
+    count = len(positions)
+    if count == 0:
+        return []
+
+    rng = np.random.default_rng(seed)
+    center = np.array([circle.center_x, circle.center_y])
+    points = (np.asarray(positions, dtype=float).reshape(count, 2) - center) / circle.radius
+    # Nodes sharing a spot (e.g. all at the default position) need a nudge to separate.
+    points += rng.normal(scale=1e-3, size=points.shape)
+    _contain(points)
+    fixed = None if movable is None else ~np.asarray(movable, dtype=bool)
+
+    pairs = np.asarray(edges, dtype=np.intp).reshape(-1, 2)
+    pairs = pairs[pairs[:, 0] != pairs[:, 1]]
+    sources, targets = pairs[:, 0], pairs[:, 1]
+
+    ideal = 0.9 * math.sqrt(math.pi / count)
+    start_temperature = 0.1
+    for step in range(iterations):
+        pivots = None if count <= _EXACT_LIMIT else rng.choice(count, _PIVOTS, replace=False)
+        displacement = _repulsion(points, ideal, pivots)
+
+        delta = points[sources] - points[targets]
+        distance = np.sqrt((delta * delta).sum(axis=1)) + 1e-9
+        pull = delta * (distance / ideal)[:, None]
+        for axis in (0, 1):
+            displacement[:, axis] -= np.bincount(sources, pull[:, axis], minlength=count)
+            displacement[:, axis] += np.bincount(targets, pull[:, axis], minlength=count)
+        # Pull to the centre, about as strong as the repulsion felt at the rim, so the
+        # outer nodes spread over the disc instead of piling up against the boundary.
+        displacement -= points * (1.5 * count * ideal * ideal)
+
+        temperature = start_temperature * (1 - step / iterations)
+        length = np.sqrt((displacement * displacement).sum(axis=1)) + 1e-12
+        move = displacement * (np.minimum(length, temperature) / length)[:, None]
+        if fixed is not None:
+            move[fixed] = 0.0
+        points += move
+        _contain(points)
+
+    placed = points * circle.radius + center
+    return [(float(x), float(y)) for x, y in placed]
+
+
+def _repulsion(points: Any, ideal: float, pivots: Any) -> Any:
+    xs = points[:, 0]
+    ys = points[:, 1]
+    other_xs = xs if pivots is None else xs[pivots]
+    other_ys = ys if pivots is None else ys[pivots]
+    scale = 1.0 if pivots is None else len(points) / len(pivots)
+    displacement = np.empty_like(points)
+    for start in range(0, len(points), _CHUNK):
+        dx = np.subtract.outer(xs[start : start + _CHUNK], other_xs)
+        dy = np.subtract.outer(ys[start : start + _CHUNK], other_ys)
+        # k^2 / d along the unit vector is k^2 * delta / d^2.
+        weight = dx * dx
+        weight += dy * dy
+        weight += 1e-9
+        np.reciprocal(weight, out=weight)
+        displacement[start : start + _CHUNK, 0] = np.einsum("ij,ij->i", dx, weight)
+        displacement[start : start + _CHUNK, 1] = np.einsum("ij,ij->i", dy, weight)
+    displacement *= ideal * ideal * scale
+    return displacement
+
+
+def _contain(points: Any) -> None:
+    limit = 1 - _MARGIN
+    distance = np.sqrt((points * points).sum(axis=1))
+    outside = distance > limit
+    if outside.any():
+        points[outside] *= (limit / distance[outside])[:, None]
+
+
+class Occupancy:
+    """Node positions of one sphere near its circle, bucketed by the spacing distance.
+
+    Loaded once with :meth:`load` and extended with :meth:`add` as spots are handed out,
+    so placing many nodes (a batch) reads ``nodes_rtree`` once per sphere.
+    """
+
+    def __init__(self, circle: Circle, points: Iterable[Point] = ()) -> None:
+        self.circle = circle
+        self.spacing = circle.radius * _SPACING
+        self._cells: dict[tuple[int, int], list[Point]] = {}
+        for point in points:
+            self.add(point)
+
+    @classmethod
+    def load(
+        cls, session: Session, sphere: Sphere, *, exclude_ids: Collection[int] = ()
+    ) -> Occupancy:
+        """Read the sphere's nodes around its circle; ``exclude_ids`` are not placed yet."""
+
+        circle = Circle.for_sphere(sphere)
+        reach = circle.radius + circle.radius * _SPACING
+        # Every organization shares the coordinate space, so only the sphere's own nodes count.
+        query = (
+            select(nodes_rtree.c.min_x, nodes_rtree.c.min_y)
+            .join(Node, Node.id == nodes_rtree.c.id)
+            .where(Node.sphere_id == sphere.id)
+            .where(nodes_rtree.c.max_x >= circle.center_x - reach)
+            .where(nodes_rtree.c.min_x <= circle.center_x + reach)
+            .where(nodes_rtree.c.max_y >= circle.center_y - reach)
+            .where(nodes_rtree.c.min_y <= circle.center_y + reach)
+        )
+        if exclude_ids:
+            query = query.where(nodes_rtree.c.id.not_in(list(exclude_ids)))
+        return cls(circle, session.execute(query).tuples())
+
+    def _cell(self, point: Point) -> tuple[int, int]:
+        return (math.floor(point[0] / self.spacing), math.floor(point[1] / self.spacing))
+
+    def add(self, point: Point) -> None:
+        self._cells.setdefault(self._cell(point), []).append(point)
+
+    def crowd(self, point: Point) -> int:
+        """Number of nodes within the spacing distance of ``point`` on both axes."""
+
+        cell_x, cell_y = self._cell(point)
+        return sum(
+            1
+            for dx in (-1, 0, 1)
+            for dy in (-1, 0, 1)
+            for other in self._cells.get((cell_x + dx, cell_y + dy), ())
+            if abs(other[0] - point[0]) <= self.spacing
+            and abs(other[1] - point[1]) <= self.spacing
+        )
+
+
+def place_node(occupancy: Occupancy, anchors: Sequence[Point] = ()) -> Point:
+    """Pick a free spot inside the sphere circle of ``occupancy`` for a node without a position.
+
+    The node goes near the centroid of ``anchors`` (positions of the nodes it is connected
+    to), or anywhere in the circle without them: candidates spiral outwards and the first
+    one with no node within the spacing distance wins, else the least crowded one. The
+    spot is not added to ``occupancy``; callers placing several nodes do that themselves.
+    """
+
+    circle = occupancy.circle
+    if anchors:
+        origin = circle.project(
+            (
+                sum(point[0] for point in anchors) / len(anchors),
+                sum(point[1] for point in anchors) / len(anchors),
+            )
+        )
+        reach = occupancy.spacing * 4
+    else:
+        origin = (circle.center_x, circle.center_y)
+        reach = circle.radius
+    best = origin
+    best_crowd: int | None = None
+    for index in range(_PLACEMENT_CANDIDATES):
+        distance = reach * math.sqrt(index / _PLACEMENT_CANDIDATES)
+        angle = index * _GOLDEN_ANGLE
+        candidate = circle.project(
+            (origin[0] + distance * math.cos(angle), origin[1] + distance * math.sin(angle))
+        )
+        crowd = occupancy.crowd(candidate)
+        if best_crowd is None or crowd < best_crowd:
+            best, best_crowd = candidate, crowd
+        if crowd == 0:
+            break
+    return best
+
+
+def write_positions(session: Session, positions: Sequence[tuple[int, float, float]]) -> None:
+    """Store ``(node_id, x, y)`` triples with one ``UPDATE`` per chunk of nodes."""
+
+    for start in range(0, len(positions), _WRITE_CHUNK):
+        chunk = positions[start : start + _WRITE_CHUNK]
+        # The CASE expressions pick each node's new coordinates by id.
+        session.execute(
+            update(Node)
+            .where(Node.id.in_([node_id for node_id, _, _ in chunk]))
+            .values(
+                x=case({node_id: x for node_id, x, _ in chunk}, value=Node.id),
+                y=case({node_id: y for node_id, _, y in chunk}, value=Node.id),
+                position=case(
+                    {
+                        node_id: type_coerce({"x": x, "y": y}, JSON)
+                        for node_id, x, y in chunk
+                    },
+                    value=Node.id,
+                ),
+            )
+            .execution_options(synchronize_session="fetch")
+        )
@@ -0,0 +1,50 @@
+from __future__ import annotations
+
+import re
+from typing import Any
+
+from sqlalchemy import Select, literal_column, select
+
+from app.models import Node
+from app.models.structures import nodes_fts
+
+_TOKEN_RE = re.compile(r"[^\W_]+")
+
+# Column weights for bm25(): label, summary, owners, links.
+_BM25_RANK = literal_column("bm25(nodes_fts, 10.0, 4.0, 2.0, 1.0)")
+
+
+def match_expression(search: str) -> str | None:
+    """Turn free-form user input into an FTS5 query of quoted prefix terms.
+
+    Every word must match (implicit AND) and the last one may be incomplete, which keeps
+    search-as-you-type working. Returns ``None`` when the input contains no words.
+    """
+
+    tokens = _TOKEN_RE.findall(search.lower())
+    if not tokens:
+        return None
+    return " ".join(f'"{token}"*' for token in tokens)
+
+
+def apply_search(query: Select[Any], search: str, *, ranked: bool) -> Select[Any]:
+    """Restrict a ``select(Node)`` query to nodes matching ``search``.
+
+    With ``ranked`` the matches are ordered by BM25 relevance before any ordering the
+    caller adds afterwards. Input without words falls back to a substring match.
+    """
+
+    expression = match_expression(search)
+    if expression is None:
+        like = f"%{search.lower()}%"
+        return query.where(Node.label.ilike(like) | Node.summary.ilike(like))
+
+    matches = (
+        select(nodes_fts.c.rowid.label("node_id"), _BM25_RANK.label("rank"))
+        .where(literal_column("nodes_fts").op("MATCH")(expression))
+        .subquery("node_matches")
+    )
+    query = query.join(matches, matches.c.node_id == Node.id)
+    if ranked:
+        query = query.order_by(matches.c.rank)
+    return query
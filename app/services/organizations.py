@@ -16,6 +16,8 @@ from app.models import (
     OrganizationRole,
     User,
 )
+from app.services import graph_changes
+from app.services.principal_cache import Principal
 
 
 def get_membership(session: Session, organization_id: int, user_id: int) -> OrganizationMember | None:
@@ -101,7 +103,7 @@ def validate_group_ids(
     return groups
 
 
-def add_user_to_group(session: Session, group: Group, user: User) -> GroupMembership:
+def add_user_to_group(session: Session, group: Group, user: User | Principal) -> GroupMembership:
     if get_membership(session, group.organization_id, user.id) is None:
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="User must belong to the organization")
 
@@ -119,6 +121,11 @@ def add_user_to_group(session: Session, group: Group, user: User) -> GroupMember
         user_id=user.id,
     )
     session.add(membership)
+    graph_changes.record_changes(
+        session,
+        group.organization_id,
+        graph_changes.upserts(graph_changes.SPHERE, [sphere.id for sphere in group.spheres]),
+    )
     session.commit()
     session.refresh(membership)
     return membership
@@ -134,12 +141,17 @@ def remove_user_from_group(session: Session, group: Group, user: User) -> None:
         return
 
     session.delete(membership)
+    graph_changes.record_changes(
+        session,
+        group.organization_id,
+        graph_changes.upserts(graph_changes.SPHERE, [sphere.id for sphere in group.spheres]),
+    )
     session.commit()
 
 
 def link_user_to_groups(
     session: Session,
-    user: User,
+    user: User | Principal,
     organization_id: int,
     group_ids: list[int],
 ) -> None:
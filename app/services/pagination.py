@@ -0,0 +1,132 @@
+from __future__ import annotations
+
+import base64
+import binascii
+import json
+from collections.abc import Callable, Sequence
+from datetime import datetime
+from typing import Any, TypeVar
+
+from fastapi import HTTPException, Response, status
+from sqlalchemy import ColumnElement, Select, tuple_
+from sqlalchemy.orm import InstrumentedAttribute
+
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+MAX_PAGE_SIZE = 1000
+
+RowT = TypeVar("RowT")
+
+
+def encode_cursor(created_at: datetime, entity_id: int) -> str:
+    raw = json.dumps([created_at.isoformat(), entity_id], separators=(",", ":"))
+    return base64.urlsafe_b64encode(raw.encode("utf-8")).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor: str) -> tuple[datetime, int]:
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        created_at_raw, entity_id = json.loads(base64.urlsafe_b64decode(padded.encode("ascii")))
+        return datetime.fromisoformat(created_at_raw), int(entity_id)
+    except (ValueError, TypeError, binascii.Error, UnicodeError) as exc:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid cursor"
+        ) from exc
+
+
+def encode_value_cursor(value: int | float, entity_id: int) -> str:
+    raw = json.dumps([value, entity_id], separators=(",", ":"))
+    return base64.urlsafe_b64encode(raw.encode("utf-8")).decode("ascii").rstrip("=")
+
+
+def decode_value_cursor(cursor: str) -> tuple[int | float, int]:
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        value, entity_id = json.loads(base64.urlsafe_b64decode(padded.encode("ascii")))
+        if not isinstance(value, (int, float)) or isinstance(value, bool):
+            raise TypeError("cursor value must be a number")
+        return value, int(entity_id)
+    except (ValueError, TypeError, binascii.Error, UnicodeError) as exc:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid cursor"
+        ) from exc
+
+
+def page_params(limit: Any, cursor: Any) -> tuple[int | None, str | None]:
+    """Normalize ``limit``/``cursor`` so routes can also be called directly without FastAPI."""
+
+    page_limit = limit if isinstance(limit, int) else None
+    page_cursor = cursor if isinstance(cursor, str) and cursor else None
+    if page_cursor is not None and page_limit is None:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Cursor requires limit")
+    return page_limit, page_cursor
+
+
+def apply_keyset(
+    query: Select[Any],
+    created_column: InstrumentedAttribute[datetime],
+    id_column: InstrumentedAttribute[int],
+    *,
+    limit: int | None,
+    cursor: str | None,
+    descending: bool,
+) -> Select[Any]:
+    """Order ``query`` by ``(created_at, id)`` and, when paginating, seek past ``cursor``.
+
+    One extra row is fetched so :func:`split_page` can tell whether another page exists.
+    """
+
+    if descending:
+        query = query.order_by(created_column.desc(), id_column.desc())
+    else:
+        query = query.order_by(created_column.asc(), id_column.asc())
+    if limit is None:
+        return query
+
+    if cursor is not None:
+        position = tuple_(created_column, id_column)
+        boundary = tuple_(*decode_cursor(cursor))
+        query = query.where(position < boundary if descending else position > boundary)
+    return query.limit(limit + 1)
+
+
+def apply_value_keyset(
+    query: Select[Any],
+    value: ColumnElement[Any],
+    id_column: InstrumentedAttribute[int],
+    *,
+    limit: int | None,
+    cursor: str | None,
+) -> Select[Any]:
+    """Order ``query`` by ``(value, id)`` descending and, when paginating, seek past ``cursor``.
+
+    The counterpart of :func:`apply_keyset` for rankings; cursors come from
+    :func:`encode_value_cursor` and ``value`` must not be ``NULL``.
+    """
+
+    query = query.order_by(value.desc(), id_column.desc())
+    if limit is None:
+        return query
+    if cursor is not None:
+        query = query.where(tuple_(value, id_column) < tuple_(*decode_value_cursor(cursor)))
+    return query.limit(limit + 1)
+
+
+def split_page(
+    rows: Sequence[RowT],
+    limit: int | None,
+    *,
+    cursor_for: Callable[[RowT], str] | None = None,
+) -> tuple[list[RowT], str | None]:
+    items = list(rows)
+    if limit is None or len(items) <= limit:
+        return items, None
+    items = items[:limit]
+    last = items[-1]
+    if cursor_for is not None:
+        return items, cursor_for(last)
+    return items, encode_cursor(last.created_at, last.id)
+
+
+def attach_next_cursor(response: Response | None, next_cursor: str | None) -> None:
+    if response is not None and next_cursor is not None:
+        response.headers[NEXT_CURSOR_HEADER] = next_cursor
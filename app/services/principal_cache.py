@@ -0,0 +1,174 @@
+from __future__ import annotations
+
+import hmac
+import threading
+import time
+from collections import OrderedDict
+from collections.abc import Callable
+from dataclasses import dataclass
+from datetime import datetime
+
+from sqlalchemy import event, inspect
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.models import User
+
+_PENDING_USERS_KEY = "principal_cache.pending"
+# Changing any of these ends the sessions cached for the user.
+_CREDENTIAL_FIELDS = ("hashed_password", "is_active", "email")
+
+
+@dataclass(frozen=True, slots=True)
+class Principal:
+    """The authenticated user as routes see it: plain values, detached from any session."""
+
+    id: int
+    email: str
+    is_active: bool
+    created_at: datetime
+
+    @classmethod
+    def from_user(cls, user: User) -> Principal:
+        return cls(
+            id=user.id, email=user.email, is_active=user.is_active, created_at=user.created_at
+        )
+
+
+@dataclass(frozen=True, slots=True)
+class _Entry:
+    # ``header.payload`` part of the token; the signature alone is the key.
+    signed: str
+    principal: Principal
+    expires_at: float
+
+
+class PrincipalCache:
+    """Bounded TTL cache of verified access tokens, keyed by the token signature.
+
+    A hit skips both the JWT verification and the user lookup. Entries live for ``ttl``
+    seconds but never past the token's ``exp``, and every entry of a user is dropped when
+    the user's credentials change, the user is deactivated or logs out. The signed part
+    of the token is compared on every hit, so a valid signature attached to another
+    payload never matches.
+    """
+
+    def __init__(
+        self, max_entries: int, ttl: float, clock: Callable[[], float] = time.time
+    ) -> None:
+        self._max_entries = max_entries
+        self._ttl = ttl
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._entries: OrderedDict[str, _Entry] = OrderedDict()
+        self._keys_by_user: dict[int, set[str]] = {}
+        # Bumped on invalidation, so a lookup that raced with it is not cached afterwards.
+        self._generations: dict[int, int] = {}
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self._max_entries > 0 and self._ttl > 0
+
+    def get(self, token: str) -> Principal | None:
+        signed, _, signature = token.rpartition(".")
+        with self._lock:
+            entry = self._entries.get(signature)
+            if entry is None or not hmac.compare_digest(entry.signed, signed):
+                self.misses += 1
+                return None
+            if entry.expires_at <= self._clock():
+                self._discard(signature)
+                self.misses += 1
+                return None
+            self._entries.move_to_end(signature)
+            self.hits += 1
+            return entry.principal
+
+    def generation(self, user_id: int) -> int:
+        with self._lock:
+            return self._generations.get(user_id, 0)
+
+    def put(self, token: str, principal: Principal, expires_at: float, generation: int) -> None:
+        """Cache ``principal`` unless its user was invalidated after ``generation`` was read."""
+
+        if not self.enabled:
+            return
+        signed, _, signature = token.rpartition(".")
+        with self._lock:
+            if self._generations.get(principal.id, 0) != generation:
+                return
+            self._discard(signature)
+            self._entries[signature] = _Entry(
+                signed=signed,
+                principal=principal,
+                expires_at=min(self._clock() + self._ttl, expires_at),
+            )
+            self._keys_by_user.setdefault(principal.id, set()).add(signature)
+            while len(self._entries) > self._max_entries:
+                self._discard(next(iter(self._entries)))
+
+    def invalidate_user(self, user_id: int) -> None:
+        with self._lock:
+            self._generations[user_id] = self._generations.get(user_id, 0) + 1
+            for signature in self._keys_by_user.pop(user_id, set()):
+                self._entries.pop(signature, None)
+            self.invalidations += 1
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._keys_by_user.clear()
+
+    def stats(self) -> dict[str, int]:
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "hits": self.hits,
+                "misses": self.misses,
+                "invalidations": self.invalidations,
+            }
+
+    def _discard(self, signature: str) -> None:
+        entry = self._entries.pop(signature, None)
+        if entry is None:
+            return
+        keys = self._keys_by_user.get(entry.principal.id)
+        if keys is not None:
+            keys.discard(signature)
+            if not keys:
+                del self._keys_by_user[entry.principal.id]
+
+
+principal_cache = PrincipalCache(
+    max_entries=settings.principal_cache_max_entries,
+    ttl=settings.principal_cache_ttl_seconds,
+)
+
+
+@event.listens_for(Session, "after_flush")
+def _collect_changed_users(session: Session, flush_context: object) -> None:
+    pending = None
+    for instance in (*session.dirty, *session.deleted):
+        if not isinstance(instance, User):
+            continue
+        state = inspect(instance)
+        if instance in session.deleted or any(
+            state.attrs[name].history.has_changes() for name in _CREDENTIAL_FIELDS
+        ):
+            if pending is None:
+                pending = session.info.setdefault(_PENDING_USERS_KEY, set())
+            pending.add(instance.id)
+
+
+@event.listens_for(Session, "after_commit")
+def _invalidate_committed(session: Session) -> None:
+    for user_id in session.info.pop(_PENDING_USERS_KEY, ()):
+        principal_cache.invalidate_user(user_id)
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard_rolled_back(session: Session) -> None:
+    session.info.pop(_PENDING_USERS_KEY, None)
@@ -0,0 +1,339 @@
+from __future__ import annotations
+
+import math
+from collections.abc import Mapping, Sequence
+
+from sqlalchemy import func, select
+from sqlalchemy.orm import Session
+
+from app.models import Node, Sphere
+from app.services.node_layout import Circle, write_positions
+
+RADIAL = "radial"
+GRID = "grid"
+PACKED = "packed"
+MODES = (RADIAL, GRID, PACKED)
+
+# Radii grow with the square root of the node count (area proportional to the nodes), offset
+# so that empty and tiny spheres stay visible next to large ones.
+_BASE_NODES = 4
+# Free space between neighbouring spheres, as a fraction of the mean radius.
+_GAP = 0.2
+# Free space around the whole layout, as a fraction of the canvas.
+_MARGIN = 0.04
+_RESOLVE_PASSES = 50
+_GOLDEN_ANGLE = math.pi * (3 - math.sqrt(5))
+
+
+def solve(node_counts: Sequence[int], mode: str = PACKED) -> list[Circle]:
+    """Circles for spheres holding ``node_counts`` nodes, fitted into the unit square.
+
+    ``radial`` fills concentric rings in the given order, ``grid`` fills rows left to right
+    and ``packed`` packs the spheres around the centre, largest first. Every mode ends with
+    an overlap resolution pass, so no two circles intersect.
+    """
+
+    if not node_counts:
+        return []
+    radii = [math.sqrt(count + _BASE_NODES) for count in node_counts]
+    gap = _GAP * sum(radii) / len(radii)
+    if mode == RADIAL:
+        centers = _radial(radii, gap)
+    elif mode == GRID:
+        centers = _grid(radii, gap)
+    elif mode == PACKED:
+        centers = _packed(radii, gap)
+    else:
+        raise ValueError(f"unknown sphere layout mode: {mode}")
+    resolve_overlaps(centers, radii, gap)
+    return _fit(centers, radii)
+
+
+def _radial(radii: Sequence[float], gap: float) -> list[list[float]]:
+    if len(radii) == 1:
+        return [[0.0, 0.0]]
+    # Rings are one widest sphere apart; each ring takes spheres in order until their
+    # diameters fill its circumference, then spreads them evenly around it.
+    spacing = 2 * max(radii) + gap
+    centers: list[list[float]] = []
+    ring: list[int] = []
+    ring_radius = spacing / 2
+    used = 0.0
+
+    def close_ring() -> None:
+        total = sum(2 * radii[index] + gap for index in ring)
+        angle = 0.0
+        for index in ring:
+            share = (2 * radii[index] + gap) / total * 2 * math.pi
+            angle += share / 2
+            centers.append([ring_radius * math.cos(angle), ring_radius * math.sin(angle)])
+            angle += share / 2
+
+    for index, radius in enumerate(radii):
+        arc = 2 * radius + gap
+        if ring and used + arc > 2 * math.pi * ring_radius:
+            close_ring()
+            ring, used = [], 0.0
+            ring_radius += spacing
+        ring.append(index)
+        used += arc
+    close_ring()
+    return centers
+
+
+def _grid(radii: Sequence[float], gap: float) -> list[list[float]]:
+    # Shelf packing: rows about as wide as the layout is tall, each row as high as its
+    # largest sphere, every row centred horizontally.
+    width = math.sqrt(sum((2 * radius + gap) ** 2 for radius in radii))
+    rows: list[list[int]] = [[]]
+    row_width = 0.0
+    for index, radius in enumerate(radii):
+        cell = 2 * radius + gap
+        if rows[-1] and row_width + cell > width:
+            rows.append([])
+            row_width = 0.0
+        rows[-1].append(index)
+        row_width += cell
+
+    centers: list[list[float]] = [[0.0, 0.0] for _ in radii]
+    top = 0.0
+    for row in rows:
+        height = max(2 * radii[index] + gap for index in row)
+        left = -sum(2 * radii[index] + gap for index in row) / 2
+        for index in row:
+            cell = 2 * radii[index] + gap
+            centers[index] = [left + cell / 2, top + height / 2]
+            left += cell
+        top += height
+    return centers
+
+
+def _packed(radii: Sequence[float], gap: float) -> list[list[float]]:
+    """Front-chain circle packing (Wang et al., as in d3's ``packSiblings``), largest first.
+
+    Each sphere is placed tangent to two neighbouring circles of the front chain (the outer
+    boundary of the packed circles), next to the pair closest to the centre; if it would
+    intersect another circle on the chain, the chain is shortened to that circle and the
+    placement retried. Radii are inflated by half the gap, so tangent spheres keep it.
+    """
+
+    order = sorted(range(len(radii)), key=lambda index: -radii[index])
+    sizes = [radii[index] + gap / 2 for index in order]
+    xs = [0.0] * len(sizes)
+    ys = [0.0] * len(sizes)
+    if len(sizes) > 1:
+        xs[0] = -sizes[1]
+        xs[1] = sizes[0]
+    if len(sizes) > 2:
+        _place(xs, ys, sizes, 1, 0, 2)
+        # The chain is a circular doubly linked list over placed circles.
+        following = {0: 1, 1: 2, 2: 0}
+        preceding = {0: 2, 1: 0, 2: 1}
+        first, second = 0, 1
+        index = 3
+        while index < len(sizes):
+            _place(xs, ys, sizes, first, second, index)
+            ahead, behind = following[second], preceding[first]
+            ahead_length, behind_length = sizes[second], sizes[first]
+            blocked = False
+            while True:
+                if ahead_length <= behind_length:
+                    if _intersects(xs, ys, sizes, ahead, index):
+                        second = ahead
+                        following[first], preceding[second] = second, first
+                        blocked = True
+                        break
+                    ahead_length += sizes[ahead]
+                    ahead = following[ahead]
+                else:
+                    if _intersects(xs, ys, sizes, behind, index):
+                        first = behind
+                        following[first], preceding[second] = second, first
+                        blocked = True
+                        break
+                    behind_length += sizes[behind]
+                    behind = preceding[behind]
+                if ahead == following[behind]:
+                    break
+            if blocked:
+                continue
+
+            following[first], preceding[index] = index, first
+            following[index], preceding[second] = second, index
+            second = index
+            # Continue from the chain pair whose weighted midpoint is closest to the centre.
+            best, best_score = first, _score(xs, ys, sizes, first, following[first])
+            current = following[first]
+            while current != second:
+                current_score = _score(xs, ys, sizes, current, following[current])
+                if current_score < best_score:
+                    best, best_score = current, current_score
+                current = following[current]
+            first, second = best, following[best]
+            index += 1
+
+    centers: list[list[float]] = [[0.0, 0.0] for _ in radii]
+    for rank, index in enumerate(order):
+        centers[index] = [xs[rank], ys[rank]]
+    return centers
+
+
+def _place(
+    xs: list[float], ys: list[float], sizes: Sequence[float], b: int, a: int, c: int
+) -> None:
+    """Put circle ``c`` tangent to circles ``a`` and ``b``."""
+
+    dx = xs[b] - xs[a]
+    dy = ys[b] - ys[a]
+    squared = dx * dx + dy * dy
+    if not squared:
+        xs[c] = xs[a] + sizes[c]
+        ys[c] = ys[a]
+        return
+    a2 = (sizes[a] + sizes[c]) ** 2
+    b2 = (sizes[b] + sizes[c]) ** 2
+    if a2 > b2:
+        x = (squared + b2 - a2) / (2 * squared)
+        y = math.sqrt(max(0.0, b2 / squared - x * x))
+        xs[c] = xs[b] - x * dx - y * dy
+        ys[c] = ys[b] - x * dy + y * dx
+    else:
+        x = (squared + a2 - b2) / (2 * squared)
+        y = math.sqrt(max(0.0, a2 / squared - x * x))
+        xs[c] = xs[a] + x * dx - y * dy
+        ys[c] = ys[a] + x * dy + y * dx
+
+
+def _intersects(
+    xs: Sequence[float], ys: Sequence[float], sizes: Sequence[float], a: int, b: int
+) -> bool:
+    reach = sizes[a] + sizes[b] - 1e-6
+    dx = xs[b] - xs[a]
+    dy = ys[b] - ys[a]
+    return reach > 0 and reach * reach > dx * dx + dy * dy
+
+
+def _score(
+    xs: Sequence[float], ys: Sequence[float], sizes: Sequence[float], a: int, b: int
+) -> float:
+    total = sizes[a] + sizes[b]
+    x = (xs[a] * sizes[b] + xs[b] * sizes[a]) / total
+    y = (ys[a] * sizes[b] + ys[b] * sizes[a]) / total
+    return x * x + y * y
+
+
+def resolve_overlaps(
+    centers: list[list[float]], radii: Sequence[float], gap: float, *, passes: int = _RESOLVE_PASSES
+) -> bool:
+    """Push overlapping circles apart in place; returns whether no overlap is left.
+
+    Candidate pairs come from a sweep over the circles sorted by their left edge, so a pass
+    only compares circles whose horizontal extents meet. Each overlap is split between the
+    two circles in inverse proportion to their areas, so small spheres give way to large ones.
+    """
+
+    count = len(centers)
+    for _ in range(passes):
+        moved = False
+        order = sorted(range(count), key=lambda index: centers[index][0] - radii[index])
+        for position, first in enumerate(order):
+            right = centers[first][0] + radii[first] + gap
+            for second in order[position + 1 :]:
+                if centers[second][0] - radii[second] > right:
+                    break
+                dx = centers[second][0] - centers[first][0]
+                dy = centers[second][1] - centers[first][1]
+                distance = math.hypot(dx, dy)
+                needed = radii[first] + radii[second] + gap
+                if distance >= needed:
+                    continue
+                if distance < 1e-9:
+                    # Coincident centres: separate along an arbitrary but stable direction.
+                    angle = (first * _GOLDEN_ANGLE) % (2 * math.pi)
+                    dx, dy, distance = math.cos(angle), math.sin(angle), 1.0
+                    overlap = needed
+                else:
+                    overlap = needed - distance
+                first_area = radii[first] ** 2
+                second_area = radii[second] ** 2
+                share = second_area / (first_area + second_area)
+                step_x = dx / distance * overlap
+                step_y = dy / distance * overlap
+                centers[first][0] -= step_x * share
+                centers[first][1] -= step_y * share
+                centers[second][0] += step_x * (1 - share)
+                centers[second][1] += step_y * (1 - share)
+                moved = True
+        if not moved:
+            return True
+    return False
+
+
+def _fit(centers: Sequence[Sequence[float]], radii: Sequence[float]) -> list[Circle]:
+    left = min(center[0] - radius for center, radius in zip(centers, radii, strict=True))
+    right = max(center[0] + radius for center, radius in zip(centers, radii, strict=True))
+    top = min(center[1] - radius for center, radius in zip(centers, radii, strict=True))
+    bottom = max(center[1] + radius for center, radius in zip(centers, radii, strict=True))
+    scale = (1 - 2 * _MARGIN) / max(right - left, bottom - top)
+    middle_x = (left + right) / 2
+    middle_y = (top + bottom) / 2
+    return [
+        Circle(
+            center_x=0.5 + (center[0] - middle_x) * scale,
+            center_y=0.5 + (center[1] - middle_y) * scale,
+            radius=radius * scale,
+        )
+        for center, radius in zip(centers, radii, strict=True)
+    ]
+
+
+def node_counts(session: Session, sphere_ids: Sequence[int]) -> dict[int, int]:
+    counts = dict(
+        session.execute(
+            select(Node.sphere_id, func.count(Node.id))
+            .where(Node.sphere_id.in_(sphere_ids))
+            .group_by(Node.sphere_id)
+        ).all()
+    )
+    return {sphere_id: counts.get(sphere_id, 0) for sphere_id in sphere_ids}
+
+
+def reproject_nodes(
+    session: Session, spheres: Sequence[Sphere], before: Mapping[int, Circle]
+) -> list[int]:
+    """Carry the nodes of ``spheres`` along from their ``before`` circles to the current ones.
+
+    Each node keeps its place relative to the sphere (offset from the centre scaled by the
+    radius ratio) and is then pulled inside the new circle. Spheres that did not move are
+    skipped. Returns the ids of the nodes written, in one chunked bulk update.
+    """
+
+    moves = {
+        sphere.id: (before[sphere.id], Circle.for_sphere(sphere))
+        for sphere in spheres
+        if Circle.for_sphere(sphere) != before[sphere.id]
+    }
+    if not moves:
+        return []
+    positions = []
+    rows = session.execute(
+        select(Node.id, Node.sphere_id, Node.x, Node.y)
+        .where(Node.sphere_id.in_(list(moves)))
+        .order_by(Node.id)
+    )
+    for node_id, sphere_id, x, y in rows:
+        old, new = moves[sphere_id]
+        scale = new.radius / old.radius
+        point = new.project(
+            (
+                new.center_x + (x - old.center_x) * scale,
+                new.center_y + (y - old.center_y) * scale,
+            )
+        )
+        positions.append((node_id, point[0], point[1]))
+    write_positions(session, positions)
+    return [node_id for node_id, _, _ in positions]
+
+
+def circles(spheres: Sequence[Sphere]) -> dict[int, Circle]:
+    return {sphere.id: Circle.for_sphere(sphere) for sphere in spheres}
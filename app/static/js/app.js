@@ -1,4 +1,12 @@
 const DEFAULT_RADIUS = 0.22;
+// Server-packed layouts give small spheres of large organizations radii well below 0.08.
+const MIN_SPHERE_RADIUS = 0.002;
+const MAX_SPHERE_RADIUS = 0.48;
+// Organizations with more nodes open in the clustered overview (/api/map/?lod=type); zooming
+// in past LOD_DETAIL_ZOOM loads every node, zooming back out below LOD_OVERVIEW_ZOOM returns.
+const LOD_NODE_LIMIT = 2000;
+const LOD_DETAIL_ZOOM = 1.5;
+const LOD_OVERVIEW_ZOOM = 0.9;
 const LAYOUT_MODES = ["saved", "radial", "grid"];
 const NODE_TYPES = ["api", "event", "service", "store", "task", "ui"];
 const NODE_STATUSES = ["active", "archived"];
@@ -193,8 +201,8 @@ function normalizeSpherePayload(raw) {
   normalized.center_y = clamp(normalizeNumber(raw.center_y ?? raw.centerY, 0.5), 0, 1);
   normalized.radius = clamp(
     normalizeNumber(raw.radius ?? raw.sphereRadius ?? DEFAULT_RADIUS, DEFAULT_RADIUS),
-    0.08,
-    0.48,
+    MIN_SPHERE_RADIUS,
+    MAX_SPHERE_RADIUS,
   );
   if (typeof raw.color === "string") {
     normalized.color = raw.color;
@@ -437,6 +445,124 @@ async function ensureOk(response, fallbackMessage) {
   throw new Error(detail || fallbackMessage);
 }
 
+const MAP_COLUMNAR_TYPE = "application/vnd.egida.map-columnar";
+const MAP_ACCEPT = `${MAP_COLUMNAR_TYPE}, application/json;q=0.9`;
+const COLUMN_ARRAY_TYPES = { u8: Uint8Array, u32: Uint32Array, f64: Float64Array };
+
+function alignTo8(offset) {
+  return Math.ceil(offset / 8) * 8;
+}
+
+function nullIfNaN(value) {
+  return Number.isNaN(value) ? null : value;
+}
+
+const isoDayCache = new Map();
+
+function pad2(value) {
+  return value < 10 ? `0${value}` : String(value);
+}
+
+function isoFromMicros(value) {
+  // Matches Python's naive datetime.isoformat(): fraction only when non-zero.
+  const seconds = Math.floor(value / 1e6);
+  const fraction = value - seconds * 1e6;
+  const day = Math.floor(seconds / 86400);
+  let date = isoDayCache.get(day);
+  if (date === undefined) {
+    date = new Date(day * 86400000).toISOString().slice(0, 10);
+    isoDayCache.set(day, date);
+  }
+  const inDay = seconds - day * 86400;
+  const time = `${pad2(Math.floor(inDay / 3600))}:${pad2(Math.floor(inDay / 60) % 60)}:${pad2(inDay % 60)}`;
+  return fraction ? `${date}T${time}.${String(fraction).padStart(6, "0")}` : `${date}T${time}`;
+}
+
+// Expands the columnar map body (see app/services/map_columnar.py) into the JSON map shape.
+function decodeColumnarMap(buffer) {
+  const bytes = new Uint8Array(buffer);
+  if (String.fromCharCode(...bytes.subarray(0, 4)) !== "EGMC") {
+    throw new Error("Неизвестный формат карты");
+  }
+  const headerLength = new DataView(buffer).getUint32(4, true);
+  const header = JSON.parse(new TextDecoder().decode(bytes.subarray(8, 8 + headerLength)));
+  const columns = {};
+  let offset = 8 + headerLength;
+  header.columns.forEach(([name, type, length]) => {
+    const ArrayType = COLUMN_ARRAY_TYPES[type];
+    columns[name] = new ArrayType(buffer, offset, length);
+    offset = alignTo8(offset + length * ArrayType.BYTES_PER_ELEMENT);
+  });
+  const strings = header.strings;
+  const parsedJson = new Map();
+  const jsonAt = (index) => {
+    if (!parsedJson.has(index)) {
+      parsedJson.set(index, JSON.parse(strings[index]));
+    }
+    return parsedJson.get(index);
+  };
+  const stringsIn = (values, offsets, index) => {
+    const result = [];
+    for (let cursor = offsets[index]; cursor < offsets[index + 1]; cursor += 1) {
+      result.push(strings[values[cursor]]);
+    }
+    return result;
+  };
+
+  const nodeIds = columns["node.id"];
+  const nodes = new Array(nodeIds.length);
+  for (let index = 0; index < nodeIds.length; index += 1) {
+    nodes[index] = {
+      id: nodeIds[index],
+      sphere_id: columns["node.sphere_id"][index],
+      label: strings[columns["node.label"][index]],
+      node_type: header.node_types[columns["node.node_type"][index]],
+      status: header.statuses[columns["node.status"][index]],
+      summary: strings[columns["node.summary"][index]],
+      position: { x: columns["node.x"][index], y: columns["node.y"][index] },
+      metadata: { ...jsonAt(columns["node.metadata"][index]) },
+      links: stringsIn(columns["node.links"], columns["node.links_offsets"], index),
+      owners: stringsIn(columns["node.owners"], columns["node.owners_offsets"], index),
+      created_at: isoFromMicros(columns["node.created_at"][index]),
+      in_degree: columns["node.in_degree"][index],
+      out_degree: columns["node.out_degree"][index],
+      degrees: jsonAt(columns["node.degrees"][index]),
+      pagerank: nullIfNaN(columns["node.pagerank"][index]),
+      betweenness: nullIfNaN(columns["node.betweenness"][index]),
+    };
+  }
+
+  const edgeIds = columns["edge.id"];
+  const edges = new Array(edgeIds.length);
+  for (let index = 0; index < edgeIds.length; index += 1) {
+    edges[index] = {
+      id: edgeIds[index],
+      sphere_id: columns["edge.sphere_id"][index],
+      source_node_id: columns["edge.source_node_id"][index],
+      target_node_id: columns["edge.target_node_id"][index],
+      relation_type: header.relation_types[columns["edge.relation_type"][index]],
+      metadata: { ...jsonAt(columns["edge.metadata"][index]) },
+      created_at: isoFromMicros(columns["edge.created_at"][index]),
+    };
+  }
+
+  return {
+    organization_id: header.organization_id,
+    version: header.version,
+    spheres: header.spheres,
+    nodes,
+    edges,
+  };
+}
+
+async function readMapPayload(response) {
+  const contentType = response.headers.get("Content-Type") || "";
+  if (contentType.startsWith(MAP_COLUMNAR_TYPE)) {
+    return decodeColumnarMap(await response.arrayBuffer());
+  }
+  return response.json();
+}
+
 function parseCommaSeparated(value) {
   return value
     .split(",")
@@ -463,6 +589,9 @@ class OrgDashboard {
     this.spheres = [];
     this.nodes = [];
     this.edges = [];
+    this.graphVersion = null;
+    this.eventSource = null;
+    this.eventSourceOrgId = "";
     this.renderedLayout = [];
     this.visibleSphereIds = new Set();
     this.layoutMode = "saved";
@@ -522,6 +651,12 @@ class OrgDashboard {
     this.openModalButtons = [];
     this.closeModalButtons = [];
     this.debouncedApplyFilters = debounce(() => this.applyFilters(), 300);
+    this.debouncedSyncChanges = debounce(() => this.syncChanges(), 150);
+    this.debouncedHandleZoom = debounce(() => this.handleZoom(), 200);
+    this.lod = null;
+    this.lodActive = false;
+    this.pendingPositions = new Map();
+    this.debouncedFlushPositions = debounce(() => this.flushPositions(), 150);
     this.documentClickHandler = (event) => this.handleDocumentClick(event);
   }
 
@@ -552,9 +687,16 @@ class OrgDashboard {
         }
       });
       this.cy.on("tap", "node", (event) => {
+        if (event.target.data("clusterId")) {
+          this.cy.zoom({ level: LOD_DETAIL_ZOOM, renderedPosition: event.renderedPosition });
+          return;
+        }
         const id = Number(event.target.data("nodeId"));
         this.openNodeCard(id);
       });
+      this.cy.on("zoom", () => {
+        this.debouncedHandleZoom();
+      });
       this.cy.on("dragfree", "node", (event) => {
         this.handleNodeDrag(event.target);
       });
@@ -584,6 +726,7 @@ class OrgDashboard {
       spheresPanel: root.querySelector('[data-role="spheres-panel"]'),
       sphereList: root.querySelector('[data-role="sphere-list"]'),
       layoutButtons: Array.from(root.querySelectorAll('[data-layout]')),
+      packSpheresButton: root.querySelector('[data-action="pack-spheres"]'),
       quickList: root.querySelector('[data-role="quick-list"]'),
       fabButton: root.querySelector('[data-action="toggle-actions"]'),
       fabMenu: root.querySelector('[data-role="fab-menu"]'),
@@ -710,6 +853,7 @@ class OrgDashboard {
       filterType,
       filterStatus,
       layoutButtons,
+      packSpheresButton,
       fabButton,
       closeNodeButton,
       archiveButton,
@@ -788,6 +932,11 @@ class OrgDashboard {
         });
       });
     }
+    if (packSpheresButton) {
+      packSpheresButton.addEventListener("click", () => {
+        this.packSpheres();
+      });
+    }
     if (fabButton) {
       fabButton.addEventListener("click", (event) => {
         event.stopPropagation();
@@ -1590,6 +1739,8 @@ class OrgDashboard {
     this.spheres = spheres;
     this.nodes = nodes;
     this.edges = edges;
+    const version = Number(payload?.version);
+    this.graphVersion = Number.isFinite(version) ? version : null;
     this.visibleSphereIds = nextVisible;
     if (this.focusSphereId !== null && !incomingIds.includes(this.focusSphereId)) {
       this.focusSphereId = null;
@@ -1643,18 +1794,71 @@ class OrgDashboard {
     return params;
   }
 
+  usesLod() {
+    const total = (this.lod?.clusters || []).reduce((sum, cluster) => sum + cluster.count, 0);
+    return total > LOD_NODE_LIMIT && !(this.filters.search || "").trim();
+  }
+
+  applyLodData(payload) {
+    this.lod = payload;
+    this.lodActive = this.usesLod();
+    if (!this.lodActive) {
+      return false;
+    }
+    this.applyMapData({ version: payload.version, spheres: payload.spheres, nodes: [], edges: [] });
+    return true;
+  }
+
+  async refreshLod() {
+    const params = this.buildMapParams({ search: "" });
+    if (!params) {
+      return false;
+    }
+    params.append("lod", "type");
+    try {
+      const response = await ensureOk(
+        await fetch(`/api/map/?${params.toString()}`, { headers: this.authHeaders() }),
+        "Не удалось загрузить обзор карты",
+      );
+      if (!this.applyLodData(await response.json())) {
+        return this.refreshMap();
+      }
+      this.error = "";
+      this.updateUI();
+      return true;
+    } catch (error) {
+      this.error = error instanceof Error ? error.message : "Ошибка загрузки обзора карты";
+      this.updateUI();
+      return false;
+    }
+  }
+
+  async handleZoom() {
+    if (!this.cy || !this.lod) {
+      return;
+    }
+    const zoom = this.cy.zoom();
+    if (this.lodActive && zoom >= LOD_DETAIL_ZOOM) {
+      this.lodActive = false;
+      await this.refreshMap();
+    } else if (!this.lodActive && zoom <= LOD_OVERVIEW_ZOOM && this.usesLod()) {
+      await this.refreshLod();
+    }
+  }
+
   async refreshMap(overrides = {}) {
     const params = this.buildMapParams(overrides);
     if (!params) {
       return false;
     }
-    const headers = this.authHeaders();
+    this.lodActive = false;
+    const headers = this.authHeaders({ Accept: MAP_ACCEPT });
     try {
       const response = await ensureOk(
         await fetch(`/api/map/?${params.toString()}`, { headers }),
         "Не удалось загрузить карту",
       );
-      const data = await response.json();
+      const data = await readMapPayload(response);
       this.applyMapData(data);
       this.error = "";
       this.updateUI();
@@ -1666,6 +1870,115 @@ class OrgDashboard {
     }
   }
 
+  applyMapChanges(payload) {
+    const mergeById = (current, upserts, deletedIds) => {
+      const removed = new Set((Array.isArray(deletedIds) ? deletedIds : []).map(Number));
+      const merged = new Map();
+      current.forEach((item) => {
+        if (!removed.has(item.id)) {
+          merged.set(item.id, item);
+        }
+      });
+      (Array.isArray(upserts) ? upserts : []).forEach((item) => {
+        const id = Number(item?.id);
+        if (Number.isFinite(id) && !removed.has(id)) {
+          merged.set(id, item);
+        }
+      });
+      return Array.from(merged.values());
+    };
+    const nodes = mergeById(this.nodes, payload.nodes, payload.deleted_node_ids);
+    const nodeIds = new Set(nodes.map((node) => Number(node.id)));
+    const edges = mergeById(this.edges, payload.edges, payload.deleted_edge_ids).filter(
+      (edge) =>
+        nodeIds.has(Number(edge.source_node_id ?? edge.from_node_id)) &&
+        nodeIds.has(Number(edge.target_node_id ?? edge.to_node_id)),
+    );
+    this.applyMapData({
+      version: payload.version,
+      spheres: mergeById(this.spheres, payload.spheres, payload.deleted_sphere_ids),
+      nodes,
+      edges,
+    });
+  }
+
+  async syncChanges() {
+    if (this.lodActive) {
+      return this.refreshLod();
+    }
+    if (this.graphVersion === null || !String(this.organizationId).trim()) {
+      return this.refreshMap();
+    }
+    const params = new URLSearchParams({
+      organization_id: String(this.organizationId).trim(),
+      since: String(this.graphVersion),
+    });
+    try {
+      const response = await ensureOk(
+        await fetch(`/api/map/changes?${params.toString()}`, { headers: this.authHeaders() }),
+        "Не удалось синхронизировать карту",
+      );
+      const data = await response.json();
+      if (data.resync_required) {
+        return this.refreshMap();
+      }
+      this.applyMapChanges(data);
+      this.error = "";
+      this.updateUI();
+      return true;
+    } catch (error) {
+      return this.refreshMap();
+    }
+  }
+
+  handleStreamVersion(event) {
+    let data;
+    try {
+      data = JSON.parse(event.data);
+    } catch (error) {
+      return;
+    }
+    const version = Number(data?.version);
+    if (!Number.isFinite(version)) {
+      return;
+    }
+    if (this.graphVersion === null || version > this.graphVersion) {
+      this.debouncedSyncChanges();
+    }
+  }
+
+  connectStream() {
+    if (typeof window.EventSource !== "function") {
+      return;
+    }
+    const orgId = String(this.organizationId).trim();
+    const token = this.token.trim();
+    if (!orgId || !token) {
+      return;
+    }
+    if (this.eventSource && this.eventSourceOrgId === orgId) {
+      return;
+    }
+    this.disconnectStream();
+    const params = new URLSearchParams({ organization_id: orgId, access_token: token });
+    const source = new EventSource(`/api/map/stream?${params.toString()}`);
+    source.addEventListener("hello", (event) => this.handleStreamVersion(event));
+    source.addEventListener("graph", (event) => this.handleStreamVersion(event));
+    source.addEventListener("resync", () => {
+      this.refreshMap();
+    });
+    this.eventSource = source;
+    this.eventSourceOrgId = orgId;
+  }
+
+  disconnectStream() {
+    if (this.eventSource) {
+      this.eventSource.close();
+    }
+    this.eventSource = null;
+    this.eventSourceOrgId = "";
+  }
+
   mapDimensions() {
     return {
       width: this.graphLayer?.clientWidth || 1280,
@@ -1687,27 +2000,39 @@ class OrgDashboard {
     const orgId = String(organizationId);
     const headers = this.authHeaders();
     const params = new URLSearchParams({ organization_id: orgId });
+    const lodParams = new URLSearchParams({ organization_id: orgId, lod: "type" });
     try {
-      const [mapRes, membersRes, groupsRes] = await Promise.all([
-        fetch(`/api/map/?${params.toString()}`, { headers }),
+      const [lodRes, membersRes, groupsRes] = await Promise.all([
+        fetch(`/api/map/?${lodParams.toString()}`, { headers }),
         fetch(`/api/organizations/${orgId}/members`, { headers }),
         fetch(`/api/organizations/${orgId}/groups`, { headers }),
       ]);
-      await ensureOk(mapRes, "Не удалось загрузить карту");
+      await ensureOk(lodRes, "Не удалось загрузить карту");
       await ensureOk(membersRes, "Не удалось загрузить участников");
       await ensureOk(groupsRes, "Не удалось загрузить группы");
-      const mapData = await mapRes.json();
-      this.applyMapData(mapData);
-      this.members = await membersRes.json();
-      this.groups = await groupsRes.json();
       this.filters = {
         sphereId: "",
         type: "",
         status: "",
         search: "",
       };
-      this.notice = "Данные организации загружены";
+      // Small organizations skip the overview and load every node right away.
+      if (!this.applyLodData(await lodRes.json())) {
+        const mapRes = await ensureOk(
+          await fetch(`/api/map/?${params.toString()}`, {
+            headers: this.authHeaders({ Accept: MAP_ACCEPT }),
+          }),
+          "Не удалось загрузить карту",
+        );
+        this.applyMapData(await readMapPayload(mapRes));
+      }
+      this.members = await membersRes.json();
+      this.groups = await groupsRes.json();
+      this.notice = this.lodActive
+        ? "Обзор организации загружен: приблизьте карту, чтобы увидеть узлы"
+        : "Данные организации загружены";
       this.error = "";
+      this.connectStream();
       this.updateUI();
       return true;
     } catch (error) {
@@ -1741,7 +2066,7 @@ class OrgDashboard {
         id: sphere.id,
         center_x: clamp(normalizeNumber(sphere.center_x, fallback[index].center_x), 0, 1),
         center_y: clamp(normalizeNumber(sphere.center_y, fallback[index].center_y), 0, 1),
-        radius: clamp(normalizeNumber(sphere.radius, fallback[index].radius), 0.08, 0.48),
+        radius: clamp(normalizeNumber(sphere.radius, fallback[index].radius), MIN_SPHERE_RADIUS, MAX_SPHERE_RADIUS),
       }));
     }
     this.renderedLayout = layout;
@@ -1853,7 +2178,7 @@ class OrgDashboard {
       }
       const centerX = clamp(entry.center_x ?? 0.5, 0, 1);
       const centerY = clamp(entry.center_y ?? 0.5, 0, 1);
-      const radius = clamp(entry.radius ?? DEFAULT_RADIUS, 0.08, 0.48);
+      const radius = clamp(entry.radius ?? DEFAULT_RADIUS, MIN_SPHERE_RADIUS, MAX_SPHERE_RADIUS);
       const pxRadius = radius * Math.min(width, height);
       const zone = document.createElement("div");
       zone.className = "sphere-zone";
@@ -1885,6 +2210,10 @@ class OrgDashboard {
     if (!this.cy) {
       return;
     }
+    if (this.lodActive) {
+      this.renderClusters();
+      return;
+    }
     const { width, height } = this.mapDimensions();
     const nodes = this.filteredNodes().map((node) => {
       const layout = this.renderedLayout.find((entry) => entry.id === node.sphere_id);
@@ -1898,7 +2227,7 @@ class OrgDashboard {
           {
             center_x: clamp(layout.center_x, 0, 1),
             center_y: clamp(layout.center_y, 0, 1),
-            radius: clamp(layout.radius, 0.08, 0.48),
+            radius: clamp(layout.radius, MIN_SPHERE_RADIUS, MAX_SPHERE_RADIUS),
           },
         );
         position = { x: projected.x * width, y: projected.y * height };
@@ -1946,6 +2275,58 @@ class OrgDashboard {
     }
   }
 
+  renderClusters() {
+    const { width, height } = this.mapDimensions();
+    const clusters = (this.lod?.clusters || []).filter(
+      (cluster) =>
+        this.visibleSphereIds.has(cluster.sphere_id) &&
+        (this.focusSphereId === null || cluster.sphere_id === this.focusSphereId),
+    );
+    const shown = new Set(clusters.map((cluster) => cluster.id));
+    const nodes = clusters.map((cluster) => {
+      const layout = this.renderedLayout.find((entry) => entry.id === cluster.sphere_id);
+      let point = { x: cluster.x, y: cluster.y };
+      if (layout) {
+        point = projectToCircle(point, {
+          center_x: clamp(layout.center_x, 0, 1),
+          center_y: clamp(layout.center_y, 0, 1),
+          radius: clamp(layout.radius, MIN_SPHERE_RADIUS, MAX_SPHERE_RADIUS),
+        });
+      }
+      const size = 36 + 6 * Math.sqrt(cluster.count);
+      return {
+        group: "nodes",
+        data: {
+          id: `cluster-${cluster.id}`,
+          clusterId: cluster.id,
+          label: `${cluster.node_type || this.sphereById(cluster.sphere_id)?.name || ""} · ${cluster.count}`,
+          sphereId: cluster.sphere_id,
+          color: NODE_COLORS[cluster.node_type] || NODE_COLORS.service,
+        },
+        position: { x: point.x * width, y: point.y * height },
+        style: { width: size, height: size, shape: "ellipse" },
+      };
+    });
+    const edges = (this.lod?.edges || [])
+      .filter((edge) => shown.has(edge.source) && shown.has(edge.target))
+      .map((edge) => ({
+        group: "edges",
+        data: {
+          id: `cluster-edge-${edge.source}-${edge.target}-${edge.relation_type}`,
+          source: `cluster-${edge.source}`,
+          target: `cluster-${edge.target}`,
+          relationType: edge.relation_type,
+          color: EDGE_COLORS[edge.relation_type] || EDGE_COLORS.depends,
+        },
+        style: { width: Math.min(12, 1 + 1.5 * Math.log2(edge.count + 1)) },
+      }));
+
+    this.cy.elements().remove();
+    this.cy.add(nodes);
+    this.cy.add(edges);
+    this.cy.nodes().ungrabify();
+  }
+
   async applyFilters() {
     await this.refreshMap();
   }
@@ -2126,7 +2507,7 @@ class OrgDashboard {
         links: "",
         owners: "",
       };
-      await this.refreshMap();
+      await this.syncChanges();
       this.notice = `Узел "${label}" создан`;
       this.error = "";
       this.updateUI();
@@ -2168,7 +2549,7 @@ class OrgDashboard {
         "Не удалось создать связь",
       );
       this.modals.edge = false;
-      await this.refreshMap();
+      await this.syncChanges();
       this.notice = "Связь создана";
       this.error = "";
       this.edgeForm.source = "";
@@ -2181,6 +2562,32 @@ class OrgDashboard {
     }
   }
 
+  async packSpheres() {
+    const organizationId = this.ensureAuthContext();
+    if (organizationId === null) {
+      return;
+    }
+    const headers = this.authHeaders({ "Content-Type": "application/json" });
+    try {
+      await ensureOk(
+        await fetch("/api/spheres/layout/solve", {
+          method: "POST",
+          headers,
+          body: JSON.stringify({ organization_id: organizationId, mode: "packed" }),
+        }),
+        "Не удалось разложить сферы",
+      );
+      await this.syncChanges();
+      this.applyLayout("saved");
+      this.notice = "Сферы разложены без пересечений";
+      this.error = "";
+      this.updateUI();
+    } catch (error) {
+      this.error = error instanceof Error ? error.message : "Ошибка раскладки сфер";
+      this.updateUI();
+    }
+  }
+
   async createSphere() {
     const organizationId = this.ensureAuthContext();
     if (organizationId === null) {
@@ -2215,7 +2622,7 @@ class OrgDashboard {
         description: "",
         color: "#38bdf8",
       };
-      await this.refreshMap();
+      await this.syncChanges();
       this.notice = `Сфера "${name}" создана`;
       this.error = "";
       this.updateUI();
@@ -2281,7 +2688,7 @@ class OrgDashboard {
       this.edges = data.edges;
       this.notice = "Граф импортирован";
       this.modals.export = false;
-      await this.refreshMap();
+      await this.syncChanges();
       this.updateUI();
     } catch (error) {
       this.error = error instanceof Error ? error.message : "Ошибка импорта";
@@ -2328,7 +2735,7 @@ class OrgDashboard {
         "Не удалось удалить узел",
       );
       this.closeNodeCard();
-      await this.refreshMap();
+      await this.syncChanges();
       this.notice = "Узел удалён";
       this.error = "";
       this.updateUI();
@@ -2349,7 +2756,7 @@ class OrgDashboard {
         }),
         "Не удалось обновить узел",
       );
-      await this.refreshMap();
+      await this.syncChanges();
       this.notice = "Узел обновлён";
       this.error = "";
       this.updateUI();
@@ -2373,7 +2780,7 @@ class OrgDashboard {
       constrained = projectToCircle(relative, {
         center_x: clamp(layout.center_x, 0, 1),
         center_y: clamp(layout.center_y, 0, 1),
-        radius: clamp(layout.radius, 0.08, 0.48),
+        radius: clamp(layout.radius, MIN_SPHERE_RADIUS, MAX_SPHERE_RADIUS),
       });
     }
     const pixels = {
@@ -2381,7 +2788,47 @@ class OrgDashboard {
       y: constrained.y * height,
     };
     cyNode.position(pixels);
-    await this.updateNode(id, { position: constrained });
+    node.position = constrained;
+    // Dragging a selection fires dragfree once per node; save them together.
+    this.pendingPositions.set(id, constrained);
+    this.debouncedFlushPositions();
+  }
+
+  async flushPositions() {
+    if (!this.pendingPositions.size) {
+      return;
+    }
+    const entries = Array.from(this.pendingPositions, ([id, position]) => ({
+      id,
+      x: position.x,
+      y: position.y,
+    }));
+    this.pendingPositions.clear();
+    await this.savePositions(entries);
+  }
+
+  async savePositions(entries) {
+    if (!entries.length) {
+      return;
+    }
+    const headers = this.authHeaders({ "Content-Type": "application/json" });
+    try {
+      await ensureOk(
+        await fetch("/api/nodes/positions", {
+          method: "POST",
+          headers,
+          body: JSON.stringify(entries),
+        }),
+        "Не удалось сохранить положение узлов",
+      );
+      await this.syncChanges();
+      this.notice = entries.length > 1 ? "Положение узлов сохранено" : "Узел обновлён";
+      this.error = "";
+      this.updateUI();
+    } catch (error) {
+      this.error = error instanceof Error ? error.message : "Ошибка сохранения положения узлов";
+      this.updateUI();
+    }
   }
 }
 
@@ -0,0 +1,142 @@
+"""Time building the adjacency index, impact queries and the topology analysis.
+
+Usage: ``python benchmarks/graph_impact.py [edge_count ...]`` (defaults to 100k).
+
+Each size seeds an in-memory SQLite database with ``n / 2`` nodes and ``n`` random
+``depends``/``uses``/``produces`` edges, builds ``app.services.graph_index`` once and then
+runs downstream impact queries from random nodes, with and without a depth limit, one
+SCC/layering pass of ``app.services.graph_topology``, reachability/path queries against
+``app.services.graph_reachability`` and one centrality pass of ``app.services.graph_metrics``.
+"""
+
+from __future__ import annotations
+
+import random
+import statistics
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from sqlalchemy import create_engine, insert  # noqa: E402
+from sqlalchemy.orm import Session  # noqa: E402
+from sqlalchemy.pool import StaticPool  # noqa: E402
+
+from app.core.config import settings  # noqa: E402
+from app.db.base import Base  # noqa: E402
+from app.models import Edge, Node, Organization, Sphere  # noqa: E402
+from app.services import (  # noqa: E402
+    graph_index,
+    graph_metrics,
+    graph_reachability,
+    graph_topology,
+)
+
+_QUERIES = 50
+
+
+def _seed(session: Session, edge_count: int) -> int:
+    organization = Organization(name="Bench", slug="bench")
+    session.add(organization)
+    session.flush()
+    sphere = Sphere(organization_id=organization.id, name="Core")
+    session.add(sphere)
+    session.flush()
+
+    node_count = max(edge_count // 2, 2)
+    session.execute(
+        insert(Node),
+        [
+            {"id": index + 1, "sphere_id": sphere.id, "label": f"Service {index}", "position": {}}
+            for index in range(node_count)
+        ],
+    )
+    rng = random.Random(7)
+    session.execute(
+        insert(Edge),
+        [
+            {
+                "sphere_id": sphere.id,
+                "source_node_id": rng.randint(1, node_count),
+                "target_node_id": rng.randint(1, node_count),
+                "relation_type": rng.choice(("depends", "uses", "produces")),
+                "metadata_json": {},
+            }
+            for _ in range(edge_count)
+        ],
+    )
+    session.commit()
+    return organization.id
+
+
+def _run(edge_count: int) -> None:
+    engine = create_engine(
+        "sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool
+    )
+    Base.metadata.create_all(engine)
+    with Session(engine) as session:
+        organization_id = _seed(session, edge_count)
+        started = time.perf_counter()
+        index = graph_index.build_index(session, organization_id, version=0)
+        index.affects  # noqa: B018 - derive the CSR used by downstream queries
+        build_ms = (time.perf_counter() - started) * 1000
+
+    rng = random.Random(11)
+    for max_depth in (3, None):
+        timings = []
+        reached = []
+        for _ in range(_QUERIES):
+            node_id = index.node_ids[rng.randrange(index.node_count)]
+            started = time.perf_counter()
+            result = graph_index.impact(index, node_id, max_depth=max_depth)
+            timings.append((time.perf_counter() - started) * 1000)
+            reached.append(len(result))
+        print(
+            f"{edge_count:>8} edges  build {build_ms:7.1f} ms  max_depth={max_depth!s:<4}  "
+            f"median {statistics.median(timings):6.2f} ms  max {max(timings):6.2f} ms  "
+            f"reached ~{int(statistics.median(reached))}"
+        )
+
+    started = time.perf_counter()
+    topology = graph_topology.analyze(index)
+    print(
+        f"{edge_count:>8} edges  topology {(time.perf_counter() - started) * 1000:7.1f} ms  "
+        f"cycles {len(topology.cycles)}  layers {len(topology.layers)}"
+    )
+
+    started = time.perf_counter()
+    reachability = graph_reachability.ReachabilityIndex.build(index)
+    build_ms = (time.perf_counter() - started) * 1000
+    node_ids = index.node_ids
+    pairs = [
+        (node_ids[rng.randrange(index.node_count)], node_ids[rng.randrange(index.node_count)])
+        for _ in range(_QUERIES)
+    ]
+    started = time.perf_counter()
+    answers = [reachability.reachable(source, target) for source, target in pairs]
+    check_us = (time.perf_counter() - started) * 1e6 / _QUERIES
+    started = time.perf_counter()
+    for source, target in pairs:
+        reachability.path(source, target)
+    path_ms = (time.perf_counter() - started) * 1000 / _QUERIES
+    print(
+        f"{edge_count:>8} edges  reachability build {build_ms:7.1f} ms  "
+        f"components {reachability.component_count}  check {check_us:6.1f} us  "
+        f"path {path_ms:6.2f} ms  reachable {sum(answers)}/{_QUERIES}"
+    )
+
+    if graph_metrics.available():
+        samples = settings.graph_metrics_samples
+        started = time.perf_counter()
+        graph_metrics.compute(index, samples=samples)
+        print(
+            f"{edge_count:>8} edges  pagerank + betweenness ({samples} sources) "
+            f"{(time.perf_counter() - started) * 1000:7.1f} ms"
+        )
+    engine.dispose()
+
+
+if __name__ == "__main__":
+    for size in [int(arg) for arg in sys.argv[1:]] or [100_000]:
+        _run(size)
@@ -0,0 +1,155 @@
+"""Compare schema-based and column-projected serialization of graph read responses.
+
+Usage: ``python benchmarks/serialize_graph.py [node_count ...]`` (defaults to 10k and 100k).
+
+Each size seeds an in-memory SQLite database with one sphere, ``n`` nodes and ``n - 1``
+edges, then times the ``/api/graph/nodes`` and ``/api/map`` bodies rendered both ways:
+ORM entities validated into ``NodeRead``/``MapNode`` models versus plain rows encoded by
+``app.services.graph_json``. Both paths must produce the same bytes. The size of the
+columnar map body (``app.services.map_columnar``) is reported for comparison.
+"""
+
+from __future__ import annotations
+
+import sys
+import time
+from collections.abc import Callable
+from datetime import datetime, timedelta
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from pydantic import TypeAdapter  # noqa: E402
+from sqlalchemy import create_engine, insert, select  # noqa: E402
+from sqlalchemy.orm import Session  # noqa: E402
+from sqlalchemy.pool import StaticPool  # noqa: E402
+
+from app.db.base import Base  # noqa: E402
+from app.models import Edge, Node, Organization, Sphere  # noqa: E402
+from app.schemas.graph import NodeRead  # noqa: E402
+from app.schemas.map import MapEdge, MapNode  # noqa: E402
+from app.services import graph_json, map_columnar  # noqa: E402
+
+_NODE_LIST = TypeAdapter(list[NodeRead])
+_MAP_NODES = TypeAdapter(list[MapNode])
+_MAP_EDGES = TypeAdapter(list[MapEdge])
+
+
+def _seed(session: Session, count: int) -> None:
+    organization = Organization(name="Bench", slug="bench")
+    session.add(organization)
+    session.flush()
+    sphere = Sphere(organization_id=organization.id, name="Core")
+    session.add(sphere)
+    session.flush()
+
+    started = datetime(2024, 1, 1)
+    session.execute(
+        insert(Node),
+        [
+            {
+                "id": index + 1,
+                "sphere_id": sphere.id,
+                "label": f"Service {index}",
+                "node_type": "service",
+                "status": "archived" if index % 10 == 0 else "active",
+                "summary": f"Handles workload {index}",
+                "position": {"x": (index % 997) / 997, "y": (index % 991) / 991},
+                "metadata_json": {"tier": index % 3, "team": "platform"},
+                "links_json": [f"https://repo/{index}"],
+                "owners_json": ["alice", "bob"],
+                "created_at": started + timedelta(seconds=index),
+            }
+            for index in range(count)
+        ],
+    )
+    session.execute(
+        insert(Edge),
+        [
+            {
+                "sphere_id": sphere.id,
+                "source_node_id": index + 1,
+                "target_node_id": index + 2,
+                "relation_type": "depends",
+                "metadata_json": {},
+                "created_at": started + timedelta(seconds=index),
+            }
+            for index in range(count - 1)
+        ],
+    )
+    session.commit()
+
+
+def _timed(render: Callable[[], bytes]) -> tuple[float, bytes]:
+    started = time.perf_counter()
+    body = render()
+    return time.perf_counter() - started, body
+
+
+def _run(count: int) -> None:
+    engine = create_engine(
+        "sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool
+    )
+    Base.metadata.create_all(engine)
+    with Session(engine) as session:
+        _seed(session, count)
+
+        node_order = (Node.created_at.desc(), Node.id.desc())
+
+        def nodes_schema() -> bytes:
+            session.expunge_all()
+            nodes = session.scalars(select(Node).order_by(*node_order)).all()
+            return _NODE_LIST.dump_json(
+                [NodeRead.model_validate(node) for node in nodes], by_alias=True
+            )
+
+        def nodes_fast() -> bytes:
+            rows = session.execute(select(*graph_json.NODE_COLUMNS).order_by(*node_order)).all()
+            return graph_json.encode_nodes(rows)
+
+        def map_schema() -> bytes:
+            session.expunge_all()
+            nodes = session.scalars(select(Node).order_by(*node_order)).all()
+            edges = session.scalars(select(Edge).order_by(Edge.id)).all()
+            return _MAP_NODES.dump_json(
+                [MapNode.model_validate(node) for node in nodes]
+            ) + _MAP_EDGES.dump_json([MapEdge.model_validate(edge) for edge in edges])
+
+        def map_fast() -> bytes:
+            nodes = session.execute(select(*graph_json.NODE_COLUMNS).order_by(*node_order)).all()
+            edges = session.execute(select(*graph_json.EDGE_COLUMNS).order_by(Edge.id)).all()
+            return graph_json.encode(
+                [graph_json.map_node_record(node) for node in nodes]
+            ) + graph_json.encode([graph_json.map_edge_record(edge) for edge in edges])
+
+        for name, schema, fast in (
+            ("nodes", nodes_schema, nodes_fast),
+            ("map", map_schema, map_fast),
+        ):
+            schema_seconds, schema_body = _timed(schema)
+            fast_seconds, fast_body = _timed(fast)
+            assert schema_body == fast_body, f"{name}: bodies differ"
+            print(
+                f"{count:>7} nodes  {name:<5}  schema {schema_seconds:6.2f}s  "
+                f"projected {fast_seconds:6.2f}s  x{schema_seconds / fast_seconds:4.1f}  "
+                f"{len(fast_body) / 1_000_000:6.1f} MB"
+            )
+
+        def map_columnar_body() -> bytes:
+            nodes = session.execute(select(*graph_json.NODE_COLUMNS).order_by(*node_order)).all()
+            edges = session.execute(select(*graph_json.EDGE_COLUMNS).order_by(Edge.id)).all()
+            return map_columnar.encode_map(
+                organization_id=0, version=0, spheres=[], nodes=nodes, edges=edges
+            )
+
+        columnar_seconds, columnar_body = _timed(map_columnar_body)
+        print(
+            f"{count:>7} nodes  map    columnar {columnar_seconds:6.2f}s  "
+            f"{len(columnar_body) / 1_000_000:6.1f} MB"
+        )
+    engine.dispose()
+
+
+if __name__ == "__main__":
+    for size in [int(arg) for arg in sys.argv[1:]] or [10_000, 100_000]:
+        _run(size)
@@ -3,7 +3,33 @@ from __future__ import annotations
 import sys
 from pathlib import Path
 
+import pytest
+
 
 PROJECT_ROOT = Path(__file__).resolve().parents[1]
 if str(PROJECT_ROOT) not in sys.path:
     sys.path.insert(0, str(PROJECT_ROOT))
+
+
+@pytest.fixture(autouse=True)
+def reset_response_caches():
+    # In-memory test databases reuse organization ids and versions across tests.
+    from app.services.map_cache import map_cache
+    from app.services.principal_cache import principal_cache
+
+    map_cache.clear()
+    principal_cache.clear()
+    yield
+    map_cache.clear()
+    principal_cache.clear()
+
+
+@pytest.fixture(autouse=True)
+def no_background_metrics(monkeypatch):
+    # The worker would recompute against the application database, not the test one.
+    from app.core.config import settings
+    from app.services.graph_metrics import scheduler
+
+    monkeypatch.setattr(settings, "graph_metrics_enabled", False)
+    yield
+    scheduler.clear()
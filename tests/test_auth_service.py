@@ -1,8 +1,12 @@
+from datetime import datetime
+
 import pytest
-from sqlalchemy import create_engine, select
+from fastapi import HTTPException
+from sqlalchemy import create_engine, event, select
 from sqlalchemy.orm import sessionmaker
 
-from app.core.security import verify_password
+from app.api.deps import get_current_user
+from app.core.security import create_access_token, verify_password
 from app.db.base import Base
 from app.models import GroupMembership, InviteStatus, Organization, OrganizationMember, OrganizationRole, User
 from app.models.structures import Group
@@ -11,6 +15,7 @@ from app.schemas.user import UserCreate
 from app.services import auth as auth_service
 from app.services import invites as invite_service
 from app.services import organizations as org_service
+from app.services.principal_cache import Principal, PrincipalCache, principal_cache
 
 
 @pytest.fixture()
@@ -78,3 +83,78 @@ def test_invite_flow_assigns_membership_and_groups(session):
     assert group_membership is not None
 
 
+def _count_queries(session):
+    statements: list[str] = []
+    event.listen(
+        session.get_bind(),
+        "before_cursor_execute",
+        lambda conn, cursor, statement, *args: statements.append(statement),
+    )
+    return statements
+
+
+def test_principal_cache_skips_the_database_until_credentials_change(session):
+    user = auth_service.register_user(
+        session, UserCreate(email="cached@example.com", password="secret123")
+    )
+    tokens = auth_service.issue_tokens(session, user)
+    other = auth_service.register_user(
+        session, UserCreate(email="other@example.com", password="secret123")
+    )
+    statements = _count_queries(session)
+
+    principal = get_current_user(session=session, token=tokens.access_token)
+    assert principal == Principal(
+        id=user.id, email=user.email, is_active=True, created_at=user.created_at
+    )
+    queried = len(statements)
+    assert queried > 0
+    assert get_current_user(session=session, token=tokens.access_token) is principal
+    assert len(statements) == queried
+
+    # A cached signature does not vouch for another payload.
+    forged = create_access_token(str(other.id)).rsplit(".", 1)[0]
+    forged += "." + tokens.access_token.rsplit(".", 1)[1]
+    with pytest.raises(HTTPException):
+        get_current_user(session=session, token=forged)
+
+    token_data = auth_service.request_password_reset(session, user.email)
+    assert token_data is not None
+    auth_service.reset_password(session, token_data[0], "newpass456")
+    assert principal_cache.stats()["entries"] == 0
+    assert get_current_user(session=session, token=tokens.access_token) is not principal
+
+    auth_service.revoke_refresh_token(session, tokens.refresh_token)
+    assert principal_cache.stats()["entries"] == 0
+
+    get_current_user(session=session, token=tokens.access_token)
+    user.is_active = False
+    session.commit()
+    with pytest.raises(HTTPException) as exc_info:
+        get_current_user(session=session, token=tokens.access_token)
+    assert exc_info.value.status_code == 401
+
+
+def test_principal_cache_entries_expire_with_the_token():
+    now = [1000.0]
+    cache = PrincipalCache(max_entries=2, ttl=60, clock=lambda: now[0])
+    principal = Principal(id=1, email="a@example.com", is_active=True, created_at=datetime.utcnow())
+
+    cache.put("h.p.short", principal, expires_at=1010, generation=0)
+    cache.put("h.p.long", principal, expires_at=5000, generation=0)
+    now[0] = 1011
+    assert cache.get("h.p.short") is None
+    assert cache.get("h.p.long") is principal
+    now[0] = 1061
+    assert cache.get("h.p.long") is None
+
+    # A lookup that started before an invalidation does not repopulate the cache.
+    generation = cache.generation(principal.id)
+    cache.invalidate_user(principal.id)
+    cache.put("h.p.stale", principal, expires_at=5000, generation=generation)
+    assert cache.get("h.p.stale") is None
+
+    for signature in ("a", "b", "c"):
+        cache.put(f"h.p.{signature}", principal, expires_at=5000, generation=cache.generation(1))
+    assert cache.get("h.p.a") is None
+    assert cache.stats()["entries"] == 2
@@ -0,0 +1,108 @@
+from __future__ import annotations
+
+import gzip
+
+from fastapi import FastAPI
+from fastapi.responses import PlainTextResponse, StreamingResponse
+from fastapi.testclient import TestClient
+
+from app.core.compression import (
+    CompressionMiddleware,
+    PrecompressedStaticFiles,
+    available_encodings,
+    negotiate,
+)
+
+
+def build_app(static_dir) -> tuple[FastAPI, PrecompressedStaticFiles]:
+    app = FastAPI()
+    app.add_middleware(CompressionMiddleware, minimum_size=100)
+    static_files = PrecompressedStaticFiles(directory=str(static_dir), minimum_size=100)
+    app.mount("/static", static_files, name="static")
+
+    @app.get("/big")
+    def big() -> dict[str, str]:
+        return {"payload": "x" * 500}
+
+    @app.get("/small")
+    def small() -> dict[str, str]:
+        return {"payload": "x"}
+
+    @app.get("/stream")
+    def stream() -> StreamingResponse:
+        return StreamingResponse(
+            (f'{{"line":{index}}}\n' for index in range(200)), media_type="application/x-ndjson"
+        )
+
+    @app.get("/events")
+    def events() -> StreamingResponse:
+        return StreamingResponse(iter(["data: x\n\n" * 100]), media_type="text/event-stream")
+
+    @app.get("/text")
+    def text() -> PlainTextResponse:
+        return PlainTextResponse("y" * 500, headers={"ETag": '"v1"'})
+
+    return app, static_files
+
+
+def test_negotiate_honours_quality_values():
+    assert "gzip" in available_encodings()
+    assert negotiate(None) is None
+    assert negotiate("identity") is None
+    assert negotiate("gzip;q=0") is None
+    assert negotiate("deflate, gzip;q=0.5") == "gzip"
+    assert negotiate("br, zstd, gzip", offered=["gzip"]) == "gzip"
+    assert negotiate("*;q=0.1", offered=["gzip"]) == "gzip"
+
+
+def test_middleware_compresses_large_bodies_only(tmp_path):
+    app, _ = build_app(tmp_path)
+    with TestClient(app) as client:
+        big = client.get("/big", headers={"Accept-Encoding": "gzip"})
+        small = client.get("/small", headers={"Accept-Encoding": "gzip"})
+        plain = client.get("/big", headers={"Accept-Encoding": "identity"})
+        text = client.get("/text", headers={"Accept-Encoding": "gzip"})
+        events = client.get("/events", headers={"Accept-Encoding": "gzip"})
+
+    assert big.headers["content-encoding"] == "gzip"
+    assert big.headers["vary"] == "Accept-Encoding"
+    assert int(big.headers["content-length"]) < len(big.content)
+    assert big.json() == plain.json()
+    assert "content-encoding" not in small.headers
+    assert "content-encoding" not in plain.headers
+    assert text.headers["etag"] == 'W/"v1"'
+    assert "content-encoding" not in events.headers
+
+
+def test_middleware_compresses_streaming_responses(tmp_path):
+    app, _ = build_app(tmp_path)
+    with TestClient(app) as client:
+        response = client.get("/stream", headers={"Accept-Encoding": "gzip"})
+
+    assert response.headers["content-encoding"] == "gzip"
+    assert "content-length" not in response.headers
+    assert response.text.splitlines()[-1] == '{"line":199}'
+
+
+def test_static_files_serve_precompressed_variants(tmp_path):
+    script = "console.log('precompressed');\n" * 50
+    (tmp_path / "app.js").write_text(script)
+    (tmp_path / "tiny.css").write_text("body{}")
+    app, static_files = build_app(tmp_path)
+
+    assert static_files.precompress() == 1
+    with TestClient(app) as client:
+        compressed = client.get("/static/app.js", headers={"Accept-Encoding": "gzip"})
+        identity = client.get("/static/app.js", headers={"Accept-Encoding": "identity"})
+        revalidated = client.get(
+            "/static/app.js",
+            headers={"Accept-Encoding": "gzip", "If-None-Match": compressed.headers["etag"]},
+        )
+
+    assert compressed.headers["content-encoding"] == "gzip"
+    assert compressed.headers["etag"].startswith("W/")
+    assert int(compressed.headers["content-length"]) == len(gzip.compress(script.encode(), 9))
+    assert compressed.text == script
+    assert identity.text == script
+    assert "content-encoding" not in identity.headers
+    assert revalidated.status_code == 304
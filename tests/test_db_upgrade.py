@@ -0,0 +1,170 @@
+import json
+
+import pytest
+from sqlalchemy import create_engine, inspect
+
+from app.db.base import Base
+from app.db.upgrade import upgrade_schema
+
+# Graph tables as the first release created them.
+LEGACY_SCHEMA = (
+    """
+    CREATE TABLE organizations (
+        id INTEGER NOT NULL PRIMARY KEY,
+        owner_id INTEGER,
+        name VARCHAR(200) NOT NULL UNIQUE,
+        slug VARCHAR(200) NOT NULL,
+        description TEXT,
+        created_at DATETIME NOT NULL
+    )
+    """,
+    """
+    CREATE TABLE spheres (
+        id INTEGER NOT NULL PRIMARY KEY,
+        organization_id INTEGER NOT NULL REFERENCES organizations (id) ON DELETE CASCADE,
+        name VARCHAR(200) NOT NULL,
+        description TEXT,
+        color VARCHAR(12),
+        center_x FLOAT,
+        center_y FLOAT,
+        radius FLOAT,
+        created_at DATETIME NOT NULL
+    )
+    """,
+    """
+    CREATE TABLE nodes (
+        id INTEGER NOT NULL PRIMARY KEY,
+        sphere_id INTEGER NOT NULL REFERENCES spheres (id) ON DELETE CASCADE,
+        label VARCHAR(200) NOT NULL,
+        node_type VARCHAR(32) NOT NULL,
+        status VARCHAR(16) NOT NULL,
+        summary TEXT,
+        position JSON NOT NULL,
+        metadata JSON NOT NULL,
+        links JSON NOT NULL,
+        owners JSON NOT NULL,
+        created_at DATETIME NOT NULL
+    )
+    """,
+    """
+    CREATE TABLE edges (
+        id INTEGER NOT NULL PRIMARY KEY,
+        sphere_id INTEGER NOT NULL REFERENCES spheres (id) ON DELETE CASCADE,
+        source_node_id INTEGER NOT NULL REFERENCES nodes (id) ON DELETE CASCADE,
+        target_node_id INTEGER NOT NULL REFERENCES nodes (id) ON DELETE CASCADE,
+        relation_type VARCHAR(24) NOT NULL,
+        metadata JSON NOT NULL,
+        created_at DATETIME NOT NULL
+    )
+    """,
+    "INSERT INTO organizations VALUES (1, NULL, 'Legacy', 'legacy', NULL, '2024-01-01')",
+    "INSERT INTO organizations VALUES (2, NULL, 'Empty', 'empty', NULL, '2024-01-01')",
+    "INSERT INTO spheres VALUES (1, 1, 'core', NULL, NULL, NULL, NULL, NULL, '2024-01-01')",
+    "INSERT INTO nodes VALUES (1, 1, 'Billing api', 'service', 'active', 'Charges cards', "
+    "'{\"x\": 0.2, \"y\": 0.3}', '{}', '[]', '[]', '2024-01-01')",
+    "INSERT INTO nodes VALUES (2, 1, 'Ledger store', 'database', 'active', NULL, "
+    "'{\"x\": 0.6, \"y\": 0.7}', '{}', '[]', '[]', '2024-01-01')",
+    "INSERT INTO nodes VALUES (3, 1, 'Orphan', 'service', 'active', NULL, '{}', '{}', '[]', "
+    "'[]', '2024-01-01')",
+    "INSERT INTO edges VALUES (1, 1, 1, 2, 'depends', '{}', '2024-01-01')",
+    "INSERT INTO edges VALUES (2, 1, 1, 2, 'uses', '{}', '2024-01-01')",
+    "INSERT INTO edges VALUES (3, 1, 2, 2, 'depends', '{}', '2024-01-01')",
+)
+
+
+def _upgraded_legacy_engine(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'legacy.db'}", future=True)
+    with engine.begin() as connection:
+        for statement in LEGACY_SCHEMA:
+            connection.exec_driver_sql(statement)
+
+    # What ``init_database`` does on start, twice to show the upgrade is repeatable.
+    for _ in range(2):
+        Base.metadata.create_all(bind=engine)
+        with engine.begin() as connection:
+            upgrade_schema(connection)
+    return engine
+
+
+def test_upgrade_adds_graph_versions_to_existing_organizations(tmp_path):
+    engine = _upgraded_legacy_engine(tmp_path)
+
+    columns = {column["name"] for column in inspect(engine).get_columns("organizations")}
+    assert {"graph_version", "graph_log_floor", "metrics_version"} <= columns
+    with engine.connect() as connection:
+        rows = connection.exec_driver_sql(
+            "SELECT id, graph_version, graph_log_floor FROM organizations ORDER BY id"
+        ).all()
+    # A client that never saw a version of the non-empty graph has to resync.
+    assert [tuple(row) for row in rows] == [(1, 1, 1), (2, 0, 0)]
+
+
+def test_upgrade_indexes_existing_node_coordinates(tmp_path):
+    engine = _upgraded_legacy_engine(tmp_path)
+
+    with engine.begin() as connection:
+        coordinates = connection.exec_driver_sql("SELECT id, x, y FROM nodes ORDER BY id").all()
+        assert [tuple(row) for row in coordinates] == [(1, 0.2, 0.3), (2, 0.6, 0.7), (3, 0.0, 0.0)]
+        in_viewport = connection.exec_driver_sql(
+            "SELECT id FROM nodes_rtree WHERE max_x >= 0.1 AND min_x <= 0.5 "
+            "AND max_y >= 0.1 AND min_y <= 0.5"
+        ).scalars()
+        assert list(in_viewport) == [1]
+
+        # The triggers follow later moves.
+        connection.exec_driver_sql("UPDATE nodes SET x = 0.9 WHERE id = 1")
+        moved = connection.exec_driver_sql("SELECT min_x FROM nodes_rtree WHERE id = 1")
+        assert moved.scalar_one() == pytest.approx(0.9, abs=1e-6)
+
+
+def _search(connection, expression):
+    rows = connection.exec_driver_sql(
+        "SELECT rowid FROM nodes_fts WHERE nodes_fts MATCH ? ORDER BY rowid", (expression,)
+    )
+    return list(rows.scalars())
+
+
+def test_upgrade_builds_the_node_search_index(tmp_path):
+    engine = _upgraded_legacy_engine(tmp_path)
+
+    with engine.begin() as connection:
+        assert _search(connection, "ledger") == [2]
+        assert _search(connection, "cards") == [1]
+
+        connection.exec_driver_sql("UPDATE nodes SET label = 'Ledger replica' WHERE id = 3")
+        assert _search(connection, "ledger") == [2, 3]
+
+
+def _degrees(connection):
+    rows = connection.exec_driver_sql(
+        "SELECT id, in_degree, out_degree, degrees FROM nodes ORDER BY id"
+    )
+    return [(row[0], row[1], row[2], json.loads(row[3])) for row in rows]
+
+
+def test_upgrade_counts_existing_edges_into_node_degrees(tmp_path):
+    engine = _upgraded_legacy_engine(tmp_path)
+
+    with engine.begin() as connection:
+        assert _degrees(connection) == [
+            (1, 0, 2, {"depends": {"in": 0, "out": 1}, "uses": {"in": 0, "out": 1}}),
+            (2, 3, 1, {"depends": {"in": 2, "out": 1}, "uses": {"in": 1, "out": 0}}),
+            (3, 0, 0, {}),
+        ]
+
+        # The triggers take over from the backfilled counts.
+        connection.exec_driver_sql("DELETE FROM edges WHERE id = 2")
+        assert _degrees(connection)[1] == (2, 2, 1, {"depends": {"in": 2, "out": 1}})
+
+
+def test_upgrade_creates_indexes_added_to_existing_tables(tmp_path):
+    engine = _upgraded_legacy_engine(tmp_path)
+
+    inspector = inspect(engine)
+    assert {"ix_nodes_created", "ix_nodes_sphere_id"} <= {
+        index["name"] for index in inspector.get_indexes("nodes")
+    }
+    assert {"ix_edges_created", "ix_edges_source_node_id", "ix_edges_target_node_id"} <= {
+        index["name"] for index in inspector.get_indexes("edges")
+    }
+    assert "ix_spheres_org_created" in {index["name"] for index in inspector.get_indexes("spheres")}
@@ -0,0 +1,153 @@
+import asyncio
+
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from app.api.deps import get_session_factory
+from app.core.security import create_access_token
+from app.db.base import Base
+from app.main import app
+from app.models import GraphChangeAction, Organization, OrganizationMember, OrganizationRole
+from app.schemas.user import UserCreate
+from app.services import auth as auth_service
+from app.services import graph_changes
+from app.services.graph_events import GraphEventHub
+
+
+@pytest.fixture()
+def session():
+    engine = create_engine("sqlite:///:memory:", future=True)
+    Base.metadata.create_all(bind=engine)
+    testing_session_local = sessionmaker(bind=engine, future=True)
+    with testing_session_local() as session:
+        yield session
+
+
+def make_event(organization_id, version):
+    return graph_changes.GraphChangeEvent(
+        organization_id=organization_id,
+        version=version,
+        changes=((graph_changes.NODE, 7, GraphChangeAction.UPSERT),),
+    )
+
+
+async def test_hub_fans_out_to_organization_subscribers():
+    hub = GraphEventHub(queue_size=4)
+    first = hub.subscribe(1)
+    second = hub.subscribe(1)
+    other = hub.subscribe(2)
+
+    hub.publish(make_event(1, 3))
+    await asyncio.sleep(0)
+
+    for subscription in (first, second):
+        message = subscription.queue.get_nowait()
+        assert message["version"] == 3
+        assert message["changes"] == [{"entity_type": "node", "entity_id": 7, "action": "upsert"}]
+    assert other.queue.empty()
+
+    hub.unsubscribe(first)
+    assert hub.subscriber_count(1) == 1
+
+
+async def test_hub_drops_slow_consumers():
+    hub = GraphEventHub(queue_size=2)
+    slow = hub.subscribe(1)
+
+    for version in range(1, 4):
+        hub.publish(make_event(1, version))
+    await asyncio.sleep(0)
+
+    assert slow.dropped is True
+    assert slow.queue.get_nowait() is None
+    assert hub.subscriber_count(1) == 0
+
+
+def test_listeners_only_see_committed_changes(session):
+    org = Organization(name="Events Org", slug="events-org")
+    session.add(org)
+    session.commit()
+
+    received = []
+    graph_changes.add_listener(received.append)
+    try:
+        graph_changes.record_upsert(session, org.id, graph_changes.NODE, 1)
+        session.rollback()
+        assert received == []
+
+        graph_changes.record_upsert(session, org.id, graph_changes.NODE, 2)
+        session.commit()
+    finally:
+        graph_changes.remove_listener(received.append)
+
+    assert [(event.organization_id, event.changes[0][1]) for event in received] == [(org.id, 2)]
+
+
+async def test_open_stream_does_not_hold_a_pooled_connection(tmp_path):
+    # A single pooled connection: anything the stream keeps checked out starves the app.
+    engine = create_engine(
+        f"sqlite:///{tmp_path / 'stream.db'}",
+        future=True,
+        pool_size=1,
+        max_overflow=0,
+        pool_timeout=1,
+    )
+    Base.metadata.create_all(bind=engine)
+    testing_session_local = sessionmaker(bind=engine, future=True, expire_on_commit=False)
+    with testing_session_local() as session:
+        owner = auth_service.register_user(
+            session, UserCreate(email="owner.stream@example.com", password="secret123")
+        )
+        organization = Organization(name="Stream Org", slug="stream-org", owner_id=owner.id)
+        session.add(organization)
+        session.flush()
+        session.add(
+            OrganizationMember(
+                organization_id=organization.id,
+                user_id=owner.id,
+                role=OrganizationRole.OWNER.value,
+            )
+        )
+        session.commit()
+        token = create_access_token(str(owner.id))
+
+    messages: asyncio.Queue = asyncio.Queue()
+    disconnected = asyncio.Event()
+
+    async def receive():
+        await disconnected.wait()
+        return {"type": "http.disconnect"}
+
+    scope = {
+        "type": "http",
+        "asgi": {"version": "3.0"},
+        "http_version": "1.1",
+        "method": "GET",
+        "scheme": "http",
+        "path": "/api/map/stream",
+        "raw_path": b"/api/map/stream",
+        "root_path": "",
+        "query_string": f"org_id={organization.id}&access_token={token}".encode(),
+        "headers": [(b"host", b"testserver")],
+        "client": ("testclient", 50000),
+        "server": ("testserver", 80),
+    }
+    app.dependency_overrides[get_session_factory] = lambda: testing_session_local
+    try:
+        stream = asyncio.create_task(app(scope, receive, messages.put))
+        start = await asyncio.wait_for(messages.get(), 5)
+        assert start["status"] == 200
+        body = b""
+        while b"event: hello" not in body:
+            body += (await asyncio.wait_for(messages.get(), 5))["body"]
+
+        assert engine.pool.checkedout() == 0
+        with engine.connect() as connection:
+            assert connection.exec_driver_sql("SELECT 1").scalar_one() == 1
+
+        disconnected.set()
+        await asyncio.wait_for(stream, 5)
+    finally:
+        app.dependency_overrides.clear()
+        engine.dispose()
@@ -1,28 +1,68 @@
-﻿import pytest
-from sqlalchemy import create_engine
+﻿import json
+import random
+from typing import List
+
+import pytest
+from fastapi import HTTPException, Response
+from pydantic import TypeAdapter
+from sqlalchemy import create_engine, select, update
 from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
 
 from app.api.routes import graph as graph_routes
 from app.api.routes import spheres as spheres_routes
+from app.core.config import settings
 from app.db.base import Base
-from app.models import Organization, OrganizationMember, OrganizationRole, Sphere
-from app.schemas.graph import EdgeCreate, NodeCreate, NodeUpdate
+from app.models import Edge, Node, Organization, OrganizationMember, OrganizationRole, Sphere
+from app.schemas.graph import (
+    EdgeCreate,
+    EdgeRead,
+    EdgeUpdate,
+    GraphBatchRequest,
+    GraphExportResponse,
+    GraphImportPayload,
+    NodeCreate,
+    NodePosition,
+    NodeRead,
+    NodeUpdate,
+)
 from app.schemas.organization import SphereCreate
 from app.schemas.user import UserCreate
 from app.services import auth as auth_service
+from app.services import (
+    graph_import,
+    graph_index,
+    graph_metrics,
+    graph_reachability,
+    graph_topology,
+    graph_versions,
+)
+from app.services.pagination import NEXT_CURSOR_HEADER
 
 
 @pytest.fixture()
 def session():
-    engine = create_engine("sqlite:///:memory:", future=True)
+    # Streamed responses read from a worker thread, like the application engine allows.
+    engine = create_engine(
+        "sqlite:///:memory:",
+        future=True,
+        connect_args={"check_same_thread": False},
+        poolclass=StaticPool,
+    )
     Base.metadata.create_all(bind=engine)
     TestingSessionLocal = sessionmaker(bind=engine, future=True)
     with TestingSessionLocal() as session:
         yield session
 
 
+def decode(response, model):
+    return [model.model_validate(item) for item in json.loads(response.body)]
+
+
 def bootstrap_org(session):
-    owner = auth_service.register_user(session, UserCreate(email="owner.graph@example.com", password="secret123"))
+    owner = auth_service.register_user(
+        session, UserCreate(email="owner.graph@example.com", password="secret123")
+    )
     org = Organization(name="Graph Org", slug="graph-org", owner_id=owner.id)
     session.add(org)
     session.flush()
@@ -56,13 +96,16 @@ def test_node_and_edge_crud(session):
     assert created_node.node_type == "api"
     assert created_node.links == ["https://repo", "https://ci"]
 
-    listed = graph_routes.list_nodes(
-        organization_id=org.id,
-        sphere_id=sphere.id,
-        node_type="api",
-        status_filter="active",
-        current_user=owner,
-        session=session,
+    listed = decode(
+        graph_routes.list_nodes(
+            organization_id=org.id,
+            sphere_id=sphere.id,
+            node_type="api",
+            status_filter="active",
+            current_user=owner,
+            session=session,
+        ),
+        NodeRead,
     )
     assert len(listed) == 1
 
@@ -99,12 +142,15 @@ def test_node_and_edge_crud(session):
     created_edge = graph_routes.create_edge(edge_payload, owner, session)
     assert created_edge.relation_type == "uses"
 
-    edges = graph_routes.list_edges(
-        organization_id=org.id,
-        sphere_id=sphere.id,
-        relation_type=None,
-        current_user=owner,
-        session=session,
+    edges = decode(
+        graph_routes.list_edges(
+            organization_id=org.id,
+            sphere_id=sphere.id,
+            relation_type=None,
+            current_user=owner,
+            session=session,
+        ),
+        EdgeRead,
     )
     assert len(edges) == 1
 
@@ -112,13 +158,16 @@ def test_node_and_edge_crud(session):
     graph_routes.delete_node(created_node_2.id, owner, session)
     graph_routes.delete_node(created_node.id, owner, session)
 
-    remaining_nodes = graph_routes.list_nodes(
-        organization_id=org.id,
-        sphere_id=None,
-        node_type=None,
-        status_filter=None,
-        current_user=owner,
-        session=session,
+    remaining_nodes = decode(
+        graph_routes.list_nodes(
+            organization_id=org.id,
+            sphere_id=None,
+            node_type=None,
+            status_filter=None,
+            current_user=owner,
+            session=session,
+        ),
+        NodeRead,
     )
     assert remaining_nodes == []
 
@@ -146,3 +195,1215 @@ def test_sphere_create_accepts_camel_case_payload(session):
     assert created.center_y == 0.4
     assert created.radius == 0.25
 
+
+def test_list_nodes_keyset_pagination(session):
+    owner, org, sphere = bootstrap_org(session)
+    created_ids = [
+        graph_routes.create_node(
+            NodeCreate(sphere_id=sphere.id, label=f"Node {index}", position={"x": 0.1, "y": 0.1}),
+            owner,
+            session,
+        ).id
+        for index in range(5)
+    ]
+
+    seen_ids = []
+    cursor = None
+    while True:
+        response = Response()
+        page = decode(
+            graph_routes.list_nodes(
+                organization_id=org.id,
+                sphere_id=None,
+                node_type=None,
+                status_filter=None,
+                search=None,
+                limit=2,
+                cursor=cursor,
+                response=response,
+                current_user=owner,
+                session=session,
+            ),
+            NodeRead,
+        )
+        assert len(page) <= 2
+        seen_ids.extend(node.id for node in page)
+        cursor = response.headers.get(NEXT_CURSOR_HEADER)
+        if cursor is None:
+            break
+
+    assert seen_ids == sorted(created_ids, reverse=True)
+
+    with pytest.raises(HTTPException) as exc_info:
+        graph_routes.list_nodes(
+            organization_id=org.id,
+            sphere_id=None,
+            node_type=None,
+            status_filter=None,
+            search=None,
+            limit=2,
+            cursor="garbage",
+            current_user=owner,
+            session=session,
+        )
+    assert exc_info.value.status_code == 400
+
+
+async def test_export_graph_streams_ndjson(session):
+    owner, org, sphere = bootstrap_org(session)
+    first = graph_routes.create_node(
+        NodeCreate(sphere_id=sphere.id, label="Source", position={"x": 0.1, "y": 0.1}),
+        owner,
+        session,
+    )
+    second = graph_routes.create_node(
+        NodeCreate(sphere_id=sphere.id, label="Target", position={"x": 0.2, "y": 0.2}),
+        owner,
+        session,
+    )
+    edge = graph_routes.create_edge(
+        EdgeCreate(sphere_id=sphere.id, source_node_id=first.id, target_node_id=second.id),
+        owner,
+        session,
+    )
+
+    streamed = graph_routes.export_graph(
+        organization_id=org.id, export_format="ndjson", current_user=owner, session=session
+    )
+    assert streamed.media_type == "application/x-ndjson"
+    body = b"".join([chunk async for chunk in streamed.body_iterator])
+    records = [json.loads(line) for line in body.decode("utf-8").splitlines()]
+
+    assert records[0] == {"type": "export", "data": {"organization_id": org.id, "version": 3}}
+    assert [(record["type"], record["data"]["id"]) for record in records[1:]] == [
+        ("sphere", sphere.id),
+        ("node", first.id),
+        ("node", second.id),
+        ("edge", edge.id),
+    ]
+    assert records[2]["data"]["label"] == "Source"
+
+
+def test_read_endpoints_match_schema_serialization(session):
+    owner, org, sphere = bootstrap_org(session)
+    first = graph_routes.create_node(
+        NodeCreate(
+            sphere_id=sphere.id,
+            label="Платёжный шлюз \"v2\"",
+            node_type="api",
+            summary="Line\nbreak",
+            position={"x": 1, "y": 1e-7},
+            metadata={"stack": ["fastapi", 3.5, None], "nested": {"ok": True}},
+            links=["https://repo"],
+            owners=["alice", "bob"],
+        ),
+        owner,
+        session,
+    )
+    second = graph_routes.create_node(
+        NodeCreate(
+            sphere_id=sphere.id, label="Ledger", status="archived", position={"x": 0.25, "y": 0.75}
+        ),
+        owner,
+        session,
+    )
+    graph_routes.create_edge(
+        EdgeCreate(
+            sphere_id=sphere.id,
+            source_node_id=first.id,
+            target_node_id=second.id,
+            metadata={"weight": 2},
+        ),
+        owner,
+        session,
+    )
+    nodes = {node.id: node for node in session.scalars(select(Node)).all()}
+    edges = {edge.id: edge for edge in session.scalars(select(Edge)).all()}
+
+    def expected(model, rows):
+        return TypeAdapter(List[model]).dump_json(
+            [model.model_validate(row) for row in rows], by_alias=True
+        )
+
+    listed = graph_routes.list_nodes(
+        organization_id=org.id,
+        sphere_id=None,
+        node_type=None,
+        status_filter=None,
+        search=None,
+        current_user=owner,
+        session=session,
+    )
+    order = [item["id"] for item in json.loads(listed.body)]
+    assert listed.body == expected(NodeRead, [nodes[node_id] for node_id in order])
+
+    found = graph_routes.search_nodes(
+        organization_id=org.id, q="ledger", current_user=owner, session=session
+    )
+    assert found.body == expected(NodeRead, [nodes[second.id]])
+
+    listed_edges = graph_routes.list_edges(
+        organization_id=org.id,
+        sphere_id=None,
+        relation_type=None,
+        current_user=owner,
+        session=session,
+    )
+    order = [item["id"] for item in json.loads(listed_edges.body)]
+    assert listed_edges.body == expected(EdgeRead, [edges[edge_id] for edge_id in order])
+
+    exported = graph_routes.export_graph(
+        organization_id=org.id, export_format="json", current_user=owner, session=session
+    )
+    data = json.loads(exported.body)
+    assert exported.body == GraphExportResponse(
+        organization_id=org.id,
+        spheres=[sphere.id],
+        nodes=[NodeRead.model_validate(nodes[item["id"]]) for item in data["nodes"]],
+        edges=[EdgeRead.model_validate(edges[item["id"]]) for item in data["edges"]],
+    ).model_dump_json(by_alias=True).encode("utf-8")
+
+
+def test_search_nodes_uses_full_text_index(session):
+    owner, org, sphere = bootstrap_org(session)
+
+    def make_node(label, summary=None, owners=()):
+        payload = NodeCreate(
+            sphere_id=sphere.id,
+            label=label,
+            summary=summary,
+            owners=list(owners),
+            position={"x": 0.5, "y": 0.5},
+        )
+        return graph_routes.create_node(payload, owner, session)
+
+    mention = make_node("Ledger", summary="Feeds the billing pipeline")
+    billing = make_node("Billing Service")
+    shared = make_node("Шлюз платежей", owners=["alice"])
+
+    def search(q):
+        nodes = decode(
+            graph_routes.search_nodes(
+                organization_id=org.id, q=q, current_user=owner, session=session
+            ),
+            NodeRead,
+        )
+        return [node.id for node in nodes]
+
+    assert search("bill") == [billing.id, mention.id]
+    assert search("ШЛЮЗ") == [shared.id]
+    assert search("alice") == [shared.id]
+    assert search("billing ledger") == [mention.id]
+
+    graph_routes.update_node(billing.id, NodeUpdate(label="Invoices"), owner, session)
+    assert search("bill") == [mention.id]
+    assert search("invoice") == [billing.id]
+
+    graph_routes.delete_node(mention.id, owner, session)
+    assert search("bill") == []
+
+
+def test_import_graph_maps_payload_ids_and_replaces_edges(session, monkeypatch):
+    owner, org, sphere = bootstrap_org(session)
+    kept = graph_routes.create_node(
+        NodeCreate(sphere_id=sphere.id, label="Kept", position={"x": 0.1, "y": 0.1}), owner, session
+    )
+    other = graph_routes.create_node(
+        NodeCreate(sphere_id=sphere.id, label="Other", position={"x": 0.2, "y": 0.2}),
+        owner,
+        session,
+    )
+    graph_routes.create_edge(
+        EdgeCreate(sphere_id=sphere.id, source_node_id=kept.id, target_node_id=other.id),
+        owner,
+        session,
+    )
+    monkeypatch.setattr(settings, "graph_import_chunk_size", 2)
+
+    def node(node_id, label, x):
+        return {
+            "id": node_id,
+            "sphere_id": sphere.id,
+            "label": label,
+            "position": {"x": x, "y": 0.5},
+            "owners": ["ops"],
+            "created_at": "2024-01-01T00:00:00",
+        }
+
+    def edge(source, target):
+        return {
+            "id": 0,
+            "sphere_id": sphere.id,
+            "source_node_id": source,
+            "target_node_id": target,
+            "relation_type": "depends",
+            "created_at": "2024-01-01T00:00:00",
+        }
+
+    payload = GraphImportPayload.model_validate(
+        {
+            "organization_id": org.id,
+            "nodes": [
+                node(kept.id, "Kept v2", 0.9),
+                node(9001, "New A", 0.3),
+                node(9002, "New B", 0.4),
+            ],
+            "edges": [edge(kept.id, 9001), edge(9001, 9002), edge(9002, kept.id)],
+        }
+    )
+    result = graph_routes.import_graph(payload, owner, session)
+
+    assert [item.label for item in result.nodes] == ["Kept v2", "New A", "New B"]
+    assert result.nodes[0].id == kept.id
+    assert result.nodes[0].owners == ["ops"]
+    new_a, new_b = result.nodes[1].id, result.nodes[2].id
+    assert {new_a, new_b}.isdisjoint({9001, 9002, kept.id, other.id})
+    assert [(item.source_node_id, item.target_node_id) for item in result.edges] == [
+        (kept.id, new_a),
+        (new_a, new_b),
+        (new_b, kept.id),
+    ]
+
+    edges = decode(
+        graph_routes.list_edges(
+            organization_id=org.id,
+            sphere_id=None,
+            relation_type=None,
+            current_user=owner,
+            session=session,
+        ),
+        EdgeRead,
+    )
+    assert {(item.source_node_id, item.target_node_id) for item in edges} == {
+        (kept.id, new_a),
+        (new_a, new_b),
+        (new_b, kept.id),
+    }
+
+    found = decode(
+        graph_routes.search_nodes(
+            organization_id=org.id,
+            q="kept",
+            current_user=owner,
+            session=session,
+        ),
+        NodeRead,
+    )
+    assert [item.label for item in found] == ["Kept v2"]
+
+
+def test_failed_import_leaves_the_graph_untouched(session, monkeypatch):
+    owner, org, sphere = bootstrap_org(session)
+    source = graph_routes.create_node(
+        NodeCreate(sphere_id=sphere.id, label="Source"), owner, session
+    )
+    target = graph_routes.create_node(
+        NodeCreate(sphere_id=sphere.id, label="Target"), owner, session
+    )
+    graph_routes.create_edge(
+        EdgeCreate(sphere_id=sphere.id, source_node_id=source.id, target_node_id=target.id),
+        owner,
+        session,
+    )
+    version = graph_versions.current_version(session, org.id)
+    monkeypatch.setattr(settings, "graph_import_chunk_size", 1)
+    insert_rows = graph_import._ChunkWriter.insert
+
+    def failing_insert(writer, model, rows):
+        if model is Edge:
+            raise RuntimeError("disk full")
+        return insert_rows(writer, model, rows)
+
+    monkeypatch.setattr(graph_import._ChunkWriter, "insert", failing_insert)
+    payload = GraphImportPayload.model_validate(
+        {
+            "organization_id": org.id,
+            "nodes": [
+                {
+                    "id": node.id,
+                    "sphere_id": sphere.id,
+                    "label": f"{node.label} v2",
+                    "position": {"x": 0.5, "y": 0.5},
+                    "created_at": "2024-01-01T00:00:00",
+                }
+                for node in (source, target)
+            ],
+            "edges": [
+                {
+                    "id": 0,
+                    "sphere_id": sphere.id,
+                    "source_node_id": target.id,
+                    "target_node_id": source.id,
+                    "relation_type": "depends",
+                    "created_at": "2024-01-01T00:00:00",
+                }
+            ],
+        }
+    )
+    with pytest.raises(RuntimeError):
+        graph_routes.import_graph(payload, owner, session)
+
+    # The edge delete and the node updates before the failure were rolled back with it.
+    edges = session.execute(select(Edge.source_node_id, Edge.target_node_id)).all()
+    assert [tuple(edge) for edge in edges] == [(source.id, target.id)]
+    assert set(session.scalars(select(Node.label))) == {"Source", "Target"}
+    assert graph_versions.current_version(session, org.id) == version
+
+
+def test_import_graph_diff_mode_touches_only_changed_rows(session):
+    owner, org, sphere = bootstrap_org(session)
+    exported = {
+        "organization_id": org.id,
+        "nodes": [
+            {
+                "id": 501,
+                "sphere_id": sphere.id,
+                "label": "Orders",
+                "position": {"x": 0.1, "y": 0.1},
+            },
+            {
+                "id": 502,
+                "sphere_id": sphere.id,
+                "label": "Billing",
+                "position": {"x": 0.2, "y": 0.2},
+            },
+            {
+                "id": 503,
+                "sphere_id": sphere.id,
+                "label": "Legacy",
+                "position": {"x": 0.3, "y": 0.3},
+            },
+        ],
+        "edges": [
+            {
+                "sphere_id": sphere.id,
+                "source_node_id": 501,
+                "target_node_id": 502,
+                "relation_type": "uses",
+            },
+            {
+                "sphere_id": sphere.id,
+                "source_node_id": 502,
+                "target_node_id": 503,
+                "relation_type": "uses",
+            },
+        ],
+        "mode": "diff",
+        "matchBy": "label",
+    }
+    for item in exported["nodes"] + exported["edges"]:
+        item.setdefault("id", 0)
+        item["created_at"] = "2024-01-01T00:00:00"
+
+    first = graph_routes.import_graph(GraphImportPayload.model_validate(exported), owner, session)
+    assert first.summary.nodes_inserted == 3
+    assert first.summary.edges_inserted == 2
+    orders_id = first.nodes[0].id
+
+    version = graph_versions.current_version(session, org.id)
+    again = graph_routes.import_graph(GraphImportPayload.model_validate(exported), owner, session)
+    assert again.summary.nodes_unchanged == 3
+    assert again.summary.edges_unchanged == 2
+    assert [item.id for item in again.nodes] == [item.id for item in first.nodes]
+    assert graph_versions.current_version(session, org.id) == version
+
+    exported["nodes"][0]["summary"] = "Takes orders"
+    exported["nodes"].pop()
+    exported["nodes"].append(
+        {
+            "id": 504,
+            "sphere_id": sphere.id,
+            "label": "Payments",
+            "position": {"x": 0.4, "y": 0.4},
+            "created_at": "2024-01-01T00:00:00",
+        }
+    )
+    exported["edges"][1]["target_node_id"] = 504
+    changed = graph_routes.import_graph(GraphImportPayload.model_validate(exported), owner, session)
+
+    assert changed.summary.model_dump() == {
+        "nodes_inserted": 1,
+        "nodes_updated": 1,
+        "nodes_deleted": 1,
+        "nodes_unchanged": 1,
+        "edges_inserted": 1,
+        "edges_updated": 0,
+        "edges_deleted": 1,
+        "edges_unchanged": 1,
+    }
+    assert changed.nodes[0].id == orders_id
+    assert changed.nodes[0].summary == "Takes orders"
+    remaining = decode(
+        graph_routes.list_nodes(
+            organization_id=org.id,
+            sphere_id=None,
+            node_type=None,
+            status_filter=None,
+            current_user=owner,
+            session=session,
+        ),
+        NodeRead,
+    )
+    assert sorted(item.label for item in remaining) == ["Billing", "Orders", "Payments"]
+
+
+def test_import_graph_diff_mode_treats_null_json_columns_as_empty(session):
+    owner, org, sphere = bootstrap_org(session)
+    node = graph_routes.create_node(
+        NodeCreate(sphere_id=sphere.id, label="Legacy", position={"x": 0.5, "y": 0.5}),
+        owner,
+        session,
+    )
+    # JSON nulls, as rows written by older versions or by hand can hold.
+    session.execute(
+        update(Node)
+        .where(Node.id == node.id)
+        .values(position={}, metadata_json=None, links_json=None, owners_json=None)
+    )
+    session.commit()
+
+    payload = {
+        "organization_id": org.id,
+        "mode": "diff",
+        "nodes": [
+            {
+                "id": node.id,
+                "sphere_id": sphere.id,
+                "label": "Legacy",
+                "position": {"x": 0.5, "y": 0.5},
+                "metadata_json": {},
+                "links_json": [],
+                "owners_json": [],
+                "created_at": "2024-01-01T00:00:00",
+            }
+        ],
+        "edges": [],
+    }
+    version = graph_versions.current_version(session, org.id)
+    result = graph_routes.import_graph(GraphImportPayload.model_validate(payload), owner, session)
+    assert result.summary.nodes_unchanged == 1
+    assert result.summary.nodes_updated == 0
+    assert graph_versions.current_version(session, org.id) == version
+
+
+def test_graph_batch_applies_operations_in_one_transaction(session):
+    owner, org, sphere = bootstrap_org(session)
+    existing = graph_routes.create_node(
+        NodeCreate(sphere_id=sphere.id, label="Existing", position={"x": 0.1, "y": 0.1}),
+        owner,
+        session,
+    )
+    version = graph_versions.current_version(session, org.id)
+
+    def create(temp_id, label):
+        return {
+            "op": "create_node",
+            "tempId": temp_id,
+            "node": {"sphere_id": sphere.id, "label": label, "position": {"x": 0.5, "y": 0.5}},
+        }
+
+    def link(temp_id, source, target):
+        return {
+            "op": "create_edge",
+            "temp_id": temp_id,
+            "edge": {"sphere_id": sphere.id, "source_node_id": source, "target_node_id": target},
+        }
+
+    batch = GraphBatchRequest.model_validate(
+        {
+            "operations": [
+                create("api", "Gateway"),
+                create("db", "Database"),
+                create("tmp", "Scratch"),
+                link("e1", "api", "db"),
+                link("e2", existing.id, "api"),
+                link("e3", "tmp", "db"),
+                {"op": "update_node", "id": "db", "node": {"summary": "Primary store"}},
+                {"op": "update_edge", "id": "e1", "edge": {"relation_type": "uses"}},
+                {"op": "delete_node", "id": "tmp"},
+            ]
+        }
+    )
+    result = graph_routes.apply_graph_batch(batch, owner, session)
+
+    assert set(result.temp_ids) == {"api", "db", "e1", "e2"}
+    assert [node.label for node in result.nodes] == ["Gateway", "Database"]
+    assert result.nodes[1].summary == "Primary store"
+    assert [
+        (edge.source_node_id, edge.target_node_id, edge.relation_type) for edge in result.edges
+    ] == [
+        (result.temp_ids["api"], result.temp_ids["db"], "uses"),
+        (existing.id, result.temp_ids["api"], "depends"),
+    ]
+    assert len(result.deleted_node_ids) == 1
+    assert len(result.deleted_edge_ids) == 1
+    assert graph_versions.current_version(session, org.id) == version + 1
+
+    failing = GraphBatchRequest.model_validate(
+        {"operations": [create("a", "Orphan"), link("x", "a", "missing")]}
+    )
+    with pytest.raises(HTTPException) as exc_info:
+        graph_routes.apply_graph_batch(failing, owner, session)
+    assert exc_info.value.status_code == 400
+    assert exc_info.value.detail == "Operation 1: Unknown temporary id"
+    labels = {
+        node.label
+        for node in decode(
+            graph_routes.list_nodes(
+                organization_id=org.id,
+                sphere_id=None,
+                node_type=None,
+                status_filter=None,
+                current_user=owner,
+                session=session,
+            ),
+            NodeRead,
+        )
+    }
+    assert labels == {"Existing", "Gateway", "Database"}
+
+
+def test_update_node_positions_writes_all_nodes(session):
+    owner, org, sphere = bootstrap_org(session)
+    nodes = [
+        graph_routes.create_node(
+            NodeCreate(sphere_id=sphere.id, label=f"Node {index}", position={"x": 0.5, "y": 0.5}),
+            owner,
+            session,
+        )
+        for index in range(3)
+    ]
+    version = graph_versions.current_version(session, org.id)
+
+    moves = [
+        NodePosition(id=node.id, x=0.1 * (index + 1), y=0.9) for index, node in enumerate(nodes)
+    ]
+    result = graph_routes.update_node_positions(moves, owner, session)
+
+    assert result.updated == 3
+    assert graph_versions.current_version(session, org.id) == version + 1
+    listed = {
+        node.id: node.position
+        for node in decode(
+            graph_routes.list_nodes(
+                organization_id=org.id,
+                sphere_id=None,
+                node_type=None,
+                status_filter=None,
+                current_user=owner,
+                session=session,
+            ),
+            NodeRead,
+        )
+    }
+    assert listed == {move.id: {"x": move.x, "y": move.y} for move in moves}
+
+    with pytest.raises(HTTPException) as exc_info:
+        graph_routes.update_node_positions([NodePosition(id=9999, x=0, y=0)], owner, session)
+    assert exc_info.value.status_code == 404
+
+
+def test_graph_impact_follows_failure_direction(session):
+    graph_index.index_cache.clear()
+    owner, org, sphere = bootstrap_org(session)
+    nodes = {
+        label: graph_routes.create_node(
+            NodeCreate(sphere_id=sphere.id, label=label, position={"x": 0.5, "y": 0.5}),
+            owner,
+            session,
+        ).id
+        for label in ("gateway", "auth", "db", "queue", "worker", "isolated")
+    }
+    for source, target, relation in (
+        ("gateway", "auth", "uses"),
+        ("auth", "db", "depends"),
+        ("auth", "queue", "produces"),
+        ("worker", "queue", "consumes"),
+    ):
+        graph_routes.create_edge(
+            EdgeCreate(
+                sphere_id=sphere.id,
+                source_node_id=nodes[source],
+                target_node_id=nodes[target],
+                relation_type=relation,
+            ),
+            owner,
+            session,
+        )
+
+    def impact(label, direction="downstream", relation_types=None, max_depth=None):
+        response = graph_routes.graph_impact(
+            node_id=nodes[label],
+            direction=direction,
+            relation_types=relation_types,
+            max_depth=max_depth,
+            current_user=owner,
+            session=session,
+        )
+        names = {node_id: label for label, node_id in nodes.items()}
+        return {
+            names[item["id"]]: (item["depth"], names[item["via"]])
+            for item in json.loads(response.body)["nodes"]
+        }
+
+    assert impact("db") == {
+        "auth": (1, "db"),
+        "gateway": (2, "auth"),
+        "queue": (2, "auth"),
+        "worker": (3, "queue"),
+    }
+    assert impact("gateway", "upstream") == {"auth": (1, "gateway"), "db": (2, "auth")}
+    assert impact("db", max_depth=1) == {"auth": (1, "db")}
+    assert impact("db", relation_types="uses, depends") == {
+        "auth": (1, "db"),
+        "gateway": (2, "auth"),
+    }
+    assert impact("isolated", "both") == {}
+    assert graph_index.index_cache.stats()["misses"] == 1
+
+    graph_routes.update_node_positions([NodePosition(id=nodes["db"], x=0.1, y=0.2)], owner, session)
+    assert impact("queue", "both")["gateway"] == (2, "auth")
+    assert graph_index.index_cache.stats()["misses"] == 1
+
+    graph_routes.create_edge(
+        EdgeCreate(
+            sphere_id=sphere.id,
+            source_node_id=nodes["isolated"],
+            target_node_id=nodes["worker"],
+            relation_type="depends",
+        ),
+        owner,
+        session,
+    )
+    assert impact("db")["isolated"] == (4, "worker")
+    assert graph_index.index_cache.stats()["misses"] == 2
+
+    with pytest.raises(HTTPException) as exc_info:
+        impact("db", relation_types="calls")
+    assert exc_info.value.status_code == 400
+    with pytest.raises(HTTPException) as exc_info:
+        graph_routes.graph_impact(
+            node_id=9999,
+            direction="downstream",
+            relation_types=None,
+            max_depth=None,
+            current_user=owner,
+            session=session,
+        )
+    assert exc_info.value.status_code == 404
+
+
+def test_cached_index_follows_nodes_moved_to_another_sphere(session):
+    graph_index.index_cache.clear()
+    owner, org, sphere = bootstrap_org(session)
+    other = Sphere(organization_id=org.id, name="Edge", color="#f97316")
+    session.add(other)
+    session.commit()
+    node = graph_routes.create_node(
+        NodeCreate(sphere_id=sphere.id, label="Mover", position={"x": 0.5, "y": 0.5}),
+        owner,
+        session,
+    )
+    version = graph_versions.current_version(session, org.id)
+    index = graph_index.index_cache.get(session, org.id, version)
+    assert list(index.node_spheres) == [sphere.id]
+    misses = graph_index.index_cache.stats()["misses"]
+
+    # A diff import that only moves a known node keeps the cached index.
+    payload = {
+        "organization_id": org.id,
+        "mode": "diff",
+        "nodes": [
+            {
+                "id": node.id,
+                "sphere_id": other.id,
+                "label": "Mover",
+                "position": {"x": 0.5, "y": 0.5},
+                "created_at": "2024-01-01T00:00:00",
+            }
+        ],
+        "edges": [],
+    }
+    graph_routes.import_graph(GraphImportPayload.model_validate(payload), owner, session)
+    version = graph_versions.current_version(session, org.id)
+    moved = graph_index.index_cache.get(session, org.id, version)
+    assert moved is index
+    assert list(moved.node_spheres) == [other.id]
+    assert graph_index.index_cache.stats()["misses"] == misses
+
+
+def test_reachability_index_answers_paths_and_follows_edge_changes(session):
+    graph_index.index_cache.clear()
+    graph_reachability.index_cache.clear()
+    owner, org, sphere = bootstrap_org(session)
+    nodes = {
+        label: graph_routes.create_node(
+            NodeCreate(sphere_id=sphere.id, label=label, position={"x": 0.5, "y": 0.5}),
+            owner,
+            session,
+        ).id
+        for label in ("api", "auth", "db", "cache", "etl", "report")
+    }
+    names = {node_id: label for label, node_id in nodes.items()}
+
+    def connect(source, target, relation):
+        return graph_routes.create_edge(
+            EdgeCreate(
+                sphere_id=sphere.id,
+                source_node_id=nodes[source],
+                target_node_id=nodes[target],
+                relation_type=relation,
+            ),
+            owner,
+            session,
+        ).id
+
+    def reachable(source, target):
+        return graph_routes.read_reachability(
+            source_node_id=nodes[source],
+            target_node_id=nodes[target],
+            current_user=owner,
+            session=session,
+        ).reachable
+
+    def path(source, target):
+        body = json.loads(
+            graph_routes.read_path(
+                source_node_id=nodes[source],
+                target_node_id=nodes[target],
+                current_user=owner,
+                session=session,
+            ).body
+        )
+        return [names[node_id] for node_id in body["nodes"]], [edge["id"] for edge in body["edges"]]
+
+    edges = {
+        "api-auth": connect("api", "auth", "uses"),
+        "auth-db": connect("auth", "db", "depends"),
+        "api-cache": connect("api", "cache", "uses"),
+        # ``produces`` feeds its target: report needs etl.
+        "etl-report": connect("etl", "report", "produces"),
+    }
+    assert reachable("api", "db")
+    assert not reachable("db", "api")
+    assert reachable("report", "etl")
+    assert not reachable("etl", "report")
+    assert reachable("cache", "cache")
+    assert path("api", "db") == (["api", "auth", "db"], [edges["api-auth"], edges["auth-db"]])
+    assert path("report", "etl") == (["report", "etl"], [edges["etl-report"]])
+    assert path("db", "api") == ([], [])
+    assert graph_reachability.index_cache.stats()["misses"] == 1
+
+    # Edge changes through the routes update the cached index in place.
+    edges["cache-db"] = connect("cache", "db", "uses")
+    edges["etl-api"] = connect("etl", "api", "depends")
+    assert reachable("report", "db")
+    assert path("report", "db") == (
+        ["report", "etl", "api", "auth", "db"],
+        [edges["etl-report"], edges["etl-api"], edges["api-auth"], edges["auth-db"]],
+    )
+    graph_routes.delete_edge(edges["auth-db"], owner, session)
+    assert path("api", "db") == (["api", "cache", "db"], [edges["api-cache"], edges["cache-db"]])
+    graph_routes.delete_edge(edges["cache-db"], owner, session)
+    assert not reachable("api", "db")
+    assert reachable("report", "cache")
+    graph_routes.update_node_positions([NodePosition(id=nodes["db"], x=0.1, y=0.2)], owner, session)
+    assert not reachable("report", "db")
+    stats = graph_reachability.index_cache.stats()
+    assert (stats["misses"], stats["updates"]) == (1, 4)
+
+    # Closing a cycle merges components, which rebuilds the index on the next query.
+    connect("auth", "etl", "uses")
+    assert reachable("etl", "auth") and reachable("auth", "etl")
+    assert path("auth", "cache")[0] == ["auth", "etl", "api", "cache"]
+    assert graph_reachability.index_cache.stats()["misses"] == 2
+
+    with pytest.raises(HTTPException) as exc_info:
+        graph_routes.read_reachability(
+            source_node_id=nodes["api"], target_node_id=9999, current_user=owner, session=session
+        )
+    assert exc_info.value.status_code == 404
+
+
+def test_reachability_index_matches_search_after_random_edits():
+    rng = random.Random(5)
+    index = graph_reachability.ReachabilityIndex(
+        organization_id=1, version=0, component_of={}, needed={}, successors=[], reach=[]
+    )
+    for node_id in range(30):
+        index.add_node(node_id)
+    edges = []
+
+    def search(source, target):
+        seen, stack = {source}, [source]
+        while stack:
+            current = stack.pop()
+            for needing, needed in edges:
+                if needing == current and needed not in seen:
+                    seen.add(needed)
+                    stack.append(needed)
+        return target in seen
+
+    for _ in range(150):
+        if edges and rng.random() < 0.3:
+            needing, needed = edges.pop(rng.randrange(len(edges)))
+            assert index.remove_edge(needing, needed, "uses")
+        else:
+            # Lower ids only need higher ones, so the graph stays acyclic.
+            needing, needed = sorted(rng.sample(range(30), 2))
+            assert index.add_edge(needing, needed, "uses")
+            edges.append((needing, needed))
+        for _ in range(20):
+            source, target = rng.randrange(30), rng.randrange(30)
+            assert index.reachable(source, target) == search(source, target)
+            chain = index.path(source, target)
+            assert (chain is not None) == search(source, target)
+    # ``0 -produces-> 29`` makes 29 need 0; the reverse need closes a cycle.
+    assert index.add_edge(0, 29, "produces")
+    assert index.reachable(29, 0)
+    assert not index.add_edge(0, 29, "uses")
+
+
+def test_node_neighborhood_returns_induced_subgraph_within_hops(session):
+    owner, org, sphere = bootstrap_org(session)
+    nodes = {
+        label: graph_routes.create_node(
+            NodeCreate(sphere_id=sphere.id, label=label, position={"x": 0.5, "y": 0.5}),
+            owner,
+            session,
+        ).id
+        for label in ("a", "b", "c", "d", "e", "isolated")
+    }
+    edges = {}
+    for source, target, relation in (
+        ("a", "b", "uses"),
+        ("c", "a", "depends"),
+        ("b", "c", "produces"),
+        ("b", "d", "uses"),
+        ("d", "e", "uses"),
+    ):
+        edges[source, target] = graph_routes.create_edge(
+            EdgeCreate(
+                sphere_id=sphere.id,
+                source_node_id=nodes[source],
+                target_node_id=nodes[target],
+                relation_type=relation,
+            ),
+            owner,
+            session,
+        ).id
+
+    def neighborhood(label, hops=1, limit=200, relation_type=None):
+        response = graph_routes.read_node_neighborhood(
+            node_id=nodes[label],
+            hops=hops,
+            limit=limit,
+            relation_type=relation_type,
+            current_user=owner,
+            session=session,
+        )
+        return json.loads(response.body)
+
+    def depths(body):
+        names = {node_id: label for label, node_id in nodes.items()}
+        return {names[item["id"]]: item["depth"] for item in body["nodes"]}
+
+    body = neighborhood("a")
+    assert depths(body) == {"a": 0, "b": 1, "c": 1}
+    # Induced subgraph: the b -> c edge between two neighbours is included.
+    assert [edge["id"] for edge in body["edges"]] == sorted(
+        [edges["a", "b"], edges["c", "a"], edges["b", "c"]]
+    )
+    assert body["truncated"] is False
+    NodeRead.model_validate(body["nodes"][0])
+    EdgeRead.model_validate(body["edges"][0])
+
+    assert depths(neighborhood("a", hops=3)) == {"a": 0, "b": 1, "c": 1, "d": 2, "e": 3}
+    assert depths(neighborhood("e", hops=2)) == {"e": 0, "d": 1, "b": 2}
+    assert depths(neighborhood("a", hops=3, relation_type="uses")) == {
+        "a": 0,
+        "b": 1,
+        "d": 2,
+        "e": 3,
+    }
+    assert depths(neighborhood("isolated", hops=3)) == {"isolated": 0}
+
+    capped = neighborhood("a", hops=3, limit=3)
+    assert depths(capped) == {"a": 0, "b": 1, "c": 1}
+    assert capped["truncated"] is True
+    capped = neighborhood("a", hops=2, limit=2)
+    assert depths(capped) == {"a": 0, "b": 1}
+    assert [edge["id"] for edge in capped["edges"]] == [edges["a", "b"]]
+    assert capped["truncated"] is True
+    assert neighborhood("a", hops=3, limit=5)["truncated"] is False
+
+    with pytest.raises(HTTPException) as exc_info:
+        neighborhood("a", relation_type="calls")
+    assert exc_info.value.status_code == 400
+    with pytest.raises(HTTPException) as exc_info:
+        graph_routes.read_node_neighborhood(
+            node_id=9999, hops=1, limit=10, relation_type=None, current_user=owner, session=session
+        )
+    assert exc_info.value.status_code == 404
+
+
+def test_graph_topology_layers_components_and_rejects_cycles(session, monkeypatch):
+    graph_index.index_cache.clear()
+    owner, org, sphere = bootstrap_org(session)
+    other_sphere = Sphere(organization_id=org.id, name="Legacy")
+    session.add(other_sphere)
+    session.commit()
+    nodes = {
+        label: graph_routes.create_node(
+            NodeCreate(sphere_id=sphere_id, label=label, position={"x": 0.5, "y": 0.5}),
+            owner,
+            session,
+        ).id
+        for label, sphere_id in (
+            ("api", sphere.id),
+            ("svc", sphere.id),
+            ("db", sphere.id),
+            ("queue", sphere.id),
+            ("worker", sphere.id),
+            ("x", other_sphere.id),
+            ("y", other_sphere.id),
+        )
+    }
+
+    def connect(source, target, relation, sphere_id=sphere.id):
+        return graph_routes.create_edge(
+            EdgeCreate(
+                sphere_id=sphere_id,
+                source_node_id=nodes[source],
+                target_node_id=nodes[target],
+                relation_type=relation,
+            ),
+            owner,
+            session,
+        )
+
+    connect("api", "svc", "uses")
+    connect("svc", "db", "depends")
+    connect("svc", "queue", "produces")
+    connect("worker", "queue", "consumes")
+    connect("x", "y", "depends", other_sphere.id)
+    connect("y", "x", "depends", other_sphere.id)
+
+    def topology(sphere_id=None, relation_types=None):
+        response = graph_routes.read_topology(
+            organization_id=org.id,
+            sphere_id=sphere_id,
+            relation_types=relation_types,
+            current_user=owner,
+            session=session,
+        )
+        names = {node_id: label for label, node_id in nodes.items()}
+        body = json.loads(response.body)
+        return (
+            body["acyclic"],
+            [sorted(names[node_id] for node_id in cycle) for cycle in body["cycles"]],
+            [sorted(names[node_id] for node_id in layer) for layer in body["layers"]],
+        )
+
+    assert topology() == (
+        False,
+        [["x", "y"]],
+        [["db", "x", "y"], ["svc"], ["api", "queue"], ["worker"]],
+    )
+    assert topology(sphere_id=sphere.id) == (
+        True,
+        [],
+        [["db"], ["svc"], ["api", "queue"], ["worker"]],
+    )
+    assert topology(sphere_id=sphere.id, relation_types="depends") == (
+        True,
+        [],
+        [["api", "db", "queue", "worker"], ["svc"]],
+    )
+
+    # Without the setting cycles are allowed.
+    reverse = connect("db", "svc", "uses")
+
+    monkeypatch.setattr(settings, "graph_acyclic_relations", ["depends", "produces"])
+    with pytest.raises(HTTPException) as exc_info:
+        connect("db", "svc", "depends")
+    assert exc_info.value.status_code == 409
+    session.rollback()
+    with pytest.raises(HTTPException) as exc_info:
+        graph_routes.update_edge(reverse.id, EdgeUpdate(relation_type="depends"), owner, session)
+    assert exc_info.value.status_code == 409
+    session.rollback()
+    with pytest.raises(HTTPException) as exc_info:
+        graph_routes.apply_graph_batch(
+            GraphBatchRequest.model_validate(
+                {
+                    "operations": [
+                        {
+                            "op": "create_edge",
+                            "edge": {
+                                "sphere_id": sphere.id,
+                                "source_node_id": nodes["svc"],
+                                "target_node_id": nodes["queue"],
+                                "relation_type": "depends",
+                            },
+                        }
+                    ]
+                }
+            ),
+            owner,
+            session,
+        )
+    assert exc_info.value.status_code == 409
+    assert exc_info.value.detail == "Operation 0: Edge would create a cycle"
+
+    assert connect("api", "db", "depends").relation_type == "depends"
+    assert graph_topology.creates_cycle(
+        session, nodes["worker"], nodes["api"], "produces", ["depends", "produces"]
+    ) is False
+    assert graph_topology.creates_cycle(
+        session, nodes["db"], nodes["db"], "depends", ["depends"]
+    ) is True
+
+
+def _metrics_graph(session):
+    owner, org, sphere = bootstrap_org(session)
+    nodes = {
+        label: graph_routes.create_node(
+            NodeCreate(sphere_id=sphere.id, label=label, position={"x": 0.5, "y": 0.5}),
+            owner,
+            session,
+        ).id
+        for label in ("hub", "api", "worker", "billing", "lonely")
+    }
+    edges = {}
+    for source, target, relation in (
+        ("api", "hub", "uses"),
+        ("worker", "api", "uses"),
+        ("billing", "hub", "depends"),
+        ("hub", "billing", "produces"),
+        ("worker", "billing", "depends"),
+    ):
+        edges[source, target] = graph_routes.create_edge(
+            EdgeCreate(
+                sphere_id=sphere.id,
+                source_node_id=nodes[source],
+                target_node_id=nodes[target],
+                relation_type=relation,
+            ),
+            owner,
+            session,
+        ).id
+    return owner, org, sphere, nodes, edges
+
+
+def test_node_degrees_follow_edge_changes_and_sort_lists(session):
+    owner, org, sphere, nodes, edges = _metrics_graph(session)
+    names = {node_id: label for label, node_id in nodes.items()}
+
+    def listed(**params):
+        response = graph_routes.list_nodes(
+            organization_id=org.id,
+            sphere_id=None,
+            node_type=None,
+            status_filter=None,
+            search=None,
+            current_user=owner,
+            session=session,
+            response=Response(),
+            **params,
+        )
+        return response, {item["id"]: item for item in json.loads(response.body)}
+
+    _, by_id = listed()
+    hub = by_id[nodes["hub"]]
+    assert (hub["in_degree"], hub["out_degree"]) == (2, 1)
+    assert hub["degrees"] == {
+        "uses": {"in": 1, "out": 0},
+        "depends": {"in": 1, "out": 0},
+        "produces": {"in": 0, "out": 1},
+    }
+    assert by_id[nodes["lonely"]]["degrees"] == {}
+    assert by_id[nodes["lonely"]]["pagerank"] is None
+
+    graph_routes.update_edge(
+        edges["billing", "hub"], EdgeUpdate(relation_type="uses"), owner, session
+    )
+    graph_routes.delete_edge(edges["hub", "billing"], owner, session)
+    _, by_id = listed()
+    assert by_id[nodes["hub"]]["degrees"] == {"uses": {"in": 2, "out": 0}}
+    billing = by_id[nodes["billing"]]
+    assert billing["degrees"] == {"uses": {"in": 0, "out": 1}, "depends": {"in": 1, "out": 0}}
+    assert (billing["in_degree"], billing["out_degree"]) == (1, 1)
+
+    # Ties are broken by the newest node first.
+    _, by_id = listed(sort="degree", min_degree=2)
+    assert [names[node_id] for node_id in by_id] == ["billing", "worker", "api", "hub"]
+    _, by_id = listed(sort="in_degree", relation_type="uses", min_degree=1)
+    assert [names[node_id] for node_id in by_id] == ["hub", "api", "billing", "worker"]
+
+    seen = []
+    cursor = None
+    while True:
+        response, by_id = listed(sort="out_degree", limit=2, cursor=cursor)
+        seen.extend(names[node_id] for node_id in by_id)
+        cursor = response.headers.get(NEXT_CURSOR_HEADER)
+        if cursor is None:
+            break
+    assert seen == ["worker", "billing", "api", "lonely", "hub"]
+
+    with pytest.raises(HTTPException) as exc_info:
+        listed(sort="degree", relation_type="calls")
+    assert exc_info.value.status_code == 400
+
+
+def test_centrality_is_recomputed_for_changed_organizations(session):
+    pytest.importorskip("numpy")
+    owner, org, sphere, nodes, edges = _metrics_graph(session)
+    assert graph_metrics.scheduler.pending() == [org.id]
+
+    def list_etag():
+        response = Response()
+        graph_routes.list_nodes(
+            organization_id=org.id,
+            sphere_id=None,
+            node_type=None,
+            status_filter=None,
+            search=None,
+            response=response,
+            current_user=owner,
+            session=session,
+        )
+        return response.headers["etag"]
+
+    before = graph_versions.current_versions(session, org.id)
+    etag = list_etag()
+    assert graph_metrics.recompute(session, org.id) == len(nodes)
+    # Centrality is versioned apart from the graph: no graph change, but fresh ETags.
+    assert graph_versions.current_versions(session, org.id) == (before[0], before[1] + 1)
+    assert list_etag() != etag
+    assert graph_metrics.recompute(session, org.id) == 0
+    assert graph_versions.current_versions(session, org.id) == (before[0], before[1] + 1)
+
+    scores = {label: session.get(Node, node_id) for label, node_id in nodes.items()}
+    # Everything ends up needing the hub; the worker reaches it through the api or billing.
+    assert max(scores, key=lambda label: scores[label].pagerank) == "hub"
+    assert sum(node.pagerank for node in scores.values()) == pytest.approx(1.0)
+    assert scores["lonely"].betweenness == 0.0
+    assert scores["hub"].betweenness == 0.0
+    assert scores["api"].betweenness == pytest.approx(scores["billing"].betweenness)
+    assert scores["api"].betweenness > 0.0
+
+    listed = graph_routes.list_nodes(
+        organization_id=org.id,
+        sphere_id=None,
+        node_type=None,
+        status_filter=None,
+        search=None,
+        sort="pagerank",
+        min_pagerank=0.0,
+        current_user=owner,
+        session=session,
+    )
+    ranked = [item["pagerank"] for item in json.loads(listed.body)]
+    assert ranked[0] == scores["hub"].pagerank
+    assert ranked == sorted(ranked, reverse=True)
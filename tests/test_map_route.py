@@ -213,3 +213,455 @@ def test_map_route_filters_by_search(client: TestClient, map_test_data):
     payload = response.json()
     node_ids = {node["id"] for node in payload["nodes"]}
     assert node_ids == {map_test_data["nodes"]["service"].id}
+
+
+def test_map_route_answers_not_modified_until_graph_changes(client: TestClient, map_test_data):
+    org_id = map_test_data["organization"].id
+    first = client.get("/api/map", params={"org_id": org_id})
+    assert first.status_code == 200
+    etag = first.headers["etag"]
+
+    cached = client.get("/api/map", params={"org_id": org_id}, headers={"If-None-Match": etag})
+    assert cached.status_code == 304
+    assert cached.headers["etag"] == etag
+
+    filtered = client.get(
+        "/api/map", params={"org_id": org_id, "status": "archived"}, headers={"If-None-Match": etag}
+    )
+    assert filtered.status_code == 200
+
+    node_id = map_test_data["nodes"]["api"].id
+    patched = client.patch(f"/api/nodes/{node_id}", json={"label": "Payments API v2"})
+    assert patched.status_code == 200
+
+    refreshed = client.get("/api/map", params={"org_id": org_id}, headers={"If-None-Match": etag})
+    assert refreshed.status_code == 200
+    assert refreshed.headers["etag"] != etag
+
+
+def test_map_changes_returns_delta_since_version(client: TestClient, map_test_data):
+    org_id = map_test_data["organization"].id
+    base_version = client.get("/api/map", params={"org_id": org_id}).json()["version"]
+
+    created = client.post(
+        "/api/nodes",
+        json={
+            "sphere_id": map_test_data["spheres"]["secondary"].id,
+            "label": "Audit Store",
+            "node_type": "store",
+            "position": {"x": 0.3, "y": 0.3},
+        },
+    )
+    assert created.status_code == 201
+    edge_id = map_test_data["edges"]["primary"].id
+    assert client.delete(f"/api/edges/{edge_id}").status_code == 204
+
+    response = client.get("/api/map/changes", params={"org_id": org_id, "since": base_version})
+    assert response.status_code == 200
+    payload = response.json()
+    assert payload["resync_required"] is False
+    assert payload["version"] == base_version + 2
+    assert [node["id"] for node in payload["nodes"]] == [created.json()["id"]]
+    assert payload["nodes"][0]["kind"] == "store"
+    assert payload["deleted_edge_ids"] == [edge_id]
+
+    unchanged = client.get(
+        "/api/map/changes", params={"org_id": org_id, "since": payload["version"]}
+    )
+    assert unchanged.json()["nodes"] == []
+    assert unchanged.json()["deleted_edge_ids"] == []
+
+
+def test_map_changes_requests_resync_after_compaction(client: TestClient, session, map_test_data):
+    from app.services import graph_changes
+
+    org_id = map_test_data["organization"].id
+    node_id = map_test_data["nodes"]["event"].id
+    for index in range(3):
+        response = client.patch(f"/api/nodes/{node_id}", json={"summary": f"rev {index}"})
+        assert response.status_code == 200
+
+    graph_changes.compact_changes(session, org_id, keep_versions=1)
+    session.commit()
+
+    stale = client.get("/api/map/changes", params={"org_id": org_id, "since": 0})
+    assert stale.json()["resync_required"] is True
+
+    recent = client.get("/api/map/changes", params={"org_id": org_id, "since": 2})
+    assert recent.json()["resync_required"] is False
+    assert [node["id"] for node in recent.json()["nodes"]] == [node_id]
+
+
+def test_map_route_serves_cached_body_until_invalidated(client: TestClient, map_test_data):
+    from app.services.map_cache import map_cache
+
+    org_id = map_test_data["organization"].id
+    before = map_cache.stats()
+    first = client.get("/api/map", params={"org_id": org_id})
+    second = client.get("/api/map", params={"org_id": org_id})
+    after = map_cache.stats()
+
+    assert first.content == second.content
+    assert after["misses"] - before["misses"] == 1
+    assert after["hits"] - before["hits"] == 1
+    assert client.get("/api/health/cache").json()["entries"] == 1
+
+    node_id = map_test_data["nodes"]["event"].id
+    assert client.patch(f"/api/nodes/{node_id}", json={"label": "Event Hub"}).status_code == 200
+    assert map_cache.stats()["entries"] == 0
+
+    refreshed = client.get("/api/map", params={"org_id": org_id}).json()
+    labels = {node["id"]: node["label"] for node in refreshed["nodes"]}
+    assert labels[node_id] == "Event Hub"
+
+
+def test_cache_stats_require_authentication(client: TestClient):
+    assert client.get("/api/health/cache").status_code == 200
+    del app.dependency_overrides[get_current_user]
+    assert client.get("/api/health/cache").status_code == 401
+    assert client.get("/api/health").status_code == 200
+
+
+def test_map_route_body_matches_schema_serialization(
+    client: TestClient, session, map_test_data
+):
+    from sqlalchemy import select
+    from sqlalchemy.orm import selectinload
+
+    from app.schemas.map import MapResponse
+
+    org_id = map_test_data["organization"].id
+    response = client.get("/api/map", params={"org_id": org_id})
+    payload = response.json()
+
+    spheres = session.scalars(
+        select(Sphere)
+        .where(Sphere.organization_id == org_id)
+        .options(selectinload(Sphere.groups))
+        .order_by(Sphere.created_at.asc())
+    ).all()
+    nodes = {node.id: node for node in session.scalars(select(Node)).all()}
+    edges = {edge.id: edge for edge in session.scalars(select(Edge)).all()}
+    expected = MapResponse.from_entities(
+        organization_id=org_id,
+        version=payload["version"],
+        spheres=spheres,
+        nodes=[nodes[item["id"]] for item in payload["nodes"]],
+        edges=[edges[item["id"]] for item in payload["edges"]],
+    )
+    assert response.content == expected.model_dump_json(by_alias=True).encode("utf-8")
+
+
+def test_map_route_keeps_the_response_model_wire_shape(client: TestClient, session, map_test_data):
+    from fastapi import FastAPI
+    from sqlalchemy import select
+    from sqlalchemy.orm import selectinload
+
+    from app.schemas.map import MapResponse
+
+    org_id = map_test_data["organization"].id
+    payload = client.get("/api/map", params={"org_id": org_id}).json()
+
+    # The route used to return ``MapResponse`` through ``response_model``.
+    spheres = session.scalars(
+        select(Sphere)
+        .where(Sphere.organization_id == org_id)
+        .options(selectinload(Sphere.groups))
+        .order_by(Sphere.created_at.asc())
+    ).all()
+    nodes = {node.id: node for node in session.scalars(select(Node)).all()}
+    edges = {edge.id: edge for edge in session.scalars(select(Edge)).all()}
+    legacy = FastAPI()
+
+    @legacy.get("/api/map", response_model=MapResponse)
+    def legacy_map() -> MapResponse:
+        return MapResponse.from_entities(
+            organization_id=org_id,
+            version=payload["version"],
+            spheres=spheres,
+            nodes=[nodes[item["id"]] for item in payload["nodes"]],
+            edges=[edges[item["id"]] for item in payload["edges"]],
+        )
+
+    with TestClient(legacy) as legacy_client:
+        assert payload == legacy_client.get("/api/map").json()
+    assert {"metadata_json", "links_json", "owners_json"} <= payload["nodes"][0].keys()
+    assert "metadata" not in payload["nodes"][0]
+    assert "metadata_json" in payload["edges"][0]
+
+
+def test_map_route_negotiates_columnar_encoding(client: TestClient, map_test_data):
+    from app.services import map_columnar
+
+    org_id = map_test_data["organization"].id
+    as_json = client.get("/api/map", params={"org_id": org_id})
+    columnar = client.get(
+        "/api/map", params={"org_id": org_id}, headers={"Accept": map_columnar.MEDIA_TYPE}
+    )
+
+    assert columnar.status_code == 200
+    assert columnar.headers["content-type"] == map_columnar.MEDIA_TYPE
+    assert "Accept" in columnar.headers["vary"].split(", ")
+    assert columnar.headers["etag"] != as_json.headers["etag"]
+    assert map_columnar.decode_map(columnar.content) == as_json.json()
+
+    revalidated = client.get(
+        "/api/map",
+        params={"org_id": org_id},
+        headers={"Accept": map_columnar.MEDIA_TYPE, "If-None-Match": columnar.headers["etag"]},
+    )
+    assert revalidated.status_code == 304
+
+
+def test_map_route_compresses_cached_body_once(
+    client: TestClient, map_test_data, monkeypatch
+):
+    from app.core.config import settings
+    from app.services.map_cache import map_cache
+
+    monkeypatch.setattr(settings, "compression_min_size", 0)
+    org_id = map_test_data["organization"].id
+    first = client.get("/api/map", params={"org_id": org_id}, headers={"Accept-Encoding": "gzip"})
+    cached_bytes = map_cache.stats()["bytes"]
+    second = client.get("/api/map", params={"org_id": org_id}, headers={"Accept-Encoding": "gzip"})
+    plain = client.get(
+        "/api/map", params={"org_id": org_id}, headers={"Accept-Encoding": "identity"}
+    )
+
+    assert first.headers["content-encoding"] == "gzip"
+    assert first.headers["etag"].startswith("W/")
+    assert first.content == second.content == plain.content
+    assert cached_bytes > len(plain.content)
+    assert map_cache.stats()["bytes"] == cached_bytes
+    assert map_cache.stats()["entries"] == 1
+    assert "content-encoding" not in plain.headers
+
+
+def test_serialized_response_cache_evicts_least_recently_used():
+    from app.services.map_cache import SerializedResponseCache
+
+    cache = SerializedResponseCache(max_entries=2, max_bytes=1024)
+    cache.put((1, "a"), 1, b"a")
+    cache.put((1, "b"), 1, b"b")
+    assert cache.get((1, "a"), 1) == b"a"
+    cache.put((2, "c"), 1, b"c")
+
+    assert cache.get((1, "b"), 1) is None
+    assert cache.get((1, "a"), 2) is None
+    assert cache.stats()["evictions"] == 1
+
+    cache.invalidate_organization(1)
+    assert cache.get((1, "a"), 1) is None
+    assert cache.get((2, "c"), 1) == b"c"
+
+
+def test_map_route_filters_by_viewport(client: TestClient, map_test_data, session):
+    org_id = map_test_data["organization"].id
+    # Every organization shares the coordinate space; another one's node in the window
+    # must not show up.
+    other = Organization(name="Other Org", slug="other-org")
+    session.add(other)
+    session.flush()
+    other_sphere = Sphere(organization_id=other.id, name="Foreign")
+    session.add(other_sphere)
+    session.flush()
+    session.add(Node(sphere_id=other_sphere.id, label="Foreign", position={"x": 0.1, "y": 0.1}))
+    session.commit()
+
+    response = client.get("/api/map", params={"org_id": org_id, "bbox": "0,0,0.5,0.5"})
+    assert response.status_code == 200
+
+    payload = response.json()
+    assert {node["id"] for node in payload["nodes"]} == {map_test_data["nodes"]["api"].id}
+    assert [edge["id"] for edge in payload["edges"]] == [map_test_data["edges"]["primary"].id]
+
+    node_id = map_test_data["nodes"]["event"].id
+    moved = client.patch(f"/api/nodes/{node_id}", json={"position": {"x": 0.2, "y": 0.3}})
+    assert moved.status_code == 200
+    response = client.get("/api/map", params={"org_id": org_id, "bbox": "0,0,0.5,0.5"})
+    assert {node["id"] for node in response.json()["nodes"]} == {
+        map_test_data["nodes"]["api"].id,
+        node_id,
+    }
+
+    invalid = client.get("/api/map", params={"org_id": org_id, "bbox": "0.5,0,0.1,1"})
+    assert invalid.status_code == 400
+
+
+def test_map_route_serves_level_of_detail_clusters(client: TestClient, map_test_data):
+    org_id = map_test_data["organization"].id
+    primary = map_test_data["spheres"]["primary"].id
+    secondary = map_test_data["spheres"]["secondary"].id
+
+    by_sphere = client.get("/api/map", params={"org_id": org_id, "lod": "sphere"})
+    assert by_sphere.status_code == 200
+    payload = by_sphere.json()
+    assert payload["lod"] == "sphere"
+    assert {sphere["id"] for sphere in payload["spheres"]} == {primary, secondary}
+    clusters = {cluster["id"]: cluster for cluster in payload["clusters"]}
+    assert clusters[str(primary)]["count"] == 2
+    assert clusters[str(primary)]["archived"] == 1
+    assert clusters[str(primary)]["x"] == pytest.approx(0.4)
+    assert clusters[str(primary)]["internal_edges"] == 1
+    assert clusters[str(secondary)]["count"] == 1
+    assert clusters[str(secondary)]["internal_edges"] == 0
+    assert payload["edges"] == []
+
+    by_type = client.get(
+        "/api/map",
+        params={"org_id": org_id, "lod": "type"},
+        headers={"Accept": "application/vnd.egida.map-columnar"},
+    )
+    assert by_type.headers["content-type"].startswith("application/json")
+    payload = by_type.json()
+    assert sorted(cluster["id"] for cluster in payload["clusters"]) == sorted(
+        [f"{primary}:api", f"{primary}:service", f"{secondary}:event"]
+    )
+    assert payload["edges"] == [
+        {
+            "source": f"{primary}:api",
+            "target": f"{primary}:service",
+            "relation_type": "depends",
+            "count": 1,
+        }
+    ]
+
+    active = client.get("/api/map", params={"org_id": org_id, "lod": "type", "status": "active"})
+    assert {cluster["count"] for cluster in active.json()["clusters"]} == {1}
+    assert active.json()["edges"] == []
+
+    revalidated = client.get(
+        "/api/map",
+        params={"org_id": org_id, "lod": "sphere"},
+        headers={"If-None-Match": by_sphere.headers["etag"]},
+    )
+    assert revalidated.status_code == 304
+    assert by_sphere.headers["etag"] != by_type.headers["etag"]
+
+    assert client.get("/api/map", params={"org_id": org_id, "lod": "node"}).status_code == 422
+    combined = client.get("/api/map", params={"org_id": org_id, "lod": "sphere", "bbox": "0,0,1,1"})
+    assert combined.status_code == 400
+
+
+def _sorted_map(payload):
+    return {
+        "spheres": sorted(payload["spheres"], key=lambda sphere: sphere["id"]),
+        "nodes": sorted(payload["nodes"], key=lambda node: node["id"]),
+        "edges": sorted(payload["edges"], key=lambda edge: edge["id"]),
+    }
+
+
+def test_snapshots_serve_past_maps_and_diffs(client: TestClient, session, map_test_data):
+    from sqlalchemy import func, select
+
+    from app.models import GraphChunk
+    from app.services import map_columnar
+
+    org_id = map_test_data["organization"].id
+    api_id = map_test_data["nodes"]["api"].id
+    edge_id = map_test_data["edges"]["primary"].id
+    live = client.get("/api/map", params={"org_id": org_id}).json()
+
+    created = client.post("/api/map/snapshots", json={"organization_id": org_id, "name": "v1"})
+    assert created.status_code == 201
+    first = created.json()
+    assert (first["node_count"], first["edge_count"], first["automatic"]) == (3, 1, False)
+    duplicate = client.post("/api/map/snapshots", json={"organization_id": org_id, "name": "v1"})
+    assert duplicate.status_code == 400
+    numeric = client.post("/api/map/snapshots", json={"organization_id": org_id, "name": "42"})
+    assert numeric.status_code == 422
+    stored = session.scalar(select(func.count()).select_from(GraphChunk))
+
+    added = client.post(
+        "/api/nodes",
+        json={
+            "sphere_id": map_test_data["spheres"]["secondary"].id,
+            "label": "Audit Store",
+            "node_type": "store",
+            "position": {"x": 0.3, "y": 0.3},
+        },
+    ).json()
+    renamed = client.patch(f"/api/nodes/{api_id}", json={"label": "Payments API v2"})
+    assert renamed.status_code == 200
+    assert client.delete(f"/api/edges/{edge_id}").status_code == 204
+
+    past = client.get("/api/map", params={"org_id": org_id, "at": "v1"})
+    assert past.status_code == 200
+    assert _sorted_map(past.json()) == _sorted_map(live)
+    assert client.get("/api/map", params={"org_id": org_id, "at": str(first["id"])}).content == (
+        past.content
+    )
+    revalidated = client.get(
+        "/api/map",
+        params={"org_id": org_id, "at": "v1"},
+        headers={"If-None-Match": past.headers["etag"]},
+    )
+    assert revalidated.status_code == 304
+    columnar = client.get(
+        "/api/map",
+        params={"org_id": org_id, "at": "v1"},
+        headers={"Accept": map_columnar.MEDIA_TYPE},
+    )
+    assert map_columnar.decode_map(columnar.content) == past.json()
+    filtered = client.get("/api/map", params={"org_id": org_id, "at": "v1", "status": "archived"})
+    service_id = map_test_data["nodes"]["service"].id
+    assert [node["id"] for node in filtered.json()["nodes"]] == [service_id]
+    assert filtered.json()["edges"] == []
+
+    second = client.post("/api/map/snapshots", json={"organization_id": org_id, "name": "v2"})
+    # Two node records and the pages above them; spheres and the other nodes are shared.
+    grown = session.scalar(select(func.count()).select_from(GraphChunk)) - stored
+    assert 0 < grown <= 10
+
+    diff = client.get(
+        "/api/map/snapshots/diff", params={"org_id": org_id, "from": "v1", "to": "v2"}
+    )
+    assert diff.status_code == 200
+    changes = diff.json()
+    assert (changes["source"]["name"], changes["target"]["name"]) == ("v1", "v2")
+    assert changes["spheres"] == {"added": [], "removed": [], "changed": []}
+    assert [node["id"] for node in changes["nodes"]["added"]] == [added["id"]]
+    labels = [
+        (change["before"]["label"], change["after"]["label"])
+        for change in changes["nodes"]["changed"]
+    ]
+    assert labels == [("Payments API", "Payments API v2")]
+    assert [edge["id"] for edge in changes["edges"]["removed"]] == [edge_id]
+
+    described = client.patch(f"/api/nodes/{added['id']}", json={"summary": "Keeps audit trails"})
+    assert described.status_code == 200
+    current = client.get("/api/map/snapshots/diff", params={"org_id": org_id, "from": "v2"}).json()
+    assert current["target"] is None
+    summaries = [change["after"]["summary"] for change in current["nodes"]["changed"]]
+    assert summaries == ["Keeps audit trails"]
+
+    listed = client.get("/api/map/snapshots", params={"org_id": org_id}).json()
+    assert [snapshot["name"] for snapshot in listed] == ["v2", "v1"]
+    assert client.delete(f"/api/map/snapshots/{second.json()['id']}").status_code == 204
+    assert session.scalar(select(func.count()).select_from(GraphChunk)) == stored
+
+    assert client.get("/api/map", params={"org_id": org_id, "at": "v9"}).status_code == 404
+    clustered = client.get("/api/map", params={"org_id": org_id, "at": "v1", "lod": "type"})
+    assert clustered.status_code == 400
+
+
+def test_import_keeps_an_automatic_snapshot_of_the_replaced_graph(
+    client: TestClient, map_test_data
+):
+    org_id = map_test_data["organization"].id
+    before = _sorted_map(client.get("/api/map", params={"org_id": org_id}).json())
+
+    payload = {"organization_id": org_id, "nodes": [], "edges": [], "mode": "diff"}
+    assert client.post("/api/graph/import", json=payload).status_code == 200
+    assert client.get("/api/map", params={"org_id": org_id}).json()["nodes"] == []
+    # The second import keeps the emptied graph; the third has nothing new to keep.
+    assert client.post("/api/graph/import", json=payload).status_code == 200
+    assert client.post("/api/graph/import", json=payload).status_code == 200
+
+    snapshots = client.get("/api/map/snapshots", params={"org_id": org_id}).json()
+    assert [(snapshot["automatic"], snapshot["node_count"]) for snapshot in snapshots] == [
+        (True, 0),
+        (True, 3),
+    ]
+    restored = client.get("/api/map", params={"org_id": org_id, "at": str(snapshots[1]["id"])})
+    assert _sorted_map(restored.json()) == before
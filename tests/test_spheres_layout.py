@@ -1,12 +1,27 @@
-﻿import pytest
-from sqlalchemy import create_engine, select
+﻿import math
+from itertools import pairwise
+
+import pytest
+from sqlalchemy import create_engine, event, select
 from sqlalchemy.orm import sessionmaker
 
+from app.api.routes import graph as graph_routes
+from app.api.routes import spheres as spheres_routes
 from app.db.base import Base
-from app.models import Organization, OrganizationMember, OrganizationRole, Sphere
-from app.schemas.organization import SphereLayoutRequest
+from app.models import (
+    Edge,
+    GraphChange,
+    Node,
+    Organization,
+    OrganizationMember,
+    OrganizationRole,
+    Sphere,
+)
+from app.schemas.graph import GraphBatchRequest, NodeCreate, NodeLayoutRequest
+from app.schemas.organization import SphereLayoutRequest, SphereLayoutSolveRequest, SphereUpdate
 from app.schemas.user import UserCreate
 from app.services import auth as auth_service
+from app.services import sphere_layout
 
 
 @pytest.fixture()
@@ -34,12 +49,25 @@ def create_org(session):
     return owner, org
 
 
+def overlapping(circles):
+    return [
+        (a, b)
+        for index, a in enumerate(circles)
+        for b in circles[index + 1 :]
+        if math.dist((a.center_x, a.center_y), (b.center_x, b.center_y))
+        < a.radius + b.radius - 1e-9
+    ]
+
+
 def test_sphere_layout_update(session):
     owner, org = create_org(session)
 
     sphere_a = Sphere(organization_id=org.id, name="Alpha", color="#38bdf8")
     sphere_b = Sphere(organization_id=org.id, name="Beta", color="#fb923c")
     session.add_all([sphere_a, sphere_b])
+    session.flush()
+    node = Node(sphere_id=sphere_a.id, label="Edge", position={"x": 0.6, "y": 0.5})
+    session.add(node)
     session.commit()
 
     layout_payload = SphereLayoutRequest(
@@ -50,8 +78,6 @@ def test_sphere_layout_update(session):
         ],
     )
 
-    from app.api.routes import spheres as spheres_routes
-
     updated = spheres_routes.update_sphere_layout(layout_payload, owner, session)
 
     assert len(updated) == 2
@@ -64,4 +90,197 @@ def test_sphere_layout_update(session):
     assert persisted.center_x == pytest.approx(0.7)
     assert persisted.radius == pytest.approx(0.18)
 
+    # The node sat 0.1 right of the default centre (0.5, 0.5) with radius 0.22; it keeps
+    # its relative place in the moved and shrunk sphere.
+    session.refresh(node)
+    assert (node.x, node.y) == pytest.approx((0.4 + 0.1 * 0.2 / 0.22, 0.6))
+    assert node.position == {"x": node.x, "y": node.y}
+    changes = session.scalars(select(GraphChange).order_by(GraphChange.id)).all()
+    assert {(change.entity_type, change.entity_id) for change in changes} == {
+        ("sphere", sphere_a.id),
+        ("sphere", sphere_b.id),
+        ("node", node.id),
+    }
+    assert len({change.version for change in changes}) == 1
+
+    spheres_routes.update_sphere(sphere_a.id, SphereUpdate(center_x=0.3), owner, session)
+    session.refresh(node)
+    assert node.x == pytest.approx(0.3 + 0.1 * 0.2 / 0.22)
+
+
+def test_sphere_layout_modes_resolve_overlaps():
+    counts = [(index * 37) % 200 for index in range(150)]
+    for mode in sphere_layout.MODES:
+        circles = sphere_layout.solve(counts, mode)
+        assert len(circles) == 150
+        assert not overlapping(circles)
+        assert all(
+            circle.radius <= circle.center_x <= 1 - circle.radius
+            and circle.radius <= circle.center_y <= 1 - circle.radius
+            for circle in circles
+        )
+        assert circles[counts.index(max(counts))].radius > circles[counts.index(0)].radius
+    assert sphere_layout.solve([3]) == [sphere_layout.Circle(0.5, 0.5, 0.46)]
+
+
+def test_solve_sphere_layout_sizes_spheres_and_moves_their_nodes(session):
+    owner, org = create_org(session)
+    spheres = [Sphere(organization_id=org.id, name=f"Sphere {index}") for index in range(5)]
+    session.add_all(spheres)
+    session.flush()
+    for index, sphere in enumerate(spheres):
+        session.add_all(
+            Node(sphere_id=sphere.id, label=f"Node {index}.{number}", position={"x": 0.5, "y": 0.6})
+            for number in range(index * 10 + 1)
+        )
+    session.commit()
+
+    solved = spheres_routes.solve_sphere_layout(
+        SphereLayoutSolveRequest(organization_id=org.id, mode="packed"), owner, session
+    )
+
+    assert [sphere.id for sphere in solved] == [sphere.id for sphere in spheres]
+    assert not overlapping(solved)
+    assert [sphere.radius for sphere in solved] == sorted(sphere.radius for sphere in solved)
+    for sphere in solved:
+        for node in session.scalars(select(Node).where(Node.sphere_id == sphere.id)):
+            # 0.1 below the old centre, scaled by the radius ratio.
+            expected = (sphere.center_x, sphere.center_y + 0.1 * sphere.radius / 0.22)
+            assert (node.x, node.y) == pytest.approx(expected)
+
+
+def test_sphere_node_layout_spreads_nodes_inside_the_circle(session):
+    pytest.importorskip("numpy")
+    owner, org = create_org(session)
+    sphere = Sphere(organization_id=org.id, name="Alpha", center_x=0.4, center_y=0.6, radius=0.2)
+    session.add(sphere)
+    session.flush()
+    nodes = [
+        Node(sphere_id=sphere.id, label=f"Service {index}", position={"x": 0.5, "y": 0.5})
+        for index in range(12)
+    ]
+    session.add_all(nodes)
+    session.flush()
+    session.add_all(
+        Edge(sphere_id=sphere.id, source=source, target=target, relation_type="uses")
+        for source, target in pairwise(nodes)
+    )
+    session.commit()
+
+    result = spheres_routes.layout_sphere_nodes(sphere.id, NodeLayoutRequest(), owner, session)
+
+    assert result.updated == 12
+    points = [(item.x, item.y) for item in result.positions]
+    assert all(math.dist(point, (0.4, 0.6)) < 0.2 for point in points)
+    assert min(math.dist(a, b) for i, a in enumerate(points) for b in points[i + 1 :]) > 0.01
+    session.expire_all()
+    stored = session.get(Node, nodes[3].id)
+    assert (stored.x, stored.y) == (result.positions[3].x, result.positions[3].y)
+    assert stored.position == {"x": stored.x, "y": stored.y}
+
+    pinned = {node.id: (node.x, node.y) for node in nodes[1:]}
+    partial = spheres_routes.layout_sphere_nodes(
+        sphere.id, NodeLayoutRequest(node_ids=[nodes[0].id]), owner, session
+    )
+    assert [item.id for item in partial.positions] == [nodes[0].id]
+    session.expire_all()
+    assert {node.id: (node.x, node.y) for node in nodes[1:]} == pinned
+
+
+def test_new_nodes_without_position_are_placed_in_their_sphere(session):
+    owner, org = create_org(session)
+    sphere = Sphere(organization_id=org.id, name="Alpha", center_x=0.3, center_y=0.7, radius=0.2)
+    # Another organization's node at the same spot does not crowd this sphere.
+    other = Organization(name="Other Org", slug="other-org")
+    session.add_all([sphere, other])
+    session.flush()
+    foreign = Sphere(organization_id=other.id, name="Foreign", center_x=0.3, center_y=0.7)
+    session.add(foreign)
+    session.flush()
+    session.add(Node(sphere_id=foreign.id, label="Foreign", position={"x": 0.3, "y": 0.7}))
+    session.commit()
+
+    first = graph_routes.create_node(NodeCreate(sphere_id=sphere.id, label="First"), owner, session)
+    second = graph_routes.create_node(
+        NodeCreate(sphere_id=sphere.id, label="Second", position={}), owner, session
+    )
+    placed = [(node.position["x"], node.position["y"]) for node in (first, second)]
+    assert placed[0] == pytest.approx((0.3, 0.7))
+    assert all(math.dist(point, (0.3, 0.7)) < 0.2 for point in placed)
+    assert math.dist(*placed) > 0.02
+
+    batch = GraphBatchRequest.model_validate(
+        {
+            "operations": [
+                {
+                    "op": "create_node",
+                    "temp_id": "anchor",
+                    "node": {
+                        "sphere_id": sphere.id,
+                        "label": "Anchor",
+                        "position": {"x": 0.4, "y": 0.8},
+                    },
+                },
+                {
+                    "op": "create_node",
+                    "temp_id": "new",
+                    "node": {"sphere_id": sphere.id, "label": "New"},
+                },
+                {
+                    "op": "create_edge",
+                    "edge": {
+                        "sphere_id": sphere.id,
+                        "source_node_id": "new",
+                        "target_node_id": "anchor",
+                        "relation_type": "uses",
+                    },
+                },
+            ]
+        }
+    )
+    graph_routes.apply_graph_batch(batch, owner, session)
+
+    anchor = session.scalar(select(Node).where(Node.label == "Anchor"))
+    new = session.scalar(select(Node).where(Node.label == "New"))
+    assert (anchor.x, anchor.y) == (0.4, 0.8)
+    assert 0 < math.dist((new.x, new.y), (anchor.x, anchor.y)) < 0.15
+    assert math.dist((new.x, new.y), (0.3, 0.7)) < 0.2
+
+
+def test_batch_places_new_nodes_from_one_read_of_the_sphere(session):
+    owner, org = create_org(session)
+    sphere = Sphere(organization_id=org.id, name="Alpha", center_x=0.5, center_y=0.5, radius=0.3)
+    session.add(sphere)
+    session.flush()
+    session.add_all(
+        Node(sphere_id=sphere.id, label=f"Old {index}", position={"x": 0.5, "y": 0.5 + index / 50})
+        for index in range(5)
+    )
+    session.commit()
+
+    rtree_reads = []
+
+    def count_rtree_reads(conn, cursor, statement, parameters, context, executemany):
+        if statement.lstrip().upper().startswith("SELECT") and "nodes_rtree" in statement:
+            rtree_reads.append(statement)
+
+    engine = session.get_bind()
+    event.listen(engine, "before_cursor_execute", count_rtree_reads)
+    try:
+        batch = GraphBatchRequest.model_validate(
+            {
+                "operations": [
+                    {"op": "create_node", "node": {"sphere_id": sphere.id, "label": f"New {index}"}}
+                    for index in range(40)
+                ]
+            }
+        )
+        graph_routes.apply_graph_batch(batch, owner, session)
+    finally:
+        event.remove(engine, "before_cursor_execute", count_rtree_reads)
 
+    assert len(rtree_reads) == 1
+    new = session.scalars(select(Node).where(Node.label.startswith("New"))).all()
+    spots = {(node.x, node.y) for node in new}
+    assert len(spots) == 40
+    assert all(math.dist(spot, (0.5, 0.5)) < 0.3 for spot in spots)